@@ -0,0 +1,149 @@
+"""
+Coalesced last_activity_at updates for student sessions.
+
+Instead of an UPDATE + COMMIT on every student request, touches are kept
+in memory and written periodically with one batched statement. On
+PostgreSQL this is a single UPDATE ... FROM (VALUES ...); other dialects
+(SQLite in tests) fall back to an executemany UPDATE.
+"""
+
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, Integer, bindparam, column, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import database
+from .background_flush import PeriodicFlusher
+from .models import StudentSession
+
+# Seconds between batched writes. 0 disables coalescing (write on every request).
+STUDENT_ACTIVITY_FLUSH_SECONDS = float(os.getenv("STUDENT_ACTIVITY_FLUSH_SECONDS", "30"))
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes (SQLite) as UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class SessionActivityTracker(PeriodicFlusher):
+    """In-memory record of the newest activity time per student session id."""
+
+    label = "Student activity"
+    task_name = "student-activity-flush"
+
+    def __init__(self, flush_interval: float = STUDENT_ACTIVITY_FLUSH_SECONDS):
+        super().__init__(flush_interval)
+        self._pending: dict[int, datetime] = {}
+        self._flushing: dict[int, datetime] = {}
+        self.touches = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether touches are coalesced instead of committed immediately."""
+        return self.flush_interval > 0
+
+    def touch(self, session_pk: int, when: datetime | None = None) -> datetime:
+        """Record activity for a session and return the recorded timestamp."""
+        when = _as_utc(when or datetime.now(timezone.utc))
+        current = self._pending.get(session_pk)
+        if current is None or when > current:
+            self._pending[session_pk] = when
+        self.touches += 1
+        return when
+
+    def last_seen(self, session_pk: int) -> datetime | None:
+        """Newest activity time known in memory (not yet written), if any."""
+        candidates = [
+            ts for ts in (self._pending.get(session_pk), self._flushing.get(session_pk))
+            if ts is not None
+        ]
+        return max(candidates) if candidates else None
+
+    def newest_activity(self, session: StudentSession) -> datetime:
+        """Newest known activity time for a session, from memory or the database."""
+        stored = _as_utc(session.last_activity_at)
+        in_memory = self.last_seen(session.id)
+        if in_memory is not None and in_memory > stored:
+            return in_memory
+        return stored
+
+    async def flush(self, session_factory=None) -> int:
+        """
+        Write all pending touches in one batched UPDATE.
+
+        Returns:
+            Number of sessions written
+        """
+        if not self._pending:
+            return 0
+
+        self._flushing, self._pending = self._pending, {}
+        items = list(self._flushing.items())
+        factory = session_factory or self._session_factory or database.async_session
+        try:
+            async with factory() as db:
+                await self._write(db, items)
+                await db.commit()
+        except Exception:
+            # Keep the touches for the next round, preferring newer ones
+            for session_pk, ts in items:
+                current = self._pending.get(session_pk)
+                if current is None or ts > current:
+                    self._pending[session_pk] = ts
+            raise
+        finally:
+            self._flushing = {}
+
+        self.flushes += 1
+        self.flushed_rows += len(items)
+        return len(items)
+
+    async def _write(self, db: AsyncSession, items: list[tuple[int, datetime]]) -> None:
+        """Issue the batched UPDATE for the given (id, timestamp) pairs."""
+        table = StudentSession.__table__
+        if db.bind.dialect.name == "postgresql":
+            touched = values(
+                column("id", Integer),
+                column("ts", DateTime(timezone=True)),
+                name="touched",
+            ).data(items)
+            stmt = (
+                update(table)
+                .where(table.c.id == touched.c.id)
+                .where(table.c.last_activity_at < touched.c.ts)
+                .values(last_activity_at=touched.c.ts)
+            )
+            await db.execute(stmt)
+        else:
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("session_pk"))
+                .where(table.c.last_activity_at < bindparam("ts"))
+                .values(last_activity_at=bindparam("ts"))
+            )
+            await db.execute(
+                stmt, [{"session_pk": pk, "ts": ts} for pk, ts in items]
+            )
+
+    def clear(self) -> None:
+        """Forget all pending touches without writing them."""
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        """Return pending count and flush counters."""
+        return {
+            "enabled": self.enabled,
+            "flush_interval_seconds": self.flush_interval,
+            "pending": len(self._pending),
+            "touches": self.touches,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+        }
+
+
+activity_tracker = SessionActivityTracker()
@@ -0,0 +1,417 @@
+"""
+Aggregated attempt analytics for teachers (statics_view).
+
+All numbers are computed in the database: attempts are ranked per
+(task, student session) with window functions, folded into one row per
+session, and then aggregated per task. Only the aggregate rows reach
+Python. Results (and the students x tasks matrix, attempt_matrix.py) are
+cached per task and per task list; a new attempt for a task drops the
+cached entries that include it once its transaction commits (dropping them
+at flush time would let a read in between cache the old numbers again).
+The worker that committed drops them at once and sends the same
+invalidation to the other workers over the live feed's LISTEN/NOTIFY
+channel (live_feed.py), so their caches follow within the notification
+delay. Entries otherwise live at most ANALYTICS_CACHE_TTL_SECONDS, which
+only matters when a notification is lost (a full NOTIFY queue; a LISTEN
+reconnect clears the whole cache).
+"""
+
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from sqlalchemy import case, distinct, event, func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from .attempt_matrix import tasklist_matrix
+from .live_feed import live_feed, notify_workers
+from .models import Parsons, StudentSession, TaskAttempt, TaskListItem
+
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300"))
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "512"))
+
+# Session.info key for invalidations waiting for their transaction to commit
+_STAGED_KEY = "staged_analytics_invalidations"
+
+
+def seconds_between(start, end, dialect_name: str):
+    """SQL expression for end - start in seconds."""
+    if dialect_name == "postgresql":
+        return func.extract("epoch", end - start)
+    return (func.julianday(end) - func.julianday(start)) * 86400.0
+
+
+def epoch_seconds(column, dialect_name: str):
+    """SQL expression for a timestamp as seconds since the Unix epoch."""
+    if dialect_name == "postgresql":
+        return func.extract("epoch", column)
+    return (func.julianday(column) - 2440587.5) * 86400.0
+
+
+def _per_session(filters: list, dialect_name: str):
+    """One row per (task, student session) with attempt counts and first success / fail times."""
+    partition = (TaskAttempt.task_id, TaskAttempt.student_session_id)
+    ranked = (
+        select(
+            TaskAttempt.task_id,
+            TaskAttempt.student_session_id.label("session_id"),
+            TaskAttempt.success,
+            TaskAttempt.completed_at,
+            func.row_number()
+            .over(partition_by=partition, order_by=(TaskAttempt.completed_at, TaskAttempt.id))
+            .label("attempt_no"),
+            func.min(TaskAttempt.task_started_at)
+            .over(partition_by=partition)
+            .label("first_started_at"),
+        )
+        .where(TaskAttempt.completed_at.is_not(None), *filters)
+        .subquery("ranked")
+    )
+
+    succeeded = ranked.c.success.is_(True)
+    failed = ranked.c.success.is_(False)
+    started = func.min(ranked.c.first_started_at)
+    return (
+        select(
+            ranked.c.task_id,
+            ranked.c.session_id,
+            func.count().label("attempts"),
+            func.count(case((succeeded, 1))).label("successes"),
+            func.min(case((succeeded, ranked.c.attempt_no))).label("first_success_no"),
+            seconds_between(
+                started, func.min(case((succeeded, ranked.c.completed_at))), dialect_name
+            ).label("solve_seconds"),
+            seconds_between(
+                started, func.min(case((failed, ranked.c.completed_at))), dialect_name
+            ).label("fail_seconds"),
+        )
+        .group_by(ranked.c.task_id, ranked.c.session_id)
+        .subquery("per_session")
+    )
+
+
+def _round(value) -> float | None:
+    return round(float(value), 3) if value is not None else None
+
+
+def _empty_task(task_id: int) -> dict:
+    return {
+        "task_id": task_id,
+        "total_attempts": 0,
+        "completions": 0,
+        "students_attempted": 0,
+        "students_completed": 0,
+        "success_rate": 0.0,
+        "avg_attempts_to_first_success": None,
+        "time_to_first_success": {"avg": None, "min": None, "max": None, "median": None},
+        "time_to_first_fail": {"avg": None, "min": None, "max": None},
+    }
+
+
+async def compute_task_stats(db: AsyncSession, filters: list) -> dict[int, dict]:
+    """
+    Aggregate attempts matching filters, grouped by task.
+
+    Args:
+        db: Database session
+        filters: Extra WHERE clauses on TaskAttempt
+
+    Returns:
+        Mapping of task id -> statistics dict (tasks without attempts are absent)
+    """
+    per_session = _per_session(filters, db.bind.dialect.name)
+    c = per_session.c
+
+    summary = await db.execute(
+        select(
+            c.task_id,
+            func.sum(c.attempts).label("attempts"),
+            func.sum(c.successes).label("successes"),
+            func.count().label("students_attempted"),
+            func.count(c.first_success_no).label("students_completed"),
+            func.avg(c.first_success_no).label("avg_attempts_to_first_success"),
+            func.avg(c.solve_seconds).label("solve_avg"),
+            func.min(c.solve_seconds).label("solve_min"),
+            func.max(c.solve_seconds).label("solve_max"),
+            func.avg(c.fail_seconds).label("fail_avg"),
+            func.min(c.fail_seconds).label("fail_min"),
+            func.max(c.fail_seconds).label("fail_max"),
+        ).group_by(c.task_id)
+    )
+
+    stats: dict[int, dict] = {}
+    for row in summary:
+        attempts = int(row.attempts or 0)
+        successes = int(row.successes or 0)
+        entry = _empty_task(row.task_id)
+        entry.update(
+            total_attempts=attempts,
+            completions=successes,
+            students_attempted=row.students_attempted,
+            students_completed=row.students_completed,
+            success_rate=round(successes / attempts, 4) if attempts else 0.0,
+            avg_attempts_to_first_success=_round(row.avg_attempts_to_first_success),
+        )
+        entry["time_to_first_success"].update(
+            avg=_round(row.solve_avg), min=_round(row.solve_min), max=_round(row.solve_max)
+        )
+        entry["time_to_first_fail"].update(
+            avg=_round(row.fail_avg), min=_round(row.fail_min), max=_round(row.fail_max)
+        )
+        stats[row.task_id] = entry
+
+    # Median time to solve: the middle one or two per-session solve times
+    solved = (
+        select(
+            c.task_id,
+            c.solve_seconds,
+            func.row_number().over(partition_by=c.task_id, order_by=c.solve_seconds).label("rn"),
+            func.count().over(partition_by=c.task_id).label("n"),
+        )
+        .where(c.solve_seconds.is_not(None))
+        .subquery("solved")
+    )
+    medians = await db.execute(
+        select(solved.c.task_id, func.avg(solved.c.solve_seconds))
+        .where(solved.c.rn * 2 >= solved.c.n, solved.c.rn * 2 <= solved.c.n + 2)
+        .group_by(solved.c.task_id)
+    )
+    for task_id, median in medians:
+        stats[task_id]["time_to_first_success"]["median"] = _round(median)
+
+    return stats
+
+
+async def task_analytics(db: AsyncSession, task_id: int) -> dict:
+    """Statistics for one task over every student session."""
+    stats = await compute_task_stats(db, [TaskAttempt.task_id == task_id])
+    return stats.get(task_id) or _empty_task(task_id)
+
+
+async def tasklist_analytics(db: AsyncSession, task_list_id: int) -> dict:
+    """Per-task statistics for a task list, limited to sessions started from that list."""
+    items = await db.execute(
+        select(TaskListItem.task_id, Parsons.title)
+        .join(Parsons, Parsons.id == TaskListItem.task_id)
+        .where(TaskListItem.task_list_id == task_list_id)
+        .order_by(TaskListItem.id.asc())
+    )
+    tasks = items.all()
+
+    filters = [
+        TaskAttempt.task_id.in_(
+            select(TaskListItem.task_id).where(TaskListItem.task_list_id == task_list_id)
+        ),
+        TaskAttempt.student_session_id.in_(
+            select(StudentSession.id).where(StudentSession.task_list_id == task_list_id)
+        ),
+    ]
+    stats = await compute_task_stats(db, filters)
+
+    students = await db.execute(
+        select(func.count(distinct(TaskAttempt.student_session_id))).where(
+            TaskAttempt.completed_at.is_not(None), *filters
+        )
+    )
+
+    task_entries = []
+    for task_id, title in tasks:
+        entry = dict(stats.get(task_id) or _empty_task(task_id))
+        entry["title"] = title
+        task_entries.append(entry)
+
+    total_attempts = sum(entry["total_attempts"] for entry in task_entries)
+    completions = sum(entry["completions"] for entry in task_entries)
+    return {
+        "task_list_id": task_list_id,
+        "total_attempts": total_attempts,
+        "completions": completions,
+        "students_attempted": students.scalar_one(),
+        "success_rate": round(completions / total_attempts, 4) if total_attempts else 0.0,
+        "tasks": task_entries,
+    }
+
+
+class AnalyticsCache:
+    """TTL/LRU cache of analytics responses keyed by ("task", id), ("tasklist", id) or ("matrix", id)."""
+
+    def __init__(
+        self,
+        ttl: float = ANALYTICS_CACHE_TTL_SECONDS,
+        max_entries: int = ANALYTICS_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, int], tuple[float, dict]] = OrderedDict()
+        # task id -> cached task lists that contain it
+        self._tasklists_by_task: dict[int, set[int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _get(self, key: tuple[str, int]) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def _put(self, key: tuple[str, int], payload: dict) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def task(self, db: AsyncSession, task_id: int) -> dict:
+        """Cached statistics for one task."""
+        key = ("task", task_id)
+        payload = self._get(key)
+        if payload is None:
+            payload = await task_analytics(db, task_id)
+            self._put(key, payload)
+        return payload
+
+    async def tasklist(self, db: AsyncSession, task_list_id: int) -> dict:
+        """Cached statistics for a task list."""
+        key = ("tasklist", task_list_id)
+        payload = self._get(key)
+        if payload is None:
+            payload = await tasklist_analytics(db, task_list_id)
+            self._put(key, payload)
+            for entry in payload["tasks"]:
+                self._tasklists_by_task.setdefault(entry["task_id"], set()).add(task_list_id)
+        return payload
+
+    async def matrix(self, db: AsyncSession, task_list_id: int) -> dict:
+        """Cached students x tasks matrix of a task list."""
+        key = ("matrix", task_list_id)
+        payload = self._get(key)
+        if payload is None:
+            payload = await tasklist_matrix(db, task_list_id)
+            self._put(key, payload)
+            for column in payload["columns"]:
+                self._tasklists_by_task.setdefault(column["task_id"], set()).add(task_list_id)
+        return payload
+
+    def invalidate_task(self, task_id: int) -> None:
+        """Drop the task's statistics and every cached task list containing it."""
+        self.invalidations += 1
+        self._entries.pop(("task", task_id), None)
+        for task_list_id in self._tasklists_by_task.pop(task_id, ()):
+            self._entries.pop(("tasklist", task_list_id), None)
+            self._entries.pop(("matrix", task_list_id), None)
+
+    def invalidate_tasklist(self, task_list_id: int) -> None:
+        """Drop a task list's statistics and matrix."""
+        self.invalidations += 1
+        self._entries.pop(("tasklist", task_list_id), None)
+        self._entries.pop(("matrix", task_list_id), None)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._entries.clear()
+        self._tasklists_by_task.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+analytics_cache = AnalyticsCache()
+
+_MESSAGE_KIND = "analytics"
+
+
+def _invalidate_local(scopes: Iterable[tuple[str, int]]) -> None:
+    for scope, scope_id in scopes:
+        if scope == "task":
+            analytics_cache.invalidate_task(scope_id)
+        else:
+            analytics_cache.invalidate_tasklist(scope_id)
+
+
+def invalidate(scopes: Iterable[tuple[str, int]]) -> None:
+    """
+    Drop cached entries in this worker and every other one, after a commit.
+
+    Args:
+        scopes: ("task", task_id) or ("tasklist", task_list_id) pairs
+    """
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+    _invalidate_local(scopes)
+    live_feed.broadcast(live_feed.message(_MESSAGE_KIND, scopes=scopes))
+
+
+async def notify_invalidation(conn: AsyncConnection, scopes: Iterable[tuple[str, int]]) -> None:
+    """
+    Have every worker drop cached entries when conn's transaction commits (also
+    from the command line tools); the calling process still calls invalidate.
+    """
+    scopes = sorted(set(scopes))
+    if scopes:
+        await notify_workers(conn, live_feed.message(_MESSAGE_KIND, scopes=scopes))
+
+
+def _on_message(message: dict) -> None:
+    _invalidate_local((scope, scope_id) for scope, scope_id in message["scopes"])
+
+
+live_feed.add_handler(_MESSAGE_KIND, _on_message, reset=analytics_cache.clear)
+
+
+def _stage(target, scope: str, scope_id: int) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    session.info.setdefault(_STAGED_KEY, set()).add((scope, scope_id))
+
+
+@event.listens_for(TaskAttempt, "after_insert")
+@event.listens_for(TaskAttempt, "after_update")
+@event.listens_for(TaskAttempt, "after_delete")
+def _invalidate_attempt_task(_mapper, _connection, target: TaskAttempt) -> None:
+    """A new or changed attempt changes the statistics of its task."""
+    _stage(target, "task", target.task_id)
+
+
+@event.listens_for(TaskListItem, "after_insert")
+@event.listens_for(TaskListItem, "after_delete")
+def _invalidate_list_membership(_mapper, _connection, target: TaskListItem) -> None:
+    """Adding or removing a task changes the list's statistics."""
+    _stage(target, "tasklist", target.task_list_id)
+
+
+@event.listens_for(StudentSession, "after_insert")
+def _invalidate_list_sessions(_mapper, _connection, target: StudentSession) -> None:
+    """A student joining a list adds a row to its matrix."""
+    if target.task_list_id is not None:
+        _stage(target, "tasklist", target.task_list_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_staged(session: Session) -> None:
+    """Entries are dropped only once the changes are visible to other readers."""
+    invalidate(session.info.pop(_STAGED_KEY, ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_staged(session: Session) -> None:
+    session.info.pop(_STAGED_KEY, None)
@@ -0,0 +1,457 @@
+"""
+Columnar in-memory copy of task_attempts for vectorized cohort analytics.
+
+Each worker keeps one NumPy array per column (attempt id, task, student
+session, task list, start / completion epoch seconds, success). A refresh
+reads only attempts with an id above the highest one already loaded, so
+keeping the copy current costs one index range scan. Group-bys,
+histograms and pivot tables then run over whole arrays without touching
+the database or building Python objects per attempt.
+
+Attempt ids from concurrent transactions can become visible out of order,
+so every refresh re-reads the last ATTEMPT_COLUMNS_OVERLAP ids and skips
+those already loaded. A regrade (regrade.py) rewrites the verdicts of a
+task's attempts in place and notifies every worker (over the live feed's
+LISTEN/NOTIFY channel); the next refresh re-reads the verdicts of that
+task's loaded attempts. Deletions (cascades from removed sessions or
+tasks, the session purge) are picked up by a full reload every
+ATTEMPT_COLUMNS_RELOAD_SECONDS, which a background task builds next to the
+loaded arrays and swaps in, so no request waits for it.
+"""
+
+import asyncio
+import os
+import time
+from collections.abc import Iterable
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from . import database
+from .analytics import epoch_seconds
+from .background_flush import PeriodicFlusher
+from .live_feed import live_feed, notify_workers
+from .models import StudentSession, TaskAttempt
+
+# Minimum seconds between incremental refreshes
+ATTEMPT_COLUMNS_REFRESH_SECONDS = float(os.getenv("ATTEMPT_COLUMNS_REFRESH_SECONDS", "1"))
+# Seconds between background full reloads (to drop deleted attempts); 0 disables them
+ATTEMPT_COLUMNS_RELOAD_SECONDS = float(os.getenv("ATTEMPT_COLUMNS_RELOAD_SECONDS", "600"))
+# Trailing ids re-read on every refresh to catch late commits
+ATTEMPT_COLUMNS_OVERLAP = int(os.getenv("ATTEMPT_COLUMNS_OVERLAP", "1000"))
+ATTEMPT_COLUMNS_BATCH_ROWS = int(os.getenv("ATTEMPT_COLUMNS_BATCH_ROWS", "10000"))
+
+# Column name -> dtype. Missing task lists are -1, missing timestamps NaN,
+# success is 1 / 0 / -1 (unknown).
+COLUMNS = {
+    "attempt_id": np.int64,
+    "task_id": np.int64,
+    "session_id": np.int64,
+    "task_list_id": np.int64,
+    "started": np.float64,
+    "completed": np.float64,
+    "success": np.int8,
+}
+
+_MESSAGE_KIND = "attempt_verdicts"
+
+_SUCCESS = case((TaskAttempt.success.is_(True), 1), (TaskAttempt.success.is_(False), 0), else_=-1)
+
+# Dimensions accepted by pivot()
+DIMENSIONS = ("task_id", "session_id", "task_list_id", "bucket")
+VALUES = ("attempts", "successes", "success_rate")
+
+
+def _epoch(value: datetime) -> float:
+    """Epoch seconds; naive datetimes are taken as UTC like the stored timestamps."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _factorize(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sorted distinct values and each value's position among them.
+
+    Ids and time buckets are dense integers, so a presence table over their
+    range replaces the sort in np.unique when the range is not much larger
+    than the input.
+    """
+    if len(values) == 0:
+        return values, np.zeros(0, np.intp)
+    low, high = values.min(), values.max()
+    span = int(high - low) + 1
+    if span > max(4 * len(values), 1 << 16):
+        return np.unique(values, return_inverse=True)
+    offsets = values - low
+    present = np.zeros(span, bool)
+    present[offsets] = True
+    position = np.cumsum(present) - 1
+    return np.flatnonzero(present) + low, position[offsets]
+
+
+class AttemptColumns(PeriodicFlusher):
+    """Growable column arrays of task attempts with vectorized aggregations."""
+
+    label = "Attempt columns reload"
+    task_name = "attempt-columns-reload"
+    # A reload on shutdown would only be thrown away
+    flush_on_stop = False
+
+    def __init__(
+        self,
+        refresh_interval: float = ATTEMPT_COLUMNS_REFRESH_SECONDS,
+        reload_interval: float = ATTEMPT_COLUMNS_RELOAD_SECONDS,
+        overlap: int = ATTEMPT_COLUMNS_OVERLAP,
+    ):
+        super().__init__(reload_interval)
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+        self.overlap = overlap
+        self._arrays = {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+        self._size = 0
+        self.max_attempt_id = 0
+        self._refreshed_at = 0.0
+        self._reloaded_at = 0.0
+        self._lock = asyncio.Lock()
+        # Tasks whose loaded verdicts were changed by a regrade
+        self._changed_tasks: set[int] = set()
+        self.refreshes = 0
+        self.reloads = 0
+        self.rows_loaded = 0
+        self.verdicts_updated = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def column(self, name: str) -> np.ndarray:
+        """Loaded values of one column (a view, do not modify)."""
+        return self._arrays[name][: self._size]
+
+    def extend(self, columns: dict[str, Iterable]) -> int:
+        """
+        Append attempts given as one sequence per column.
+
+        Returns:
+            Number of attempts appended
+        """
+        batch = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+        count = len(batch["attempt_id"])
+        if count == 0:
+            return 0
+
+        needed = self._size + count
+        capacity = len(self._arrays["attempt_id"])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2, 1024)
+            for name, array in self._arrays.items():
+                grown = np.empty(capacity, array.dtype)
+                grown[: self._size] = array[: self._size]
+                self._arrays[name] = grown
+        for name, values in batch.items():
+            self._arrays[name][self._size : needed] = values
+        self._size = needed
+        self.max_attempt_id = max(self.max_attempt_id, int(batch["attempt_id"].max()))
+        self.rows_loaded += count
+        return count
+
+    async def refresh(self, db: AsyncSession, force: bool = False) -> int:
+        """
+        Load attempts added since the last refresh (everything on the first one)
+        and re-read the verdicts of re-graded tasks.
+
+        Args:
+            db: Database session
+            force: Refresh even if the last one was less than refresh_interval ago
+
+        Returns:
+            Number of attempts appended
+        """
+        async with self._lock:
+            now = time.monotonic()
+            if not force and self._refreshed_at and now - self._refreshed_at < self.refresh_interval:
+                return 0
+            if not self._reloaded_at:
+                # Later full reloads run in the background (flush)
+                self._reloaded_at = now
+                self.reloads += 1
+            if self._changed_tasks:
+                await self._update_verdicts(db)
+            appended = await self._load_new(db)
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+            return appended
+
+    async def _load_new(self, db: AsyncSession) -> int:
+        """Append the attempts above the loaded ids (minus the overlap) that are not loaded yet."""
+        low = max(0, self.max_attempt_id - self.overlap) if self._size else 0
+        known = self.column("attempt_id")
+        known = known[known > low]
+
+        dialect_name = db.bind.dialect.name
+        stmt = (
+            select(
+                TaskAttempt.id,
+                TaskAttempt.task_id,
+                TaskAttempt.student_session_id,
+                func.coalesce(StudentSession.task_list_id, -1),
+                epoch_seconds(TaskAttempt.task_started_at, dialect_name),
+                epoch_seconds(TaskAttempt.completed_at, dialect_name),
+                _SUCCESS,
+            )
+            .join(StudentSession, StudentSession.id == TaskAttempt.student_session_id)
+            .where(TaskAttempt.id > low)
+            .order_by(TaskAttempt.id.asc())
+            .execution_options(yield_per=ATTEMPT_COLUMNS_BATCH_ROWS)
+        )
+
+        appended = 0
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            batch = {
+                name: np.asarray(values, dtype=dtype)
+                for (name, dtype), values in zip(COLUMNS.items(), zip(*rows))
+            }
+            if len(known):
+                fresh = ~np.isin(batch["attempt_id"], known)
+                batch = {name: values[fresh] for name, values in batch.items()}
+            appended += self.extend(batch)
+        return appended
+
+    async def _update_verdicts(self, db: AsyncSession) -> None:
+        """Overwrite the loaded success values of the re-graded tasks."""
+        task_ids = sorted(self._changed_tasks)
+        result = await db.execute(
+            select(TaskAttempt.id, _SUCCESS).where(
+                TaskAttempt.task_id.in_(task_ids), TaskAttempt.id <= self.max_attempt_id
+            )
+        )
+        rows = result.all()
+        self._changed_tasks.difference_update(task_ids)
+        if not rows or not self._size:
+            return
+        ids = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+        verdicts = np.fromiter((row[1] for row in rows), np.int8, len(rows))
+
+        # Loaded ids are almost sorted (late commits are appended out of order)
+        loaded = self.column("attempt_id")
+        order = np.argsort(loaded, kind="stable")
+        found = np.minimum(np.searchsorted(loaded, ids, sorter=order), len(loaded) - 1)
+        positions = order[found]
+        matches = loaded[positions] == ids
+        self._arrays["success"][positions[matches]] = verdicts[matches]
+        self.verdicts_updated += int(matches.sum())
+
+    def mark_changed(self, task_ids: Iterable[int]) -> None:
+        """Re-read these tasks' verdicts on the next refresh (after a regrade)."""
+        self._changed_tasks.update(task_ids)
+
+    def _mark_all_changed(self) -> None:
+        """Verdict messages may have been missed: re-read every loaded task's verdicts."""
+        self.mark_changed(np.unique(self.column("task_id")).tolist())
+
+    async def flush(self, session_factory=None) -> int:
+        """
+        Reload every attempt into new arrays and swap them in (drops deleted attempts).
+        Runs every reload_interval seconds in the background task started by start().
+
+        Returns:
+            Number of attempts loaded
+        """
+        if not self._reloaded_at:
+            # Nothing loaded yet; the first refresh loads everything
+            return 0
+        factory = session_factory or self._session_factory or database.async_read_session
+        reloaded = AttemptColumns(overlap=self.overlap)
+        async with factory() as db:
+            await reloaded._load_new(db)
+
+        async with self._lock:
+            # Attempts appended by refreshes while the reload ran
+            newer = self.column("attempt_id") > reloaded.max_attempt_id
+            reloaded.extend({name: self.column(name)[newer] for name in COLUMNS})
+            self._arrays, self._size = reloaded._arrays, reloaded._size
+            self.max_attempt_id = reloaded.max_attempt_id
+            self.rows_loaded += reloaded.rows_loaded
+            self._reloaded_at = time.monotonic()
+            self.reloads += 1
+            return self._size
+
+    def mask(
+        self,
+        task_list_id: int | None = None,
+        task_ids: Iterable[int] | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> np.ndarray:
+        """
+        Boolean selector over the loaded attempts; only completed attempts match.
+
+        Args:
+            task_list_id: Only attempts from sessions started from this task list
+            task_ids: Only attempts of these tasks
+            start: Only attempts completed at or after this time
+            end: Only attempts completed before this time
+        """
+        completed = self.column("completed")
+        selected = ~np.isnan(completed)
+        if task_list_id is not None:
+            selected &= self.column("task_list_id") == task_list_id
+        if task_ids is not None:
+            selected &= np.isin(self.column("task_id"), np.fromiter(task_ids, np.int64))
+        if start is not None:
+            selected &= completed >= _epoch(start)
+        if end is not None:
+            selected &= completed < _epoch(end)
+        return selected
+
+    def task_summary(self, selected: np.ndarray) -> dict[int, dict]:
+        """
+        Attempts, successes, distinct sessions and median solve time per task.
+
+        Solve time is completion minus start of each successful attempt.
+        """
+        task_ids = self.column("task_id")[selected]
+        if len(task_ids) == 0:
+            return {}
+        session_ids = self.column("session_id")[selected]
+        succeeded = self.column("success")[selected] == 1
+
+        tasks, task_index = _factorize(task_ids)
+        attempts = np.bincount(task_index, minlength=len(tasks))
+        successes = np.bincount(task_index, weights=succeeded, minlength=len(tasks)).astype(np.int64)
+        _, session_index = _factorize(session_ids)
+        session_count = int(session_index.max()) + 1
+        if len(tasks) * session_count <= 1 << 26:
+            seen = np.zeros(len(tasks) * session_count, bool)
+            seen[task_index * session_count + session_index] = True
+            sessions = seen.reshape(len(tasks), session_count).sum(axis=1)
+        else:
+            pairs = np.unique(task_index * session_count + session_index)
+            sessions = np.bincount(pairs // session_count, minlength=len(tasks))
+
+        medians = np.full(len(tasks), np.nan)
+        solve = (self.column("completed") - self.column("started"))[selected][succeeded]
+        if len(solve):
+            solved_tasks = task_index[succeeded]
+            # Sort by solve time, then stably by task (narrow integer keys get a
+            # radix sort): each task's times end up contiguous and ordered
+            order = np.argsort(solve)
+            keys = solved_tasks[order].astype(np.min_scalar_type(len(tasks)))
+            order = order[np.argsort(keys, kind="stable")]
+            solved_tasks, solve = solved_tasks[order], solve[order]
+            groups, first, counts = np.unique(solved_tasks, return_index=True, return_counts=True)
+            medians[groups] = (solve[first + (counts - 1) // 2] + solve[first + counts // 2]) / 2
+
+        return {
+            int(task_id): {
+                "task_id": int(task_id),
+                "attempts": int(attempts[i]),
+                "successes": int(successes[i]),
+                "sessions": int(sessions[i]),
+                "success_rate": round(successes[i] / attempts[i], 4),
+                "median_solve_seconds": None if np.isnan(medians[i]) else round(float(medians[i]), 3),
+            }
+            for i, task_id in enumerate(tasks)
+        }
+
+    def solve_time_histogram(self, selected: np.ndarray, bins: int = 20) -> tuple[np.ndarray, np.ndarray]:
+        """Bin edges and counts of the solve times of successful attempts."""
+        succeeded = selected & (self.column("success") == 1)
+        solve = self.column("completed")[succeeded] - self.column("started")[succeeded]
+        solve = solve[~np.isnan(solve)]
+        if len(solve) == 0:
+            return np.zeros(bins + 1), np.zeros(bins, np.int64)
+        counts, edges = np.histogram(np.maximum(solve, 0), bins=bins)
+        return edges, counts
+
+    def _dimension(self, name: str, selected: np.ndarray, bucket_seconds: int) -> np.ndarray:
+        if name == "bucket":
+            # Bucket numbers are dense; pivot() scales them back to epoch seconds
+            return np.floor(self.column("completed")[selected] / bucket_seconds).astype(np.int64)
+        if name not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {name}, use one of: {', '.join(DIMENSIONS)}")
+        return self.column(name)[selected]
+
+    def pivot(
+        self,
+        selected: np.ndarray,
+        index: str,
+        columns: str,
+        value: str = "attempts",
+        bucket_seconds: int = 3600,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cross-tabulate the selected attempts.
+
+        Args:
+            selected: Mask from mask()
+            index: Row dimension ("task_id", "session_id", "task_list_id" or "bucket")
+            columns: Column dimension (same choices)
+            value: "attempts", "successes" or "success_rate"
+            bucket_seconds: Width of "bucket" (completion time, epoch aligned)
+
+        Returns:
+            Row keys, column keys and the len(rows) x len(columns) matrix
+        """
+        if value not in VALUES:
+            raise ValueError(f"Unknown value {value}, use one of: {', '.join(VALUES)}")
+        row_keys, row_index = _factorize(self._dimension(index, selected, bucket_seconds))
+        col_keys, col_index = _factorize(self._dimension(columns, selected, bucket_seconds))
+        if index == "bucket":
+            row_keys = row_keys * bucket_seconds
+        if columns == "bucket":
+            col_keys = col_keys * bucket_seconds
+        shape = (len(row_keys), len(col_keys))
+        cells = row_index * len(col_keys) + col_index
+
+        attempts = np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape)
+        if value == "attempts":
+            return row_keys, col_keys, attempts
+        succeeded = self.column("success")[selected] == 1
+        successes = np.bincount(cells, weights=succeeded, minlength=shape[0] * shape[1]).reshape(shape)
+        if value == "successes":
+            return row_keys, col_keys, successes.astype(np.int64)
+        rate = np.divide(successes, attempts, out=np.zeros(shape), where=attempts > 0)
+        return row_keys, col_keys, rate
+
+    def clear(self) -> None:
+        """Drop every loaded attempt; the next refresh reloads from the database."""
+        self._size = 0
+        self.max_attempt_id = 0
+        self._refreshed_at = 0.0
+        self._reloaded_at = 0.0
+        self._changed_tasks.clear()
+
+    def stats(self) -> dict:
+        """Return size and refresh counters."""
+        return {
+            "attempts": self._size,
+            "max_attempt_id": self.max_attempt_id,
+            "memory_bytes": sum(array.nbytes for array in self._arrays.values()),
+            "refreshes": self.refreshes,
+            "reloads": self.reloads,
+            "rows_loaded": self.rows_loaded,
+            "verdicts_updated": self.verdicts_updated,
+        }
+
+
+attempt_columns = AttemptColumns()
+
+
+async def notify_verdict_changes(conn: AsyncConnection, task_ids: Iterable[int]) -> None:
+    """
+    Have every worker re-read these tasks' verdicts when conn's transaction
+    commits (also from the command line); the calling process still calls
+    attempt_columns.mark_changed.
+    """
+    await notify_workers(conn, live_feed.message(_MESSAGE_KIND, task_ids=sorted(set(task_ids))))
+
+
+def _on_message(message: dict) -> None:
+    attempt_columns.mark_changed(message["task_ids"])
+
+
+live_feed.add_handler(_MESSAGE_KIND, _on_message, reset=attempt_columns._mark_all_changed)
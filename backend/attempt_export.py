@@ -0,0 +1,220 @@
+"""
+Streaming export of a task list's attempts (CSV, NDJSON or Parquet).
+
+Rows of task_attempts joined with student_sessions and parsons are read
+through a server-side cursor in batches of EXPORT_BATCH_ROWS and encoded
+batch by batch, so the response starts immediately and memory stays
+bounded by one batch regardless of how many attempts are exported.
+Parquet needs the optional pyarrow package; each batch becomes one row
+group.
+"""
+
+import csv
+import io
+import json
+import os
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Parsons, StudentSession, TaskAttempt
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "2000"))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+COLUMNS = (
+    "attempt_id",
+    "task_id",
+    "task_title",
+    "student_session_id",
+    "session_uuid",
+    "username",
+    "task_started_at",
+    "completed_at",
+    "success",
+    "submitted_order",
+    "submitted_inputs",
+)
+
+
+def parquet_available() -> bool:
+    """Whether pyarrow is installed."""
+    return pyarrow is not None
+
+
+def export_query(
+    task_list_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    task_ids: Sequence[int] | None = None,
+):
+    """SELECT for the export, ordered by attempt id. start/end bound completed_at (end exclusive)."""
+    stmt = (
+        select(
+            TaskAttempt.id.label("attempt_id"),
+            TaskAttempt.task_id,
+            Parsons.title.label("task_title"),
+            TaskAttempt.student_session_id,
+            StudentSession.session_id.label("session_uuid"),
+            StudentSession.username,
+            TaskAttempt.task_started_at,
+            TaskAttempt.completed_at,
+            TaskAttempt.success,
+            TaskAttempt.submitted_order,
+            TaskAttempt.submitted_inputs,
+        )
+        .join(StudentSession, StudentSession.id == TaskAttempt.student_session_id)
+        .join(Parsons, Parsons.id == TaskAttempt.task_id)
+        .where(StudentSession.task_list_id == task_list_id)
+        .order_by(TaskAttempt.id.asc())
+    )
+    if start is not None:
+        stmt = stmt.where(TaskAttempt.completed_at >= start)
+    if end is not None:
+        stmt = stmt.where(TaskAttempt.completed_at < end)
+    if task_ids:
+        stmt = stmt.where(TaskAttempt.task_id.in_(task_ids))
+    return stmt
+
+
+def _plain(row) -> dict:
+    """Row as JSON-friendly values (timestamps as ISO 8601, UUID as text)."""
+    return {
+        "attempt_id": row.attempt_id,
+        "task_id": row.task_id,
+        "task_title": row.task_title,
+        "student_session_id": row.student_session_id,
+        "session_uuid": str(row.session_uuid),
+        "username": row.username,
+        "task_started_at": row.task_started_at.isoformat() if row.task_started_at else None,
+        "completed_at": row.completed_at.isoformat() if row.completed_at else None,
+        "success": row.success,
+        "submitted_order": row.submitted_order,
+        "submitted_inputs": row.submitted_inputs,
+    }
+
+
+def _encode_csv(rows, header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(COLUMNS)
+    for row in rows:
+        values = _plain(row)
+        for key in ("submitted_order", "submitted_inputs"):
+            if values[key] is not None:
+                values[key] = json.dumps(values[key], separators=(",", ":"))
+        writer.writerow(values[column] for column in COLUMNS)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(rows) -> bytes:
+    return "".join(
+        json.dumps(_plain(row), separators=(",", ":")) + "\n" for row in rows
+    ).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_schema():
+    return pyarrow.schema(
+        [
+            ("attempt_id", pyarrow.int64()),
+            ("task_id", pyarrow.int64()),
+            ("task_title", pyarrow.string()),
+            ("student_session_id", pyarrow.int64()),
+            ("session_uuid", pyarrow.string()),
+            ("username", pyarrow.string()),
+            ("task_started_at", pyarrow.timestamp("us", tz="UTC")),
+            ("completed_at", pyarrow.timestamp("us", tz="UTC")),
+            ("success", pyarrow.bool_()),
+            # JSON documents as text
+            ("submitted_order", pyarrow.string()),
+            ("submitted_inputs", pyarrow.string()),
+        ]
+    )
+
+
+def _parquet_batch(rows, schema):
+    columns = {column: [] for column in COLUMNS}
+    for row in rows:
+        for column in COLUMNS:
+            value = getattr(row, column)
+            if column == "session_uuid":
+                value = str(value)
+            elif column in ("submitted_order", "submitted_inputs") and value is not None:
+                value = json.dumps(value, separators=(",", ":"))
+            columns[column].append(value)
+    return pyarrow.Table.from_pydict(columns, schema=schema)
+
+
+async def stream_attempts(db: AsyncSession, stmt, export_format: str) -> AsyncIterator[bytes]:
+    """
+    Encode the export query's rows batch by batch.
+
+    Args:
+        db: Session to stream with (kept open until the generator finishes)
+        stmt: Query from export_query
+        export_format: "csv", "ndjson" or "parquet"
+    """
+    result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_ROWS))
+
+    if export_format == "parquet":
+        schema = _parquet_schema()
+        sink = _ChunkSink()
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+        try:
+            async for rows in result.partitions():
+                writer.write_table(_parquet_batch(rows, schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+        return
+
+    header = True
+    if export_format == "csv":
+        async for rows in result.partitions():
+            yield _encode_csv(rows, header)
+            header = False
+        if header:
+            yield _encode_csv([], header)
+        return
+
+    async for rows in result.partitions():
+        yield _encode_ndjson(rows)
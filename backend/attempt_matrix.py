@@ -0,0 +1,131 @@
+"""
+Students x tasks matrix of a task list (teacher heatmap).
+
+One aggregate query returns a row per (student session, task) with the
+attempt and success counts, left-joined from the list's sessions so that
+students without attempts still get a row. The sparse rows are pivoted
+into dense row-major arrays with NumPy: each session and task is mapped to
+its row / column index with searchsorted and the counts are scattered in
+one assignment. The response carries the row and column labels once and
+two integer grids (cell state and attempt count), so the payload grows
+with the number of cells, not with the number of attempts.
+"""
+
+import numpy as np
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Parsons, StudentSession, TaskAttempt, TaskListItem
+
+# Cell states, as stored in the "state" grid
+UNTOUCHED = 0
+ATTEMPTED = 1
+SOLVED = 2
+CELL_STATES = {UNTOUCHED: "untouched", ATTEMPTED: "attempted", SOLVED: "solved"}
+
+
+def pivot_cells(
+    row_ids: np.ndarray,
+    column_ids: np.ndarray,
+    cell_rows: np.ndarray,
+    cell_columns: np.ndarray,
+    cell_values: np.ndarray,
+) -> np.ndarray:
+    """
+    Scatter sparse (row id, column id, value) cells into a dense grid.
+
+    Args:
+        row_ids: Sorted unique row ids
+        column_ids: Column ids in display order (unique)
+        cell_rows, cell_columns, cell_values: One entry per cell; cells whose
+            ids are not among row_ids / column_ids are dropped
+    """
+    grid = np.zeros((len(row_ids), len(column_ids)), dtype=np.int64)
+    if not len(cell_rows) or not len(row_ids) or not len(column_ids):
+        return grid
+    column_order = np.argsort(column_ids, kind="stable")
+    sorted_columns = column_ids[column_order]
+
+    rows = np.searchsorted(row_ids, cell_rows)
+    columns = np.searchsorted(sorted_columns, cell_columns)
+    rows_clipped = np.minimum(rows, len(row_ids) - 1)
+    columns_clipped = np.minimum(columns, len(sorted_columns) - 1)
+    known = (row_ids[rows_clipped] == cell_rows) & (sorted_columns[columns_clipped] == cell_columns)
+
+    grid[rows_clipped[known], column_order[columns_clipped[known]]] = cell_values[known]
+    return grid
+
+
+async def tasklist_matrix(db: AsyncSession, task_list_id: int) -> dict:
+    """
+    Attempt counts and solved / attempted / untouched state for every session x task of a list.
+
+    Returns:
+        {"task_list_id", "rows": [{session_id, username}], "columns": [{task_id, title}],
+        "states": CELL_STATES, "state": [[...]], "attempts": [[...]]}, grids row-major
+        with one row per session (in join order) and one column per task (in list order)
+    """
+    result = await db.execute(
+        select(TaskListItem.task_id, Parsons.title)
+        .join(Parsons, Parsons.id == TaskListItem.task_id)
+        .where(TaskListItem.task_list_id == task_list_id)
+        .order_by(TaskListItem.id.asc())
+    )
+    columns = list({task_id: title for task_id, title in result}.items())
+
+    list_tasks = select(TaskListItem.task_id).where(TaskListItem.task_list_id == task_list_id)
+    result = await db.execute(
+        select(
+            StudentSession.id,
+            StudentSession.username,
+            TaskAttempt.task_id,
+            func.count(TaskAttempt.id),
+            func.count(case((TaskAttempt.success.is_(True), 1))),
+        )
+        .outerjoin(
+            TaskAttempt,
+            and_(
+                TaskAttempt.student_session_id == StudentSession.id,
+                TaskAttempt.task_id.in_(list_tasks),
+            ),
+        )
+        .where(StudentSession.task_list_id == task_list_id)
+        .group_by(StudentSession.id, StudentSession.username, TaskAttempt.task_id)
+        .order_by(StudentSession.id.asc())
+    )
+    cells = result.all()
+
+    usernames = {session_id: username for session_id, username, *_ in cells}
+    row_ids = np.fromiter(usernames, dtype=np.int64, count=len(usernames))
+    column_ids = np.array([task_id for task_id, _ in columns], dtype=np.int64)
+    cell_rows = np.fromiter((cell[0] for cell in cells), dtype=np.int64, count=len(cells))
+    cell_columns = np.fromiter(
+        (-1 if cell[2] is None else cell[2] for cell in cells), dtype=np.int64, count=len(cells)
+    )
+    attempts = pivot_cells(
+        row_ids,
+        column_ids,
+        cell_rows,
+        cell_columns,
+        np.fromiter((cell[3] for cell in cells), dtype=np.int64, count=len(cells)),
+    )
+    solved = pivot_cells(
+        row_ids,
+        column_ids,
+        cell_rows,
+        cell_columns,
+        np.fromiter((cell[4] for cell in cells), dtype=np.int64, count=len(cells)),
+    )
+    state = np.where(solved > 0, SOLVED, np.where(attempts > 0, ATTEMPTED, UNTOUCHED))
+
+    return {
+        "task_list_id": task_list_id,
+        "rows": [
+            {"session_id": session_id, "username": username}
+            for session_id, username in usernames.items()
+        ],
+        "columns": [{"task_id": task_id, "title": title} for task_id, title in columns],
+        "states": CELL_STATES,
+        "state": state.tolist(),
+        "attempts": attempts.tolist(),
+    }
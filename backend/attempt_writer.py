@@ -0,0 +1,118 @@
+"""
+Optional write-behind buffer for TaskAttempt submissions.
+
+When enabled, submit_test_result only puts the attempt on a bounded
+asyncio queue and returns. A background task flushes the queue as
+multi-row INSERTs every ATTEMPT_FLUSH_INTERVAL_MS milliseconds or
+ATTEMPT_FLUSH_MAX_ROWS rows, whichever comes first, so a lab full of
+students pressing Run costs a handful of commits per second instead of
+one per click. The queue is drained on application shutdown; a batch
+that still fails after ATTEMPT_FLUSH_RETRIES tries is dropped and counted
+in failed_rows (see background_flush.py).
+
+Queued attempts get their id up front (allocate_id: the table's sequence
+on PostgreSQL), so the response carries attempt_id in both modes. The
+block moves of the run travel with the queued row and are written in the
+same transaction as the attempt, since a separate move request could
+otherwise arrive before the attempt exists. Allocated ids commit up to a
+flush interval out of order, which the columnar store's overlap covers
+(attempt_columns.py).
+"""
+
+import asyncio
+import os
+from typing import Any
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .analytics import invalidate as invalidate_analytics
+from .background_flush import BatchWriter
+from .models import TaskAttempt
+from .move_events import write_move_events
+from .task_stats import record_attempts
+
+ATTEMPT_WRITE_BEHIND = os.getenv("ATTEMPT_WRITE_BEHIND", "false").lower() == "true"
+ATTEMPT_QUEUE_MAX_SIZE = int(os.getenv("ATTEMPT_QUEUE_MAX_SIZE", "10000"))
+ATTEMPT_FLUSH_INTERVAL_MS = int(os.getenv("ATTEMPT_FLUSH_INTERVAL_MS", "200"))
+ATTEMPT_FLUSH_MAX_ROWS = int(os.getenv("ATTEMPT_FLUSH_MAX_ROWS", "500"))
+ATTEMPT_ENQUEUE_TIMEOUT_MS = int(os.getenv("ATTEMPT_ENQUEUE_TIMEOUT_MS", "100"))
+ATTEMPT_FLUSH_RETRIES = 3
+
+
+class AttemptQueueFullError(Exception):
+    """Raised when the buffer stays full for longer than the enqueue timeout."""
+
+
+class AttemptWriteBuffer(BatchWriter):
+    """Bounded queue plus background flusher for TaskAttempt rows."""
+
+    label = "Attempt"
+    task_name = "attempt-write-behind"
+    retries = ATTEMPT_FLUSH_RETRIES
+
+    def __init__(
+        self,
+        max_size: int = ATTEMPT_QUEUE_MAX_SIZE,
+        flush_interval_ms: int = ATTEMPT_FLUSH_INTERVAL_MS,
+        flush_max_rows: int = ATTEMPT_FLUSH_MAX_ROWS,
+        enqueue_timeout_ms: int = ATTEMPT_ENQUEUE_TIMEOUT_MS,
+    ):
+        super().__init__(flush_interval_ms / 1000, flush_max_rows, max_queued=max_size)
+        self.max_size = max_size
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self.enqueued = 0
+        self.rejected = 0
+        # Highest id handed out without a sequence (SQLite, single process)
+        self._last_id = 0
+
+    async def allocate_id(self, db: AsyncSession) -> int:
+        """Reserve the id of an attempt that is written later."""
+        if db.bind.dialect.name == "postgresql":
+            result = await db.execute(
+                text("SELECT nextval(pg_get_serial_sequence('task_attempts', 'id'))")
+            )
+            return result.scalar_one()
+        result = await db.execute(select(func.max(TaskAttempt.id)))
+        self._last_id = max(self._last_id, result.scalar() or 0) + 1
+        return self._last_id
+
+    async def submit(self, row: dict[str, Any], moves: list[tuple] = ()) -> None:
+        """
+        Queue one TaskAttempt row (a dict of column values) and the move
+        event records of its run (see move_events.move_records).
+
+        Waits up to the enqueue timeout for space; raises
+        AttemptQueueFullError if the queue is still full after that.
+        """
+        try:
+            await self._put([(row, list(moves))], timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AttemptQueueFullError("Attempt queue is full") from None
+        self.enqueued += 1
+
+    async def _write(self, session, rows: list[tuple[dict[str, Any], list[tuple]]]) -> None:
+        """One multi-row INSERT plus its task_stats upsert, then the attempts' moves."""
+        attempts = [attempt for attempt, _ in rows]
+        await record_attempts(session, attempts)
+        await session.execute(insert(TaskAttempt), attempts)
+        await write_move_events(session, [record for _, moves in rows for record in moves])
+
+    def _written(self, rows: list[tuple[dict[str, Any], list[tuple]]]) -> None:
+        # Core INSERTs bypass the ORM events that invalidate analytics
+        invalidate_analytics(("task", attempt["task_id"]) for attempt, _ in rows)
+
+    def stats(self) -> dict:
+        """Return queue depth and flush latency metrics."""
+        return {
+            "enabled": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            **self.flush_stats(),
+        }
+
+
+attempt_writer = AttemptWriteBuffer()
@@ -13,6 +13,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from .database import get_db
 from .models import Teacher
+from .password_hashing import password_hasher
+from .principal_cache import TeacherPrincipal, principal_cache
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-please")
@@ -38,10 +40,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 async def get_current_user(
     request: Request,
     db: AsyncSession = Depends(get_db)
-) -> Teacher:
+) -> TeacherPrincipal:
     """
     Dependency to get the current authenticated user from JWT token.
     Checks cookies first (for browser navigation), then Authorization header (for API calls).
+    Returns a cached TeacherPrincipal when the teacher was seen recently.
     Raises HTTPException if token is invalid or user not found.
     """
     credentials_exception = HTTPException(
@@ -70,6 +73,11 @@ async def get_current_user(
     except jwt.InvalidTokenError:
         raise credentials_exception
     
+    # Recently authenticated teachers are served from the principal cache
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+
     # Fetch user from database
     result = await db.execute(
         select(Teacher).where(Teacher.username == username)
@@ -79,13 +87,16 @@ async def get_current_user(
     if user is None or not user.is_active:
         raise credentials_exception
     
-    return user
+    principal = TeacherPrincipal.from_teacher(user)
+    principal_cache.put(principal)
+    return principal
 
 
 async def authenticate_user(username: str, password: str, db: AsyncSession) -> Optional[Teacher]:
     """
     Authenticate a user by username and password.
     Returns the Teacher object if valid, None otherwise.
+    Raises PasswordHasherOverloaded if the hashing pool is at capacity.
     """
     result = await db.execute(
         select(Teacher).where(Teacher.username == username)
@@ -95,11 +106,12 @@ async def authenticate_user(username: str, password: str, db: AsyncSession) -> O
     if not user or not user.is_active:
         return None
     
-    if not user.verify_password(password):
+    # bcrypt runs on the password hasher's thread pool, not the event loop
+    if not await password_hasher.verify(password, user.password_hash):
         return None
     
     return user
 
 
 # Type alias for current user dependency (FastAPI template style)
-CurrentUser = Annotated[Teacher, Depends(get_current_user)]
+CurrentUser = Annotated[TeacherPrincipal, Depends(get_current_user)]
@@ -0,0 +1,218 @@
+"""
+Background flushing shared by the write-behind buffers and coalescing trackers.
+
+Two shapes of deferred write run next to the request handlers:
+
+- BatchWriter: rows are queued by the requests and a background task
+  writes them in batches of up to flush_max_rows, collected for at most
+  flush_interval seconds, each batch in its own transaction
+  (attempt_writer.py, move_events.py). A batch that still fails after
+  `retries` tries is dropped and counted in failed_rows.
+- PeriodicFlusher: state is merged in memory and flush() writes it every
+  flush_interval seconds, keeping it for the next round when the write
+  fails (activity_tracker.py, solve_times.py). The same loop also runs
+  periodic reloads off the request path (attempt_columns.py).
+
+Both write whatever is still pending when they are stopped.
+"""
+
+import asyncio
+import time
+from typing import Any
+
+from . import database
+
+
+class BatchWriter:
+    """Queue of row batches plus a background task writing them in transactions."""
+
+    # Log prefix, e.g. "Attempt" gives "Attempt flush failed (1/3): ..."
+    label = "Batch"
+    task_name = "batch-writer"
+    retries = 3
+
+    def __init__(self, flush_interval: float, flush_max_rows: int, max_queued: int = 0):
+        self.flush_interval = flush_interval
+        self.flush_max_rows = flush_max_rows
+        # Queued batches before put waits (0: unbounded)
+        self.max_queued = max_queued
+        self._queue: asyncio.Queue | None = None
+        self._queued_rows = 0
+        self._task: asyncio.Task | None = None
+        self._session_factory = None
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        """Whether the background flusher is active."""
+        return self._task is not None and not self._task.done()
+
+    def start(self, session_factory=None) -> None:
+        """
+        Start the background flusher on the running event loop.
+
+        Args:
+            session_factory: async_sessionmaker to write with (default: database.async_session)
+        """
+        if self.running:
+            return
+        self._session_factory = session_factory or database.async_session
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._queued_rows = 0
+        self._task = asyncio.create_task(self._run(), name=self.task_name)
+
+    async def stop(self) -> None:
+        """Stop accepting rows, flush everything still queued and wait for the flusher."""
+        if self._task is None:
+            return
+        await self._queue.put(None)  # Sentinel: drain and exit
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def _put(self, rows: list, timeout: float) -> None:
+        """Queue a batch, waiting up to timeout seconds for space (asyncio.TimeoutError)."""
+        await asyncio.wait_for(self._queue.put(rows), timeout=timeout)
+        self._queued_rows += len(rows)
+
+    def _put_nowait(self, rows: list) -> None:
+        self._queue.put_nowait(rows)
+        self._queued_rows += len(rows)
+
+    async def _run(self) -> None:
+        """Collect batches for up to flush_interval and write them together."""
+        stopping = False
+        while not stopping:
+            batch = await self._queue.get()
+            if batch is None:
+                stopping = True
+                rows = []
+            else:
+                rows = list(batch)
+
+            deadline = time.monotonic() + self.flush_interval
+            while not stopping and len(rows) < self.flush_max_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if batch is None:
+                    stopping = True
+                else:
+                    rows.extend(batch)
+
+            if stopping:
+                # Drain whatever is left behind the sentinel
+                while not self._queue.empty():
+                    batch = self._queue.get_nowait()
+                    if batch is not None:
+                        rows.extend(batch)
+
+            self._queued_rows -= len(rows)
+            for start in range(0, len(rows), self.flush_max_rows):
+                await self._flush(rows[start:start + self.flush_max_rows])
+
+    async def _flush(self, rows: list) -> None:
+        """Write one chunk in its own transaction, retrying on failure."""
+        if not rows:
+            return
+        for attempt in range(1, self.retries + 1):
+            started = time.perf_counter()
+            try:
+                async with self._session_factory() as session:
+                    await self._write(session, rows)
+                    await session.commit()
+            except Exception as e:
+                print(f"{self.label} flush failed ({attempt}/{self.retries}): {e}")
+                if attempt == self.retries:
+                    print(f"{self.label} flush gave up, dropping {len(rows)} rows")
+                    self.failed_rows += len(rows)
+                    return
+                await asyncio.sleep(0.1 * attempt)
+                continue
+
+            self._written(rows)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+            return
+
+    async def _write(self, session, rows: list) -> None:
+        """Write rows in session's transaction (committed by the caller)."""
+        raise NotImplementedError
+
+    def _written(self, rows: list) -> None:
+        """Called once a chunk is committed."""
+
+    def flush_stats(self) -> dict[str, Any]:
+        """Flush counters and latencies; failed_rows were dropped after the last retry."""
+        return {
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+        }
+
+
+class PeriodicFlusher:
+    """Calls flush() every flush_interval seconds in a background task, and once more on stop."""
+
+    # Log prefix, e.g. "Student activity" gives "Student activity flush failed: ..."
+    label = "Periodic"
+    task_name = "periodic-flush"
+    # Whether stop() runs a last flush (pending writes) or just ends the task
+    flush_on_stop = True
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._task: asyncio.Task | None = None
+        self._session_factory = None
+
+    async def flush(self, session_factory=None) -> int:
+        """Write the pending state; returns the number of rows written."""
+        raise NotImplementedError
+
+    def start(self, session_factory=None) -> None:
+        """Start the periodic flush task on the running event loop (not with flush_interval <= 0)."""
+        if self.flush_interval <= 0 or self._task is not None:
+            return
+        self._session_factory = session_factory
+        self._task = asyncio.create_task(self._run(), name=self.task_name)
+
+    async def stop(self) -> None:
+        """Stop the periodic task and write whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if not self.flush_on_stop:
+            return
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"{self.label} flush failed on shutdown: {e}")
+
+    async def _run(self) -> None:
+        """Flush every flush_interval seconds."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"{self.label} flush failed: {e}")
@@ -0,0 +1,218 @@
+"""
+Structural fast-path verdict for Parsons submissions, before any code runs.
+
+The submitted code is what the browser assembles from the solution column:
+one line per block, indented with four spaces per level, with the faded
+blanks (___) filled in. Comparing it line by line with the task's blocks in
+correct_solution["correct_order"] (and any correct_solution
+["alternative_orders"], lists of block ids that are accepted as well)
+gives one of two outcomes:
+
+- "wrong": the submission is not made of the task's blocks - a line that
+  matches no block (edited code, an empty blank), a block used twice, or a
+  block of the solution left out (a Parsons solution uses every block of an
+  accepted order). The result names the first such block.
+- "execute": everything else, and the doctests decide. This covers blocks
+  that are all present but in another order or indentation (it may be a
+  valid order the task does not list), filled blanks (their values are
+  checked by running the code, blocks only fix the text around them), and
+  exact matches of an accepted order.
+
+A submission is never passed on its blocks alone; the doctests are the
+only source of a passing verdict. The tasks shipped in parsons_probs all
+have blanks and are written flush-left, so comparing blocks could not
+confirm one of their solutions anyway: the check only skips execution for
+submissions that cannot be right.
+"""
+
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+STRUCTURAL_FAST_PATH = os.getenv("STRUCTURAL_FAST_PATH", "true").lower() == "true"
+
+BLANK = "___"
+
+WRONG = "wrong"
+EXECUTE = "execute"
+
+
+@dataclass(frozen=True, slots=True)
+class StructuralVerdict:
+    """Outcome of the block comparison; block is 1-based in the submission."""
+
+    outcome: str
+    reason: str
+    block: int | None = None
+
+    @property
+    def final(self) -> bool:
+        """Whether the verdict replaces running the doctests."""
+        return self.outcome != EXECUTE
+
+    def result(self) -> dict:
+        """The verdict as a grading result (see grading.run_doctests)."""
+        return {
+            "status": "fail",
+            "header": f"Wrong at block {self.block}",
+            "details": self.reason,
+            "passed": 0,
+            "failed": 0,
+            "examples": [],
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class _ReferenceLine:
+    block_id: str
+    code: str
+    pattern: re.Pattern | None  # Set for lines with blanks
+
+    def matches(self, code: str) -> bool:
+        if self.pattern is None:
+            return code == self.code
+        return self.pattern.fullmatch(code) is not None
+
+
+def _reference_lines(blocks: dict[str, dict], order: list[str]) -> list[_ReferenceLine] | None:
+    lines = []
+    for block_id in order:
+        block = blocks.get(block_id)
+        if block is None or not isinstance(block.get("code"), str):
+            return None
+        for line in block["code"].split("\n"):
+            code = line.strip()
+            pattern = None
+            if BLANK in code:
+                pattern = re.compile(r"(.*\S.*?)".join(re.escape(part) for part in code.split(BLANK)))
+            lines.append(_ReferenceLine(block_id, code, pattern))
+    return lines
+
+
+def _submitted_lines(submitted_code: str) -> list[str]:
+    """The code of every non-empty line, without its indentation."""
+    return [code for code in (line.strip() for line in submitted_code.split("\n")) if code]
+
+
+def _assign(reference: list[_ReferenceLine], submitted: list[str]) -> list[int | None]:
+    """
+    Match submitted lines to distinct reference lines (maximum bipartite matching,
+    so that lines fitting several blank templates are never misassigned).
+    """
+    candidates = []
+    for position, code in enumerate(submitted):
+        fitting = [index for index, line in enumerate(reference) if line.matches(code)]
+        # Prefer the reference line at the same position
+        if position in fitting:
+            fitting.remove(position)
+            fitting.insert(0, position)
+        candidates.append(fitting)
+
+    owner: dict[int, int] = {}
+
+    def place(position: int, seen: set[int]) -> bool:
+        for index in candidates[position]:
+            if index in seen:
+                continue
+            seen.add(index)
+            if index not in owner or place(owner[index], seen):
+                owner[index] = position
+                return True
+        return False
+
+    for position in range(len(submitted)):
+        place(position, set())
+    matched: list[int | None] = [None] * len(submitted)
+    for index, position in owner.items():
+        matched[position] = index
+    return matched
+
+
+def _compare(reference: list[_ReferenceLine], submitted: list[str]) -> StructuralVerdict:
+    matched = _assign(reference, submitted)
+    for position, index in enumerate(matched):
+        if index is None:
+            code = submitted[position]
+            if any(line.matches(code) for line in reference):
+                reason = "This block is used more than once."
+            else:
+                reason = "This line is not one of the task's blocks (or a blank is empty)."
+            return StructuralVerdict(WRONG, reason, position + 1)
+    if len(submitted) < len(reference):
+        missing = min(set(range(len(reference))) - set(matched))
+        block = min(missing, len(submitted)) + 1
+        return StructuralVerdict(WRONG, "A block of the solution is missing.", block)
+    return StructuralVerdict(EXECUTE, "Every block of an accepted order is used once.")
+
+
+class StructureChecker:
+    """Compares submissions with the stored block orders and counts the outcomes."""
+
+    def __init__(self, enabled: bool = STRUCTURAL_FAST_PATH):
+        self.enabled = enabled
+        self.outcomes: Counter[str] = Counter()
+
+    def check(
+        self, code_blocks: dict | None, correct_solution: dict | None, submitted_code: str
+    ) -> StructuralVerdict:
+        """
+        Verdict for a submission (see the module docstring for the policy).
+
+        Args:
+            code_blocks: Parsons.code_blocks, {"blocks": [{"id", "code", "indent", ...}], ...}
+            correct_solution: Parsons.correct_solution, {"correct_order": [block ids], ...}
+            submitted_code: Code assembled by the browser from the solution column
+        """
+        verdict = self._check(code_blocks, correct_solution, submitted_code)
+        self.outcomes[verdict.outcome] += 1
+        return verdict
+
+    def _check(self, code_blocks, correct_solution, submitted_code: str) -> StructuralVerdict:
+        if not self.enabled:
+            return StructuralVerdict(EXECUTE, "Structural check disabled.")
+        if not isinstance(code_blocks, dict) or not isinstance(correct_solution, dict):
+            return StructuralVerdict(EXECUTE, "The task has no blocks.")
+        blocks = {
+            block["id"]: block
+            for block in code_blocks.get("blocks") or []
+            if isinstance(block, dict) and "id" in block
+        }
+        orders = [
+            correct_solution.get("correct_order"),
+            *(correct_solution.get("alternative_orders") or []),
+        ]
+        references = [
+            reference
+            for reference in (
+                _reference_lines(blocks, order) for order in orders if isinstance(order, list) and order
+            )
+            if reference
+        ]
+        if not references:
+            return StructuralVerdict(EXECUTE, "The task has no block order.")
+
+        submitted = _submitted_lines(submitted_code)
+        verdicts = [_compare(reference, submitted) for reference in references]
+        # Wrong only if every accepted order rules it out
+        for verdict in verdicts:
+            if verdict.outcome == EXECUTE:
+                return verdict
+        return verdicts[0]
+
+    def clear(self) -> None:
+        """Reset the counters."""
+        self.outcomes.clear()
+
+    def stats(self) -> dict:
+        """Return how often each outcome was given."""
+        checks = sum(self.outcomes.values())
+        return {
+            "enabled": self.enabled,
+            "checks": checks,
+            **{outcome: self.outcomes[outcome] for outcome in (WRONG, EXECUTE)},
+            "skipped_execution_rate": self.outcomes[WRONG] / checks if checks else 0.0,
+        }
+
+
+structure_checker = StructureChecker()
@@ -0,0 +1,239 @@
+"""
+Normalized-code fingerprints of submitted solutions.
+
+A submission is parsed with ast and printed back with ast.unparse, which
+drops comments and fixes whitespace, literal spacing and quote style.
+User-chosen names (variables, arguments, functions) are renamed v0, v1, ...
+in order of first appearance, while builtins, attributes and keyword
+argument names are kept. Submissions that differ only in layout or naming
+therefore share a fingerprint, which is stored in an indexed column so
+common wrong (and right) answers of a task can be counted with one GROUP BY.
+
+Code that does not parse (often the interesting wrong answers) falls back
+to a whitespace-normalized form that keeps indentation.
+
+New submissions are fingerprinted when they are stored. Attempts from
+before the column existed keep a NULL fingerprint, and are left out of the
+clusters, until the backfill command has reached them. It commits in
+batches and can be run (or stopped and resumed) while the server is up.
+
+Usage:
+    python -m backend.code_fingerprint backfill   # fingerprint existing attempts
+"""
+
+import ast
+import asyncio
+import builtins
+import hashlib
+import re
+import sys
+import textwrap
+
+from sqlalchemy import bindparam, distinct, func, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from .models import StudentSession, TaskAttempt, TaskList
+
+# Longer submissions are fingerprinted without parsing
+CODE_FINGERPRINT_MAX_CHARS = 20_000
+BACKFILL_BATCH_ROWS = 1000
+
+_BUILTINS = frozenset(dir(builtins))
+_SPACES = re.compile(r"[ \t]+")
+
+
+class _Renamer(ast.NodeTransformer):
+    """Renames user-chosen identifiers to v0, v1, ... in order of first appearance."""
+
+    def __init__(self):
+        self.names: dict[str, str] = {}
+
+    def _rename(self, name: str) -> str:
+        if name in _BUILTINS:
+            return name
+        if name not in self.names:
+            self.names[name] = f"v{len(self.names)}"
+        return self.names[name]
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        node.id = self._rename(node.id)
+        return node
+
+    def visit_arg(self, node: ast.arg) -> ast.arg:
+        node.arg = self._rename(node.arg)
+        node.annotation = None
+        return node
+
+    def _visit_definition(self, node):
+        node.name = self._rename(node.name)
+        return self.generic_visit(node)
+
+    visit_FunctionDef = _visit_definition
+    visit_AsyncFunctionDef = _visit_definition
+    visit_ClassDef = _visit_definition
+
+    def _visit_scope_names(self, node):
+        node.names = [self._rename(name) for name in node.names]
+        return node
+
+    visit_Global = _visit_scope_names
+    visit_Nonlocal = _visit_scope_names
+
+
+def _normalize_text(code: str) -> str:
+    """Whitespace-only normalization for code that does not parse."""
+    lines = []
+    for line in textwrap.dedent(code.expandtabs(4)).splitlines():
+        stripped = line.strip()
+        if stripped and not stripped.startswith("#"):
+            indent = len(line) - len(line.lstrip())
+            lines.append(" " * indent + _SPACES.sub(" ", stripped))
+    return "\n".join(lines)
+
+
+def normalize_code(code: str) -> str:
+    """Canonical form of a submission (prefixed "raw:" if it could not be parsed)."""
+    if len(code) <= CODE_FINGERPRINT_MAX_CHARS:
+        try:
+            tree = ast.parse(textwrap.dedent(code.expandtabs(4)))
+            return ast.unparse(_Renamer().visit(tree))
+        except (SyntaxError, ValueError, RecursionError):
+            pass
+    return "raw:" + _normalize_text(code)
+
+
+def code_fingerprint(code: str | None) -> str | None:
+    """32-character hex fingerprint of the normalized code, or None without code."""
+    if code is None:
+        return None
+    return hashlib.blake2b(normalize_code(code).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def submitted_code(submitted_inputs: dict | None) -> str | None:
+    """The code of a stored submission, if any."""
+    if isinstance(submitted_inputs, dict) and isinstance(submitted_inputs.get("code"), str):
+        return submitted_inputs["code"]
+    return None
+
+
+async def answer_clusters(db: AsyncSession, task_id: int, teacher_id: int, limit: int = 10) -> dict:
+    """
+    Most common failing and passing answer variants of a task, counting only
+    attempts from sessions in the teacher's task lists (the example code is a
+    student's verbatim submission).
+
+    Returns:
+        {"task_id", "failing": [...], "passing": [...]}, each entry with
+        fingerprint, attempts, sessions and the code of the earliest attempt
+    """
+    grouped = (
+        select(
+            TaskAttempt.success,
+            TaskAttempt.code_fingerprint,
+            func.count().label("attempts"),
+            func.count(distinct(TaskAttempt.student_session_id)).label("sessions"),
+            func.min(TaskAttempt.id).label("example_id"),
+        )
+        .join(StudentSession, StudentSession.id == TaskAttempt.student_session_id)
+        .join(TaskList, TaskList.id == StudentSession.task_list_id)
+        .where(
+            TaskAttempt.task_id == task_id,
+            TaskAttempt.code_fingerprint.is_not(None),
+            TaskAttempt.success.is_not(None),
+            TaskList.teacher_id == teacher_id,
+        )
+        .group_by(TaskAttempt.success, TaskAttempt.code_fingerprint)
+        .subquery("grouped")
+    )
+    ranked = select(
+        grouped,
+        func.row_number()
+        .over(
+            partition_by=grouped.c.success,
+            order_by=(grouped.c.attempts.desc(), grouped.c.example_id.asc()),
+        )
+        .label("rank"),
+    ).subquery("ranked")
+    result = await db.execute(
+        select(ranked).where(ranked.c.rank <= limit).order_by(ranked.c.rank.asc())
+    )
+    rows = result.all()
+
+    examples = {}
+    if rows:
+        result = await db.execute(
+            select(TaskAttempt.id, TaskAttempt.submitted_inputs).where(
+                TaskAttempt.id.in_([row.example_id for row in rows])
+            )
+        )
+        examples = {attempt_id: submitted_code(inputs) for attempt_id, inputs in result}
+
+    clusters = {"task_id": task_id, "failing": [], "passing": []}
+    for row in rows:
+        clusters["passing" if row.success else "failing"].append(
+            {
+                "fingerprint": row.code_fingerprint,
+                "attempts": row.attempts,
+                "sessions": row.sessions,
+                "example_code": examples.get(row.example_id),
+            }
+        )
+    return clusters
+
+
+async def backfill_code_fingerprints(engine: AsyncEngine, batch_rows: int = BACKFILL_BATCH_ROWS) -> int:
+    """
+    Fingerprint attempts stored before the column existed, committing every
+    batch_rows attempts, so the command can be stopped and run again.
+
+    Returns:
+        Number of attempts fingerprinted
+    """
+    stmt = (
+        update(TaskAttempt.__table__)
+        .where(TaskAttempt.__table__.c.id == bindparam("attempt_id"))
+        .values(code_fingerprint=bindparam("fingerprint"))
+    )
+    updated = 0
+    last_id = 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                select(TaskAttempt.id, TaskAttempt.submitted_inputs)
+                .where(TaskAttempt.code_fingerprint.is_(None), TaskAttempt.id > last_id)
+                .order_by(TaskAttempt.id.asc())
+                .limit(batch_rows)
+            )
+            rows = result.all()
+            if not rows:
+                return updated
+            last_id = rows[-1].id
+
+            params = []
+            for attempt_id, submitted_inputs in rows:
+                fingerprint = code_fingerprint(submitted_code(submitted_inputs))
+                if fingerprint is not None:
+                    params.append({"attempt_id": attempt_id, "fingerprint": fingerprint})
+            if params:
+                await conn.execute(stmt, params)
+                updated += len(params)
+        print(f"Fingerprinted {updated} attempts (up to id {last_id})")
+
+
+async def main(argv: list[str]) -> None:
+    """Entry point for the backfill command."""
+    from .database import engine
+
+    if argv[:1] != ["backfill"]:
+        print("Usage: python -m backend.code_fingerprint backfill")
+        return
+
+    try:
+        count = await backfill_code_fingerprints(engine)
+        print(f"Fingerprinted {count} attempts")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
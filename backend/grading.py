@@ -0,0 +1,727 @@
+"""
+Server-side doctest grading in sandboxed, pre-forked worker processes.
+
+The browser grades with js/doctest-grader.js: prepareCode splices the
+submitted function body into the task's function header (its docstring
+holds the doctests) and a Pyodide worker runs doctest.testmod. prepare_code
+rebuilds exactly the same program here, and run_doctests runs its
+doctests with a collecting DocTestRunner that returns one result per
+example instead of doctest's text report. Tasks loaded by migrate_tasks
+also carry their doctest examples pre-parsed (Parsons.test_cases); those
+are run directly against the executed program, skipping doctest's
+docstring discovery, parsing and runner machinery.
+
+GRADER_WORKERS worker processes are started once (by default through the
+forkserver, so they never inherit the application's threads or sockets,
+without preloading the application's __main__), replace their environment
+with GRADER_ENVIRONMENT (so settings such as SECRET_KEY and DATABASE_URL
+are not visible) and, where the kernel allows it, move into an empty
+network namespace.
+Each grading is run in a fresh fork of a worker, so the student's code
+never sees state left behind by another submission. Before running the
+code the fork:
+
+- sets RLIMIT_CPU (GRADER_CPU_SECONDS), RLIMIT_AS (GRADER_MEMORY_MB),
+  RLIMIT_FSIZE 0, RLIMIT_NPROC 0 and RLIMIT_CORE 0,
+- closes every inherited file descriptor except its result pipe,
+- installs an audit hook that refuses sockets, subprocesses, ctypes,
+  opening files for writing and reading files outside the Python
+  installation's library directories (no /proc/*/environ, no application
+  files),
+- arms a wall-clock alarm of GRADER_TIMEOUT_SECONDS.
+
+The worker kills forks that outlive the timeout, and the pool replaces
+workers that die or stop answering. The sandbox protects the server; the
+student's code still runs in the same process as its own grader, so a
+submission written to tamper with its own verdict can do so. The server's
+verdict is therefore no more trustworthy than the browser's, and
+GRADE_ON_SUBMIT (store it instead of the browser's on submit) is off by
+default until the comparison runs outside the student's process.
+
+Results travel as JSON (never pickle) from the fork to the worker and on
+to the application.
+"""
+
+import asyncio
+import ctypes
+import doctest
+import io
+import json
+import linecache
+import multiprocessing
+import os
+import resource
+import select
+import signal
+import sys
+import sysconfig
+import time
+import traceback
+import types
+from contextlib import redirect_stderr, redirect_stdout
+
+# Grade submissions on the server and store that verdict instead of the browser's
+# (off: the verdict can still be forged by the submitted code, see above)
+GRADE_ON_SUBMIT = os.getenv("GRADE_ON_SUBMIT", "false").lower() == "true"
+GRADER_WORKERS = int(os.getenv("GRADER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Gradings waiting for a worker before new ones are rejected
+GRADER_MAX_QUEUED = int(os.getenv("GRADER_MAX_QUEUED", "256"))
+GRADER_TIMEOUT_SECONDS = float(os.getenv("GRADER_TIMEOUT_SECONDS", "5"))
+GRADER_CPU_SECONDS = int(os.getenv("GRADER_CPU_SECONDS", "2"))
+GRADER_MEMORY_MB = int(os.getenv("GRADER_MEMORY_MB", "512"))
+GRADER_START_METHOD = os.getenv("GRADER_START_METHOD", "forkserver")
+# Longest expected / got / details text kept in a result
+GRADER_MAX_OUTPUT_CHARS = int(os.getenv("GRADER_MAX_OUTPUT_CHARS", "2000"))
+
+PROGRAM_FILENAME = "<exec>"
+# The whole environment of the worker processes; nothing is inherited
+GRADER_ENVIRONMENT = {"PATH": os.defpath, "LC_ALL": "C.UTF-8"}
+# Extra time the pool grants a worker on top of the grading timeout
+_WORKER_GRACE_SECONDS = 2.0
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+# Graded once by each worker so that every fork inherits warm doctest / re caches
+_WARMUP_HEADER = 'def double(x):\n    """\n    >>> double(2)\n    4\n    """'
+_WARMUP_CODE = "def double(x):\n    return x * 2"
+_BLOCKED_AUDIT_EVENTS = frozenset(
+    {
+        "socket.__new__",
+        "socket.connect",
+        "socket.bind",
+        "socket.getaddrinfo",
+        "os.system",
+        "os.exec",
+        "os.posix_spawn",
+        "os.fork",
+        "os.forkpty",
+        "os.kill",
+        "os.killpg",
+        "subprocess.Popen",
+        "ctypes.dlopen",
+        "ctypes.cdata",
+        "os.remove",
+        "os.rename",
+        "os.rmdir",
+        "shutil.rmtree",
+    }
+)
+
+
+class GraderOverloaded(Exception):
+    """Raised when too many gradings are already waiting for a worker."""
+
+
+class InvalidSubmission(Exception):
+    """The submitted code cannot be spliced into the function header."""
+
+
+class _Deadline(KeyboardInterrupt):
+    """Raised inside a grading fork when its time is up.
+
+    A KeyboardInterrupt subclass because doctest's runner reports every
+    other exception as an example failure and carries on.
+    """
+
+
+def _next_unindented_line(lines: list[str], start: int) -> int:
+    """Index of the next line that is neither empty nor indented (len(lines) if none)."""
+    line_num = start
+    while line_num < len(lines):
+        line = lines[line_num]
+        if not (line == "" or line[0] in " \t\n"):
+            break
+        line_num += 1
+    return line_num
+
+
+def _docstring_end(lines: list[str]) -> int:
+    """Index of the line after the last docstring quote (-1 without a docstring)."""
+    start_line = -1
+    in_docstring = False
+    for i, line in enumerate(lines):
+        if '"""' in line.strip():
+            if in_docstring:
+                start_line = i + 1
+                continue
+            in_docstring = True
+    return start_line
+
+
+def prepare_code(submitted_code: str, code_header: str) -> tuple[str, int]:
+    """
+    Splice the submitted function body into the task's function header,
+    as prepareCode in js/doctest-grader.js does.
+
+    Returns:
+        (program, start_line): the program and the index of its first submitted line
+
+    Raises:
+        InvalidSubmission: With the message the browser grader would show
+    """
+    lines = code_header.split("\n")
+    start_line = _docstring_end(lines)
+    if start_line < 0:
+        raise InvalidSubmission("The task's function header has no docstring with tests")
+
+    code_lines = (submitted_code + "\n").split("\n")
+    if not ("def" in code_lines[0] or "class" in code_lines[0]):
+        raise InvalidSubmission("First code line must be `def` or `class` declaration")
+    # The def / class line comes from the header
+    code_lines.pop(0)
+
+    if _next_unindented_line(code_lines, 0) != len(code_lines):
+        raise InvalidSubmission(
+            "All lines in a function or class definition should be indented at least once. "
+            "It looks like you have a line that has no indentation."
+        )
+
+    end_of_replaced = _next_unindented_line(lines, start_line)
+    program = lines[:start_line] + code_lines + lines[end_of_replaced:]
+    return "\n".join(program), start_line
+
+
+def _clip(text: str) -> str:
+    if len(text) <= GRADER_MAX_OUTPUT_CHARS:
+        return text
+    return text[:GRADER_MAX_OUTPUT_CHARS] + "\n... (output truncated)"
+
+
+def failure_result(header: str, details: str = "") -> dict:
+    """A result for a submission whose doctests could not run."""
+    return {
+        "status": "fail",
+        "header": header,
+        "details": _clip(details),
+        "passed": 0,
+        "failed": 0,
+        "examples": [],
+    }
+
+
+def _error_details(error: BaseException, start_line: int) -> str:
+    """"Error at line N:" plus the error, N counted in the submitted code (extractError)."""
+    frames = [
+        frame for frame in traceback.extract_tb(error.__traceback__)
+        if frame.filename == PROGRAM_FILENAME
+    ]
+    line = error.lineno if isinstance(error, SyntaxError) else (frames[-1].lineno if frames else None)
+    report = traceback.format_exception_only(type(error), error)
+    if isinstance(error, SyntaxError) and report and report[0].lstrip().startswith("File"):
+        report = report[1:]
+    if line is None:
+        return "".join(report).rstrip()
+    return f"Error at line {line - (start_line - 1)}:\n" + "".join(report).rstrip()
+
+
+class _CollectingRunner(doctest.DocTestRunner):
+    """DocTestRunner that records one result per example instead of printing a report."""
+
+    def __init__(self):
+        super().__init__(verbose=False, optionflags=0)
+        self.examples: list[dict] = []
+
+    def _record(self, test, example, got: str, passed: bool) -> None:
+        line = example.lineno + 1 + (test.lineno or 0)
+        self.examples.append(
+            {
+                "source": example.source.rstrip("\n"),
+                "expected": _clip(example.want.rstrip("\n")),
+                "got": _clip(got.rstrip("\n")),
+                "passed": passed,
+                "line": line,
+            }
+        )
+
+    def report_start(self, out, test, example):
+        pass
+
+    def report_success(self, out, test, example, got):
+        self._record(test, example, got, True)
+
+    def report_failure(self, out, test, example, got):
+        self._record(test, example, got, False)
+
+    def report_unexpected_exception(self, out, test, example, exc_info):
+        got = "Traceback (most recent call last):\n  ...\n" + "".join(
+            traceback.format_exception_only(exc_info[0], exc_info[1])
+        )
+        self._record(test, example, got, False)
+
+
+def _details(examples: list[dict]) -> str:
+    """Text report of the failed examples, like the browser grader shows."""
+    blocks = []
+    for example in examples:
+        if not example["passed"]:
+            blocks.append(
+                f"❌ Failed example (line {example['line']}):\n    {example['source']}\n"
+                f"Expected:\n    {example['expected']}\nGot:\n    {example['got']}"
+            )
+    return "\n\n".join(blocks)
+
+
+def _run_test_cases(globs: dict, test_cases: list[dict], output: io.StringIO) -> list[dict]:
+    """
+    Run pre-parsed doctest examples (see migrate_tasks.extract_test_cases) in one namespace,
+    checking output and exceptions as DocTestRunner does.
+    """
+    checker = doctest.OutputChecker()
+    examples = []
+    for number, case in enumerate(test_cases):
+        flags = 0
+        for name, enabled in (case.get("options") or {}).items():
+            if enabled:
+                flags |= doctest.OPTIONFLAGS_BY_NAME.get(name, 0)
+        output.seek(0)
+        output.truncate()
+        exception = None
+        try:
+            # "single" mode echoes expression values through sys.displayhook, like doctest
+            exec(compile(case["source"], f"<example {number}>", "single", dont_inherit=True), globs)
+        except KeyboardInterrupt:
+            raise
+        except BaseException as e:
+            exception = e
+
+        got = output.getvalue()
+        if got and not got.endswith("\n"):
+            got += "\n"
+        if exception is None:
+            passed = checker.check_output(case["want"], got, flags)
+        else:
+            formatted = traceback.format_exception_only(type(exception), exception)
+            expected_exception = case.get("exc_msg") is not None
+            # Like doctest, only the last line ("ValueError: ...") is compared
+            passed = expected_exception and checker.check_output(case["exc_msg"], formatted[-1], flags)
+            # Reported like _CollectingRunner: unexpected exceptions without the printed output
+            got = (got if expected_exception else "") + "Traceback (most recent call last):\n  ...\n" + "".join(formatted)
+        examples.append(
+            {
+                "source": case["source"].rstrip("\n"),
+                "expected": _clip(case["want"].rstrip("\n")),
+                "got": _clip(got.rstrip("\n")),
+                "passed": passed,
+                "line": case["line"],
+            }
+        )
+    return examples
+
+
+def run_doctests(program: str, start_line: int, test_cases: list[dict] | None = None) -> dict:
+    """
+    Execute a prepared program as __main__ and run its doctests (doctest.testmod semantics).
+
+    Runs in the calling process without any sandbox; the pool calls it in a sandboxed fork.
+
+    Args:
+        program, start_line: As returned by prepare_code
+        test_cases: Pre-parsed examples of the function header; without them the
+            doctests are found and parsed from the program's docstrings
+
+    Returns:
+        {"status": "pass" | "fail", "header", "details", "passed", "failed", "examples"}
+        with examples [{"source", "expected", "got", "passed", "line"}]
+    """
+    try:
+        code = compile(program, PROGRAM_FILENAME, "exec")
+    except (SyntaxError, ValueError) as e:
+        return failure_result("Syntax error", _error_details(e, start_line))
+
+    module = types.ModuleType("__main__")
+    module.__file__ = PROGRAM_FILENAME
+    # Lets DocTestFinder and tracebacks see the program's source lines
+    linecache.cache[PROGRAM_FILENAME] = (
+        len(program), None, program.splitlines(keepends=True), PROGRAM_FILENAME
+    )
+    output = io.StringIO()
+    runner = _CollectingRunner()
+    # The program runs as __main__, like the script the browser grader executes
+    real_main = sys.modules.get("__main__")
+    sys.modules["__main__"] = module
+    try:
+        try:
+            with redirect_stdout(output), redirect_stderr(output):
+                exec(code, module.__dict__)
+        except _Deadline:
+            raise
+        except BaseException as e:
+            return failure_result("Error running tests", _error_details(e, start_line))
+
+        if test_cases is not None:
+            with redirect_stdout(output), redirect_stderr(output):
+                examples = _run_test_cases(dict(module.__dict__), test_cases, output)
+        else:
+            tests = doctest.DocTestFinder(exclude_empty=True).find(module, "__main__")
+            with redirect_stderr(output):
+                for test in sorted(tests, key=lambda t: t.name):
+                    runner.run(test, out=output.write, clear_globs=True)
+            examples = runner.examples
+    finally:
+        if real_main is not None:
+            sys.modules["__main__"] = real_main
+
+    passed = sum(example["passed"] for example in examples)
+    failed = len(examples) - passed
+    return {
+        "status": "pass" if examples and not failed else "fail",
+        "header": f"{passed} of {len(examples)} tests passed",
+        "details": _clip(_details(examples)),
+        "passed": passed,
+        "failed": failed,
+        "examples": examples,
+    }
+
+
+def timeout_result(timeout: float) -> dict:
+    return failure_result(
+        "Infinite loop",
+        f"Your code did not finish executing within {timeout:g} seconds. "
+        "Please look to see if you accidentally coded an infinite loop.",
+    )
+
+
+def _library_roots() -> tuple[str, ...]:
+    """Directories of the standard library and installed packages (readable while grading)."""
+    paths = sysconfig.get_paths()
+    roots = {
+        os.path.realpath(paths[key])
+        for key in ("stdlib", "platstdlib", "purelib", "platlib")
+        if key in paths
+    }
+    return tuple(sorted(root.rstrip(os.sep) + os.sep for root in roots))
+
+
+_READABLE_ROOTS = _library_roots()
+
+
+def _audit(event: str, args: tuple) -> None:
+    if event in _BLOCKED_AUDIT_EVENTS:
+        raise PermissionError(f"{event} is not allowed while grading")
+    if event == "open" and args:
+        path = args[0]
+        mode = args[1] if len(args) > 1 else None
+        flags = args[2] if len(args) > 2 else 0
+        writing = (isinstance(mode, str) and any(c in mode for c in "wax+")) or (
+            isinstance(flags, int) and flags & (os.O_WRONLY | os.O_RDWR | os.O_CREAT)
+        )
+        if writing:
+            raise PermissionError("Writing files is not allowed while grading")
+        # Already open descriptors (only the result pipe survives _enter_sandbox)
+        if isinstance(path, int):
+            return
+        # Imports read modules from the library directories; nothing else is readable
+        if not os.path.realpath(os.fsdecode(path)).startswith(_READABLE_ROOTS):
+            raise PermissionError("Reading files is not allowed while grading")
+
+
+def _deadline(_signum, _frame):
+    raise _Deadline()
+
+
+def _enter_sandbox(result_fd: int, cpu_seconds: int, memory_mb: int, timeout: float) -> None:
+    """Restrict the current (fork) process before it runs submitted code."""
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    keep = sorted({0, 1, 2, result_fd})
+    for low, high in zip(keep, keep[1:] + [resource.getrlimit(resource.RLIMIT_NOFILE)[0]]):
+        os.closerange(low + 1, high)
+
+    memory = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    signal.signal(signal.SIGXCPU, _deadline)
+    signal.signal(signal.SIGALRM, _deadline)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    sys.addaudithook(_audit)
+
+
+def _grade_in_fork(
+    program: str,
+    start_line: int,
+    test_cases: list[dict] | None,
+    timeout: float,
+    cpu_seconds: int,
+    memory_mb: int,
+) -> dict:
+    """Run one grading in a sandboxed child of the worker; kill it after timeout."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status_code = 0
+        try:
+            os.close(read_fd)
+            _enter_sandbox(write_fd, cpu_seconds, memory_mb, timeout)
+            try:
+                result = run_doctests(program, start_line, test_cases)
+            except _Deadline:
+                result = timeout_result(timeout)
+            except MemoryError:
+                result = failure_result("Error running tests", "MemoryError: the program used too much memory")
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            payload = json.dumps(result).encode()
+            while payload:
+                payload = payload[os.write(write_fd, payload):]
+        except BaseException:
+            status_code = 1
+        finally:
+            os._exit(status_code)
+
+    os.close(write_fd)
+    chunks = []
+    deadline = time.monotonic() + timeout + 0.5
+    timed_out = False
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+                timed_out = True
+                break
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(read_fd)
+        if timed_out:
+            os.kill(pid, signal.SIGKILL)
+        _, wait_status = os.waitpid(pid, 0)
+
+    if timed_out or (os.WIFSIGNALED(wait_status) and os.WTERMSIG(wait_status) in (signal.SIGKILL, signal.SIGXCPU)):
+        return timeout_result(timeout)
+    try:
+        result = json.loads(b"".join(chunks))
+    except ValueError:
+        return failure_result("Unexpected error occurred")
+    if not isinstance(result, dict) or result.get("status") not in ("pass", "fail"):
+        return failure_result("Unexpected error occurred")
+    return result
+
+
+def _isolate_network() -> None:
+    """Move this worker into an empty network namespace where the kernel allows it."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.unshare(_CLONE_NEWUSER | _CLONE_NEWNET)
+    except (OSError, AttributeError):
+        pass
+
+
+def worker_main(conn, cpu_seconds: int, memory_mb: int) -> None:
+    """Worker process loop: receive (program, start_line, test_cases, timeout) jobs, answer with JSON results."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # os.environ is backed by posix.environ, so this also empties the raw copy
+    os.environ.clear()
+    os.environ.update(GRADER_ENVIRONMENT)
+    _isolate_network()
+    run_doctests(*prepare_code(_WARMUP_CODE, _WARMUP_HEADER))
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        program, start_line, test_cases, timeout = job
+        started = time.perf_counter()
+        result = _grade_in_fork(program, start_line, test_cases, timeout, cpu_seconds, memory_mb)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        conn.send_bytes(json.dumps(result).encode())
+
+
+class _Worker:
+    """One pre-started worker process and the application's end of its pipe."""
+
+    def __init__(self, context, cpu_seconds: int, memory_mb: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=worker_main, args=(child_conn, cpu_seconds, memory_mb), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self) -> asyncio.Future:
+        """Kill the process and reap it on a thread; returns the join's future."""
+        self.process.kill()
+        self.conn.close()
+        return asyncio.get_running_loop().run_in_executor(None, self.process.join)
+
+
+class GradingPool:
+    """Pre-started grading workers plus bounded admission, used from the event loop."""
+
+    def __init__(
+        self,
+        workers: int = GRADER_WORKERS,
+        max_queued: int = GRADER_MAX_QUEUED,
+        timeout: float = GRADER_TIMEOUT_SECONDS,
+        cpu_seconds: int = GRADER_CPU_SECONDS,
+        memory_mb: int = GRADER_MEMORY_MB,
+        start_method: str = GRADER_START_METHOD,
+    ):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.start_method = start_method
+        self._context = None
+        self._idle: asyncio.Queue | None = None
+        self._all: list[_Worker] = []
+        # Joins of killed workers still running on threads
+        self._reaping: set[asyncio.Future] = set()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.max_ms = 0.0
+        self._total_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        """Whether the workers have been started."""
+        return self._idle is not None
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of running plus waiting gradings."""
+        return self.workers + self.max_queued
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context, self.cpu_seconds, self.memory_mb)
+        self._all.append(worker)
+        return worker
+
+    def start(self) -> None:
+        """Start the worker processes (call from the running event loop)."""
+        if self.running:
+            return
+        self._context = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            # Do not import the application's entry point (and its settings) into the server
+            self._context.set_forkserver_preload([])
+        self._idle = asyncio.Queue()
+        for _ in range(self.workers):
+            self._idle.put_nowait(self._spawn())
+
+    async def stop(self) -> None:
+        """Ask every worker to exit and wait for them."""
+        if not self.running:
+            return
+        workers, self._all, self._idle = self._all, [], None
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            await asyncio.to_thread(worker.process.join, 5)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.conn.close()
+        if self._reaping:
+            await asyncio.gather(*self._reaping)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        self._all.remove(worker)
+        reaping = worker.kill()
+        self._reaping.add(reaping)
+        reaping.add_done_callback(self._reaping.discard)
+        self.restarts += 1
+        return self._spawn()
+
+    async def _receive(self, worker: _Worker, timeout: float) -> bytes:
+        """Wait for the worker's answer without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        fd = worker.conn.fileno()
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await asyncio.wait_for(ready, timeout)
+        finally:
+            loop.remove_reader(fd)
+        return worker.conn.recv_bytes()
+
+    async def run(
+        self,
+        program: str,
+        start_line: int,
+        timeout: float | None = None,
+        test_cases: list[dict] | None = None,
+    ) -> dict:
+        """
+        Grade a prepared program on a worker (see run_doctests).
+
+        Raises:
+            GraderOverloaded: When capacity gradings are already running or waiting
+        """
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise GraderOverloaded("Too many gradings in progress")
+        if not self.running:
+            self.start()
+
+        timeout = timeout or self.timeout
+        self.in_flight += 1
+        started = time.perf_counter()
+        worker = await self._idle.get()
+        try:
+            worker.conn.send((program, start_line, test_cases, timeout))
+            result = json.loads(await self._receive(worker, timeout + _WORKER_GRACE_SECONDS))
+        except (asyncio.TimeoutError, EOFError, OSError, ValueError):
+            worker = self._replace(worker)
+            result = timeout_result(timeout)
+        except BaseException:
+            # Cancelled (client gone, regrade stopped) with the reply still on its way:
+            # reusing the worker would hand that reply to the next grading
+            worker = self._replace(worker)
+            raise
+        finally:
+            self.in_flight -= 1
+            if self._idle is not None:
+                self._idle.put_nowait(worker)
+
+        if result["header"] == "Infinite loop":
+            self.timeouts += 1
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.completed += 1
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self._total_ms += elapsed_ms
+        return result
+
+    async def grade(
+        self,
+        submitted_code: str,
+        code_header: str,
+        timeout: float | None = None,
+        test_cases: list[dict] | None = None,
+    ) -> dict:
+        """Prepare a submission like the browser grader and run its doctests on a worker."""
+        try:
+            program, start_line = prepare_code(submitted_code, code_header)
+        except InvalidSubmission as e:
+            return failure_result("Error running tests", str(e))
+        return await self.run(program, start_line, timeout, test_cases)
+
+    def stats(self) -> dict:
+        """Return pool size, admission and latency metrics."""
+        return {
+            "enabled": self.running,
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "max_ms": round(self.max_ms, 3),
+            "avg_ms": round(self._total_ms / self.completed, 3) if self.completed else 0.0,
+        }
+
+
+grading_pool = GradingPool()
@@ -0,0 +1,220 @@
+"""
+Content-addressed cache of server-side grading results.
+
+Students of a class often submit the same solution, byte for byte or up to
+trailing whitespace. A result is keyed by (task id, task version, code
+hash): the task version is a digest of the function header the doctests
+live in and of its pre-parsed test cases, so editing a task makes its old
+results unreachable, and the code hash is a digest of the submitted code
+with line endings and trailing whitespace normalized. Nothing else is normalized: renaming a variable or
+moving a line changes error messages and reported line numbers, so such
+submissions are graded on their own. Code containing triple-quoted strings
+or backslashes only has its line endings normalized, because trailing
+whitespace may be significant there.
+
+Lookups go to an in-process LRU first and then, with
+GRADING_CACHE_PERSIST, to the grading_results table shared by every
+worker; database hits are promoted into the LRU. Timeouts and crashed
+gradings are never cached because they depend on server load.
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from .grading import GRADER_MAX_OUTPUT_CHARS
+from .models import GradingResult, Parsons
+
+GRADING_CACHE_MAX_ENTRIES = int(os.getenv("GRADING_CACHE_MAX_ENTRIES", "4096"))
+GRADING_CACHE_PERSIST = os.getenv("GRADING_CACHE_PERSIST", "true").lower() == "true"
+# Tasks listed individually in stats(), busiest first
+GRADING_CACHE_METRIC_TASKS = int(os.getenv("GRADING_CACHE_METRIC_TASKS", "50"))
+
+# Bump when the grader's output for the same program changes
+GRADER_REVISION = f"doctest-1:{GRADER_MAX_OUTPUT_CHARS}"
+
+# Results that depend on load rather than on the code
+_UNCACHEABLE_HEADERS = frozenset({"Infinite loop", "Unexpected error occurred"})
+_TRAILING_WHITESPACE = re.compile(r"[ \t]+$", re.MULTILINE)
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def task_version(code_header: str, test_cases: list[dict] | None = None) -> str:
+    """32-character digest of a task's grading inputs."""
+    cases = json.dumps(test_cases, sort_keys=True)
+    return _digest(f"{GRADER_REVISION}\0{code_header}\0{cases}")
+
+
+def normalize_submission(code: str) -> str:
+    """Submitted code with LF line endings and, where safe, no trailing whitespace."""
+    code = code.replace("\r\n", "\n").replace("\r", "\n")
+    if '"""' in code or "'''" in code or "\\" in code:
+        return code
+    return _TRAILING_WHITESPACE.sub("", code).rstrip("\n")
+
+
+def submission_hash(code: str) -> str:
+    """32-character digest of the normalized submitted code."""
+    return _digest(normalize_submission(code))
+
+
+def cacheable(result: dict) -> bool:
+    """Whether a grading result depends only on the program."""
+    return result.get("header") not in _UNCACHEABLE_HEADERS
+
+
+class GradingInputs(NamedTuple):
+    """What the server grader needs to know about a task."""
+
+    code_header: str
+    test_cases: list | None
+    code_blocks: dict
+    correct_solution: dict
+
+
+async def task_grading_inputs(db: AsyncConnection | AsyncSession, task_id: int) -> GradingInputs | None:
+    """
+    The function header (with its doctests), pre-parsed test cases and blocks of a task,
+    or None if the task does not exist or has no header.
+    """
+    result = await db.execute(
+        select(Parsons.code_blocks, Parsons.test_cases, Parsons.correct_solution).where(
+            Parsons.id == task_id
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    code_blocks, test_cases, correct_solution = row
+    if isinstance(code_blocks, dict) and isinstance(code_blocks.get("function_header"), str):
+        return GradingInputs(code_blocks["function_header"], test_cases, code_blocks, correct_solution)
+    return None
+
+
+class GradingCache:
+    """LRU of (task_id, task_version, code_hash) -> result, backed by grading_results."""
+
+    def __init__(
+        self,
+        max_entries: int = GRADING_CACHE_MAX_ENTRIES,
+        persist: bool = GRADING_CACHE_PERSIST,
+    ):
+        self.max_entries = max_entries
+        self.persist = persist
+        self._entries: OrderedDict[tuple[int, str, str], dict] = OrderedDict()
+        # task_id -> [lookups, memory hits, database hits]
+        self._tasks: dict[int, list[int]] = {}
+        self.stores = 0
+
+    @staticmethod
+    def key(
+        task_id: int,
+        code_header: str,
+        submitted_code: str,
+        test_cases: list[dict] | None = None,
+    ) -> tuple[int, str, str]:
+        """Cache key of a submission."""
+        return task_id, task_version(code_header, test_cases), submission_hash(submitted_code)
+
+    def _remember(self, key: tuple[int, str, str], result: dict) -> None:
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, db: AsyncSession, key: tuple[int, str, str]) -> dict | None:
+        """Return the cached result of a submission, or None on a miss."""
+        counters = self._tasks.setdefault(key[0], [0, 0, 0])
+        counters[0] += 1
+
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            counters[1] += 1
+            return result
+
+        if not self.persist:
+            return None
+        task_id, version, code_hash = key
+        row = await db.execute(
+            select(GradingResult.result).where(
+                GradingResult.task_id == task_id,
+                GradingResult.task_version == version,
+                GradingResult.code_hash == code_hash,
+            )
+        )
+        result = row.scalar_one_or_none()
+        if result is not None:
+            counters[2] += 1
+            self._remember(key, result)
+        return result
+
+    async def put(self, db: AsyncSession, key: tuple[int, str, str], result: dict) -> None:
+        """
+        Cache a fresh result. With persistence it is inserted in a short transaction
+        of its own on db's engine, so the caller's transaction is left alone.
+        """
+        if not cacheable(result):
+            return
+        self._remember(key, result)
+        self.stores += 1
+        if not self.persist:
+            return
+        task_id, version, code_hash = key
+        async with db.bind.begin() as conn:
+            dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+            await conn.execute(
+                dialect.insert(GradingResult)
+                .values(task_id=task_id, task_version=version, code_hash=code_hash, result=result)
+                .on_conflict_do_nothing(index_elements=["task_id", "task_version", "code_hash"])
+            )
+
+    def clear(self) -> None:
+        """Drop every in-memory entry and counter."""
+        self._entries.clear()
+        self._tasks.clear()
+        self.stores = 0
+
+    def task_stats(self, task_id: int) -> dict:
+        """Lookup and hit counters of one task."""
+        lookups, memory_hits, db_hits = self._tasks.get(task_id, (0, 0, 0))
+        hits = memory_hits + db_hits
+        return {
+            "lookups": lookups,
+            "memory_hits": memory_hits,
+            "db_hits": db_hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def stats(self) -> dict:
+        """Return size, overall and per-task hit rates (busiest tasks first)."""
+        lookups = sum(counters[0] for counters in self._tasks.values())
+        memory_hits = sum(counters[1] for counters in self._tasks.values())
+        db_hits = sum(counters[2] for counters in self._tasks.values())
+        busiest = sorted(self._tasks, key=lambda task_id: self._tasks[task_id][0], reverse=True)
+        return {
+            "size": len(self._entries),
+            "persist": self.persist,
+            "stores": self.stores,
+            "lookups": lookups,
+            "memory_hits": memory_hits,
+            "db_hits": db_hits,
+            "hit_rate": (memory_hits + db_hits) / lookups if lookups else 0.0,
+            "tasks": {
+                task_id: self.task_stats(task_id)
+                for task_id in busiest[:GRADING_CACHE_METRIC_TASKS]
+            },
+        }
+
+
+grading_cache = GradingCache()
@@ -0,0 +1,419 @@
+"""
+Live feed of submissions per task list (Server-Sent Events).
+
+Committed attempts are published as small events. Every worker keeps an
+in-process fan-out of subscribers per task list, each with a bounded
+queue; publishing never awaits, and a subscriber whose queue is full is
+dropped (its stream ends with a "dropped" event and the browser's
+EventSource reconnects). A stalled teacher tab therefore cannot slow
+down submissions.
+
+On PostgreSQL the events travel between workers with LISTEN/NOTIFY: a
+background task sends NOTIFY from a queue and a dedicated connection
+listens, delivering to the local subscribers. The listening connection is
+checked every LIVE_FEED_HEARTBEAT_SECONDS and reopened with backoff when
+it drops; the streams open at that point missed events, so they are ended
+and their browsers reconnect with a fresh snapshot. Other databases
+(SQLite in tests, single-worker setups) deliver in-process directly.
+
+The same channel carries cache messages between workers: a message with
+a "kind" goes to the handler registered for that kind (add_handler) in
+every other worker, e.g. the analytics cache dropping entries after a
+submission committed elsewhere. After a reconnect, when messages may have
+been missed, each handler's reset callback runs instead.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from sqlalchemy import event as sa_event, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+LIVE_FEED_QUEUE_SIZE = int(os.getenv("LIVE_FEED_QUEUE_SIZE", "100"))
+LIVE_FEED_HEARTBEAT_SECONDS = float(os.getenv("LIVE_FEED_HEARTBEAT_SECONDS", "15"))
+LIVE_FEED_NOTIFY_QUEUE_SIZE = int(os.getenv("LIVE_FEED_NOTIFY_QUEUE_SIZE", "1000"))
+# Upper bound of the backoff between attempts to reopen the LISTEN connection
+LIVE_FEED_RECONNECT_MAX_SECONDS = float(os.getenv("LIVE_FEED_RECONNECT_MAX_SECONDS", "30"))
+LIVE_FEED_CHANNEL = "task_attempt_feed"
+
+# Session.info key for events waiting for their transaction to commit
+_STAGED_KEY = "staged_feed_events"
+# Queue marker telling a subscriber it was dropped
+DROPPED = object()
+
+
+@dataclass(eq=False)
+class Subscriber:
+    """One open stream for a task list."""
+
+    task_list_id: int
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(LIVE_FEED_QUEUE_SIZE))
+    dropped: bool = False
+    drop_reason: str = ""
+
+
+class PostgresNotifier:
+    """Sends feed events with NOTIFY and delivers received ones to the local feed."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        deliver,
+        max_queued: int = LIVE_FEED_NOTIFY_QUEUE_SIZE,
+        on_reconnect=None,
+        check_interval: float = LIVE_FEED_HEARTBEAT_SECONDS,
+        retry_delay: float = 1.0,
+    ):
+        self.engine = engine
+        self.deliver = deliver
+        self.on_reconnect = on_reconnect
+        self.check_interval = check_interval
+        self.retry_delay = retry_delay
+        self._outbound: asyncio.Queue = asyncio.Queue(max_queued)
+        self._listen_conn: AsyncConnection | None = None
+        self._lost = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._listen_task: asyncio.Task | None = None
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+    def send(self, event: dict) -> None:
+        """Queue an event for NOTIFY without waiting."""
+        try:
+            self._outbound.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _on_notify(self, _connection, _pid, _channel, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        self.received += 1
+        self.deliver(event)
+
+    async def start(self) -> None:
+        """Open the LISTEN connection and start the NOTIFY sender."""
+        await self._connect()
+        self._task = asyncio.create_task(self._run(), name="live-feed-notify")
+        self._listen_task = asyncio.create_task(self._listen(), name="live-feed-listen")
+
+    async def stop(self) -> None:
+        for task in (self._listen_task, self._task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._listen_task = None
+        await self._disconnect()
+
+    async def _connect(self) -> None:
+        self._lost.clear()
+        self._listen_conn = await self.engine.connect()
+        raw = await self._listen_conn.get_raw_connection()
+        raw.driver_connection.add_termination_listener(lambda _connection: self._lost.set())
+        await raw.driver_connection.add_listener(LIVE_FEED_CHANNEL, self._on_notify)
+
+    async def _disconnect(self) -> None:
+        if self._listen_conn is None:
+            return
+        conn, self._listen_conn = self._listen_conn, None
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+    async def _alive(self) -> bool:
+        """Wait up to check_interval for the connection to drop, then probe it."""
+        try:
+            await asyncio.wait_for(self._lost.wait(), timeout=self.check_interval)
+            return False
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await self._listen_conn.execute(text("SELECT 1"))
+        except Exception:
+            return False
+        return True
+
+    async def _listen(self) -> None:
+        """Keep the LISTEN connection open, reopening it with backoff when it drops."""
+        while True:
+            if await self._alive():
+                continue
+            print("Live feed LISTEN connection lost, reconnecting")
+            await self._disconnect()
+            delay = self.retry_delay
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    await self._connect()
+                    break
+                except Exception as e:
+                    print(f"Live feed LISTEN reconnect failed: {e}")
+                    await self._disconnect()
+                    delay = min(delay * 2, LIVE_FEED_RECONNECT_MAX_SECONDS)
+            self.reconnects += 1
+            if self.on_reconnect is not None:
+                self.on_reconnect()
+
+    async def _run(self) -> None:
+        """Send queued events; reconnect after errors."""
+        while True:
+            try:
+                async with self.engine.connect() as conn:
+                    conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                    while True:
+                        event = await self._outbound.get()
+                        await conn.execute(
+                            text("SELECT pg_notify(:channel, :payload)"),
+                            {"channel": LIVE_FEED_CHANNEL, "payload": json.dumps(event)},
+                        )
+                        self.sent += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Live feed NOTIFY failed: {e}")
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._outbound.qsize(),
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+        }
+
+
+async def notify_workers(conn: AsyncConnection, message: dict) -> None:
+    """
+    Send a cache message to every worker when conn's transaction commits
+    (NOTIFY is transactional), also from processes without a running feed
+    such as the command line tools. Does nothing on other databases.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    await conn.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": LIVE_FEED_CHANNEL, "payload": json.dumps(message)},
+    )
+
+
+class LiveFeed:
+    """Per-task-list fan-out of attempt events to bounded subscriber queues."""
+
+    def __init__(self, queue_size: int = LIVE_FEED_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._channels: dict[int, set[Subscriber]] = {}
+        self._notifier: PostgresNotifier | None = None
+        # kind -> (handler, reset) for cache messages
+        self._handlers: dict[str, tuple[Callable[[dict], None], Callable[[], None] | None]] = {}
+        # Tags this worker's messages, which it has applied already
+        self.origin = uuid.uuid4().hex
+        self.published = 0
+        self.delivered = 0
+        self.dropped_subscribers = 0
+        self.messages_received = 0
+
+    def subscribe(self, task_list_id: int) -> Subscriber:
+        """Register a new stream for a task list."""
+        subscriber = Subscriber(task_list_id, asyncio.Queue(self.queue_size))
+        self._channels.setdefault(task_list_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Remove a stream (safe to call twice)."""
+        subscribers = self._channels.get(subscriber.task_list_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._channels[subscriber.task_list_id]
+
+    def _drop(self, subscriber: Subscriber, reason: str = "too slow") -> None:
+        """Disconnect a subscriber that fell behind, leaving only the DROPPED marker."""
+        subscriber.dropped = True
+        subscriber.drop_reason = reason
+        self.unsubscribe(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(DROPPED)
+        self.dropped_subscribers += 1
+
+    def deliver(self, event: dict) -> None:
+        """Fan an event out to this worker's subscribers of its task list."""
+        for subscriber in list(self._channels.get(event["task_list_id"], ())):
+            try:
+                subscriber.queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def publish(self, event: dict) -> None:
+        """Send an event to every worker's subscribers (never blocks)."""
+        self.published += 1
+        if self._notifier is not None:
+            self._notifier.send(event)
+        else:
+            self.deliver(event)
+
+    def add_handler(
+        self, kind: str, handler: Callable[[dict], None], reset: Callable[[], None] | None = None
+    ) -> None:
+        """
+        Receive the cache messages of one kind sent by other workers.
+
+        Args:
+            kind: Value of the messages' "kind" key
+            handler: Called with each message
+            reset: Called when messages may have been missed (LISTEN reconnect)
+        """
+        self._handlers[kind] = (handler, reset)
+
+    def message(self, kind: str, **fields) -> dict:
+        """A cache message from this worker, for broadcast or notify_workers."""
+        return {"kind": kind, "origin": self.origin, **fields}
+
+    def broadcast(self, message: dict) -> None:
+        """Send a cache message to the other workers (never blocks; a no-op without NOTIFY)."""
+        if self._notifier is not None:
+            self._notifier.send(message)
+
+    def receive(self, message: dict) -> None:
+        """Route a message from the channel: attempt events to subscribers, the rest to handlers."""
+        kind = message.get("kind")
+        if kind is None:
+            self.deliver(message)
+            return
+        if message.get("origin") == self.origin or kind not in self._handlers:
+            return
+        self.messages_received += 1
+        self._handlers[kind][0](message)
+
+    def _reconnected(self) -> None:
+        """Events and messages sent while LISTEN was down are lost."""
+        self._drop_all()
+        for _handler, reset in self._handlers.values():
+            if reset is not None:
+                reset()
+
+    def stage(self, db: AsyncSession, event: dict) -> None:
+        """Queue an event that is published once db's transaction commits."""
+        db.info.setdefault(_STAGED_KEY, []).append(event)
+
+    async def start(self, engine: AsyncEngine) -> None:
+        """Use LISTEN/NOTIFY between workers when the database is PostgreSQL."""
+        if engine.dialect.name != "postgresql" or self._notifier is not None:
+            return
+        notifier = PostgresNotifier(engine, self.receive, on_reconnect=self._reconnected)
+        try:
+            await notifier.start()
+        except Exception as e:
+            print(f"Live feed LISTEN failed, delivering in-process only: {e}")
+            await notifier.stop()
+            return
+        self._notifier = notifier
+
+    async def stop(self) -> None:
+        """Stop cross-worker delivery and end open streams."""
+        if self._notifier is not None:
+            await self._notifier.stop()
+            self._notifier = None
+        self._drop_all("server stopping")
+
+    def _drop_all(self, reason: str = "events missed") -> None:
+        """End every open stream, e.g. after events from other workers were missed."""
+        for subscribers in list(self._channels.values()):
+            for subscriber in list(subscribers):
+                self._drop(subscriber, reason)
+
+    def clear(self) -> None:
+        """Forget every subscriber without notifying them."""
+        self._channels.clear()
+
+    def stats(self) -> dict:
+        """Return subscriber and delivery counters."""
+        return {
+            "subscribers": sum(len(s) for s in self._channels.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped_subscribers,
+            "messages_received": self.messages_received,
+            "notify": self._notifier.stats() if self._notifier is not None else None,
+        }
+
+
+def _format_event(name: str, data: dict) -> bytes:
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+async def event_stream(
+    feed: LiveFeed,
+    subscriber: Subscriber,
+    counters: dict[int, dict],
+    heartbeat: float = LIVE_FEED_HEARTBEAT_SECONDS,
+):
+    """
+    Server-Sent Events body for one teacher tab.
+
+    The caller subscribes before reading the counters, so no submission
+    committed after that read is missed (one committed while it runs may be
+    counted twice). The body unsubscribes when it ends (client disconnect
+    cancels the generator). Starts with a "snapshot" of the per-task
+    counters, then sends an "attempt" event with the task's updated counters
+    for every submission. Comment lines keep idle connections open.
+
+    Args:
+        feed: Feed the subscriber belongs to
+        subscriber: Subscription of the task list whose submissions are streamed
+        counters: task_id -> {"attempt_count", "success_count", "session_count"}
+        heartbeat: Seconds of silence before a keep-alive comment
+    """
+    try:
+        yield _format_event("snapshot", {"tasks": {str(k): v for k, v in counters.items()}})
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            if event is DROPPED:
+                yield _format_event("dropped", {"reason": f"{subscriber.drop_reason}, reconnect"})
+                return
+
+            task_counters = counters.setdefault(
+                event["task_id"], {"attempt_count": 0, "success_count": 0, "session_count": 0}
+            )
+            task_counters["attempt_count"] += 1
+            if event["success"]:
+                task_counters["success_count"] += 1
+            if event["first_attempt"]:
+                task_counters["session_count"] += 1
+            yield _format_event("attempt", {"attempt": event, "counters": task_counters})
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+live_feed = LiveFeed()
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _publish_staged(session: Session) -> None:
+    """Events are published only once their attempts are committed."""
+    for staged in session.info.pop(_STAGED_KEY, ()):
+        live_feed.publish(staged)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _drop_staged(session: Session) -> None:
+    session.info.pop(_STAGED_KEY, None)
@@ -9,15 +9,20 @@ from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Annotated
 
-from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, StringConstraints
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime as dt
+from .activity_tracker import activity_tracker
+from .attempt_columns import attempt_columns
+from .attempt_export import EXPORT_FORMATS, export_query, parquet_available, stream_attempts
+from .analytics import analytics_cache
+from .attempt_writer import ATTEMPT_WRITE_BEHIND, AttemptQueueFullError, attempt_writer
 from .auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     CurrentUser,
@@ -25,25 +30,68 @@ from .auth import (
     create_access_token,
     get_current_user,
 )
-from .database import get_db, init_db
+from .block_structure import structure_checker
+from .code_fingerprint import answer_clusters, code_fingerprint
+from .database import dispose_engines, engine, get_db, get_read_db, init_db
+from .grading import GRADE_ON_SUBMIT, GraderOverloaded, grading_pool
+from .grading_cache import GradingInputs, grading_cache, task_grading_inputs
 from .models import Parsons, TaskList, TaskListItem, Teacher, TaskAttempt, StudentSession
+from .password_hashing import PasswordHasherOverloaded, password_hasher
+from .live_feed import event_stream, live_feed
+from .move_events import (
+    MOVE_EVENT_MAX_BATCH,
+    MOVE_EVENT_WRITE_BEHIND,
+    MoveEventQueueFullError,
+    move_event_writer,
+    move_records,
+    write_move_events,
+)
+from .principal_cache import TeacherPrincipal, principal_cache
+from .regrade import regrade_runner
 from .reset_db import reset_db
 from .seed import seed_db
+from .solve_times import TASK, TASKLIST, solve_time_sketches
 from .student_auth import (
     create_student_session,
     set_session_cookie,
     get_current_student_session,
     get_current_student_session_no_update,
 )
+from .student_progress import student_progress
+from .task_catalog import task_catalog
+from .task_stats import get_tasklist_stats, record_attempts
+from .tasklist_cache import TaskListRef, tasklist_resolver
+from .template_store import TemplateStore
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
-    """Initialize database and seed data on startup."""
+    """Initialize database and seed data on startup, drain buffers on shutdown."""
     # Create tables from SQLAlchemy models and seed initial data
     await init_db()
     await seed_db()
+    template_store.load()
+    if ATTEMPT_WRITE_BEHIND:
+        attempt_writer.start()
+    if MOVE_EVENT_WRITE_BEHIND:
+        move_event_writer.start()
+    activity_tracker.start()
+    solve_time_sketches.start()
+    attempt_columns.start()
+    await live_feed.start(engine)
+    grading_pool.start()
     yield
+    # Flush any queued attempts and session touches before the worker exits
+    await attempt_writer.stop()
+    await move_event_writer.stop()
+    await activity_tracker.stop()
+    await solve_time_sketches.stop()
+    await attempt_columns.stop()
+    await live_feed.stop()
+    await regrade_runner.stop()
+    await grading_pool.stop()
+    password_hasher.shutdown()
+    await dispose_engines()
 
 
 app = FastAPI(title="Faded Parsons Problems", lifespan=lifespan)
@@ -60,6 +108,15 @@ app.add_middleware(
 # Get the base directory (parent of backend folder)
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# HTML templates are served from memory (see template_store.py)
+template_store = TemplateStore(BASE_DIR / "templates")
+
+# Teacher pages must never be cached by the browser
+NO_STORE_HEADERS = {
+    "Cache-Control": "no-store, no-cache, must-revalidate, max-age=0",
+    "Pragma": "no-cache",
+}
+
 
 # Pydantic models for request/response
 class Token(BaseModel):
@@ -100,11 +157,176 @@ class ProblemSetTaskResponse(BaseModel):
     created_at: str
 
 
+class ProblemSetTaskProgress(BaseModel):
+    task_id: int
+    title: str
+    status: str
+    attempts: int
+    best_attempt_id: int | None
+    first_success_at: str | None
+
+
+class DurationStats(BaseModel):
+    avg: float | None
+    min: float | None
+    max: float | None
+
+
+class SolveTimeStats(DurationStats):
+    median: float | None
+
+
+class TaskAnalyticsResponse(BaseModel):
+    task_id: int
+    total_attempts: int
+    completions: int
+    students_attempted: int
+    students_completed: int
+    success_rate: float
+    avg_attempts_to_first_success: float | None
+    time_to_first_success: SolveTimeStats
+    time_to_first_fail: DurationStats
+
+
+class TaskListTaskAnalytics(TaskAnalyticsResponse):
+    title: str
+
+
+class TaskListAnalyticsResponse(BaseModel):
+    task_list_id: int
+    total_attempts: int
+    completions: int
+    students_attempted: int
+    success_rate: float
+    tasks: list[TaskListTaskAnalytics]
+
+
+class TaskStatsResponse(BaseModel):
+    task_id: int
+    attempt_count: int
+    success_count: int
+    session_count: int
+    success_rate: float
+    avg_solve_seconds: float | None
+    min_solve_seconds: float | None
+    max_solve_seconds: float | None
+
+
+class SolveTimeResponse(BaseModel):
+    count: int
+    min: float | None
+    max: float | None
+    p50: float | None
+    p90: float | None
+
+
+class AnswerCluster(BaseModel):
+    fingerprint: str
+    attempts: int
+    sessions: int
+    example_code: str | None
+
+
+class TaskClustersResponse(BaseModel):
+    task_id: int
+    failing: list[AnswerCluster]
+    passing: list[AnswerCluster]
+
+
+class CohortTaskStats(BaseModel):
+    task_id: int
+    attempts: int
+    successes: int
+    sessions: int
+    success_rate: float
+    median_solve_seconds: float | None
+
+
+class Histogram(BaseModel):
+    edges: list[float]
+    counts: list[int]
+
+
+class ActivityTimeline(BaseModel):
+    bucket_seconds: int
+    buckets: list[datetime]
+    task_ids: list[int]
+    attempts: list[list[int]]
+
+
+class CohortAnalyticsResponse(BaseModel):
+    task_list_id: int
+    tasks: list[CohortTaskStats]
+    solve_time_histogram: Histogram
+    activity: ActivityTimeline
+
+
+class MatrixRow(BaseModel):
+    session_id: int
+    username: str | None
+
+
+class MatrixColumn(BaseModel):
+    task_id: int
+    title: str
+
+
+class TaskListMatrixResponse(BaseModel):
+    task_list_id: int
+    rows: list[MatrixRow]
+    columns: list[MatrixColumn]
+    # Cell state code -> name (untouched / attempted / solved)
+    states: dict[int, str]
+    # Row-major grids, one inner list per row
+    state: list[list[int]]
+    attempts: list[list[int]]
+
+
 class NicknameRequest(BaseModel):
     nickname: str
     unique_link_code: str
 
 
+class GradeRequest(BaseModel):
+    code: str
+
+
+class GradedExample(BaseModel):
+    source: str
+    expected: str
+    got: str
+    passed: bool
+    line: int
+
+
+class GradeResponse(BaseModel):
+    status: str
+    header: str
+    details: str
+    passed: int
+    failed: int
+    examples: list[GradedExample]
+
+
+class RegradeRequest(BaseModel):
+    task_ids: Annotated[list[int], Field(min_length=1, max_length=1000)]
+    restart: bool = False
+
+
+# [block_id, from_position, to_position, indent, offset_ms]; positions are -1 in the starter column
+MoveEventRow = tuple[
+    Annotated[str, StringConstraints(max_length=64)],
+    Annotated[int, Field(ge=-1)],
+    Annotated[int, Field(ge=-1)],
+    Annotated[int, Field(ge=0, le=100)],
+    Annotated[int, Field(ge=0, le=2**31 - 1)],
+]
+
+
+class MoveEventBatch(BaseModel):
+    events: Annotated[list[MoveEventRow], Field(max_length=MOVE_EVENT_MAX_BATCH)]
+
+
 class SubmitTestResultRequest(BaseModel):
     task_id: int
     success: bool
@@ -112,6 +334,8 @@ class SubmitTestResultRequest(BaseModel):
     test_output: str
     repr_code: str
     start_time: str | None = None  # ISO format timestamp from localStorage
+    # Block moves made before this run, stored with the attempt
+    moves: Annotated[list[MoveEventRow], Field(max_length=MOVE_EVENT_MAX_BATCH)] = []
 
 
 # Mount static directories (only if they exist)
@@ -148,6 +372,8 @@ async def reset_test_db():
 
     try:
         await reset_db()
+        tasklist_resolver.clear()
+        task_catalog.clear()
         await seed_db()
         return {"status": "success", "message": "Database reset complete"}
     except Exception as e:
@@ -157,136 +383,117 @@ async def reset_test_db():
         ) from e
 
 
+async def require_problemset(unique_link_code: str, db: AsyncSession) -> TaskListRef:
+    """Resolve a link code through the task list cache or raise 404."""
+    problemset = await tasklist_resolver.resolve(unique_link_code, db)
+
+    if not problemset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Problem set with code {unique_link_code} not found",
+        )
+
+    return problemset
+
+
+async def require_owned_problemset(
+    task_list_id: int, current_user: TeacherPrincipal, db: AsyncSession
+) -> None:
+    """Raise 404 unless the problem set exists and belongs to the current teacher."""
+    result = await db.execute(select(TaskList.teacher_id).where(TaskList.id == task_list_id))
+    owner_id = result.scalar_one_or_none()
+    if owner_id is None or owner_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Problemset with id {task_list_id} not found",
+        )
+
+
 @app.get("/", response_class=HTMLResponse)
-async def index():
+async def index(request: Request):
     """Serve the main index page."""
-    index_path = BASE_DIR / "templates" / "index.html"
-    return FileResponse(index_path)
+    return template_store.response("index.html", request)
 
 @app.get("/student_start_page", response_class=HTMLResponse)
-async def student_start_view():
+async def student_start_view(request: Request):
     """Serve the main index page."""
-    index_path = BASE_DIR / "templates" / "student_start_page.html"
-    return FileResponse(index_path)
+    return template_store.response("student_start_page.html", request)
 
 @app.get("/index.html", response_class=HTMLResponse)
-async def index_html():
+async def index_html(request: Request):
     """Serve the main index page (explicit path)."""
-    index_path = BASE_DIR / "templates" / "index.html"
-    return FileResponse(index_path)
+    return template_store.response("index.html", request)
 
 
 @app.get("/problem.html", response_class=HTMLResponse)
-async def problem_page():
+async def problem_page(request: Request):
     """Serve the problem page."""
-    problem_path = BASE_DIR / "templates" / "problem.html"
-    return FileResponse(problem_path)
+    return template_store.response("problem.html", request)
 
 
 @app.get("/set/{unique_link_code}", response_class=HTMLResponse)
 async def problemset_page(
     unique_link_code: str,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     student_session = Depends(get_current_student_session_no_update)
 ):
     """Serve problemset page by unique link code. Redirects to tasks if session exists."""
-    stmt = select(TaskList).where(TaskList.unique_link_code == unique_link_code)
-    result = await db.execute(stmt)
-    problemset = result.scalar_one_or_none()
-
-    if not problemset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Problem set with code {unique_link_code} not found",
-        )
+    await require_problemset(unique_link_code, db)
 
     # If student already has a session, redirect to tasks page
     if student_session:
         return RedirectResponse(url=f"/set/{unique_link_code}/tasks", status_code=status.HTTP_303_SEE_OTHER)
 
-    problemset_path = BASE_DIR / "templates" / "nickname.html"
-    response = FileResponse(problemset_path)
-    response.headers["X-Problemset-Code"] = unique_link_code
-    return response
+    return template_store.response(
+        "nickname.html", request, headers={"X-Problemset-Code": unique_link_code}
+    )
 
 
 @app.get("/set/{unique_link_code}/tasks", response_class=HTMLResponse)
-async def problemset_tasks_page(unique_link_code: str, db: AsyncSession = Depends(get_db)):
+async def problemset_tasks_page(unique_link_code: str, request: Request, db: AsyncSession = Depends(get_db)):
     """Serve task list page by unique link code."""
-    stmt = select(TaskList).where(TaskList.unique_link_code == unique_link_code)
-    result = await db.execute(stmt)
-    problemset = result.scalar_one_or_none()
+    await require_problemset(unique_link_code, db)
 
-    if not problemset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Problem set with code {unique_link_code} not found",
-        )
-
-    tasks_path = BASE_DIR / "templates" / "problemset.html"
-    response = FileResponse(tasks_path)
-    response.headers["X-Problemset-Code"] = unique_link_code
-    return response
+    return template_store.response(
+        "problemset.html", request, headers={"X-Problemset-Code": unique_link_code}
+    )
 
 
 @app.get("/set/{unique_link_code}/tasks/{task_id:int}", response_class=HTMLResponse)
-async def problemset_task_page(unique_link_code: str, task_id: int, db: AsyncSession = Depends(get_db)):
+async def problemset_task_page(unique_link_code: str, task_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """Serve task page by unique link code and task id."""
-    stmt = select(TaskList).where(TaskList.unique_link_code == unique_link_code)
-    result = await db.execute(stmt)
-    problemset = result.scalar_one_or_none()
+    await require_problemset(unique_link_code, db)
 
-    if not problemset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Problem set with code {unique_link_code} not found",
-        )
-
-    task_path = BASE_DIR / "templates" / "student_problem.html"
-    response = FileResponse(task_path)
-    response.headers["X-Problemset-Code"] = unique_link_code
-    response.headers["X-Task-Id"] = str(task_id)
-    return response
+    return template_store.response(
+        "student_problem.html",
+        request,
+        headers={"X-Problemset-Code": unique_link_code, "X-Task-Id": str(task_id)},
+    )
 
 
 @app.get("/set/{unique_link_code}/tasks/{task_id:int}/description", response_class=HTMLResponse)
-async def problemset_task_description_page(unique_link_code: str, task_id: int, db: AsyncSession = Depends(get_db)):
+async def problemset_task_description_page(unique_link_code: str, task_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """Serve task description page by unique link code and task id."""
-    stmt = select(TaskList).where(TaskList.unique_link_code == unique_link_code)
-    result = await db.execute(stmt)
-    problemset = result.scalar_one_or_none()
-
-    if not problemset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Problem set with code {unique_link_code} not found",
-        )
+    await require_problemset(unique_link_code, db)
 
-    description_path = BASE_DIR / "templates" / "problem.html"
-    response = FileResponse(description_path)
-    response.headers["X-Problemset-Code"] = unique_link_code
-    response.headers["X-Task-Id"] = str(task_id)
-    return response
+    return template_store.response(
+        "problem.html",
+        request,
+        headers={"X-Problemset-Code": unique_link_code, "X-Task-Id": str(task_id)},
+    )
 
 
 @app.get("/set/{unique_link_code}/tasks/{task_id:int}/start", response_class=HTMLResponse)
-async def problemset_task_start_page(unique_link_code: str, task_id: int, db: AsyncSession = Depends(get_db)):
+async def problemset_task_start_page(unique_link_code: str, task_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """Serve the start page for a task by unique link code and task id."""
-    stmt = select(TaskList).where(TaskList.unique_link_code == unique_link_code)
-    result = await db.execute(stmt)
-    problemset = result.scalar_one_or_none()
-
-    if not problemset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Problem set with code {unique_link_code} not found",
-        )
+    await require_problemset(unique_link_code, db)
 
-    start_path = BASE_DIR / "templates" / "student_start_page.html"
-    response = FileResponse(start_path)
-    response.headers["X-Problemset-Code"] = unique_link_code
-    response.headers["X-Task-Id"] = str(task_id)
-    return response
+    return template_store.response(
+        "student_start_page.html",
+        request,
+        headers={"X-Problemset-Code": unique_link_code, "X-Task-Id": str(task_id)},
+    )
 
 
 @app.get("/exerciselist")
@@ -299,11 +506,9 @@ async def exercise_list(request: Request, db: AsyncSession = Depends(get_db)):
             url="/index.html", status_code=status.HTTP_303_SEE_OTHER
         )
 
-    exerciselist_path = BASE_DIR / "templates" / "exerciselist.html"
-    response = FileResponse(exerciselist_path)
-    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    response.headers["Pragma"] = "no-cache"
-    return response
+    return template_store.response(
+        "exerciselist.html", request, headers=NO_STORE_HEADERS
+    )
 
 
 @app.get("/statics_view", response_class=HTMLResponse)
@@ -318,17 +523,14 @@ async def statics_view(request: Request, db: AsyncSession = Depends(get_db)):
             url="/index.html", status_code=status.HTTP_303_SEE_OTHER
         )
 
-    statics_path = BASE_DIR / "templates" / "statics_view.html"
-    response = FileResponse(statics_path)
-    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    response.headers["Pragma"] = "no-cache"
-    return response
+    return template_store.response(
+        "statics_view.html", request, headers=NO_STORE_HEADERS
+    )
 
 @app.get("/register", response_class=HTMLResponse)
-async def register_page():
+async def register_page(request: Request):
     """Serve a simple registration page."""
-    register_path = BASE_DIR / "templates" / "register.html"
-    return FileResponse(register_path)
+    return template_store.response("register.html", request)
 
 
 # Authentication endpoints
@@ -342,7 +544,14 @@ async def login_access_token(
     OAuth2 compatible token login, get an access token for future requests.
     Also sets an HTTP-only cookie for browser-based page navigation.
     """
-    user = await authenticate_user(form_data.username, form_data.password, db)
+    try:
+        user = await authenticate_user(form_data.username, form_data.password, db)
+    except PasswordHasherOverloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts right now, please try again",
+            headers={"Retry-After": "1"},
+        )
 
     if not user:
         raise HTTPException(
@@ -381,6 +590,29 @@ async def get_current_user_info(current_user: CurrentUser):
     return UserInfo(username=current_user.username, email=current_user.email)
 
 
+@app.get("/api/metrics")
+async def get_metrics(_current_user: CurrentUser):
+    """
+    Get in-process cache counters for this worker.
+    """
+    return {
+        "tasklist_cache": tasklist_resolver.stats(),
+        "attempt_writer": attempt_writer.stats(),
+        "move_event_writer": move_event_writer.stats(),
+        "student_activity": activity_tracker.stats(),
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "task_catalog": task_catalog.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "solve_time_sketches": solve_time_sketches.stats(),
+        "live_feed": live_feed.stats(),
+        "attempt_columns": attempt_columns.stats(),
+        "grading_pool": grading_pool.stats(),
+        "grading_cache": grading_cache.stats(),
+        "structural_verdicts": structure_checker.stats(),
+    }
+
+
 @app.post("/api/logout")
 async def logout(response: Response):
     """
@@ -413,9 +645,7 @@ async def validate_nickname(
         )
 
     # Verify the task list exists
-    stmt = select(TaskList).where(TaskList.unique_link_code == unique_link_code)
-    result = await db.execute(stmt)
-    task_list = result.scalar_one_or_none()
+    task_list = await tasklist_resolver.resolve(unique_link_code, db)
 
     if not task_list:
         raise HTTPException(
@@ -441,7 +671,7 @@ async def validate_nickname(
 
 
 @app.get("/api/tasks/{task_id}", response_model=TaskResponse)
-async def get_task(task_id: int, db: AsyncSession = Depends(get_db)):
+async def get_task(task_id: int, db: AsyncSession = Depends(get_read_db)):
     """
     Get a single task by ID.
     Returns the complete task data including code blocks and solution.
@@ -470,38 +700,14 @@ async def get_task(task_id: int, db: AsyncSession = Depends(get_db)):
 
 
 @app.get("/api/tasks")
-async def list_tasks(db: AsyncSession = Depends(get_db)):
+async def list_tasks(db: AsyncSession = Depends(get_read_db)):
     """
     List all public tasks.
-    Returns: array of tasks with basic info (no code blocks).
+    Returns: array of tasks with basic info (no code blocks), served from the
+    pre-serialized task catalog.
     """
-    import json
-
-    query = select(Parsons).where(Parsons.is_public)
-
-    result = await db.execute(query)
-    tasks = result.scalars().all()
-
-    task_list = []
-    for task in tasks:
-        # Parse the description JSON to get the actual description text
-        try:
-            description_data = json.loads(task.description)
-            description_text = description_data.get("description", "")
-        except (json.JSONDecodeError, AttributeError):
-            description_text = ""
-
-        task_list.append(
-            {
-                "id": task.id,
-                "title": task.title,
-                "description": description_text,
-                "task_type": task.task_type,
-                "created_at": task.created_at.isoformat(),
-            }
-        )
-
-    return task_list
+    body = await task_catalog.get_body(db)
+    return Response(content=body, media_type="application/json")
 
 @app.post("/api/register")
 async def api_register(request: Request, db: AsyncSession = Depends(get_db)):
@@ -548,8 +754,16 @@ async def api_register(request: Request, db: AsyncSession = Depends(get_db)):
             detail="Username or email already exists",
         )
 
-    teacher = Teacher(username=username, email=email)
-    teacher.set_password(password)
+    try:
+        password_hash = await password_hasher.hash(password)
+    except PasswordHasherOverloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many registrations right now, please try again",
+            headers={"Retry-After": "1"},
+        )
+
+    teacher = Teacher(username=username, email=email, password_hash=password_hash)
 
     db.add(teacher)
     await db.commit()
@@ -558,7 +772,7 @@ async def api_register(request: Request, db: AsyncSession = Depends(get_db)):
     return {"status": "success", "id": teacher.id}
 
 @app.get("/api/problemsets/{problemset_id}", response_model=ProblemSetResponse)
-async def get_problemset(problemset_id: int, db: AsyncSession = Depends(get_db)):
+async def get_problemset(problemset_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get a single problemset (task list) by id."""
     stmt = select(TaskList).where(TaskList.id == problemset_id)
     result = await db.execute(stmt)
@@ -583,18 +797,10 @@ async def get_problemset(problemset_id: int, db: AsyncSession = Depends(get_db))
 
 
 @app.get("/api/problemsets/{code}/tasks", response_model=list[ProblemSetTaskResponse])
-async def get_problemset_tasks_by_code(code: str, db: AsyncSession = Depends(get_db)):
+async def get_problemset_tasks_by_code(code: str, db: AsyncSession = Depends(get_read_db)):
     """Get all tasks belonging to a problemset by unique link code."""
 
-    problemset_stmt = select(TaskList).where(TaskList.unique_link_code == code)
-    problemset_result = await db.execute(problemset_stmt)
-    problemset = problemset_result.scalar_one_or_none()
-
-    if not problemset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Problem set with code {code} not found",
-        )
+    problemset = await require_problemset(code, db)
 
     stmt = (
         select(Parsons)
@@ -619,8 +825,40 @@ async def get_problemset_tasks_by_code(code: str, db: AsyncSession = Depends(get
     return problemset_tasks
 
 
+@app.get("/api/problemsets/{code}/progress", response_model=list[ProblemSetTaskProgress])
+async def get_problemset_progress(
+    code: str,
+    db: AsyncSession = Depends(get_db),
+    student_session: StudentSession | None = Depends(get_current_student_session_no_update),
+):
+    """
+    The current student's progress on every task of a problemset: best result
+    (solved, failed, in_progress or not_started), attempt count and first success time.
+    """
+    problemset = await require_problemset(code, db)
+
+    if not student_session:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Student session required to see progress"
+        )
+
+    progress = await student_progress(db, problemset.id, student_session.id)
+    return [
+        ProblemSetTaskProgress(
+            **{
+                **task,
+                "first_success_at": (
+                    task["first_success_at"].isoformat() if task["first_success_at"] else None
+                ),
+            }
+        )
+        for task in progress
+    ]
+
+
 @app.get("/api/problemsets/{problemset_id:int}/tasks", response_model=list[ProblemSetTaskResponse])
-async def get_problemset_tasks(problemset_id: int, db: AsyncSession = Depends(get_db)):
+async def get_problemset_tasks(problemset_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get all tasks belonging to a problemset (task list) by id."""
 
     problemset_stmt = select(TaskList.id).where(TaskList.id == problemset_id)
@@ -656,16 +894,304 @@ async def get_problemset_tasks(problemset_id: int, db: AsyncSession = Depends(ge
     return problemset_tasks
 
 
+@app.get("/api/analytics/tasks/{task_id}", response_model=TaskAnalyticsResponse)
+async def get_task_analytics(
+    task_id: int,
+    _current_user: CurrentUser,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Attempt statistics for one task across all student sessions.
+    Durations are in seconds, measured from the student's first start of the task.
+    """
+    result = await db.execute(select(Parsons.id).where(Parsons.id == task_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found",
+        )
+
+    return await analytics_cache.task(db, task_id)
+
+
+@app.get("/api/analytics/tasklists/{task_list_id}", response_model=TaskListAnalyticsResponse)
+async def get_tasklist_analytics(
+    task_list_id: int,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Per-task attempt statistics for a problem set owned by the current teacher,
+    counting only sessions started from that problem set.
+    """
+    await require_owned_problemset(task_list_id, current_user, db)
+
+    return await analytics_cache.tasklist(db, task_list_id)
+
+
+@app.get("/api/analytics/tasks/{task_id}/solve-times", response_model=SolveTimeResponse)
+async def get_task_solve_times(
+    task_id: int,
+    _current_user: CurrentUser,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Approximate p50 / p90 time to solve a task (seconds, within 1% relative error),
+    from the merged solve-time sketch.
+    """
+    result = await db.execute(select(Parsons.id).where(Parsons.id == task_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found",
+        )
+
+    return await solve_time_sketches.summary(db, TASK, task_id)
+
+
+@app.get("/api/analytics/tasks/{task_id}/clusters", response_model=TaskClustersResponse)
+async def get_task_clusters(
+    task_id: int,
+    current_user: CurrentUser,
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Most common failing and passing answers of a task, grouping submissions
+    that differ only in whitespace, comments or variable names. Only attempts
+    made in the caller's task lists are counted or shown.
+    """
+    result = await db.execute(select(Parsons.id).where(Parsons.id == task_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found",
+        )
+
+    return await answer_clusters(db, task_id, current_user.id, limit)
+
+
+@app.get("/api/analytics/tasklists/{task_list_id}/solve-times", response_model=SolveTimeResponse)
+async def get_tasklist_solve_times(
+    task_list_id: int,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Approximate p50 / p90 time to solve any task of a problem set owned by the current teacher."""
+    await require_owned_problemset(task_list_id, current_user, db)
+
+    return await solve_time_sketches.summary(db, TASKLIST, task_list_id)
+
+
+@app.get(
+    "/api/analytics/tasklists/{task_list_id}/summary",
+    response_model=list[TaskStatsResponse],
+)
+async def get_tasklist_summary(
+    task_list_id: int,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Running per-task totals for a problem set, read from the task_stats rollup.
+    Cost does not grow with the number of attempts.
+    """
+    await require_owned_problemset(task_list_id, current_user, db)
+
+    return [
+        TaskStatsResponse(
+            task_id=row.task_id,
+            attempt_count=row.attempt_count,
+            success_count=row.success_count,
+            session_count=row.session_count,
+            success_rate=round(row.success_count / row.attempt_count, 4) if row.attempt_count else 0.0,
+            avg_solve_seconds=(
+                round(row.solve_seconds_sum / row.success_count, 3) if row.success_count else None
+            ),
+            min_solve_seconds=row.solve_seconds_min,
+            max_solve_seconds=row.solve_seconds_max,
+        )
+        for row in await get_tasklist_stats(db, task_list_id)
+    ]
+
+
+@app.get(
+    "/api/analytics/tasklists/{task_list_id}/matrix",
+    response_model=TaskListMatrixResponse,
+)
+async def get_tasklist_matrix(
+    task_list_id: int,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Heatmap of a problem set owned by the current teacher: every student session
+    against every task, with the cell state and attempt count. Cached until the
+    next submission for one of the list's tasks.
+    """
+    await require_owned_problemset(task_list_id, current_user, db)
+
+    return await analytics_cache.matrix(db, task_list_id)
+
+
+@app.get(
+    "/api/analytics/tasklists/{task_list_id}/cohort",
+    response_model=CohortAnalyticsResponse,
+)
+async def get_tasklist_cohort(
+    task_list_id: int,
+    current_user: CurrentUser,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    bucket_seconds: Annotated[int, Query(ge=60, le=31 * 86400)] = 3600,
+    bins: Annotated[int, Query(ge=1, le=200)] = 20,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Cohort view of a problem set owned by the current teacher: per-task totals,
+    a solve-time histogram and attempts per task over time buckets, computed
+    over this worker's columnar copy of the attempts.
+    Optional filters: completed_at in [start, end).
+    """
+    await require_owned_problemset(task_list_id, current_user, db)
+
+    result = await db.execute(
+        select(TaskListItem.task_id)
+        .where(TaskListItem.task_list_id == task_list_id)
+        .order_by(TaskListItem.id.asc())
+    )
+    task_ids = result.scalars().all()
+
+    await attempt_columns.refresh(db)
+    selected = attempt_columns.mask(
+        task_list_id=task_list_id,
+        task_ids=task_ids,
+        start=start,
+        end=end,
+    )
+    summary = attempt_columns.task_summary(selected)
+    edges, counts = attempt_columns.solve_time_histogram(selected, bins)
+    buckets, columns, attempts = attempt_columns.pivot(
+        selected, "bucket", "task_id", bucket_seconds=bucket_seconds
+    )
+
+    return CohortAnalyticsResponse(
+        task_list_id=task_list_id,
+        tasks=[
+            summary.get(task_id)
+            or CohortTaskStats(
+                task_id=task_id,
+                attempts=0,
+                successes=0,
+                sessions=0,
+                success_rate=0.0,
+                median_solve_seconds=None,
+            )
+            for task_id in task_ids
+        ],
+        solve_time_histogram=Histogram(
+            edges=[round(float(edge), 3) for edge in edges], counts=counts.tolist()
+        ),
+        activity=ActivityTimeline(
+            bucket_seconds=bucket_seconds,
+            buckets=[datetime.fromtimestamp(int(bucket), tz=timezone.utc) for bucket in buckets],
+            task_ids=columns.tolist(),
+            attempts=attempts.tolist(),
+        ),
+    )
+
+
+@app.get("/api/tasklists/{task_list_id}/live")
+async def tasklist_live_feed(
+    task_list_id: int,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Server-Sent Events stream of submissions to a problem set owned by the
+    current teacher, with each task's running counters.
+
+    The snapshot is read on the primary (a lagging replica would miss or
+    double-count events already on the stream), and the session is closed
+    before streaming: the dependency only exits when the response ends, so
+    an open tab would otherwise hold a pooled connection.
+    """
+    try:
+        await require_owned_problemset(task_list_id, current_user, db)
+        # Subscribe first: a submission committed after the snapshot is read must reach the stream
+        subscriber = live_feed.subscribe(task_list_id)
+        try:
+            counters = {
+                row.task_id: {
+                    "attempt_count": row.attempt_count,
+                    "success_count": row.success_count,
+                    "session_count": row.session_count,
+                }
+                for row in await get_tasklist_stats(db, task_list_id)
+            }
+        except BaseException:
+            live_feed.unsubscribe(subscriber)
+            raise
+    finally:
+        await db.close()
+
+    return StreamingResponse(
+        event_stream(live_feed, subscriber, counters),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/tasklists/{task_list_id}/attempts/export")
+async def export_tasklist_attempts(
+    task_list_id: int,
+    current_user: CurrentUser,
+    export_format: Annotated[str, Query(alias="format")] = "csv",
+    start: datetime | None = None,
+    end: datetime | None = None,
+    task_id: Annotated[list[int] | None, Query()] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Stream every attempt of a problem set owned by the current teacher, joined
+    with its student session and task, as CSV, NDJSON or Parquet.
+    Optional filters: completed_at in [start, end) and one or more task_id values.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format {export_format}, use one of: {', '.join(EXPORT_FORMATS)}",
+        )
+    if export_format == "parquet" and not parquet_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Parquet export requires the pyarrow package",
+        )
+
+    await require_owned_problemset(task_list_id, current_user, db)
+
+    stmt = export_query(task_list_id, start=start, end=end, task_ids=task_id)
+    filename = f"tasklist-{task_list_id}-attempts.{export_format}"
+    return StreamingResponse(
+        stream_attempts(db, stmt, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @app.post("/api/tasks/{task_id}/submit-result")
 async def submit_test_result(
     task_id: int,
     result: SubmitTestResultRequest,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     student_session: StudentSession | None = Depends(get_current_student_session)
 ):
     """
-    Save a student's test result for a task.
-    Creates a new attempt record for each submission.
+    Save a student's test result for a task, with the block moves of the run.
+    Creates a new attempt record for each submission, or queues it
+    when the write-behind buffer is enabled (ATTEMPT_WRITE_BEHIND=true);
+    both return the attempt's id.
     """
     # If no student session, we can't save results
     if not student_session:
@@ -684,18 +1210,228 @@ async def submit_test_result(
     else:
         task_started_at = datetime.now(timezone.utc)
 
-    new_attempt = TaskAttempt(
-        student_session_id=student_session.id,
-        task_id=task_id,
-        task_started_at=task_started_at,
-        completed_at=datetime.now(timezone.utc),
-        success=result.success,
-        submitted_inputs={
+    # With GRADE_ON_SUBMIT (off by default) the server's own verdict replaces the browser's
+    success = result.success
+    if GRADE_ON_SUBMIT and grading_pool.running:
+        grading_inputs = await task_grading_inputs(db, task_id)
+        if grading_inputs and grading_inputs.code_header:
+            graded = await grade_or_503(db, task_id, result.submitted_code, grading_inputs)
+            success = graded["status"] == "pass"
+
+    attempt_values = {
+        "student_session_id": student_session.id,
+        "task_id": task_id,
+        "task_started_at": task_started_at,
+        "completed_at": datetime.now(timezone.utc),
+        "success": success,
+        "submitted_inputs": {
             "code": result.submitted_code
+        },
+        "code_fingerprint": code_fingerprint(result.submitted_code),
+    }
+
+    # Write-behind mode: acknowledge now, the buffer inserts in batches (moves included)
+    if attempt_writer.running:
+        attempt_id = await attempt_writer.allocate_id(db)
+        attempt_values["id"] = attempt_id
+        try:
+            await attempt_writer.submit(attempt_values, move_records(attempt_id, result.moves))
+        except AttemptQueueFullError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many submissions right now, please try again",
+                headers={"Retry-After": "1"},
+            )
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "status": "success",
+            "message": "Test result queued",
+            "attempt_id": attempt_id,
+            "moves_accepted": len(result.moves),
+            "success": success,
         }
+
+    await record_attempts(
+        db, [attempt_values], {student_session.id: student_session.task_list_id}
     )
+    new_attempt = TaskAttempt(**attempt_values)
     db.add(new_attempt)
+    await db.flush()
 
+    records = move_records(new_attempt.id, result.moves)
+    if not move_event_writer.running:
+        await write_move_events(db, records)
     await db.commit()
 
-    return {"status": "success", "message": "Test result saved"}
+    moves_accepted = len(records)
+    if records and move_event_writer.running:
+        # Queued only after the commit, so the moves never reference a missing attempt
+        try:
+            move_event_writer.submit(records)
+        except MoveEventQueueFullError:
+            moves_accepted = 0
+
+    return {
+        "status": "success",
+        "message": "Test result saved",
+        "attempt_id": new_attempt.id,
+        "moves_accepted": moves_accepted,
+        "success": success,
+    }
+
+
+async def grade_or_503(
+    db: AsyncSession, task_id: int, submitted_code: str, inputs: GradingInputs
+) -> dict:
+    """
+    Grade by block structure when that is conclusive, else from the result cache
+    or on the worker pool, answering 503 when the pool is saturated.
+    """
+    verdict = structure_checker.check(inputs.code_blocks, inputs.correct_solution, submitted_code)
+    if verdict.final:
+        return verdict.result()
+
+    key = grading_cache.key(task_id, inputs.code_header, submitted_code, inputs.test_cases)
+    cached = await grading_cache.get(db, key)
+    if cached is not None:
+        return cached
+
+    try:
+        graded = await grading_pool.grade(
+            submitted_code, inputs.code_header, test_cases=inputs.test_cases
+        )
+    except GraderOverloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many gradings right now, please try again",
+            headers={"Retry-After": "1"},
+        )
+    await grading_cache.put(db, key, graded)
+    return graded
+
+
+@app.post("/api/tasks/{task_id}/grade", response_model=GradeResponse)
+async def grade_task_submission(
+    task_id: int,
+    request: GradeRequest,
+    db: AsyncSession = Depends(get_db),
+    student_session: StudentSession | None = Depends(get_current_student_session_no_update),
+):
+    """
+    Run the task's doctests against submitted code on the sandboxed grading pool.
+    Returns the verdict with one result per doctest example.
+    """
+    if not student_session:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Student session required to grade code"
+        )
+
+    grading_inputs = await task_grading_inputs(db, task_id)
+    if grading_inputs is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found or has no tests",
+        )
+
+    return await grade_or_503(db, task_id, request.code, grading_inputs)
+
+
+@app.post("/api/admin/regrade", status_code=status.HTTP_202_ACCEPTED)
+async def start_regrade(
+    request: RegradeRequest,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Re-grade the stored attempts of tasks against their current doctests, in the
+    background on the grading pool (see regrade.py). Teachers may only re-grade
+    tasks they created: a run rewrites the verdicts every other teacher sees, so
+    other teachers' tasks are refused with 403 even when public, and unknown ids
+    with 404, before anything starts. Shared tasks are re-graded by their owner
+    (the migrate_tasks account) or with python -m backend.regrade.
+    """
+    task_ids = list(dict.fromkeys(request.task_ids))
+    result = await db.execute(
+        select(Parsons.id, Parsons.created_by_teacher_id).where(Parsons.id.in_(task_ids))
+    )
+    found = {task_id: owner_id == current_user.id for task_id, owner_id in result}
+    missing = sorted(set(task_ids) - found.keys())
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tasks not found: {', '.join(map(str, missing))}",
+        )
+    forbidden = sorted(task_id for task_id, allowed in found.items() if not allowed)
+    if forbidden:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Not allowed to re-grade tasks: {', '.join(map(str, forbidden))}",
+        )
+    if regrade_runner.running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A regrade is already running",
+        )
+
+    regrade_runner.start(db.bind, grading_pool, task_ids, restart=request.restart)
+    return regrade_runner.status()
+
+
+@app.get("/api/admin/regrade")
+async def get_regrade_status(_current_user: CurrentUser):
+    """
+    Progress of the current or last regrade run on this worker.
+    """
+    return regrade_runner.status()
+
+
+@app.post("/api/tasks/{task_id}/attempts/{attempt_id}/moves", status_code=status.HTTP_202_ACCEPTED)
+async def submit_move_events(
+    task_id: int,
+    attempt_id: int,
+    batch: MoveEventBatch,
+    db: AsyncSession = Depends(get_db),
+    student_session: StudentSession | None = Depends(get_current_student_session_no_update),
+):
+    """
+    Record the block moves a student made before submitting an attempt.
+    Events are compact rows [block_id, from_position, to_position, indent, offset_ms]
+    and are written in the background (MOVE_EVENT_WRITE_BEHIND, on by default).
+    The attempt must already be stored: with the attempt write-behind buffer,
+    send the moves with the submission instead (SubmitTestResultRequest.moves).
+    """
+    if not student_session:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Student session required to save moves"
+        )
+
+    result = await db.execute(
+        select(TaskAttempt.id).where(
+            TaskAttempt.id == attempt_id,
+            TaskAttempt.task_id == task_id,
+            TaskAttempt.student_session_id == student_session.id,
+        )
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Attempt with id {attempt_id} not found",
+        )
+
+    records = move_records(attempt_id, batch.events)
+    if move_event_writer.running:
+        try:
+            move_event_writer.submit(records)
+        except MoveEventQueueFullError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many move events right now, please try again",
+                headers={"Retry-After": "1"},
+            )
+    else:
+        await write_move_events(db, records)
+        await db.commit()
+
+    return {"status": "success", "accepted": len(records)}
@@ -2,27 +2,40 @@
 Migration script to convert task files (YAML + Python) to database records.
 Run this script to populate the parsons table from existing task files.
 
+Existing tasks (matched by title) are skipped. With --update their
+function header and pre-parsed doctests are refreshed from the task files
+instead, so that a fixed doctest reaches the database; re-grade the
+updated tasks' attempts afterwards with python -m backend.regrade.
+
 Usage:
     python -m backend.migrate_tasks
+    python -m backend.migrate_tasks --update   # also refresh the doctests of existing tasks
 
     Or from Docker (ensure web service is running with --profile web):
     docker compose exec web python -m backend.migrate_tasks
 """
 
+import ast
 import asyncio
+import doctest
 import json
 import re
+import sys
 from pathlib import Path
 from typing import Any, Dict, List
 
 import yaml
-from sqlalchemy import select
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 
 from backend.database import async_session
 from backend.models import Parsons, Teacher
 
 # Path to the parsons_probs folder
 PARSONS_PROBS_DIR = Path(__file__).parent.parent / "parsons_probs"
+BACKFILL_BATCH_ROWS = 500
+
+_OPTION_NAMES = {flag: name for name, flag in doctest.OPTIONFLAGS_BY_NAME.items()}
 
 
 def parse_problem_description(html_description: str) -> Dict[str, str]:
@@ -170,6 +183,49 @@ def extract_function_signature(function_file: str) -> str:
     return "\n".join(result_lines)
 
 
+def extract_test_cases(function_header: str) -> List[Dict[str, Any]] | None:
+    """
+    Parse the doctest examples of a function header's docstring.
+
+    Args:
+        function_header: Function definition with docstring (see extract_function_signature)
+
+    Returns:
+        One dict per example with "source", "want", "exc_msg" (expected exception
+        message or None), "line" (1-based, within the header) and "options"
+        (doctest directive name -> enabled), or None if the header has no
+        parsable function with a docstring
+    """
+    try:
+        tree = ast.parse(function_header)
+    except SyntaxError:
+        return None
+    function = next(
+        (node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))),
+        None,
+    )
+    if function is None or not function.body:
+        return None
+    docstring = function.body[0]
+    if not (
+        isinstance(docstring, ast.Expr)
+        and isinstance(docstring.value, ast.Constant)
+        and isinstance(docstring.value.value, str)
+    ):
+        return None
+
+    return [
+        {
+            "source": example.source,
+            "want": example.want,
+            "exc_msg": example.exc_msg,
+            "line": docstring.lineno + example.lineno,
+            "options": {_OPTION_NAMES[flag]: enabled for flag, enabled in example.options.items()},
+        }
+        for example in doctest.DocTestParser().get_examples(docstring.value.value)
+    ]
+
+
 def get_function_name(function_header: str) -> str:
     """
     Extract function name from Python function header.
@@ -235,9 +291,11 @@ def load_task_file(task_name: str) -> Dict[str, Any] | None:
         return {
             "title": task_name,
             "description": json.dumps(parsed_description),
+            "description_text": parsed_description["description"],
             "task_instructions": task_instructions,
             "task_type": task_type,
             "code_blocks": {"blocks": blocks, "function_header": function_header},
+            "test_cases": extract_test_cases(function_header),
             "correct_solution": {
                 "correct_order": correct_order,
                 "test_function": test_fn,
@@ -298,9 +356,78 @@ async def task_exists(task_title: str) -> bool:
         return result.scalar_one_or_none() is not None
 
 
-async def migrate_tasks():
+async def update_grading_inputs(session: AsyncSession, task_data: Dict[str, Any]) -> int | None:
+    """
+    Refresh the function header and test cases of an existing task from its files.
+
+    Only the grading inputs are touched; blocks, description and solution stay as stored.
+
+    Args:
+        session: Session the change is made in (the caller commits)
+        task_data: Parsed task files, as returned by load_task_file
+
+    Returns:
+        The task id if anything changed, else None
+    """
+    result = await session.execute(select(Parsons).where(Parsons.title == task_data["title"]).limit(1))
+    task = result.scalar_one_or_none()
+    if task is None:
+        return None
+
+    header = task_data["code_blocks"].get("function_header")
+    code_blocks = task.code_blocks if isinstance(task.code_blocks, dict) else {}
+    if code_blocks.get("function_header") == header and task.test_cases == task_data.get("test_cases"):
+        return None
+    # A new dict, so that the JSON column is seen as changed
+    task.code_blocks = {**code_blocks, "function_header": header}
+    task.test_cases = task_data.get("test_cases")
+    await session.flush()
+    return task.id
+
+
+async def backfill_test_cases(conn: AsyncConnection) -> int:
+    """
+    Fill Parsons.test_cases from the stored function headers (schema migration step).
+
+    Returns:
+        Number of tasks that got test cases
+    """
+    statement = (
+        update(Parsons)
+        .where(Parsons.__table__.c.id == bindparam("task_id"))
+        .values(test_cases=bindparam("test_cases"))
+    )
+    filled = 0
+    last_id = 0
+    while True:
+        result = await conn.execute(
+            select(Parsons.id, Parsons.code_blocks)
+            .where(Parsons.test_cases.is_(None), Parsons.id > last_id)
+            .order_by(Parsons.id)
+            .limit(BACKFILL_BATCH_ROWS)
+        )
+        rows = result.all()
+        if not rows:
+            return filled
+        last_id = rows[-1].id
+
+        updates = []
+        for task_id, code_blocks in rows:
+            header = code_blocks.get("function_header") if isinstance(code_blocks, dict) else None
+            test_cases = extract_test_cases(header) if isinstance(header, str) else None
+            if test_cases is not None:
+                updates.append({"task_id": task_id, "test_cases": test_cases})
+        if updates:
+            await conn.execute(statement, updates)
+            filled += len(updates)
+
+
+async def migrate_tasks(update: bool = False):
     """
     Main migration function. Loads all task files and inserts into database.
+
+    Args:
+        update: Refresh the doctests of tasks that already exist instead of skipping them
     """
     print("Starting task migration...")
 
@@ -324,6 +451,7 @@ async def migrate_tasks():
     migrated = 0
     skipped = 0
     failed = 0
+    updated = []
 
     async with async_session() as session:
         for task_name in task_names:
@@ -331,8 +459,22 @@ async def migrate_tasks():
 
             # Check if already exists
             if await task_exists(task_name):
-                print("SKIPPED (already exists)")
-                skipped += 1
+                if not update:
+                    print("SKIPPED (already exists)")
+                    skipped += 1
+                    continue
+                task_data = load_task_file(task_name)
+                if not task_data:
+                    print("FAILED (couldn't parse files)")
+                    failed += 1
+                    continue
+                task_id = await update_grading_inputs(session, task_data)
+                if task_id is None:
+                    print("SKIPPED (doctests unchanged)")
+                    skipped += 1
+                else:
+                    print(f"✓ UPDATED doctests (id={task_id})")
+                    updated.append(task_id)
                 continue
 
             # Load task data
@@ -347,10 +489,12 @@ async def migrate_tasks():
                 created_by_teacher_id=teacher.id,
                 title=task_data["title"],
                 description=task_data["description"],
+                description_text=task_data.get("description_text"),
                 task_instructions=task_data["task_instructions"],
                 task_type=task_data["task_type"],
                 code_blocks=task_data["code_blocks"],
                 correct_solution=task_data["correct_solution"],
+                test_cases=task_data.get("test_cases"),
                 is_public=True,
             )
 
@@ -376,20 +520,25 @@ async def migrate_tasks():
     print(f"\n{'=' * 50}")
     print(f"Migration Summary:")
     print(f"  Migrated: {migrated}")
+    if update:
+        print(f"  Updated:  {len(updated)}")
     print(f"  Skipped:  {skipped}")
     print(f"  Failed:   {failed}")
     print(f"  Total:    {len(task_names)}")
     print(f"{'=' * 50}")
+    if updated:
+        print("Re-grade their attempts with:")
+        print(f"  python -m backend.regrade run {' '.join(map(str, updated))}")
 
 
-async def main():
+async def main(argv: list[str] | None = None):
     """Entry point for the migration script."""
     try:
-        await migrate_tasks()
+        await migrate_tasks(update="--update" in (argv or []))
     except Exception as e:
         print(f"Fatal error: {e}")
         raise
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(sys.argv[1:]))
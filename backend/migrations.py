@@ -0,0 +1,349 @@
+"""
+Versioned schema migrations.
+
+init_db creates missing tables with Base.metadata.create_all, which never
+alters tables that already exist. Changes to existing tables (new columns,
+new indexes) are listed here as numbered migrations and recorded in the
+schema_migrations table once applied. Every step is idempotent, so a fresh
+database created by create_all simply records them as applied.
+
+Index migrations marked non-transactional run with CREATE INDEX
+CONCURRENTLY on PostgreSQL, so they can be applied to a live database
+without locking writes. A PostgreSQL advisory lock keeps several workers
+starting at once from running migrations in parallel.
+
+Backfills that scan the attempt tables are not migrations: every worker
+start would run them under the migration lock. They are one-off commands,
+named in the migration that introduced the data, to run once after
+deploying it.
+
+Usage:
+    python -m backend.migrations            # apply pending migrations
+    python -m backend.migrations status     # list applied / pending
+
+    Or from Docker:
+    docker compose exec web python -m backend.migrations
+"""
+
+import asyncio
+import importlib
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+# Arbitrary constant identifying this application's migration lock
+MIGRATION_LOCK_ID = 734_219_001
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+async def _has_table(conn: AsyncConnection, table: str) -> bool:
+    return await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(table))
+
+
+@dataclass(frozen=True)
+class AddColumn:
+    """ALTER TABLE ... ADD COLUMN, skipped if the column already exists."""
+
+    table: str
+    column: str
+    ddl_type: str
+
+    async def apply(self, conn: AsyncConnection) -> None:
+        # Tables created later by create_all already have the column
+        if not await _has_table(conn, self.table):
+            return
+        columns = await conn.run_sync(
+            lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns(self.table)}
+        )
+        if self.column in columns:
+            return
+        await conn.execute(
+            text(f"ALTER TABLE {self.table} ADD COLUMN {self.column} {self.ddl_type}")
+        )
+
+
+@dataclass(frozen=True)
+class CreateIndex:
+    """CREATE INDEX IF NOT EXISTS, CONCURRENTLY on PostgreSQL outside a transaction."""
+
+    name: str
+    table: str
+    columns: str
+    where: str | None = None
+
+    async def apply(self, conn: AsyncConnection, concurrently: bool = False) -> None:
+        if not await _has_table(conn, self.table):
+            return
+        if concurrently:
+            # Indexes on a partitioned table cannot be built concurrently;
+            # the plain build cascades to every partition.
+            kind = await conn.execute(
+                text("SELECT relkind FROM pg_class WHERE relname = :table"),
+                {"table": self.table},
+            )
+            concurrently = kind.scalar() != "p"
+        keyword = "CONCURRENTLY " if concurrently else ""
+        if concurrently:
+            # A failed concurrent build leaves an INVALID index behind that
+            # IF NOT EXISTS would happily skip; drop it and build again.
+            invalid = await conn.execute(
+                text(
+                    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :name AND NOT i.indisvalid"
+                ),
+                {"name": self.name},
+            )
+            if invalid.first() is not None:
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.name}"))
+
+        where = f" WHERE {self.where}" if self.where else ""
+        await conn.execute(
+            text(
+                f"CREATE INDEX {keyword}IF NOT EXISTS {self.name} "
+                f"ON {self.table} ({self.columns}){where}"
+            )
+        )
+
+
+@dataclass(frozen=True)
+class Backfill:
+    """Run a data backfill coroutine, given as "module:function" relative to this package."""
+
+    table: str
+    function: str
+
+    async def apply(self, conn: AsyncConnection) -> None:
+        if not await _has_table(conn, self.table):
+            return
+        # Imported lazily: the models import database, which imports this module
+        module_name, function_name = self.function.split(":")
+        module = importlib.import_module(module_name, package=__package__)
+        await getattr(module, function_name)(conn)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A numbered schema change made of idempotent steps."""
+
+    version: int
+    name: str
+    steps: tuple
+    # CONCURRENTLY cannot run inside a transaction block
+    transactional: bool = True
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        version=1,
+        name="parsons.description_text",
+        steps=(AddColumn("parsons", "description_text", "TEXT"),),
+    ),
+    Migration(
+        version=2,
+        name="indexes for foreign keys and hot predicates",
+        transactional=False,
+        steps=(
+            CreateIndex("ix_task_attempts_task_id_success", "task_attempts", "task_id, success"),
+            CreateIndex(
+                "ix_task_attempts_session_task_completed",
+                "task_attempts",
+                "student_session_id, task_id, completed_at",
+            ),
+            CreateIndex(
+                "ix_task_list_items_task_list_id_id", "task_list_items", "task_list_id, id"
+            ),
+            CreateIndex("ix_task_list_items_task_id", "task_list_items", "task_id"),
+            CreateIndex("ix_student_sessions_task_list_id", "student_sessions", "task_list_id"),
+            CreateIndex("ix_move_events_attempt_id", "move_events", "attempt_id"),
+            CreateIndex(
+                "ix_parsons_public_updated_at", "parsons", "updated_at", where="is_public"
+            ),
+        ),
+    ),
+    # Aggregates every attempt; run python -m backend.task_stats rebuild once instead
+    Migration(
+        version=3,
+        name="task_stats rollup (task_stats rebuild)",
+        steps=(),
+    ),
+    # Streams every successful attempt; run python -m backend.solve_times rebuild once instead
+    Migration(
+        version=4,
+        name="solve time sketches (solve_times rebuild)",
+        steps=(),
+    ),
+    # Older attempts are fingerprinted by python -m backend.code_fingerprint backfill
+    Migration(
+        version=5,
+        name="task_attempts.code_fingerprint",
+        steps=(AddColumn("task_attempts", "code_fingerprint", "VARCHAR(32)"),),
+    ),
+    Migration(
+        version=6,
+        name="index for code fingerprint clusters",
+        transactional=False,
+        steps=(
+            CreateIndex(
+                "ix_task_attempts_task_fingerprint", "task_attempts", "task_id, code_fingerprint"
+            ),
+        ),
+    ),
+    Migration(
+        version=7,
+        name="move_events block and position columns",
+        steps=(
+            AddColumn("move_events", "block_id", "VARCHAR(64)"),
+            AddColumn("move_events", "from_position", "INTEGER"),
+            AddColumn("move_events", "to_position", "INTEGER"),
+            AddColumn("move_events", "indent", "INTEGER"),
+            AddColumn("move_events", "offset_ms", "INTEGER"),
+        ),
+    ),
+    # Partitioning copies both tables under a lock; it is the one-off command
+    # python -m backend.retention partition now, not a startup migration
+    Migration(
+        version=8,
+        name="partition task_attempts and move_events by month (retention partition)",
+        steps=(),
+    ),
+    Migration(
+        version=9,
+        name="index for expired student session purge",
+        transactional=False,
+        steps=(
+            CreateIndex(
+                "ix_student_sessions_last_activity_at", "student_sessions", "last_activity_at"
+            ),
+        ),
+    ),
+    Migration(
+        version=10,
+        name="parsons.test_cases",
+        steps=(
+            AddColumn("parsons", "test_cases", "JSON"),
+            Backfill("parsons", ".migrate_tasks:backfill_test_cases"),
+        ),
+    ),
+)
+
+
+async def _applied_versions(conn: AsyncConnection) -> set[int]:
+    result = await conn.execute(select(schema_migrations.c.version))
+    return set(result.scalars().all())
+
+
+async def _record(conn: AsyncConnection, migration: Migration) -> None:
+    await conn.execute(
+        schema_migrations.insert().values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=datetime.now(timezone.utc),
+        )
+    )
+
+
+async def _apply(engine: AsyncEngine, migration: Migration) -> None:
+    """Apply one migration, in a transaction unless it builds indexes concurrently."""
+    if not migration.transactional and engine.dialect.name == "postgresql":
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for step in migration.steps:
+                if isinstance(step, CreateIndex):
+                    await step.apply(conn, concurrently=True)
+                else:
+                    await step.apply(conn)
+            await _record(conn, migration)
+        return
+
+    async with engine.begin() as conn:
+        for step in migration.steps:
+            await step.apply(conn)
+        await _record(conn, migration)
+
+
+async def run_migrations(engine: AsyncEngine) -> list[int]:
+    """
+    Apply every pending migration in version order.
+
+    Args:
+        engine: Engine of the database to migrate
+
+    Returns:
+        Versions that were applied by this call
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(migration_metadata.create_all, checkfirst=True)
+
+    is_postgres = engine.dialect.name == "postgresql"
+    applied_now = []
+    async with engine.connect() as lock_conn:
+        if is_postgres:
+            lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+            await lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            async with engine.connect() as conn:
+                applied = await _applied_versions(conn)
+
+            for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                if migration.version in applied:
+                    continue
+                await _apply(engine, migration)
+                applied_now.append(migration.version)
+                print(f"Applied migration {migration.version}: {migration.name}")
+        finally:
+            if is_postgres:
+                await lock_conn.execute(
+                    text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID}
+                )
+
+    return applied_now
+
+
+async def migration_status(engine: AsyncEngine) -> list[tuple[int, str, bool]]:
+    """Return (version, name, applied) for every known migration."""
+    async with engine.begin() as conn:
+        await conn.run_sync(migration_metadata.create_all, checkfirst=True)
+        applied = await _applied_versions(conn)
+    return [(m.version, m.name, m.version in applied) for m in MIGRATIONS]
+
+
+async def main(argv: list[str]) -> None:
+    """Entry point for the migration command."""
+    from .database import engine
+
+    try:
+        if argv[:1] == ["status"]:
+            for version, name, applied in await migration_status(engine):
+                print(f"{'✓' if applied else ' '} {version:>4}  {name}")
+        else:
+            applied_now = await run_migrations(engine)
+            if not applied_now:
+                print("Database schema is up to date")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -6,7 +6,7 @@ from datetime import datetime, timezone
 from uuid import UUID
 
 import bcrypt
-from sqlalchemy import JSON,Boolean, DateTime, ForeignKey, Integer, String, Uuid
+from sqlalchemy import JSON,Boolean, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, Uuid, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .database import Base
@@ -49,6 +49,15 @@ class Parsons(Base):
     """Parsons problem task model."""
 
     __tablename__ = "parsons"
+    __table_args__ = (
+        # Public task listing and its freshness check (max updated_at where is_public)
+        Index(
+            "ix_parsons_public_updated_at",
+            "updated_at",
+            postgresql_where=text("is_public"),
+            sqlite_where=text("is_public"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     created_by_teacher_id: Mapped[int] = mapped_column(
@@ -56,10 +65,14 @@ class Parsons(Base):
     )
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(String(None), nullable=False)
+    # Plain description text extracted from the description JSON at migration time
+    description_text: Mapped[str | None] = mapped_column(String(None), nullable=True)
     task_instructions: Mapped[str] = mapped_column(String(None), nullable=True)
     task_type: Mapped[str] = mapped_column(String(50), nullable=False)
     code_blocks: Mapped[dict] = mapped_column(JSON, nullable=False)
     correct_solution: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # Doctest examples of the function header, pre-parsed for the server grader
+    test_cases: Mapped[list | None] = mapped_column(JSON(none_as_null=True), nullable=True)
     is_public: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
     updated_at: Mapped[datetime] = mapped_column(
@@ -86,6 +99,11 @@ class TaskListItem(Base):
     """Task list item model."""
 
     __tablename__ = "task_list_items"
+    __table_args__ = (
+        # Tasks of a list in insertion order
+        Index("ix_task_list_items_task_list_id_id", "task_list_id", "id"),
+        Index("ix_task_list_items_task_id", "task_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     task_list_id: Mapped[int] = mapped_column(
@@ -100,6 +118,10 @@ class StudentSession(Base):
     """Student session model."""
 
     __tablename__ = "student_sessions"
+    __table_args__ = (
+        Index("ix_student_sessions_task_list_id", "task_list_id"),
+        Index("ix_student_sessions_last_activity_at", "last_activity_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     session_id: Mapped[UUID] = mapped_column(Uuid, unique=True, nullable=False)
@@ -117,6 +139,19 @@ class TaskAttempt(Base):
     """Student attempt for a specific task."""
 
     __tablename__ = "task_attempts"
+    __table_args__ = (
+        # Per-task analytics (completions, success rate)
+        Index("ix_task_attempts_task_id_success", "task_id", "success"),
+        # Per-student progress within a task list
+        Index(
+            "ix_task_attempts_session_task_completed",
+            "student_session_id",
+            "task_id",
+            "completed_at",
+        ),
+        # Common answers per task (analytics clusters)
+        Index("ix_task_attempts_task_fingerprint", "task_id", "code_fingerprint"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     student_session_id: Mapped[int] = mapped_column(
@@ -132,15 +167,105 @@ class TaskAttempt(Base):
     success: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
     submitted_order: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     submitted_inputs: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # Hash of the normalized submitted code (code_fingerprint.py)
+    code_fingerprint: Mapped[str | None] = mapped_column(String(32), nullable=True)
+
+
+class TaskStats(Base):
+    """Running attempt totals per task within a task list (see task_stats.py)."""
+
+    __tablename__ = "task_stats"
+
+    task_list_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("task_lists.id", ondelete="CASCADE"), primary_key=True
+    )
+    task_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("parsons.id", ondelete="CASCADE"), primary_key=True
+    )
+    attempt_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    success_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    session_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Seconds from task_started_at to completed_at of successful attempts
+    solve_seconds_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    solve_seconds_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    solve_seconds_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utc_now, onupdate=utc_now
+    )
+
+
+class SolveTimeSketch(Base):
+    """Persisted solve-time quantile sketch of a task or task list (see solve_times.py)."""
+
+    __tablename__ = "solve_time_sketches"
+
+    # "task" or "tasklist"
+    scope: Mapped[str] = mapped_column(String(16), primary_key=True)
+    scope_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    sample_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    sketch: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utc_now, onupdate=utc_now
+    )
+
+
+class GradingResult(Base):
+    """Persisted server-side grading result of a submission (see grading_cache.py)."""
+
+    __tablename__ = "grading_results"
+
+    task_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("parsons.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Digest of the task's grading inputs (function header and its doctests)
+    task_version: Mapped[str] = mapped_column(String(32), primary_key=True)
+    # Digest of the whitespace-normalized submitted code
+    code_hash: Mapped[str] = mapped_column(String(32), primary_key=True)
+    result: Mapped[dict] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
+
+
+class RegradeCheckpoint(Base):
+    """Progress of re-grading a task's stored attempts (see regrade.py)."""
+
+    __tablename__ = "regrade_checkpoints"
+
+    task_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("parsons.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Task version the attempts are being re-graded against
+    task_version: Mapped[str] = mapped_column(String(32), nullable=False)
+    # Attempts up to this id have been re-graded
+    last_attempt_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    processed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    changed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Attempts whose verdict stayed unknown (timeouts, crashed gradings)
+    unresolved: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utc_now, onupdate=utc_now
+    )
 
 
 class MoveEvent(Base):
     """Individual move event tied to a task attempt."""
 
     __tablename__ = "move_events"
+    __table_args__ = (
+        Index("ix_move_events_attempt_id", "attempt_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     attempt_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("task_attempts.id", ondelete="CASCADE"), nullable=False
     )
     event_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
+    # Dragged block (code line id within the task's blocks)
+    block_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # Positions in the solution column; -1 is the starter (trash) column
+    from_position: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    to_position: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    indent: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Milliseconds since the student's previous run of the task (or page load)
+    offset_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
@@ -0,0 +1,125 @@
+"""
+Batched ingestion of Parsons block moves (move_events).
+
+The browser collects its drags and posts them with each submission as a
+compact array of [block_id, from_position, to_position, indent, offset_ms]
+rows. The request only validates the batch and puts it on a bounded
+in-memory queue; a background task writes the queued rows every
+MOVE_EVENT_FLUSH_INTERVAL_MS milliseconds, using COPY on PostgreSQL and
+multi-row INSERTs elsewhere, on its own connection. Moves therefore never
+share a transaction or a lock with submissions, and a burst of
+drags costs a handful of COPYs per second.
+
+With MOVE_EVENT_WRITE_BEHIND=false, or before the writer is started,
+batches are written directly in the request's transaction. Moves of an
+attempt queued by the attempt write-behind buffer are written with that
+attempt instead (attempt_writer.py).
+"""
+
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .background_flush import BatchWriter
+from .models import MoveEvent
+
+MOVE_EVENT_WRITE_BEHIND = os.getenv("MOVE_EVENT_WRITE_BEHIND", "true").lower() == "true"
+# Rows held in memory before new batches are rejected
+MOVE_EVENT_QUEUE_MAX_ROWS = int(os.getenv("MOVE_EVENT_QUEUE_MAX_ROWS", "100000"))
+MOVE_EVENT_FLUSH_INTERVAL_MS = int(os.getenv("MOVE_EVENT_FLUSH_INTERVAL_MS", "500"))
+MOVE_EVENT_FLUSH_MAX_ROWS = int(os.getenv("MOVE_EVENT_FLUSH_MAX_ROWS", "10000"))
+# Largest batch one request may post
+MOVE_EVENT_MAX_BATCH = int(os.getenv("MOVE_EVENT_MAX_BATCH", "2000"))
+MOVE_EVENT_FLUSH_RETRIES = 3
+
+COPY_COLUMNS = (
+    "attempt_id",
+    "event_time",
+    "block_id",
+    "from_position",
+    "to_position",
+    "indent",
+    "offset_ms",
+)
+
+
+class MoveEventQueueFullError(Exception):
+    """Raised when a batch does not fit in the move event queue."""
+
+
+def move_records(attempt_id: int, events: list, received_at: datetime | None = None) -> list[tuple]:
+    """
+    Rows in COPY_COLUMNS order for one attempt's compact events.
+
+    Args:
+        attempt_id: Attempt the moves belong to
+        events: [block_id, from_position, to_position, indent, offset_ms] items
+        received_at: event_time for every row (default: now)
+    """
+    received_at = received_at or datetime.now(timezone.utc)
+    return [
+        (attempt_id, received_at, block_id, from_position, to_position, indent, offset_ms)
+        for block_id, from_position, to_position, indent, offset_ms in events
+    ]
+
+
+async def write_move_events(db: AsyncSession, records: list[tuple]) -> None:
+    """Write rows with COPY on PostgreSQL or a multi-row INSERT, in db's transaction."""
+    if not records:
+        return
+    if db.bind.dialect.name == "postgresql":
+        conn = await db.connection()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            MoveEvent.__tablename__, records=records, columns=COPY_COLUMNS
+        )
+        return
+    await db.execute(
+        insert(MoveEvent), [dict(zip(COPY_COLUMNS, record)) for record in records]
+    )
+
+
+class MoveEventWriter(BatchWriter):
+    """Bounded queue of move event batches plus a background COPY flusher."""
+
+    label = "Move event"
+    task_name = "move-event-writer"
+    retries = MOVE_EVENT_FLUSH_RETRIES
+
+    def __init__(
+        self,
+        max_rows: int = MOVE_EVENT_QUEUE_MAX_ROWS,
+        flush_interval_ms: int = MOVE_EVENT_FLUSH_INTERVAL_MS,
+        flush_max_rows: int = MOVE_EVENT_FLUSH_MAX_ROWS,
+    ):
+        super().__init__(flush_interval_ms / 1000, flush_max_rows)
+        self.max_rows = max_rows
+        self.accepted_rows = 0
+        self.rejected_rows = 0
+
+    def submit(self, records: list[tuple]) -> None:
+        """Queue one batch without waiting; raises MoveEventQueueFullError when over capacity."""
+        if self._queued_rows + len(records) > self.max_rows:
+            self.rejected_rows += len(records)
+            raise MoveEventQueueFullError("Move event queue is full")
+        self._put_nowait(records)
+        self.accepted_rows += len(records)
+
+    async def _write(self, session, rows: list[tuple]) -> None:
+        await write_move_events(session, rows)
+
+    def stats(self) -> dict:
+        """Return queue depth and flush counters."""
+        return {
+            "enabled": self.running,
+            "queued_rows": self._queued_rows,
+            "queue_max_rows": self.max_rows,
+            "accepted_rows": self.accepted_rows,
+            "rejected_rows": self.rejected_rows,
+            **self.flush_stats(),
+        }
+
+
+move_event_writer = MoveEventWriter()
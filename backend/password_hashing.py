@@ -0,0 +1,117 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow (hundreds of milliseconds per call). Running it
+inside an async handler stalls every other request on the worker, so login
+and registration dispatch it to a small dedicated thread pool (bcrypt
+releases the GIL while hashing). Admission is bounded: once
+PASSWORD_HASH_WORKERS calls are running and PASSWORD_HASH_MAX_QUEUED more
+are waiting, further calls fail fast with PasswordHasherOverloaded.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+PASSWORD_HASH_MAX_QUEUED = int(os.getenv("PASSWORD_HASH_MAX_QUEUED", "32"))
+
+
+class PasswordHasherOverloaded(Exception):
+    """Raised when too many password operations are already pending."""
+
+
+class PasswordHasher:
+    """Bounded thread pool for bcrypt hashing and verification."""
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queued: int = PASSWORD_HASH_MAX_QUEUED,
+    ):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor: ThreadPoolExecutor | None = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queue_ms = 0.0
+        self._total_queue_ms = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of running plus waiting operations."""
+        return self.workers + self.max_queued
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def _run(self, func, *args):
+        """Run func(*args) on the pool, recording how long it waited to start."""
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise PasswordHasherOverloaded("Too many password operations in progress")
+
+        submitted = time.perf_counter()
+        queue_ms = 0.0
+
+        def timed():
+            nonlocal queue_ms
+            queue_ms = (time.perf_counter() - submitted) * 1000
+            return func(*args)
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), timed)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.max_queue_ms = max(self.max_queue_ms, queue_ms)
+            self._total_queue_ms += queue_ms
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with a fresh salt."""
+        return await self._run(_hash_password, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        """Check a password against a stored bcrypt hash."""
+        return await self._run(_verify_password, password, password_hash)
+
+    def shutdown(self) -> None:
+        """Stop the worker threads (waits for running operations)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        """Return concurrency and queue-time metrics."""
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "max_queue_ms": round(self.max_queue_ms, 3),
+            "avg_queue_ms": round(self._total_queue_ms / self.completed, 3) if self.completed else 0.0,
+        }
+
+
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+
+def _verify_password(password: str, password_hash: str) -> bool:
+    return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,112 @@
+"""
+Short-TTL cache of authenticated teachers, keyed by the JWT "sub" claim.
+
+get_current_user used to load the Teacher row on every protected request.
+With this cache a valid token for a recently seen teacher is resolved
+without a database round-trip. Entries are dropped as soon as the Teacher
+row is updated or deleted through the ORM (e.g. deactivated or edited),
+and otherwise live at most PRINCIPAL_CACHE_TTL_SECONDS.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event, inspect
+
+from .models import Teacher
+
+# 0 disables the cache (every request hits the database)
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "1024"))
+
+
+@dataclass(frozen=True, slots=True)
+class TeacherPrincipal:
+    """Detached, read-only view of the authenticated teacher."""
+
+    id: int
+    username: str
+    email: str
+    is_active: bool
+
+    @classmethod
+    def from_teacher(cls, teacher: Teacher) -> "TeacherPrincipal":
+        """Build a principal from a loaded Teacher row."""
+        return cls(
+            id=teacher.id,
+            username=teacher.username,
+            email=teacher.email,
+            is_active=teacher.is_active,
+        )
+
+
+class PrincipalCache:
+    """TTL/LRU mapping of username -> TeacherPrincipal for active teachers."""
+
+    def __init__(
+        self,
+        ttl: float = PRINCIPAL_CACHE_TTL_SECONDS,
+        max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, TeacherPrincipal]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> TeacherPrincipal | None:
+        """Return the cached principal for a username, or None on a miss."""
+        entry = self._entries.get(username)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[username]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(username)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, principal: TeacherPrincipal) -> None:
+        """Cache an active principal."""
+        if self.ttl <= 0 or not principal.is_active:
+            return
+        self._entries[principal.username] = (time.monotonic() + self.ttl, principal)
+        self._entries.move_to_end(principal.username)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        """Drop a single username."""
+        self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+principal_cache = PrincipalCache()
+
+
+@event.listens_for(Teacher, "after_update")
+@event.listens_for(Teacher, "after_delete")
+def _invalidate_teacher(_mapper, _connection, target: Teacher) -> None:
+    """Drop cached principals when a teacher is edited, deactivated or removed."""
+    usernames = {target.username}
+    usernames.update(inspect(target).attrs.username.history.deleted or ())
+    for username in usernames:
+        if username:
+            principal_cache.invalidate(username)
@@ -0,0 +1,214 @@
+"""
+Mergeable quantile sketch with relative-error guarantees (DDSketch).
+
+Values are counted in logarithmic buckets: bucket i holds values in
+(gamma^(i-1), gamma^i] with gamma = (1 + alpha) / (1 - alpha), so any
+quantile is answered within a relative error of alpha. Two sketches with
+the same alpha merge exactly by adding bucket counts, which makes the
+sketch suitable for combining per-worker partial results. Durations of
+a day at alpha = 1% need fewer than a thousand buckets.
+"""
+
+import math
+import struct
+from collections.abc import Iterable
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BUCKETS = 2048
+# Values at or below this (including zero and negative durations) share one bucket
+MIN_TRACKED_VALUE = 1e-3
+
+_HEADER = struct.Struct("<BdQQddqI")
+_FORMAT_VERSION = 1
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class QuantileSketch:
+    """DDSketch over non-negative values (solve times in seconds)."""
+
+    __slots__ = ("alpha", "max_buckets", "_gamma", "_log_gamma", "buckets", "zero_count", "count", "min", "max")
+
+    def __init__(
+        self,
+        alpha: float = DEFAULT_RELATIVE_ACCURACY,
+        max_buckets: int = DEFAULT_MAX_BUCKETS,
+    ):
+        self.alpha = alpha
+        self.max_buckets = max_buckets
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # Midpoint (in relative terms) of the bucket (gamma^(key-1), gamma^key]
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def add(self, value: float, weight: int = 1) -> None:
+        """Count a value weight times."""
+        if value <= MIN_TRACKED_VALUE:
+            self.zero_count += weight
+        else:
+            key = self._key(value)
+            self.buckets[key] = self.buckets.get(key, 0) + weight
+            if len(self.buckets) > self.max_buckets:
+                self._collapse()
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def update(self, values: Iterable[float]) -> None:
+        """Count every value in an iterable."""
+        for value in values:
+            self.add(value)
+
+    def _collapse(self) -> None:
+        """Fold the lowest buckets together to stay within max_buckets."""
+        keys = sorted(self.buckets)
+        excess = len(keys) - self.max_buckets
+        target = keys[excess]
+        for key in keys[:excess]:
+            self.buckets[target] += self.buckets.pop(key)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Add another sketch's counts into this one."""
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, bucket_count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + bucket_count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def subtract(self, other: "QuantileSketch") -> None:
+        """
+        Remove counts that were merged in before (samples that were withdrawn).
+        Counts do not go below zero. When an extreme is removed, min and max
+        fall back to the value of the remaining lowest / highest bucket.
+        """
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot subtract sketches with different relative accuracy")
+        for key, bucket_count in other.buckets.items():
+            if key not in self.buckets:
+                # Folded by _collapse into the next higher bucket
+                key = min((k for k in self.buckets if k > key), default=None)
+                if key is None:
+                    continue
+            remaining = self.buckets[key] - bucket_count
+            if remaining > 0:
+                self.buckets[key] = remaining
+            else:
+                del self.buckets[key]
+        self.zero_count = max(self.zero_count - other.zero_count, 0)
+        self.count = self.zero_count + sum(self.buckets.values())
+
+        if not self.count:
+            self.min, self.max = math.inf, -math.inf
+            return
+        if other.min <= self.min and not self.zero_count:
+            self.min = self._value(min(self.buckets))
+        if other.max >= self.max:
+            self.max = self._value(max(self.buckets)) if self.buckets else min(self.max, MIN_TRACKED_VALUE)
+        self.min = min(self.min, self.max)
+
+    def rebucketed(self, alpha: float) -> "QuantileSketch":
+        """Approximate copy with a different relative accuracy (for configuration changes)."""
+        sketch = QuantileSketch(alpha=alpha, max_buckets=self.max_buckets)
+        if self.zero_count:
+            sketch.add(0.0, self.zero_count)
+        for key, bucket_count in self.buckets.items():
+            sketch.add(self._value(key), bucket_count)
+        if self.count:
+            sketch.min, sketch.max = self.min, self.max
+        return sketch
+
+    def quantile(self, q: float) -> float | None:
+        """Value at quantile q (0..1), or None for an empty sketch."""
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        if self.count == 0:
+            return None
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            result = 0.0
+        else:
+            result = self.max
+            for key in sorted(self.buckets):
+                seen += self.buckets[key]
+                if rank < seen:
+                    result = self._value(key)
+                    break
+        return min(max(result, self.min), self.max)
+
+    def to_bytes(self) -> bytes:
+        """Compact binary form: a fixed header and varint bucket counts over the key range."""
+        if self.buckets:
+            offset = min(self.buckets)
+            span = max(self.buckets) - offset + 1
+        else:
+            offset, span = 0, 0
+        out = bytearray(
+            _HEADER.pack(
+                _FORMAT_VERSION,
+                self.alpha,
+                self.count,
+                self.zero_count,
+                self.min if self.count else 0.0,
+                self.max if self.count else 0.0,
+                offset,
+                span,
+            )
+        )
+        for key in range(offset, offset + span):
+            _write_varint(out, self.buckets.get(key, 0))
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, max_buckets: int = DEFAULT_MAX_BUCKETS) -> "QuantileSketch":
+        """Rebuild a sketch from to_bytes output."""
+        version, alpha, count, zero_count, low, high, offset, span = _HEADER.unpack_from(data)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported sketch format {version}")
+        sketch = cls(alpha=alpha, max_buckets=max_buckets)
+        sketch.count = count
+        sketch.zero_count = zero_count
+        if count:
+            sketch.min, sketch.max = low, high
+        pos = _HEADER.size
+        for key in range(offset, offset + span):
+            bucket_count, pos = _read_varint(data, pos)
+            if bucket_count:
+                sketch.buckets[key] = bucket_count
+        return sketch
@@ -0,0 +1,580 @@
+"""
+Bulk re-grading of stored attempts after a task's doctests change.
+
+Fixing a task's function header or its doctests changes its task version
+(grading_cache.task_version), but attempts graded against the old version
+keep their old verdict. A regrade run reads each task's attempts in id
+order (through a server-side cursor on PostgreSQL, in keyset pages on
+SQLite) and grades them in batches of REGRADE_BATCH_SIZE:
+
+- each distinct submission (grading_cache.submission_hash) is graded once
+  per run, and results already in grading_results for the current task
+  version are reused,
+- the block structure check (block_structure.py) fails submissions that
+  are not made of the task's blocks without running code,
+- the rest run concurrently on a sandboxed GradingPool.
+
+Each batch writes the attempts whose verdict changed, the fresh results
+(into grading_results, so live grading reuses them) and the task's row in
+regrade_checkpoints in one transaction, together with the changed
+attempts' deltas to task_stats and solve_time_sketches
+(task_stats.apply_verdict_changes), so the rollups stay consistent with
+live submissions writing to them. The batch also NOTIFYs every worker to
+drop its cached analytics of the task (analytics.notify_invalidation)
+and re-read the task's verdicts in its columnar copy (attempt_columns.py),
+which reaches the web workers from the command line too. An interrupted run resumes after the
+last committed batch, and a finished task is skipped until its version
+changes again (or with --restart). Timeouts and crashed gradings depend on
+load, so those attempts keep their stored verdict and are counted as
+unresolved.
+
+After fixing a doctest in parsons_probs, python -m backend.migrate_tasks
+--update writes the corrected function_header and test_cases of existing
+tasks and prints the ids to re-grade.
+Teachers can also re-grade the tasks they created with POST
+/api/admin/regrade and follow the run with GET /api/admin/regrade; such
+runs share the application's grading pool with live submissions.
+
+Usage:
+    python -m backend.regrade run TASK_ID [TASK_ID ...]   # re-grade these tasks
+    python -m backend.regrade run --all                   # every task with doctests
+    python -m backend.regrade run --restart TASK_ID       # also re-grade finished tasks
+    python -m backend.regrade status                      # list checkpoints
+"""
+
+import asyncio
+import os
+import sys
+import time
+from collections.abc import AsyncIterator, Callable, Iterable, Sequence
+from dataclasses import dataclass, field
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .analytics import analytics_cache, notify_invalidation
+from .attempt_columns import attempt_columns, notify_verdict_changes
+from .block_structure import StructureChecker
+from .code_fingerprint import submitted_code
+from .grading import GraderOverloaded, GradingPool
+from .grading_cache import (
+    GradingInputs,
+    cacheable,
+    grading_cache,
+    submission_hash,
+    task_grading_inputs,
+    task_version,
+)
+from .models import GradingResult, Parsons, RegradeCheckpoint, TaskAttempt, utc_now
+from .task_stats import apply_verdict_changes
+
+# Attempts per fetch from the cursor and per committed batch
+REGRADE_BATCH_SIZE = int(os.getenv("REGRADE_BATCH_SIZE", "1000"))
+# Worker processes of the command's own grading pool
+REGRADE_WORKERS = int(os.getenv("REGRADE_WORKERS", str(os.cpu_count() or 1)))
+# Tries per submission before a timeout or rejection leaves it unresolved
+REGRADE_RETRIES = int(os.getenv("REGRADE_RETRIES", "3"))
+
+RUNNING = "running"
+FINISHED = "finished"
+SKIPPED = "skipped"
+
+
+@dataclass
+class RegradeProgress:
+    """
+    Progress of one task. status is running, finished, or skipped (no doctests, or
+    this version was re-graded before); the counters include resumed batches.
+    """
+
+    task_id: int
+    task_version: str = ""
+    status: str = RUNNING
+    total: int = 0
+    processed: int = 0
+    changed: int = 0
+    unresolved: int = 0
+    last_attempt_id: int = 0
+    started: float = field(default_factory=time.monotonic)
+    resumed_from: int = 0
+
+    def as_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        done = self.processed - self.resumed_from
+        return {
+            "task_id": self.task_id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "changed": self.changed,
+            "unresolved": self.unresolved,
+            "last_attempt_id": self.last_attempt_id,
+            "attempts_per_second": round(done / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+async def _open_checkpoint(
+    conn: AsyncConnection, task_id: int, version: str, restart: bool
+) -> RegradeProgress:
+    """Resume the task's checkpoint for this version, or start a fresh one."""
+    result = await conn.execute(
+        select(RegradeCheckpoint).where(RegradeCheckpoint.task_id == task_id)
+    )
+    row = result.one_or_none()
+    if row is not None and row.task_version == version and not restart:
+        return RegradeProgress(
+            task_id,
+            version,
+            status=FINISHED if row.finished_at is not None else RUNNING,
+            processed=row.processed,
+            changed=row.changed,
+            unresolved=row.unresolved,
+            last_attempt_id=row.last_attempt_id,
+            resumed_from=row.processed,
+        )
+
+    values = {
+        "task_version": version,
+        "last_attempt_id": 0,
+        "processed": 0,
+        "changed": 0,
+        "unresolved": 0,
+        "started_at": utc_now(),
+        "finished_at": None,
+    }
+    if row is None:
+        await conn.execute(insert(RegradeCheckpoint).values(task_id=task_id, **values))
+    else:
+        await conn.execute(
+            update(RegradeCheckpoint).where(RegradeCheckpoint.task_id == task_id).values(**values)
+        )
+    return RegradeProgress(task_id, version)
+
+
+async def _grade(
+    pool: GradingPool, limit: asyncio.Semaphore, inputs: GradingInputs, code: str
+) -> dict | None:
+    """Grade one submission, retrying rejections and load-dependent results."""
+    for attempt in range(REGRADE_RETRIES):
+        async with limit:
+            try:
+                result = await pool.grade(code, inputs.code_header, test_cases=inputs.test_cases)
+            except GraderOverloaded:
+                result = None
+        if result is not None and cacheable(result):
+            return result
+        if attempt + 1 < REGRADE_RETRIES:
+            await asyncio.sleep(0.1 * 2**attempt)
+    return None
+
+
+class _TaskRegrade:
+    """Verdicts of the distinct submissions of one task within a run."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        pool: GradingPool,
+        inputs: GradingInputs,
+        progress: RegradeProgress,
+        concurrency: int,
+    ):
+        self.engine = engine
+        self.pool = pool
+        self.inputs = inputs
+        self.progress = progress
+        self.checker = StructureChecker()
+        self.limit = asyncio.Semaphore(concurrency)
+        # code hash -> passes, None when the grading never came back conclusive
+        self.verdicts: dict[str, bool | None] = {}
+
+    async def _resolve(self, codes: dict[str, str]) -> dict[str, dict]:
+        """Fill verdicts for new submissions; returns the results graded on the pool."""
+        task_id, version = self.progress.task_id, self.progress.task_version
+        if grading_cache.persist:
+            async with self.engine.connect() as conn:
+                stored = await conn.execute(
+                    select(GradingResult.code_hash, GradingResult.result).where(
+                        GradingResult.task_id == task_id,
+                        GradingResult.task_version == version,
+                        GradingResult.code_hash.in_(list(codes)),
+                    )
+                )
+                for code_hash, result in stored:
+                    self.verdicts[code_hash] = result["status"] == "pass"
+                    del codes[code_hash]
+
+        for code_hash, code in list(codes.items()):
+            verdict = self.checker.check(
+                self.inputs.code_blocks, self.inputs.correct_solution, code
+            )
+            if verdict.final:
+                # Only ever "wrong": passing verdicts come from the doctests
+                self.verdicts[code_hash] = False
+                del codes[code_hash]
+
+        results = await asyncio.gather(
+            *(_grade(self.pool, self.limit, self.inputs, code) for code in codes.values())
+        )
+        fresh = {}
+        for code_hash, result in zip(codes, results):
+            if result is None:
+                self.verdicts[code_hash] = None
+            else:
+                self.verdicts[code_hash] = result["status"] == "pass"
+                fresh[code_hash] = result
+        return fresh
+
+    async def batch(self, rows: Sequence) -> None:
+        """Re-grade a batch of attempts and commit it with the checkpoint."""
+        progress = self.progress
+        hashes = []
+        new_codes: dict[str, str] = {}
+        for row in rows:
+            code = submitted_code(row.submitted_inputs)
+            code_hash = submission_hash(code) if code is not None else None
+            hashes.append(code_hash)
+            if code_hash is not None and code_hash not in self.verdicts:
+                new_codes.setdefault(code_hash, code)
+        fresh = await self._resolve(new_codes) if new_codes else {}
+
+        updates = []
+        changes = []
+        for row, code_hash in zip(rows, hashes):
+            passed = self.verdicts[code_hash] if code_hash is not None else None
+            if code_hash is not None and passed is None:
+                progress.unresolved += 1
+            elif passed is not None and passed != row.success:
+                updates.append(
+                    {"attempt_id": row.id, "started": row.task_started_at, "passed": passed}
+                )
+                changes.append(
+                    {
+                        "student_session_id": row.student_session_id,
+                        "task_id": progress.task_id,
+                        "task_started_at": row.task_started_at,
+                        "completed_at": row.completed_at,
+                        "success": passed,
+                    }
+                )
+        progress.processed += len(rows)
+        progress.changed += len(updates)
+        progress.last_attempt_id = rows[-1].id
+
+        attempts = TaskAttempt.__table__
+        async with self.engine.begin() as conn:
+            if updates:
+                # task_started_at is part of the key (and prunes partitions on PostgreSQL)
+                await conn.execute(
+                    update(attempts)
+                    .where(
+                        attempts.c.id == bindparam("attempt_id"),
+                        attempts.c.task_started_at == bindparam("started"),
+                    )
+                    .values(success=bindparam("passed")),
+                    updates,
+                )
+                await apply_verdict_changes(conn, changes)
+                await notify_invalidation(conn, [("task", progress.task_id)])
+                await notify_verdict_changes(conn, [progress.task_id])
+            if fresh and grading_cache.persist:
+                dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+                await conn.execute(
+                    dialect.insert(GradingResult).on_conflict_do_nothing(
+                        index_elements=["task_id", "task_version", "code_hash"]
+                    ),
+                    [
+                        {
+                            "task_id": progress.task_id,
+                            "task_version": progress.task_version,
+                            "code_hash": code_hash,
+                            "result": result,
+                        }
+                        for code_hash, result in fresh.items()
+                    ],
+                )
+            await conn.execute(
+                update(RegradeCheckpoint)
+                .where(RegradeCheckpoint.task_id == progress.task_id)
+                .values(
+                    last_attempt_id=progress.last_attempt_id,
+                    processed=progress.processed,
+                    changed=progress.changed,
+                    unresolved=progress.unresolved,
+                )
+            )
+        if updates:
+            analytics_cache.invalidate_task(progress.task_id)
+            attempt_columns.mark_changed([progress.task_id])
+
+
+def _graded_attempts(task_id: int):
+    """Submitted attempts of a task (attempts that were only started have no verdict)."""
+    return (TaskAttempt.task_id == task_id) & TaskAttempt.success.is_not(None)
+
+
+async def _attempt_batches(
+    engine: AsyncEngine, task_id: int, after_id: int, batch_size: int
+) -> AsyncIterator[Sequence]:
+    """
+    Batches of a task's graded attempts in id order. PostgreSQL streams them through
+    one server-side cursor; SQLite cannot commit while another connection is reading,
+    so there each batch is a separate keyset query.
+    """
+    query = (
+        select(
+            TaskAttempt.id,
+            TaskAttempt.student_session_id,
+            TaskAttempt.task_started_at,
+            TaskAttempt.completed_at,
+            TaskAttempt.success,
+            TaskAttempt.submitted_inputs,
+        )
+        .where(_graded_attempts(task_id))
+        .order_by(TaskAttempt.id)
+    )
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as reader:
+            result = await reader.stream(
+                query.where(TaskAttempt.id > after_id).execution_options(yield_per=batch_size)
+            )
+            async for rows in result.partitions(batch_size):
+                yield rows
+        return
+
+    while True:
+        async with engine.connect() as conn:
+            result = await conn.execute(query.where(TaskAttempt.id > after_id).limit(batch_size))
+            rows = result.all()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1].id
+
+
+async def regrade_task(
+    engine: AsyncEngine,
+    pool: GradingPool,
+    task_id: int,
+    restart: bool = False,
+    batch_size: int = REGRADE_BATCH_SIZE,
+    concurrency: int | None = None,
+    on_progress: Callable[[RegradeProgress], None] | None = None,
+) -> RegradeProgress:
+    """
+    Re-grade the completed attempts of one task against its current version.
+
+    Args:
+        restart: Start over even if the checkpoint says this version is done
+        concurrency: Submissions graded at once (default: the pool's workers)
+        on_progress: Called after the checkpoint is opened and after every batch
+    """
+    async with engine.begin() as conn:
+        inputs = await task_grading_inputs(conn, task_id)
+        if inputs is None:
+            return RegradeProgress(task_id, status=SKIPPED)
+        version = task_version(inputs.code_header, inputs.test_cases)
+        progress = await _open_checkpoint(conn, task_id, version, restart)
+        if progress.status == FINISHED:
+            progress.status = SKIPPED
+            progress.total = progress.processed
+            return progress
+
+        remaining = await conn.scalar(
+            select(func.count()).where(
+                _graded_attempts(task_id), TaskAttempt.id > progress.last_attempt_id
+            )
+        )
+        progress.total = progress.processed + remaining
+    if on_progress:
+        on_progress(progress)
+
+    regrade = _TaskRegrade(engine, pool, inputs, progress, concurrency or pool.workers)
+    async for rows in _attempt_batches(engine, task_id, progress.last_attempt_id, batch_size):
+        await regrade.batch(rows)
+        if on_progress:
+            on_progress(progress)
+
+    async with engine.begin() as conn:
+        await conn.execute(
+            update(RegradeCheckpoint)
+            .where(RegradeCheckpoint.task_id == task_id)
+            .values(finished_at=utc_now())
+        )
+    progress.status = FINISHED
+    if on_progress:
+        on_progress(progress)
+    return progress
+
+
+async def gradable_task_ids(engine: AsyncEngine) -> list[int]:
+    """Ids of every task with a function header to run doctests from."""
+    async with engine.connect() as conn:
+        result = await conn.execute(select(Parsons.id, Parsons.code_blocks).order_by(Parsons.id))
+        return [
+            task_id
+            for task_id, code_blocks in result
+            if isinstance(code_blocks, dict) and isinstance(code_blocks.get("function_header"), str)
+        ]
+
+
+async def run_regrade(
+    engine: AsyncEngine,
+    pool: GradingPool,
+    task_ids: Iterable[int] | None = None,
+    restart: bool = False,
+    batch_size: int = REGRADE_BATCH_SIZE,
+    concurrency: int | None = None,
+    on_progress: Callable[[RegradeProgress], None] | None = None,
+) -> list[RegradeProgress]:
+    """
+    Re-grade the given tasks (default: every task with doctests) one after another.
+    """
+    if task_ids is None:
+        task_ids = await gradable_task_ids(engine)
+    runs = []
+    for task_id in task_ids:
+        runs.append(
+            await regrade_task(
+                engine,
+                pool,
+                task_id,
+                restart=restart,
+                batch_size=batch_size,
+                concurrency=concurrency,
+                on_progress=on_progress,
+            )
+        )
+    return runs
+
+
+class RegradeRunner:
+    """A single background regrade run, started and watched through the admin API."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self.task_ids: list[int] = []
+        self.progress: dict[int, RegradeProgress] = {}
+        self.error: str | None = None
+        self.runs = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(
+        self, engine: AsyncEngine, pool: GradingPool, task_ids: list[int], restart: bool = False
+    ) -> None:
+        """Start re-grading in the background; raises RuntimeError if a run is active."""
+        if self.running:
+            raise RuntimeError("A regrade is already running")
+        self.task_ids = list(task_ids)
+        self.progress = {}
+        self.error = None
+        self.runs += 1
+        self._task = asyncio.create_task(self._run(engine, pool, restart))
+
+    async def _run(self, engine: AsyncEngine, pool: GradingPool, restart: bool) -> None:
+        try:
+            await run_regrade(engine, pool, self.task_ids, restart=restart, on_progress=self._record)
+        except Exception as exc:
+            self.error = repr(exc)
+            print(f"Regrade failed: {exc!r}")
+
+    def _record(self, progress: RegradeProgress) -> None:
+        self.progress[progress.task_id] = progress
+
+    async def stop(self) -> None:
+        """Cancel a running regrade; it resumes from its checkpoints next time."""
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def clear(self) -> None:
+        """Forget the last run (not while one is active)."""
+        if not self.running:
+            self._task = None
+            self.task_ids = []
+            self.progress = {}
+            self.error = None
+            self.runs = 0
+
+    def status(self) -> dict:
+        """Whether a run is active and the progress of each of its tasks."""
+        return {
+            "running": self.running,
+            "task_ids": self.task_ids,
+            "error": self.error,
+            "tasks": [
+                self.progress[task_id].as_dict()
+                for task_id in self.task_ids
+                if task_id in self.progress
+            ],
+        }
+
+
+regrade_runner = RegradeRunner()
+
+
+def _print_progress(progress: RegradeProgress) -> None:
+    info = progress.as_dict()
+    share = f"{info['processed'] / info['total']:.0%}" if info["total"] else "-"
+    print(
+        f"task {info['task_id']}: {info['status']}, {info['processed']}/{info['total']} attempts"
+        f" ({share}), {info['changed']} changed, {info['unresolved']} unresolved,"
+        f" {info['attempts_per_second']}/s"
+    )
+
+
+async def main(argv: list[str]) -> None:
+    """Entry point for the regrade commands."""
+    from .database import engine
+
+    command, args = (argv[0], argv[1:]) if argv else (None, [])
+    task_ids = [int(arg) for arg in args if arg.isdigit()]
+    flags = {arg for arg in args if arg.startswith("--")}
+    if command not in ("run", "status") or (
+        command == "run" and bool(task_ids) == ("--all" in flags)
+    ):
+        print("Usage: python -m backend.regrade run TASK_ID ...|--all [--restart] | status")
+        return
+
+    try:
+        if command == "status":
+            async with engine.connect() as conn:
+                result = await conn.execute(
+                    select(RegradeCheckpoint).order_by(RegradeCheckpoint.task_id)
+                )
+                for row in result:
+                    state = "finished" if row.finished_at is not None else "unfinished"
+                    print(
+                        f"task {row.task_id}: {state}, {row.processed} attempts,"
+                        f" {row.changed} changed, {row.unresolved} unresolved"
+                    )
+            return
+
+        pool = GradingPool(workers=REGRADE_WORKERS)
+        pool.start()
+        try:
+            runs = await run_regrade(
+                engine,
+                pool,
+                task_ids or None,
+                restart="--restart" in flags,
+                on_progress=_print_progress,
+            )
+        finally:
+            await pool.stop()
+        changed = sum(run.changed for run in runs)
+        print(f"Re-graded {len(runs)} tasks, {changed} verdicts changed")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
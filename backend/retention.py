@@ -0,0 +1,469 @@
+"""
+Monthly partitioning, archival and purging of attempt history.
+
+On PostgreSQL task_attempts (by task_started_at) and move_events (by
+event_time) can be range-partitioned by month, plus a default partition
+for rows outside the prepared months. Converting the existing tables is a
+one-off command (partition) that copies every row while both tables are
+locked, so it is run by hand during a maintenance window, never on
+startup. Once they are partitioned, startup and every retention run
+create the partitions for the next PARTITION_PREMAKE_MONTHS months.
+
+A partitioned task_attempts has no unique key on id alone, so the
+conversion drops the move_events foreign key to it: nothing enforces
+move_events.attempt_id any more, and attempts removed by the cascades from
+student_sessions or parsons leave their move events behind. The retention
+job and the session purge delete move events together with their attempts.
+
+The retention job keeps RETENTION_MONTHS months hot. Older partitions
+are detached (a short lock on the parent), copied to gzip-compressed CSV
+files under RETENTION_ARCHIVE_DIR and dropped, so the live tables and
+their indexes never grow past the retention window. Old rows that are not
+in a monthly partition (the default partition, or any table on SQLite)
+are archived the same way and deleted in batches.
+
+Student sessions are purged in batches once they have expired
+(STUDENT_SESSION_EXPIRE_HOURS) without submitting anything, or once their
+last activity is older than the retention window. Rollups (task_stats,
+solve_time_sketches) keep their totals; every batch notifies the web
+workers to drop their cached analytics and matrices of the affected tasks
+and task lists.
+
+Usage:
+    python -m backend.retention run              # partitions, archive, purge
+    python -m backend.retention partition        # one-off: convert the tables (locks them)
+    python -m backend.retention partitions       # only create upcoming partitions
+    python -m backend.retention purge-sessions   # only purge student sessions
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import os
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import delete, distinct, exists, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.schema import CreateIndex
+
+from .analytics import notify_invalidation
+from .models import MoveEvent, StudentSession, TaskAttempt
+from .student_auth import STUDENT_SESSION_EXPIRE_HOURS
+
+# Months of attempts and move events kept in the live tables
+RETENTION_MONTHS = int(os.getenv("RETENTION_MONTHS", "24"))
+RETENTION_ARCHIVE_DIR = Path(os.getenv("RETENTION_ARCHIVE_DIR", "archive"))
+# Monthly partitions created ahead of time
+PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+
+
+@dataclass(frozen=True)
+class PartitionedTable:
+    """A table range-partitioned by month on PostgreSQL."""
+
+    model: type
+    column: str
+
+    @property
+    def name(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def time_column(self):
+        return getattr(self.model, self.column)
+
+    def partition_name(self, month: date) -> str:
+        return f"{self.name}_p{month:%Y%m}"
+
+
+# move_events first: archived before the attempts they belong to
+PARTITIONED_TABLES = (
+    PartitionedTable(MoveEvent, "event_time"),
+    PartitionedTable(TaskAttempt, "task_started_at"),
+)
+
+
+def month_start(value: datetime | date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _utc(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def retention_cutoff(now: datetime | None = None, months: int = RETENTION_MONTHS) -> datetime:
+    """Start of the oldest month kept in the live tables."""
+    now = now or datetime.now(timezone.utc)
+    return _utc(add_months(month_start(now), -months))
+
+
+async def _relkind(conn: AsyncConnection, name: str) -> str | None:
+    result = await conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relkind IN ('r', 'p')"),
+        {"name": name},
+    )
+    return result.scalar_one_or_none()
+
+
+async def _create_partition(conn: AsyncConnection, table: PartitionedTable, month: date) -> bool:
+    """Create one monthly partition unless it exists or the default partition holds its rows."""
+    name = table.partition_name(month)
+    if await _relkind(conn, name) is not None:
+        return False
+    low, high = _utc(month), _utc(add_months(month, 1))
+    if await _relkind(conn, f"{table.name}_default") is not None:
+        clash = await conn.execute(
+            text(
+                f"SELECT 1 FROM {table.name}_default "
+                f"WHERE {table.column} >= :low AND {table.column} < :high LIMIT 1"
+            ),
+            {"low": low, "high": high},
+        )
+        if clash.first() is not None:
+            print(f"Not creating {name}: the default partition already holds rows for {month:%Y-%m}")
+            return False
+    await conn.execute(
+        text(
+            f"CREATE TABLE {name} PARTITION OF {table.name} "
+            f"FOR VALUES FROM ('{low.isoformat()}') TO ('{high.isoformat()}')"
+        )
+    )
+    return True
+
+
+async def ensure_partitions(conn: AsyncConnection, now: datetime | None = None) -> int:
+    """
+    Create monthly partitions from the current month through PARTITION_PREMAKE_MONTHS ahead.
+
+    Returns:
+        Number of partitions created (always 0 outside PostgreSQL)
+    """
+    if conn.dialect.name != "postgresql":
+        return 0
+    current = month_start(now or datetime.now(timezone.utc))
+    created = 0
+    for table in PARTITIONED_TABLES:
+        if await _relkind(conn, table.name) != "p":
+            continue
+        for offset in range(PARTITION_PREMAKE_MONTHS + 1):
+            created += await _create_partition(conn, table, add_months(current, offset))
+    return created
+
+
+async def _convert_to_partitioned(conn: AsyncConnection, table: PartitionedTable) -> None:
+    """Replace a plain table by a monthly partitioned copy with the same rows and indexes."""
+    name = table.name
+    legacy = f"{name}_unpartitioned"
+    sequence = (
+        await conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": name})
+    ).scalar_one()
+    foreign_keys = (
+        await conn.execute(
+            text(
+                "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f' "
+                "AND confrelid NOT IN (SELECT partrelid FROM pg_partitioned_table)"
+            ),
+            {"table": name},
+        )
+    ).scalars().all()
+    referencing = (
+        await conn.execute(
+            text(
+                "SELECT CAST(conrelid AS regclass)::text, conname FROM pg_constraint "
+                "WHERE confrelid = CAST(:table AS regclass) AND contype = 'f'"
+            ),
+            {"table": name},
+        )
+    ).all()
+    bounds = (
+        await conn.execute(text(f"SELECT min({table.column}), max({table.column}) FROM {name}"))
+    ).one()
+
+    await conn.execute(text(f"ALTER TABLE {name} RENAME TO {legacy}"))
+    await conn.execute(text(f"ALTER INDEX {name}_pkey RENAME TO {legacy}_pkey"))
+    for index in table.model.__table__.indexes:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    await conn.execute(
+        text(
+            f"CREATE TABLE {name} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({table.column})"
+        )
+    )
+    # The partition key has to be part of the primary key
+    await conn.execute(text(f"ALTER TABLE {name} ALTER COLUMN {table.column} SET NOT NULL"))
+    await conn.execute(text(f"ALTER TABLE {name} ADD PRIMARY KEY (id, {table.column})"))
+    if sequence:
+        await conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {name}.id"))
+    for definition in foreign_keys:
+        await conn.execute(text(f"ALTER TABLE {name} ADD {definition}"))
+    await conn.execute(text(f"CREATE TABLE {name}_default PARTITION OF {name} DEFAULT"))
+
+    first = month_start(bounds[0]) if bounds[0] else month_start(datetime.now(timezone.utc))
+    last = month_start(bounds[1]) if bounds[1] else first
+    month = first
+    while month <= last:
+        await _create_partition(conn, table, month)
+        month = add_months(month, 1)
+
+    await conn.execute(text(f"INSERT INTO {name} SELECT * FROM {legacy}"))
+    # Foreign keys cannot reference the new table's (id, time) key by id alone
+    for referencing_table, constraint in referencing:
+        print(f"Dropping foreign key {constraint} of {referencing_table} to {name}")
+        await conn.execute(text(f"ALTER TABLE {referencing_table} DROP CONSTRAINT {constraint}"))
+    await conn.execute(text(f"DROP TABLE {legacy}"))
+    for index in table.model.__table__.indexes:
+        await conn.execute(CreateIndex(index))
+
+
+async def partition_tables(conn: AsyncConnection) -> None:
+    """
+    One-off conversion of task_attempts and move_events to monthly partitions,
+    in the caller's transaction (the partition command).
+
+    Does nothing outside PostgreSQL or for tables that are already partitioned.
+    Both tables are locked while their rows are copied. Foreign keys pointing
+    at task_attempts (move_events.attempt_id) are dropped and not re-created.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    for table in sorted(PARTITIONED_TABLES, key=lambda t: t.name != TaskAttempt.__tablename__):
+        if await _relkind(conn, table.name) == "r":
+            await _convert_to_partitioned(conn, table)
+    await ensure_partitions(conn)
+
+
+def _archive_path(archive_dir: Path, table: str, label: str) -> Path:
+    path = archive_dir / table / f"{label}.csv.gz"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+async def _old_partitions(conn: AsyncConnection, table: PartitionedTable, cutoff: datetime) -> list[tuple[str, bool]]:
+    """(name, attached) of monthly partitions, attached or left detached, ending before cutoff."""
+    result = await conn.execute(
+        text(
+            "SELECT c.relname, EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid) "
+            "FROM pg_class c WHERE c.relkind = 'r' AND c.relname ~ :pattern ORDER BY c.relname"
+        ),
+        {"pattern": f"^{table.name}_p[0-9]{{6}}$"},
+    )
+    old = []
+    for name, attached in result:
+        month = datetime.strptime(name[-6:], "%Y%m").date()
+        if add_months(month, 1) <= cutoff.date():
+            old.append((name, attached))
+    return old
+
+
+async def archive_partitions(engine: AsyncEngine, cutoff: datetime, archive_dir: Path = RETENTION_ARCHIVE_DIR) -> list[Path]:
+    """
+    Detach, archive and drop monthly partitions that end before cutoff (PostgreSQL only).
+
+    Detaching happens in its own short transaction; the copy and the drop
+    then only lock the detached table. A partition left detached by an
+    interrupted run is picked up by the next one.
+
+    Returns:
+        Archive files written
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+    written = []
+    for table in PARTITIONED_TABLES:
+        async with engine.connect() as conn:
+            partitions = await _old_partitions(conn, table, cutoff)
+        for name, attached in partitions:
+            if attached:
+                async with engine.begin() as conn:
+                    await conn.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {name}"))
+
+            path = _archive_path(archive_dir, table.name, f"{name[-6:-2]}-{name[-2:]}")
+            partial = path.with_suffix(".partial")
+            async with engine.begin() as conn:
+                raw = await conn.get_raw_connection()
+                with gzip.open(partial, "wb") as archive:
+
+                    async def write(chunk: bytes) -> None:
+                        archive.write(chunk)
+
+                    await raw.driver_connection.copy_from_table(
+                        name, output=write, format="csv", header=True
+                    )
+                partial.replace(path)
+                await conn.execute(text(f"DROP TABLE {name}"))
+            written.append(path)
+            print(f"Archived {name} to {path}")
+    return written
+
+
+async def archive_rows(
+    engine: AsyncEngine,
+    table: PartitionedTable,
+    cutoff: datetime,
+    archive_dir: Path = RETENTION_ARCHIVE_DIR,
+    batch_size: int = RETENTION_BATCH_SIZE,
+) -> int:
+    """
+    Archive and delete rows older than cutoff that are not in a monthly partition.
+
+    Rows go to one gzip CSV per run and are deleted in batches of batch_size,
+    each batch in its own transaction.
+
+    Returns:
+        Number of rows archived
+    """
+    columns = [column.name for column in table.model.__table__.columns]
+    model_table = table.model.__table__
+    old = table.time_column < cutoff
+    path = None
+    archived = 0
+    last_id = 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                select(model_table).where(old, model_table.c.id > last_id)
+                .order_by(model_table.c.id).limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            if path is None:
+                stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+                path = _archive_path(archive_dir, table.name, f"before-{cutoff:%Y-%m}-{stamp}")
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if archived == 0:
+                writer.writerow(columns)
+            writer.writerows(rows)
+            with gzip.open(path, "at", encoding="utf-8", newline="") as archive:
+                archive.write(buffer.getvalue())
+
+            ids = [row.id for row in rows]
+            if table.model is TaskAttempt:
+                await conn.execute(delete(MoveEvent).where(MoveEvent.attempt_id.in_(ids)))
+            await conn.execute(delete(model_table).where(model_table.c.id.in_(ids)))
+            archived += len(rows)
+            last_id = ids[-1]
+    if archived:
+        print(f"Archived {archived} rows of {table.name} to {path}")
+    return archived
+
+
+async def purge_sessions(
+    engine: AsyncEngine,
+    cutoff: datetime,
+    now: datetime | None = None,
+    batch_size: int = RETENTION_BATCH_SIZE,
+) -> int:
+    """
+    Delete student sessions that expired without any attempt, or whose last
+    activity is older than cutoff, together with their attempts and move events.
+
+    Returns:
+        Number of sessions deleted
+    """
+    now = now or datetime.now(timezone.utc)
+    expired = StudentSession.last_activity_at < now - timedelta(hours=STUDENT_SESSION_EXPIRE_HOURS)
+    no_attempts = ~exists().where(TaskAttempt.student_session_id == StudentSession.id)
+    purgeable = expired & ((StudentSession.last_activity_at < cutoff) | no_attempts)
+
+    purged = 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                select(StudentSession.id, StudentSession.task_list_id)
+                .where(purgeable)
+                .order_by(StudentSession.id)
+                .limit(batch_size)
+            )
+            sessions = result.all()
+            if not sessions:
+                return purged
+            ids = [session_id for session_id, _ in sessions]
+            task_ids = await conn.scalars(
+                select(distinct(TaskAttempt.task_id)).where(TaskAttempt.student_session_id.in_(ids))
+            )
+            # Cached analytics and matrices of every worker drop the purged students
+            await notify_invalidation(
+                conn,
+                [("tasklist", task_list_id) for _, task_list_id in sessions if task_list_id is not None]
+                + [("task", task_id) for task_id in task_ids],
+            )
+            attempts = select(TaskAttempt.id).where(TaskAttempt.student_session_id.in_(ids))
+            await conn.execute(delete(MoveEvent).where(MoveEvent.attempt_id.in_(attempts)))
+            await conn.execute(delete(TaskAttempt).where(TaskAttempt.student_session_id.in_(ids)))
+            await conn.execute(delete(StudentSession).where(StudentSession.id.in_(ids)))
+            purged += len(ids)
+
+
+async def run_retention(
+    engine: AsyncEngine,
+    now: datetime | None = None,
+    months: int = RETENTION_MONTHS,
+    archive_dir: Path = RETENTION_ARCHIVE_DIR,
+) -> dict:
+    """
+    Run the whole retention job.
+
+    Returns:
+        Counts of created partitions, archived partitions and rows, and purged sessions
+    """
+    cutoff = retention_cutoff(now, months)
+    async with engine.begin() as conn:
+        created = await ensure_partitions(conn, now)
+    files = await archive_partitions(engine, cutoff, archive_dir)
+    rows = {
+        table.name: await archive_rows(engine, table, cutoff, archive_dir)
+        for table in PARTITIONED_TABLES
+    }
+    sessions = await purge_sessions(engine, cutoff, now)
+    return {
+        "cutoff": cutoff.isoformat(),
+        "partitions_created": created,
+        "partitions_archived": len(files),
+        "rows_archived": rows,
+        "sessions_purged": sessions,
+    }
+
+
+async def main(argv: list[str]) -> None:
+    """Entry point for the retention commands."""
+    from .database import engine
+
+    command = argv[0] if argv else None
+    if command not in ("run", "partition", "partitions", "purge-sessions"):
+        print("Usage: python -m backend.retention run|partition|partitions|purge-sessions")
+        return
+
+    try:
+        if command == "run":
+            print(await run_retention(engine))
+        elif command == "partition":
+            if engine.dialect.name != "postgresql":
+                print("Partitioning needs PostgreSQL")
+                return
+            async with engine.begin() as conn:
+                await partition_tables(conn)
+            print("Partitioned " + ", ".join(table.name for table in PARTITIONED_TABLES))
+        elif command == "partitions":
+            async with engine.begin() as conn:
+                print(f"Created {await ensure_partitions(conn)} partitions")
+        else:
+            print(f"Purged {await purge_sessions(engine, retention_cutoff())} student sessions")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
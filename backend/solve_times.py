@@ -0,0 +1,304 @@
+"""
+Solve-time distributions (p50 / p90) per task and per task list.
+
+Each successful submission adds its solve time to an in-memory quantile
+sketch (quantile_sketch.py) for its task and its task list once the
+submission's transaction commits. A periodic flush merges these per-worker
+deltas into the solve_time_sketches table under a row lock, so sketches
+from every worker combine and survive restarts. Queries merge the stored
+sketch with this worker's unflushed delta; other workers' deltas show up
+after their next flush (at most SOLVE_TIME_SKETCH_FLUSH_SECONDS).
+
+Re-graded attempts (regrade.py) move their solve times in or out of the
+stored sketches directly, in the transaction that flips their verdicts.
+A solve time still waiting in another worker's unflushed delta cannot be
+removed that way; the rebuild command recomputes the exact sketches.
+Startup does not backfill the table: run the rebuild once after upgrading
+a database with attempts from before the sketches existed.
+
+Usage:
+    python -m backend.solve_times rebuild     # recompute from task_attempts
+"""
+
+import asyncio
+import os
+import sys
+from collections.abc import Iterable
+
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.orm import Session
+
+from . import database
+from .analytics import seconds_between
+from .background_flush import PeriodicFlusher
+from .models import SolveTimeSketch, StudentSession, TaskAttempt
+from .quantile_sketch import QuantileSketch
+
+# Seconds between merges of the in-memory deltas into the database
+SOLVE_TIME_SKETCH_FLUSH_SECONDS = float(os.getenv("SOLVE_TIME_SKETCH_FLUSH_SECONDS", "10"))
+# Relative accuracy of the reported quantiles
+SOLVE_TIME_SKETCH_ACCURACY = float(os.getenv("SOLVE_TIME_SKETCH_ACCURACY", "0.01"))
+
+TASK = "task"
+TASKLIST = "tasklist"
+
+# Session.info key for solve times waiting for their transaction to commit
+_STAGED_KEY = "staged_solve_times"
+
+
+class SolveTimeSketches(PeriodicFlusher):
+    """Per-worker solve-time sketch deltas and their persistence."""
+
+    label = "Solve time sketch"
+    task_name = "solve-time-sketch-flush"
+
+    def __init__(
+        self,
+        flush_interval: float = SOLVE_TIME_SKETCH_FLUSH_SECONDS,
+        alpha: float = SOLVE_TIME_SKETCH_ACCURACY,
+    ):
+        super().__init__(flush_interval)
+        self.alpha = alpha
+        self._pending: dict[tuple[str, int], QuantileSketch] = {}
+        self._flushing: dict[tuple[str, int], QuantileSketch] = {}
+        self.samples = 0
+        self.flushes = 0
+        self.flushed_sketches = 0
+
+    def stage(self, db: AsyncSession, task_id: int, task_list_id: int | None, seconds: float) -> None:
+        """Queue a solve time that is added once db's transaction commits."""
+        db.info.setdefault(_STAGED_KEY, []).append((task_id, task_list_id, seconds))
+
+    def add(self, task_id: int, task_list_id: int | None, seconds: float) -> None:
+        """Add a committed solve time to the task's and task list's deltas."""
+        for key in _keys(task_id, task_list_id):
+            sketch = self._pending.get(key)
+            if sketch is None:
+                sketch = self._pending[key] = QuantileSketch(self.alpha)
+            sketch.add(seconds)
+        self.samples += 1
+
+    def _load(self, data: bytes) -> QuantileSketch:
+        sketch = QuantileSketch.from_bytes(data)
+        if sketch.alpha != self.alpha:
+            sketch = sketch.rebucketed(self.alpha)
+        return sketch
+
+    async def get(self, db: AsyncSession, scope: str, scope_id: int) -> QuantileSketch:
+        """Stored sketch for (scope, scope_id) merged with this worker's unflushed delta."""
+        result = await db.execute(
+            select(SolveTimeSketch.sketch).where(
+                SolveTimeSketch.scope == scope, SolveTimeSketch.scope_id == scope_id
+            )
+        )
+        data = result.scalar_one_or_none()
+        sketch = self._load(data) if data is not None else QuantileSketch(self.alpha)
+        for deltas in (self._flushing, self._pending):
+            delta = deltas.get((scope, scope_id))
+            if delta is not None:
+                sketch.merge(delta)
+        return sketch
+
+    async def summary(self, db: AsyncSession, scope: str, scope_id: int) -> dict:
+        """Sample count, min, max, p50 and p90 solve time in seconds."""
+        sketch = await self.get(db, scope, scope_id)
+
+        def rounded(value):
+            return round(value, 3) if value is not None else None
+
+        return {
+            "count": sketch.count,
+            "min": rounded(sketch.min) if sketch.count else None,
+            "max": rounded(sketch.max) if sketch.count else None,
+            "p50": rounded(sketch.quantile(0.5)),
+            "p90": rounded(sketch.quantile(0.9)),
+        }
+
+    async def flush(self, session_factory=None) -> int:
+        """
+        Merge all pending deltas into the stored sketches.
+
+        Returns:
+            Number of sketches written
+        """
+        if not self._pending:
+            return 0
+
+        self._flushing, self._pending = self._pending, {}
+        factory = session_factory or self._session_factory or database.async_session
+        try:
+            async with factory() as db:
+                # Sorted so concurrent flushes lock rows in the same order
+                for key in sorted(self._flushing):
+                    await self._merge_into_row(db, key, self._flushing[key])
+                await db.commit()
+        except Exception:
+            # Keep the deltas for the next round
+            for key, delta in self._flushing.items():
+                pending = self._pending.get(key)
+                if pending is not None:
+                    delta.merge(pending)
+                self._pending[key] = delta
+            raise
+        finally:
+            written = len(self._flushing)
+            self._flushing = {}
+
+        self.flushes += 1
+        self.flushed_sketches += written
+        return written
+
+    async def apply_changes(
+        self,
+        conn: AsyncConnection,
+        added: Iterable[tuple[int, int | None, float]],
+        removed: Iterable[tuple[int, int | None, float]],
+    ) -> int:
+        """
+        Add and remove (task_id, task_list_id, seconds) solve times in the stored
+        sketches, in the caller's transaction.
+
+        Returns:
+            Number of sketches written
+        """
+        deltas: dict[tuple[str, int], tuple[QuantileSketch, QuantileSketch]] = {}
+        for index, samples in enumerate((added, removed)):
+            for task_id, task_list_id, seconds in samples:
+                for key in _keys(task_id, task_list_id):
+                    if key not in deltas:
+                        deltas[key] = (QuantileSketch(self.alpha), QuantileSketch(self.alpha))
+                    deltas[key][index].add(seconds)
+        # Sorted like flush, so both lock rows in the same order
+        for key in sorted(deltas):
+            await self._merge_into_row(conn, key, *deltas[key])
+        return len(deltas)
+
+    async def _merge_into_row(
+        self,
+        db: AsyncConnection | AsyncSession,
+        key: tuple[str, int],
+        delta: QuantileSketch,
+        removed: QuantileSketch | None = None,
+    ) -> None:
+        scope, scope_id = key
+        dialect_name = db.bind.dialect.name if isinstance(db, AsyncSession) else db.dialect.name
+        dialect = postgresql if dialect_name == "postgresql" else sqlite
+        await db.execute(
+            dialect.insert(SolveTimeSketch)
+            .values(scope=scope, scope_id=scope_id, sample_count=0, sketch=QuantileSketch(self.alpha).to_bytes())
+            .on_conflict_do_nothing(index_elements=["scope", "scope_id"])
+        )
+        result = await db.execute(
+            select(SolveTimeSketch.sketch)
+            .where(SolveTimeSketch.scope == scope, SolveTimeSketch.scope_id == scope_id)
+            .with_for_update()
+        )
+        sketch = self._load(result.scalar_one())
+        sketch.merge(delta)
+        if removed is not None:
+            sketch.subtract(removed)
+        await db.execute(
+            update(SolveTimeSketch)
+            .where(SolveTimeSketch.scope == scope, SolveTimeSketch.scope_id == scope_id)
+            .values(sample_count=sketch.count, sketch=sketch.to_bytes())
+        )
+
+    def clear(self) -> None:
+        """Forget all unflushed deltas."""
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        """Return pending count and flush counters."""
+        return {
+            "flush_interval_seconds": self.flush_interval,
+            "relative_accuracy": self.alpha,
+            "pending_sketches": len(self._pending),
+            "samples": self.samples,
+            "flushes": self.flushes,
+            "flushed_sketches": self.flushed_sketches,
+        }
+
+
+def _keys(task_id: int, task_list_id: int | None) -> list[tuple[str, int]]:
+    """Sketches a solve time counts in: its task's and its task list's."""
+    keys = [(TASK, task_id)]
+    if task_list_id is not None:
+        keys.append((TASKLIST, task_list_id))
+    return keys
+
+
+solve_time_sketches = SolveTimeSketches()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_staged(session: Session) -> None:
+    """Solve times become visible only once their attempts are committed."""
+    for task_id, task_list_id, seconds in session.info.pop(_STAGED_KEY, ()):
+        solve_time_sketches.add(task_id, task_list_id, seconds)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_staged(session: Session) -> None:
+    session.info.pop(_STAGED_KEY, None)
+
+
+async def rebuild_solve_time_sketches(conn: AsyncConnection) -> int:
+    """
+    Recompute every stored sketch from task_attempts. Runs in the caller's transaction.
+
+    Returns:
+        Number of sketches written
+    """
+    alpha = solve_time_sketches.alpha
+    solve = seconds_between(TaskAttempt.task_started_at, TaskAttempt.completed_at, conn.dialect.name)
+    result = await conn.stream(
+        select(TaskAttempt.task_id, StudentSession.task_list_id, solve)
+        .join(StudentSession, StudentSession.id == TaskAttempt.student_session_id)
+        .where(TaskAttempt.success.is_(True), TaskAttempt.completed_at.is_not(None))
+    )
+
+    sketches: dict[tuple[str, int], QuantileSketch] = {}
+    async for task_id, task_list_id, seconds in result:
+        for key in _keys(task_id, task_list_id):
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = QuantileSketch(alpha)
+            sketch.add(float(seconds))
+
+    await conn.execute(SolveTimeSketch.__table__.delete())
+    if sketches:
+        await conn.execute(
+            SolveTimeSketch.__table__.insert(),
+            [
+                {
+                    "scope": scope,
+                    "scope_id": scope_id,
+                    "sample_count": sketch.count,
+                    "sketch": sketch.to_bytes(),
+                }
+                for (scope, scope_id), sketch in sketches.items()
+            ],
+        )
+    return len(sketches)
+
+
+async def main(argv: list[str]) -> None:
+    """Entry point for the rebuild command."""
+    from .database import engine
+
+    if argv[:1] != ["rebuild"]:
+        print("Usage: python -m backend.solve_times rebuild")
+        return
+
+    try:
+        async with engine.begin() as conn:
+            count = await rebuild_solve_time_sketches(conn)
+        print(f"Rebuilt solve time sketches: {count} sketches")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
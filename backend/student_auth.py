@@ -9,7 +9,9 @@ from typing import Optional
 from fastapi import Cookie, HTTPException, status, Response, Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
+from .activity_tracker import activity_tracker
 from .database import get_db
 from .models import StudentSession, TaskList
 
@@ -87,18 +89,21 @@ async def get_student_session(
     # Check if session has expired based on last activity
     if check_expiry:
         expiry_threshold = datetime.now(timezone.utc) - timedelta(hours=STUDENT_SESSION_EXPIRE_HOURS)
-        # Handle both timezone-aware and naive datetimes (SQLite may return naive)
-        last_activity = session.last_activity_at
-        if last_activity.tzinfo is None:
-            last_activity = last_activity.replace(tzinfo=timezone.utc)
+        # Newest of the stored value and any touch not yet written by the tracker
+        last_activity = activity_tracker.newest_activity(session)
         if last_activity < expiry_threshold:
             # Session expired
             return None
 
     # Update last activity timestamp (only if requested)
     if update_activity:
-        session.last_activity_at = datetime.now(timezone.utc)
-        await db.commit()
+        if activity_tracker.enabled:
+            # Recorded in memory and written in batches by the activity tracker
+            now = activity_tracker.touch(session.id)
+            set_committed_value(session, "last_activity_at", now)
+        else:
+            session.last_activity_at = datetime.now(timezone.utc)
+            await db.commit()
 
     return session
 
@@ -0,0 +1,82 @@
+"""
+A student's progress on every task of a task list.
+
+One statement ranks the session's attempts per task with window functions
+(attempt count, first success time and the best attempt, where solved
+beats failed beats unfinished) and left-joins the ranked best attempts to
+the list's items, so tasks without attempts are included. The attempts
+are read through ix_task_attempts_session_task_completed, which already
+delivers the session's rows ordered by task_id for the window partitions.
+"""
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Parsons, TaskAttempt, TaskListItem
+
+# Best result per task, best first
+SOLVED = "solved"
+FAILED = "failed"
+IN_PROGRESS = "in_progress"
+NOT_STARTED = "not_started"
+
+
+async def student_progress(db: AsyncSession, task_list_id: int, student_session_id: int) -> list[dict]:
+    """
+    Best result, attempt count and first success time for every task of a list.
+
+    Returns:
+        One dict per task in list order: task_id, title, status, attempts,
+        best_attempt_id and first_success_at (None if never solved)
+    """
+    list_tasks = select(TaskListItem.task_id).where(TaskListItem.task_list_id == task_list_id)
+    result_rank = case(
+        (TaskAttempt.success.is_(True), 2), (TaskAttempt.success.is_(False), 1), else_=0
+    )
+    by_task = {"partition_by": TaskAttempt.task_id}
+    ranked = (
+        select(
+            TaskAttempt.task_id,
+            TaskAttempt.id.label("attempt_id"),
+            result_rank.label("result"),
+            func.count().over(**by_task).label("attempts"),
+            func.min(case((TaskAttempt.success.is_(True), TaskAttempt.completed_at)))
+            .over(**by_task)
+            .label("first_success_at"),
+            func.row_number()
+            .over(**by_task, order_by=(result_rank.desc(), TaskAttempt.id.asc()))
+            .label("rank"),
+        )
+        .where(
+            TaskAttempt.student_session_id == student_session_id,
+            TaskAttempt.task_id.in_(list_tasks),
+        )
+        .subquery("ranked")
+    )
+    result = await db.execute(
+        select(
+            TaskListItem.task_id,
+            Parsons.title,
+            ranked.c.attempt_id,
+            ranked.c.result,
+            ranked.c.attempts,
+            ranked.c.first_success_at,
+        )
+        .join(Parsons, Parsons.id == TaskListItem.task_id)
+        .outerjoin(ranked, and_(ranked.c.task_id == TaskListItem.task_id, ranked.c.rank == 1))
+        .where(TaskListItem.task_list_id == task_list_id)
+        .order_by(TaskListItem.id.asc())
+    )
+
+    statuses = {2: SOLVED, 1: FAILED, 0: IN_PROGRESS, None: NOT_STARTED}
+    return [
+        {
+            "task_id": row.task_id,
+            "title": row.title,
+            "status": statuses[row.result],
+            "attempts": row.attempts or 0,
+            "best_attempt_id": row.attempt_id,
+            "first_success_at": row.first_success_at,
+        }
+        for row in result
+    ]
@@ -0,0 +1,200 @@
+"""
+Precomputed read model for the public task listing (/api/tasks).
+
+The catalog keeps one compact record per public task, loaded with a
+column-projected query (no code_blocks / correct_solution JSON), and the
+serialized JSON response body for the current catalog version. Requests
+are answered with that body; the catalog only goes back to the database
+when it has been marked stale by an ORM write or when the periodic
+freshness check (max updated_at + row count) shows a change.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Parsons
+
+# How often (seconds) to compare the catalog against the table for writes
+# made by other workers. ORM writes in this process mark it stale at once.
+TASK_CATALOG_CHECK_SECONDS = float(os.getenv("TASK_CATALOG_CHECK_SECONDS", "5"))
+
+
+def extract_description_text(description: str | None) -> str:
+    """Return the plain description text stored in a Parsons.description JSON string."""
+    try:
+        return json.loads(description).get("description", "")
+    except (json.JSONDecodeError, AttributeError, TypeError):
+        return ""
+
+
+class TaskCatalogEntry:
+    """One public task as shown in the listing."""
+
+    __slots__ = ("id", "title", "description", "task_type", "created_at", "updated_at")
+
+    def __init__(
+        self,
+        id: int,
+        title: str,
+        description: str,
+        task_type: str,
+        created_at: datetime,
+        updated_at: datetime,
+    ):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.task_type = task_type
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "task_type": self.task_type,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+_CATALOG_COLUMNS = (
+    Parsons.id,
+    Parsons.title,
+    Parsons.description_text,
+    Parsons.description,
+    Parsons.task_type,
+    Parsons.created_at,
+    Parsons.updated_at,
+    Parsons.is_public,
+)
+
+
+def _entry_from_row(row) -> TaskCatalogEntry:
+    """Build an entry, falling back to parsing the JSON for rows without description_text."""
+    description = row.description_text
+    if description is None:
+        description = extract_description_text(row.description)
+    return TaskCatalogEntry(
+        row.id, row.title, description, row.task_type, row.created_at, row.updated_at
+    )
+
+
+class TaskCatalog:
+    """In-memory public task listing with a pre-serialized JSON body."""
+
+    def __init__(self, check_interval: float = TASK_CATALOG_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._entries: dict[int, TaskCatalogEntry] = {}
+        self._max_updated_at: datetime | None = None
+        self._body: bytes | None = None
+        self._checked_at = 0.0
+        self.stale = True
+        self.version = 0
+        self.full_loads = 0
+        self.incremental_loads = 0
+
+    def mark_stale(self) -> None:
+        """Force a freshness check on the next request."""
+        self.stale = True
+
+    def clear(self) -> None:
+        """Drop all entries; the next request reloads from scratch."""
+        self._entries = {}
+        self._max_updated_at = None
+        self._body = None
+        self.stale = True
+
+    async def _signature(self, db: AsyncSession) -> tuple[datetime | None, int]:
+        result = await db.execute(
+            select(func.max(Parsons.updated_at), func.count(Parsons.id)).where(
+                Parsons.is_public
+            )
+        )
+        max_updated_at, count = result.one()
+        return max_updated_at, count
+
+    async def _full_load(self, db: AsyncSession) -> None:
+        result = await db.execute(select(*_CATALOG_COLUMNS).where(Parsons.is_public))
+        self._entries = {row.id: _entry_from_row(row) for row in result}
+        self.full_loads += 1
+
+    async def _incremental_load(self, db: AsyncSession) -> None:
+        """Apply rows whose updated_at moved past the newest one already loaded."""
+        result = await db.execute(
+            select(*_CATALOG_COLUMNS).where(Parsons.updated_at > self._max_updated_at)
+        )
+        for row in result:
+            if row.is_public:
+                self._entries[row.id] = _entry_from_row(row)
+            else:
+                self._entries.pop(row.id, None)
+        self.incremental_loads += 1
+
+    def _serialize(self) -> None:
+        ordered = [self._entries[task_id].to_dict() for task_id in sorted(self._entries)]
+        self._body = json.dumps(ordered, separators=(",", ":")).encode("utf-8")
+        self._max_updated_at = max(
+            (entry.updated_at for entry in self._entries.values()), default=None
+        )
+        self.version += 1
+
+    async def get_body(self, db: AsyncSession) -> bytes:
+        """
+        Return the serialized task listing, refreshing it first if needed.
+
+        Args:
+            db: Database session used for freshness checks and reloads
+
+        Returns:
+            UTF-8 JSON array of public tasks
+        """
+        now = time.monotonic()
+        if (
+            self._body is not None
+            and not self.stale
+            and now - self._checked_at < self.check_interval
+        ):
+            return self._body
+
+        self.stale = False
+        self._checked_at = now
+        max_updated_at, count = await self._signature(db)
+        if self._body is not None and max_updated_at == self._max_updated_at and count == len(self._entries):
+            return self._body
+
+        if self._body is None or self._max_updated_at is None:
+            await self._full_load(db)
+        else:
+            await self._incremental_load(db)
+            if len(self._entries) != count:
+                # Rows were deleted; only a full load can tell which
+                await self._full_load(db)
+
+        self._serialize()
+        return self._body
+
+    def stats(self) -> dict:
+        """Return catalog size and reload counters."""
+        return {
+            "version": self.version,
+            "size": len(self._entries),
+            "full_loads": self.full_loads,
+            "incremental_loads": self.incremental_loads,
+        }
+
+
+task_catalog = TaskCatalog()
+
+
+@event.listens_for(Parsons, "after_insert")
+@event.listens_for(Parsons, "after_update")
+@event.listens_for(Parsons, "after_delete")
+def _mark_catalog_stale(_mapper, _connection, _target) -> None:
+    """Any ORM write to a task triggers a freshness check on the next request."""
+    task_catalog.mark_stale()
@@ -0,0 +1,361 @@
+"""
+Incrementally maintained per-(task list, task) attempt totals.
+
+Every submission adds its deltas to the task_stats row of its task list
+and task with a single upsert, in the same transaction as the attempt
+INSERT (both for the synchronous path and the write-behind buffer). Reads
+are then a primary-key lookup no matter how many attempts exist. The
+solve times are also staged for the quantile sketches (solve_times.py)
+and each attempt for the teachers' live feed (live_feed.py).
+
+session_count is incremented the first time a session attempts a task;
+two simultaneous first submissions from the same session can count it
+twice. Attempts from sessions without a task list are not rolled up.
+Attempts whose verdict was changed by a regrade (regrade.py) move between
+passed and failed with apply_verdict_changes, under a lock on their rows.
+The rebuild command recomputes the table from task_attempts; run it once
+after upgrading a database that has attempts from before task_stats
+existed (startup no longer backfills it), preferably before traffic
+resumes, since submissions during the rebuild wait on its rows.
+
+Usage:
+    python -m backend.task_stats rebuild
+
+    Or from Docker:
+    docker compose exec web python -m backend.task_stats rebuild
+"""
+
+import asyncio
+import sys
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import case, delete, distinct, func, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from .analytics import seconds_between
+from .models import StudentSession, TaskAttempt, TaskStats
+from .live_feed import live_feed
+from .solve_times import solve_time_sketches
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes (SQLite) as UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def solve_seconds(row: dict[str, Any]) -> float | None:
+    """Solve duration of a successful attempt row, or None."""
+    started, completed = row.get("task_started_at"), row.get("completed_at")
+    if not row.get("success") or started is None or completed is None:
+        return None
+    return (_as_utc(completed) - _as_utc(started)).total_seconds()
+
+
+def _upsert(dialect_name: str):
+    """INSERT ... ON CONFLICT DO UPDATE adding the excluded deltas to the stored totals."""
+    if dialect_name == "postgresql":
+        stmt, least, greatest = postgresql.insert(TaskStats), func.least, func.greatest
+    else:
+        # SQLite's multi-argument min()/max() are its LEAST/GREATEST
+        stmt, least, greatest = sqlite.insert(TaskStats), func.min, func.max
+
+    table = TaskStats.__table__
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.task_list_id, table.c.task_id],
+        set_={
+            "attempt_count": table.c.attempt_count + new.attempt_count,
+            "success_count": table.c.success_count + new.success_count,
+            "session_count": table.c.session_count + new.session_count,
+            "solve_seconds_sum": table.c.solve_seconds_sum + new.solve_seconds_sum,
+            "solve_seconds_min": least(
+                func.coalesce(table.c.solve_seconds_min, new.solve_seconds_min),
+                func.coalesce(new.solve_seconds_min, table.c.solve_seconds_min),
+            ),
+            "solve_seconds_max": greatest(
+                func.coalesce(table.c.solve_seconds_max, new.solve_seconds_max),
+                func.coalesce(new.solve_seconds_max, table.c.solve_seconds_max),
+            ),
+            "updated_at": new.updated_at,
+        },
+    )
+
+
+async def record_attempts(
+    db: AsyncSession,
+    rows: Iterable[dict[str, Any]],
+    task_list_ids: dict[int, int | None] | None = None,
+) -> int:
+    """
+    Add new attempts to the rollup. Call before the attempts are added to the
+    session, in the same transaction, so first attempts per session can be detected.
+
+    Args:
+        db: Session of the transaction inserting the attempts
+        rows: TaskAttempt column values (student_session_id, task_id, success, ...)
+        task_list_ids: Known student_session id -> task_list_id; looked up if missing
+
+    Returns:
+        Number of task_stats rows upserted
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    task_list_ids = dict(task_list_ids or {})
+    unknown = {row["student_session_id"] for row in rows} - task_list_ids.keys()
+    if unknown:
+        result = await db.execute(
+            select(StudentSession.id, StudentSession.task_list_id).where(
+                StudentSession.id.in_(unknown)
+            )
+        )
+        task_list_ids.update(dict(result.all()))
+
+    pairs = {(row["student_session_id"], row["task_id"]) for row in rows}
+    result = await db.execute(
+        select(TaskAttempt.student_session_id, TaskAttempt.task_id)
+        .where(tuple_(TaskAttempt.student_session_id, TaskAttempt.task_id).in_(pairs))
+        .distinct()
+    )
+    seen = set(map(tuple, result.all()))
+
+    now = datetime.now(timezone.utc)
+    deltas: dict[tuple[int, int], dict[str, Any]] = {}
+    for row in rows:
+        task_list_id = task_list_ids.get(row["student_session_id"])
+        seconds = solve_seconds(row)
+        if seconds is not None:
+            solve_time_sketches.stage(db, row["task_id"], task_list_id, seconds)
+        if task_list_id is None:
+            continue
+        key = (task_list_id, row["task_id"])
+        delta = deltas.setdefault(
+            key,
+            {
+                "task_list_id": task_list_id,
+                "task_id": row["task_id"],
+                "attempt_count": 0,
+                "success_count": 0,
+                "session_count": 0,
+                "solve_seconds_sum": 0.0,
+                "solve_seconds_min": None,
+                "solve_seconds_max": None,
+                "updated_at": now,
+            },
+        )
+        delta["attempt_count"] += 1
+        pair = (row["student_session_id"], row["task_id"])
+        first_attempt = pair not in seen
+        if first_attempt:
+            seen.add(pair)
+            delta["session_count"] += 1
+        live_feed.stage(
+            db,
+            {
+                "task_list_id": task_list_id,
+                "task_id": row["task_id"],
+                "student_session_id": row["student_session_id"],
+                "success": bool(row.get("success")),
+                "solve_seconds": seconds,
+                "first_attempt": first_attempt,
+                "completed_at": row["completed_at"].isoformat() if row.get("completed_at") else None,
+            },
+        )
+        if row.get("success"):
+            delta["success_count"] += 1
+        if seconds is not None:
+            delta["solve_seconds_sum"] += seconds
+            if delta["solve_seconds_min"] is None or seconds < delta["solve_seconds_min"]:
+                delta["solve_seconds_min"] = seconds
+            if delta["solve_seconds_max"] is None or seconds > delta["solve_seconds_max"]:
+                delta["solve_seconds_max"] = seconds
+
+    if deltas:
+        await db.execute(_upsert(db.bind.dialect.name), list(deltas.values()))
+    return len(deltas)
+
+
+async def _solve_range(conn: AsyncConnection, task_list_id: int, task_id: int) -> tuple:
+    """Shortest and longest solve time of a task within a task list."""
+    solve = seconds_between(TaskAttempt.task_started_at, TaskAttempt.completed_at, conn.dialect.name)
+    result = await conn.execute(
+        select(func.min(solve), func.max(solve))
+        .select_from(TaskAttempt)
+        .join(StudentSession, StudentSession.id == TaskAttempt.student_session_id)
+        .where(
+            StudentSession.task_list_id == task_list_id,
+            TaskAttempt.task_id == task_id,
+            TaskAttempt.success.is_(True),
+            TaskAttempt.completed_at.is_not(None),
+        )
+    )
+    return tuple(result.one())
+
+
+async def apply_verdict_changes(conn: AsyncConnection, rows: Iterable[dict[str, Any]]) -> int:
+    """
+    Move re-graded attempts between passed and failed in task_stats and the solve
+    time sketches. Call in the transaction that updated the attempts.
+
+    Args:
+        conn: Connection of the transaction updating the attempts
+        rows: Attempts whose verdict flipped (student_session_id, task_id,
+            task_started_at, completed_at and the new success)
+
+    Returns:
+        Number of task_stats rows updated
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    result = await conn.execute(
+        select(StudentSession.id, StudentSession.task_list_id).where(
+            StudentSession.id.in_({row["student_session_id"] for row in rows})
+        )
+    )
+    task_list_ids = dict(result.all())
+
+    added, removed = [], []
+    deltas: dict[tuple[int, int], dict[str, Any]] = {}
+    for row in rows:
+        task_list_id = task_list_ids.get(row["student_session_id"])
+        seconds = solve_seconds({**row, "success": True})
+        if seconds is not None:
+            (added if row["success"] else removed).append((row["task_id"], task_list_id, seconds))
+        if task_list_id is None:
+            continue
+        delta = deltas.setdefault(
+            (task_list_id, row["task_id"]),
+            {"success_count": 0, "solve_seconds_sum": 0.0, "added": [], "removed": []},
+        )
+        sign = 1 if row["success"] else -1
+        delta["success_count"] += sign
+        if seconds is not None:
+            delta["solve_seconds_sum"] += sign * seconds
+            delta["added" if row["success"] else "removed"].append(seconds)
+
+    table = TaskStats.__table__
+    stored = []
+    if deltas:
+        # Locked so submissions of these tasks wait with their upserts until this commits
+        result = await conn.execute(
+            select(table.c.task_list_id, table.c.task_id, table.c.solve_seconds_min, table.c.solve_seconds_max)
+            .where(tuple_(table.c.task_list_id, table.c.task_id).in_(sorted(deltas)))
+            .order_by(table.c.task_list_id, table.c.task_id)
+            .with_for_update()
+        )
+        stored = result.all()
+    now = datetime.now(timezone.utc)
+    for task_list_id, task_id, low, high in stored:
+        delta = deltas[(task_list_id, task_id)]
+        # Removing a solve time at an extreme needs the next one from task_attempts
+        if any(
+            (low is not None and seconds <= low + 1e-3) or (high is not None and seconds >= high - 1e-3)
+            for seconds in delta["removed"]
+        ):
+            low, high = await _solve_range(conn, task_list_id, task_id)
+        else:
+            for seconds in delta["added"]:
+                low = seconds if low is None else min(low, seconds)
+                high = seconds if high is None else max(high, seconds)
+        await conn.execute(
+            update(table)
+            .where(table.c.task_list_id == task_list_id, table.c.task_id == task_id)
+            .values(
+                success_count=table.c.success_count + delta["success_count"],
+                solve_seconds_sum=table.c.solve_seconds_sum + delta["solve_seconds_sum"],
+                solve_seconds_min=low,
+                solve_seconds_max=high,
+                updated_at=now,
+            )
+        )
+
+    await solve_time_sketches.apply_changes(conn, added, removed)
+    return len(stored)
+
+
+async def rebuild_task_stats(conn: AsyncConnection | AsyncSession) -> int:
+    """
+    Recompute task_stats from task_attempts. Runs in the caller's transaction.
+
+    Returns:
+        Number of task_stats rows written
+    """
+    dialect_name = conn.bind.dialect.name if isinstance(conn, AsyncSession) else conn.dialect.name
+    succeeded = TaskAttempt.success.is_(True)
+    solve = seconds_between(TaskAttempt.task_started_at, TaskAttempt.completed_at, dialect_name)
+    solved = case((succeeded & TaskAttempt.completed_at.is_not(None), solve))
+
+    totals = (
+        select(
+            StudentSession.task_list_id,
+            TaskAttempt.task_id,
+            func.count(),
+            func.count(case((succeeded, 1))),
+            func.count(distinct(TaskAttempt.student_session_id)),
+            func.coalesce(func.sum(solved), 0.0),
+            func.min(solved),
+            func.max(solved),
+            func.current_timestamp(),
+        )
+        .join(StudentSession, StudentSession.id == TaskAttempt.student_session_id)
+        .where(StudentSession.task_list_id.is_not(None))
+        .group_by(StudentSession.task_list_id, TaskAttempt.task_id)
+    )
+
+    await conn.execute(delete(TaskStats))
+    await conn.execute(
+        insert(TaskStats).from_select(
+            [
+                "task_list_id",
+                "task_id",
+                "attempt_count",
+                "success_count",
+                "session_count",
+                "solve_seconds_sum",
+                "solve_seconds_min",
+                "solve_seconds_max",
+                "updated_at",
+            ],
+            totals,
+        )
+    )
+    result = await conn.execute(select(func.count()).select_from(TaskStats))
+    return result.scalar_one()
+
+
+async def get_tasklist_stats(db: AsyncSession, task_list_id: int) -> list[TaskStats]:
+    """Rollup rows of a task list, ordered by task id."""
+    result = await db.execute(
+        select(TaskStats)
+        .where(TaskStats.task_list_id == task_list_id)
+        .order_by(TaskStats.task_id.asc())
+    )
+    return list(result.scalars().all())
+
+
+async def main(argv: list[str]) -> None:
+    """Entry point for the rebuild command."""
+    from .database import engine
+
+    if argv[:1] != ["rebuild"]:
+        print("Usage: python -m backend.task_stats rebuild")
+        return
+
+    try:
+        async with engine.begin() as conn:
+            count = await rebuild_task_stats(conn)
+        print(f"Rebuilt task_stats: {count} rows")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,194 @@
+"""
+In-process cache for resolving task list link codes.
+
+Every /set/{unique_link_code}/... page and the student APIs look up the same
+TaskList row by its link code. The resolver keeps a small TTL + LRU cache of
+those lookups (including "not found" results) so that a whole class opening
+the same link does not turn into one database round-trip per request.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import TaskList
+
+TASKLIST_CACHE_TTL_SECONDS = float(os.getenv("TASKLIST_CACHE_TTL_SECONDS", "60"))
+TASKLIST_CACHE_NEGATIVE_TTL_SECONDS = float(
+    os.getenv("TASKLIST_CACHE_NEGATIVE_TTL_SECONDS", "5")
+)
+TASKLIST_CACHE_MAX_ENTRIES = int(os.getenv("TASKLIST_CACHE_MAX_ENTRIES", "1024"))
+
+
+@dataclass(frozen=True, slots=True)
+class TaskListRef:
+    """Detached snapshot of the TaskList columns the routes need."""
+
+    id: int
+    title: str
+    unique_link_code: str
+    teacher_id: int
+    expires_at: datetime | None
+
+
+class TaskListResolver:
+    """
+    TTL/LRU cache mapping unique_link_code -> TaskListRef (or None).
+
+    Concurrent misses for the same code share a single database query.
+    Positive entries never outlive the task list's own expires_at.
+    """
+
+    def __init__(
+        self,
+        ttl: float = TASKLIST_CACHE_TTL_SECONDS,
+        negative_ttl: float = TASKLIST_CACHE_NEGATIVE_TTL_SECONDS,
+        max_entries: int = TASKLIST_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, TaskListRef | None]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def _get_cached(self, code: str) -> tuple[bool, TaskListRef | None]:
+        """Return (found, value) for a non-expired cache entry."""
+        entry = self._entries.get(code)
+        if entry is None:
+            return False, None
+
+        deadline, value = entry
+        if deadline <= time.monotonic():
+            del self._entries[code]
+            return False, None
+
+        self._entries.move_to_end(code)
+        return True, value
+
+    def _store(self, code: str, value: TaskListRef | None) -> None:
+        """Insert a lookup result, evicting the least recently used entries."""
+        now = time.monotonic()
+        if value is None:
+            deadline = now + self.negative_ttl
+        else:
+            deadline = now + self.ttl
+            if value.expires_at is not None:
+                expires_at = value.expires_at
+                if expires_at.tzinfo is None:
+                    expires_at = expires_at.replace(tzinfo=timezone.utc)
+                remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+                if remaining <= 0:
+                    return
+                deadline = min(deadline, now + remaining)
+
+        self._entries[code] = (deadline, value)
+        self._entries.move_to_end(code)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _load(self, code: str, db: AsyncSession) -> TaskListRef | None:
+        """Fetch the task list columns for a link code from the database."""
+        stmt = select(
+            TaskList.id,
+            TaskList.title,
+            TaskList.unique_link_code,
+            TaskList.teacher_id,
+            TaskList.expires_at,
+        ).where(TaskList.unique_link_code == code)
+        result = await db.execute(stmt)
+        row = result.one_or_none()
+        if row is None:
+            return None
+        return TaskListRef(*row)
+
+    async def resolve(self, code: str, db: AsyncSession) -> TaskListRef | None:
+        """
+        Resolve a link code to a TaskListRef, or None if no such list exists.
+
+        Args:
+            code: The task list's unique_link_code
+            db: Database session used on a cache miss
+
+        Returns:
+            TaskListRef or None
+        """
+        found, value = self._get_cached(code)
+        if found:
+            self.hits += 1
+            if value is None:
+                self.negative_hits += 1
+            return value
+
+        self.misses += 1
+
+        pending = self._inflight.get(code)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leading query failed; fall back to our own session
+                return await self._load(code, db)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[code] = future
+        try:
+            value = await self._load(code, db)
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            self._store(code, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(code, None)
+
+    def invalidate(self, code: str) -> None:
+        """Drop a single link code from the cache."""
+        self._entries.pop(code, None)
+
+    def clear(self) -> None:
+        """Drop every cached entry (counters are kept)."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+tasklist_resolver = TaskListResolver()
+
+
+@event.listens_for(TaskList, "after_insert")
+@event.listens_for(TaskList, "after_update")
+@event.listens_for(TaskList, "after_delete")
+def _invalidate_task_list(_mapper, _connection, target: TaskList) -> None:
+    """Invalidate cached lookups whenever a task list is created, edited or removed."""
+    codes = {target.unique_link_code}
+    history = inspect(target).attrs.unique_link_code.history
+    codes.update(history.deleted or ())
+    for code in codes:
+        if code:
+            tasklist_resolver.invalidate(code)
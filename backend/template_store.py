@@ -0,0 +1,179 @@
+"""
+In-memory store for the static HTML templates.
+
+Templates are read once, hashed into a strong ETag and kept alongside gzip
+and brotli encodings, so page routes can answer from memory and reply
+304 Not Modified to browsers that already have the current version.
+"""
+
+import gzip
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import Request, Response, status
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "false").lower() == "true"
+
+HTML_MEDIA_TYPE = "text/html; charset=utf-8"
+
+
+@dataclass(slots=True)
+class Template:
+    """A loaded template with its precomputed encodings."""
+
+    etag_base: str
+    mtime_ns: int
+    body: bytes
+    gzip_body: bytes
+    brotli_body: bytes | None
+
+    def variant(self, encoding: str | None) -> tuple[bytes, str]:
+        """Return (body, strong ETag) for the given content coding."""
+        if encoding == "br":
+            return self.brotli_body, f'"{self.etag_base}-br"'
+        if encoding == "gzip":
+            return self.gzip_body, f'"{self.etag_base}-gz"'
+        return self.body, f'"{self.etag_base}"'
+
+    def etags(self) -> set[str]:
+        """All ETags that identify the current content, in any encoding."""
+        return {
+            f'"{self.etag_base}"',
+            f'"{self.etag_base}-gz"',
+            f'"{self.etag_base}-br"',
+        }
+
+
+def _accepted_encodings(accept_encoding: str) -> set[str]:
+    """Parse an Accept-Encoding header into the set of codings with q > 0."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def _if_none_match_tags(header: str) -> set[str]:
+    """Parse If-None-Match into a set of opaque tags (weak prefixes stripped)."""
+    tags = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.add(tag)
+    return tags
+
+
+class TemplateStore:
+    """
+    Holds templates/*.html in memory.
+
+    With auto_reload enabled (development), each access checks the file's
+    mtime and reloads it when it has changed on disk.
+    """
+
+    def __init__(self, directory: Path, auto_reload: bool = TEMPLATES_AUTO_RELOAD):
+        self.directory = Path(directory)
+        self.auto_reload = auto_reload
+        self._templates: dict[str, Template] = {}
+        self._loaded = False
+
+    def _read(self, path: Path) -> Template:
+        """Read a template file and build all of its encodings."""
+        body = path.read_bytes()
+        return Template(
+            etag_base=hashlib.sha256(body).hexdigest()[:32],
+            mtime_ns=path.stat().st_mtime_ns,
+            body=body,
+            gzip_body=gzip.compress(body, compresslevel=9, mtime=0),
+            brotli_body=brotli.compress(body, quality=11) if brotli else None,
+        )
+
+    def load(self) -> None:
+        """(Re)load every *.html file in the template directory."""
+        self._templates = {
+            path.name: self._read(path) for path in self.directory.glob("*.html")
+        }
+        self._loaded = True
+
+    def get(self, name: str) -> Template:
+        """Return a loaded template by file name."""
+        if not self._loaded:
+            self.load()
+
+        template = self._templates.get(name)
+        if self.auto_reload:
+            path = self.directory / name
+            if path.exists() and (
+                template is None or path.stat().st_mtime_ns != template.mtime_ns
+            ):
+                template = self._read(path)
+                self._templates[name] = template
+
+        if template is None:
+            raise KeyError(name)
+        return template
+
+    def response(
+        self, name: str, request: Request, headers: dict[str, str] | None = None
+    ) -> Response:
+        """
+        Build a response for a template, honouring If-None-Match and Accept-Encoding.
+
+        Args:
+            name: Template file name, e.g. "index.html"
+            request: Incoming request (for conditional and encoding headers)
+            headers: Extra headers applied to both 200 and 304 responses
+
+        Returns:
+            Response with the negotiated body, or an empty 304
+        """
+        template = self.get(name)
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        if "br" in accepted and template.brotli_body is not None:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            encoding = None
+        body, etag = template.variant(encoding)
+
+        response_headers = {
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "no-cache",
+        }
+        if headers:
+            response_headers.update(headers)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = _if_none_match_tags(if_none_match)
+            if "*" in tags or tags & template.etags():
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers
+                )
+
+        if encoding:
+            response_headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=HTML_MEDIA_TYPE, headers=response_headers)
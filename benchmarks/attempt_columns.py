@@ -0,0 +1,167 @@
+"""
+Benchmark: columnar NumPy aggregations versus SQL and pure Python loops.
+
+Generates synthetic attempts (tasks, sessions, start / completion times,
+success), loads them into an AttemptColumns store, an in-memory SQLite
+table and a list of tuples, and times the same three cohort queries on
+each: per-task totals with distinct sessions, a solve-time histogram and
+an hourly attempts-per-task pivot. Results are checked against each
+other before timings are printed.
+
+Usage:
+    python -m benchmarks.attempt_columns [--rows 500000] [--tasks 50] [--sessions 5000]
+"""
+
+import argparse
+import sqlite3
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from backend.attempt_columns import AttemptColumns
+
+BINS = 20
+BUCKET_SECONDS = 3600
+
+
+def generate(rows: int, tasks: int, sessions: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    started = 1_700_000_000 + rng.uniform(0, 30 * 86400, rows)
+    return {
+        "attempt_id": np.arange(1, rows + 1),
+        "task_id": rng.integers(1, tasks + 1, rows),
+        "session_id": rng.integers(1, sessions + 1, rows),
+        "task_list_id": np.ones(rows, np.int64),
+        "started": started,
+        "completed": started + rng.lognormal(3, 1, rows),
+        "success": (rng.random(rows) < 0.4).astype(np.int8),
+    }
+
+
+def timed(label: str, results: dict, timings: dict, func, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - started)
+    results[label] = value
+    timings[label] = best
+
+
+def numpy_queries(store: AttemptColumns) -> dict:
+    selected = store.mask()
+    summary = store.task_summary(selected)
+    _, counts = store.solve_time_histogram(selected, BINS)
+    _, _, pivot = store.pivot(selected, "bucket", "task_id", bucket_seconds=BUCKET_SECONDS)
+    return {
+        "totals": {task: (s["attempts"], s["successes"], s["sessions"]) for task, s in summary.items()},
+        "histogram_total": int(counts.sum()),
+        "pivot_total": int(pivot.sum()),
+    }
+
+
+def sql_queries(conn: sqlite3.Connection) -> dict:
+    totals = {
+        task: (attempts, successes, sessions)
+        for task, attempts, successes, sessions in conn.execute(
+            "SELECT task_id, count(*), sum(success = 1), count(DISTINCT session_id) "
+            "FROM attempts GROUP BY task_id"
+        )
+    }
+    low, high = conn.execute(
+        "SELECT min(completed - started), max(completed - started) FROM attempts WHERE success = 1"
+    ).fetchone()
+    width = (high - low) / BINS
+    histogram = conn.execute(
+        "SELECT min(CAST((completed - started - ?) / ? AS INTEGER), ?), count(*) "
+        "FROM attempts WHERE success = 1 GROUP BY 1",
+        (low, width, BINS - 1),
+    ).fetchall()
+    pivot = conn.execute(
+        "SELECT CAST(completed / ? AS INTEGER), task_id, count(*) FROM attempts GROUP BY 1, 2",
+        (BUCKET_SECONDS,),
+    ).fetchall()
+    return {
+        "totals": totals,
+        "histogram_total": sum(count for _, count in histogram),
+        "pivot_total": sum(count for _, _, count in pivot),
+    }
+
+
+def python_queries(rows: list[tuple]) -> dict:
+    attempts: dict[int, int] = defaultdict(int)
+    successes: dict[int, int] = defaultdict(int)
+    sessions: dict[int, set] = defaultdict(set)
+    solve = []
+    pivot: dict[tuple[int, int], int] = defaultdict(int)
+    for task_id, session_id, started, completed, success in rows:
+        attempts[task_id] += 1
+        sessions[task_id].add(session_id)
+        if success == 1:
+            successes[task_id] += 1
+            solve.append(completed - started)
+        pivot[int(completed // BUCKET_SECONDS), task_id] += 1
+
+    low, high = min(solve), max(solve)
+    width = (high - low) / BINS
+    histogram = [0] * BINS
+    for seconds in solve:
+        histogram[min(int((seconds - low) / width), BINS - 1)] += 1
+    return {
+        "totals": {task: (attempts[task], successes[task], len(sessions[task])) for task in attempts},
+        "histogram_total": sum(histogram),
+        "pivot_total": sum(pivot.values()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    data = generate(args.rows, args.tasks, args.sessions, args.seed)
+
+    started = time.perf_counter()
+    store = AttemptColumns()
+    store.extend(data)
+    load_numpy = time.perf_counter() - started
+
+    plain = list(
+        zip(
+            data["task_id"].tolist(),
+            data["session_id"].tolist(),
+            data["started"].tolist(),
+            data["completed"].tolist(),
+            data["success"].tolist(),
+        )
+    )
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE attempts (task_id INTEGER, session_id INTEGER, started REAL, completed REAL, success INTEGER)"
+    )
+    conn.executemany("INSERT INTO attempts VALUES (?, ?, ?, ?, ?)", plain)
+
+    results: dict = {}
+    timings: dict = {}
+    timed("numpy", results, timings, lambda: numpy_queries(store))
+    timed("sql (sqlite)", results, timings, lambda: sql_queries(conn))
+    timed("python loops", results, timings, lambda: python_queries(plain), repeat=1)
+
+    reference = results["numpy"]
+    for label, value in results.items():
+        if value != reference:
+            raise SystemExit(f"{label} disagrees with numpy")
+
+    print(f"rows: {args.rows:,}  tasks: {args.tasks}  sessions: {args.sessions}")
+    print(f"numpy load: {load_numpy * 1000:.1f} ms, {store.stats()['memory_bytes'] / 1e6:.1f} MB")
+    for label, seconds in timings.items():
+        ratio = seconds / timings["numpy"]
+        print(f"{label:>14}: {seconds * 1000:9.1f} ms  ({ratio:6.1f}x numpy)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: authenticated teacher request throughput with and without the
+principal cache.
+
+Runs GET /api/me against the ASGI app with an in-memory SQLite database,
+first with the cache disabled (one Teacher SELECT per request) and then
+with it enabled.
+
+Usage:
+    python -m benchmarks.auth_throughput [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import time
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from backend.auth import create_access_token
+from backend.database import Base, get_db
+from backend.main import app
+from backend.models import Teacher
+from backend.principal_cache import principal_cache
+
+
+async def run(requests: int) -> None:
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_maker() as session:
+        teacher = Teacher(username="bench", email="bench@example.com", password_hash="x")
+        session.add(teacher)
+        await session.commit()
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        results = {}
+        for label, ttl in (("without cache", 0), ("with cache", 30)):
+            principal_cache.clear()
+            principal_cache.ttl = ttl
+            # Warm-up
+            for _ in range(20):
+                await client.get("/api/me", headers=headers)
+
+            started = time.perf_counter()
+            for _ in range(requests):
+                response = await client.get("/api/me", headers=headers)
+                assert response.status_code == 200
+            elapsed = time.perf_counter() - started
+            results[label] = requests / elapsed
+            print(f"{label:>14}: {results[label]:8.0f} req/s ({elapsed * 1000 / requests:.3f} ms/req)")
+
+    print(f"{'speedup':>14}: {results['with cache'] / results['without cache']:.2f}x")
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
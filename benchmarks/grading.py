@@ -0,0 +1,103 @@
+"""
+Benchmark: server-side doctest grading throughput.
+
+Grades the same submission in-process (no isolation, the lower bound):
+with plain doctest.testmod, with run_doctests finding and parsing the
+docstring, and with run_doctests running the test cases pre-parsed by
+migrate_tasks. Then grades it on the sandboxed worker pool with
+concurrent requests. Reports gradings/s and per-grading latency.
+
+Usage:
+    python -m benchmarks.grading [--gradings 500] [--workers 4] [--concurrency 32]
+"""
+
+import argparse
+import asyncio
+import doctest
+import io
+import time
+import types
+from contextlib import redirect_stdout
+
+from backend.grading import GradingPool, prepare_code, run_doctests
+from backend.migrate_tasks import extract_test_cases
+
+HEADER = '''def add_in_range(start, stop):
+    """
+    >>> add_in_range(3, 5)
+    12
+    >>> add_in_range(1, 10)
+    55
+    """'''
+
+SOLUTION = """def add_in_range(start, stop):
+    total = 0
+    while start <= stop:
+        total += start
+        start += 1
+    return total"""
+
+
+def bench_testmod(gradings: int) -> float:
+    program, _ = prepare_code(SOLUTION, HEADER)
+    started = time.perf_counter()
+    for _ in range(gradings):
+        module = types.ModuleType("graded")
+        exec(compile(program, "<exec>", "exec"), module.__dict__)
+        with redirect_stdout(io.StringIO()):
+            assert doctest.testmod(module).failed == 0
+    return time.perf_counter() - started
+
+
+def bench_in_process(gradings: int, test_cases: list[dict] | None = None) -> float:
+    program, start_line = prepare_code(SOLUTION, HEADER)
+    started = time.perf_counter()
+    for _ in range(gradings):
+        assert run_doctests(program, start_line, test_cases)["status"] == "pass"
+    return time.perf_counter() - started
+
+
+async def bench_pool(gradings: int, workers: int, concurrency: int, test_cases: list[dict]) -> float:
+    pool = GradingPool(workers=workers, max_queued=concurrency)
+    pool.start()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def grade_one() -> None:
+        async with limit:
+            result = await pool.grade(SOLUTION, HEADER, test_cases=test_cases)
+        assert result["status"] == "pass", result
+
+    try:
+        await asyncio.gather(*(grade_one() for _ in range(workers * 4)))  # Warm-up
+        started = time.perf_counter()
+        await asyncio.gather(*(grade_one() for _ in range(gradings)))
+        elapsed = time.perf_counter() - started
+        print(f"{'pool stats':>15}: {pool.stats()}")
+    finally:
+        await pool.stop()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--gradings", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    test_cases = extract_test_cases(HEADER)
+    results = {
+        "doctest.testmod": bench_testmod(args.gradings),
+        "doctest parse": bench_in_process(args.gradings),
+        "test cases": bench_in_process(args.gradings, test_cases),
+        "pool": asyncio.run(bench_pool(args.gradings, args.workers, args.concurrency, test_cases)),
+    }
+    for label, elapsed in results.items():
+        print(
+            f"{label:>15}: {args.gradings / elapsed:8.0f} gradings/s "
+            f"({elapsed * 1000 / args.gradings:.3f} ms/grading)"
+        )
+
+
+if __name__ == "__main__":
+    main()
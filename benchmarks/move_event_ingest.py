@@ -0,0 +1,124 @@
+"""
+Benchmark: move event ingestion throughput, direct writes versus write-behind.
+
+Posts batches of compact move events to
+POST /api/tasks/{id}/attempts/{attempt_id}/moves against the ASGI app,
+first writing each batch in the request's transaction and then through
+the background writer (COPY on PostgreSQL, multi-row INSERT elsewhere),
+and reports accepted events per second and the time until every event
+is stored. Defaults to a temporary SQLite file; pass a PostgreSQL URL to
+measure COPY.
+
+Usage:
+    python -m benchmarks.move_event_ingest [--requests 500] [--events 100]
+    python -m benchmarks.move_event_ingest --database-url postgresql+asyncpg://...
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from backend.database import Base, get_db
+from backend.main import app
+from backend.models import MoveEvent, Parsons, StudentSession, TaskAttempt, Teacher
+from backend.move_events import move_event_writer
+
+
+async def run(database_url: str, requests: int, events: int, concurrency: int) -> None:
+    engine = create_async_engine(database_url, pool_size=concurrency)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    token = uuid.uuid4()
+    async with session_maker() as session:
+        teacher = Teacher(username=f"bench-{token}", email=f"{token}@example.com", password_hash="x")
+        session.add(teacher)
+        await session.flush()
+        task = Parsons(
+            created_by_teacher_id=teacher.id,
+            title="Bench",
+            description="{}",
+            task_type="normal",
+            code_blocks={},
+            correct_solution={},
+        )
+        student = StudentSession(session_id=token, username="bench")
+        session.add_all([task, student])
+        await session.flush()
+        attempt = TaskAttempt(student_session_id=student.id, task_id=task.id)
+        session.add(attempt)
+        await session.commit()
+        task_id, attempt_id = task.id, attempt.id
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    url = f"/api/tasks/{task_id}/attempts/{attempt_id}/moves"
+    body = {"events": [[f"{i % 12}", i % 12, (i + 3) % 12, i % 4, i * 250] for i in range(events)]}
+
+    async def stored() -> int:
+        async with session_maker() as session:
+            result = await session.execute(
+                select(func.count()).select_from(MoveEvent).where(MoveEvent.attempt_id == attempt_id)
+            )
+            return result.scalar_one()
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://bench", cookies={"student_session": str(token)}
+    ) as client:
+        for label, write_behind in (("direct", False), ("write-behind", True)):
+            if write_behind:
+                move_event_writer.start(session_maker)
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def post():
+                async with semaphore:
+                    response = await client.post(url, json=body)
+                    assert response.status_code == 202, response.text
+
+            started = time.perf_counter()
+            await asyncio.gather(*(post() for _ in range(requests)))
+            accepted = time.perf_counter() - started
+            if write_behind:
+                await move_event_writer.stop()
+            durable = time.perf_counter() - started
+
+            total = requests * events
+            assert await stored() == total
+            print(
+                f"{label:>12}: {total / accepted:10.0f} events/s accepted, "
+                f"{accepted * 1000 / requests:6.2f} ms/request, all stored after {durable:.2f} s"
+            )
+            async with session_maker() as session:
+                await session.execute(delete(MoveEvent).where(MoveEvent.attempt_id == attempt_id))
+                await session.commit()
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--events", type=int, default=100, help="events per request")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--database-url", help="default: a temporary SQLite file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{Path(tmp) / 'moves.db'}"
+        asyncio.run(run(database_url, args.requests, args.events, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark: bulk re-grading throughput.
+
+Fills a database with stored attempts of a few tasks, where students
+submit a limited number of distinct programs (half of them wrong, every
+verdict stored inverted), then re-grades everything with run_regrade on a
+sandboxed worker pool. Reports attempts/s, the number of programs actually
+run and verifies that every verdict was flipped. Defaults to a temporary
+SQLite file; pass a PostgreSQL URL to measure the server-side cursor.
+
+Usage:
+    python -m benchmarks.regrade [--attempts 200000] [--tasks 20] [--distinct 200] [--workers 4]
+    python -m benchmarks.regrade --database-url postgresql+asyncpg://...
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.database import Base
+from backend.grading import GradingPool
+from backend.migrate_tasks import extract_test_cases
+from backend.models import Parsons, StudentSession, TaskAttempt, Teacher
+from backend.regrade import run_regrade
+
+HEADER = '''def add_in_range(start, stop):
+    """
+    >>> add_in_range(3, 5)
+    12
+    >>> add_in_range(1, 10)
+    55
+    """'''
+
+SOLUTION = """def add_in_range(start, stop):
+    total = 0  # {variant}
+    while start <= stop:
+        total += start
+        start += {step}
+    return total"""
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+INSERT_ROWS = 5000
+
+
+async def fill(engine, attempts: int, tasks: int, distinct: int) -> list[int]:
+    token = uuid.uuid4()
+    async with engine.begin() as conn:
+        teacher_id = await conn.scalar(
+            insert(Teacher)
+            .values(username=f"bench-{token}", email=f"{token}@example.com", password_hash="x")
+            .returning(Teacher.id)
+        )
+        task_ids = [
+            await conn.scalar(
+                insert(Parsons)
+                .values(
+                    created_by_teacher_id=teacher_id,
+                    title=f"Bench {index}",
+                    description="{}",
+                    task_type="normal",
+                    code_blocks={"blocks": [], "function_header": HEADER},
+                    correct_solution={},
+                    test_cases=extract_test_cases(HEADER),
+                )
+                .returning(Parsons.id)
+            )
+            for index in range(tasks)
+        ]
+        session_id = await conn.scalar(
+            insert(StudentSession).values(session_id=token, username="bench").returning(StudentSession.id)
+        )
+
+    rows = []
+    for index in range(attempts):
+        variant = (index // tasks) % distinct
+        passes = variant % 2 == 0
+        rows.append(
+            {
+                "student_session_id": session_id,
+                "task_id": task_ids[index % tasks],
+                "task_started_at": T0 + timedelta(seconds=index),
+                "completed_at": T0 + timedelta(seconds=index + 30),
+                "success": not passes,
+                "submitted_inputs": {"code": SOLUTION.format(variant=variant, step=1 if passes else 2)},
+            }
+        )
+        if len(rows) == INSERT_ROWS or index == attempts - 1:
+            async with engine.begin() as conn:
+                await conn.execute(insert(TaskAttempt), rows)
+            rows = []
+    return task_ids
+
+
+async def run(database_url: str, attempts: int, tasks: int, distinct: int, workers: int) -> None:
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    started = time.perf_counter()
+    task_ids = await fill(engine, attempts, tasks, distinct)
+    print(f"inserted {attempts} attempts in {time.perf_counter() - started:.1f} s")
+
+    pool = GradingPool(workers=workers)
+    pool.start()
+    try:
+        started = time.perf_counter()
+        runs = await run_regrade(engine, pool, task_ids)
+        elapsed = time.perf_counter() - started
+        programs = pool.stats()["completed"]
+    finally:
+        await pool.stop()
+
+    async with engine.connect() as conn:
+        remaining = await conn.scalar(
+            select(func.count()).where(TaskAttempt.task_id.in_(task_ids), TaskAttempt.success.is_(False))
+        )
+    changed = sum(run.changed for run in runs)
+    assert changed == attempts, changed
+    print(
+        f"re-graded {attempts} attempts in {elapsed:.1f} s ({attempts / elapsed:.0f} attempts/s), "
+        f"{programs} programs run, {changed} verdicts changed, {remaining} attempts failing"
+    )
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--attempts", type=int, default=200_000)
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument("--distinct", type=int, default=200, help="distinct programs per task")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--database-url", help="default: a temporary SQLite file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{Path(tmp) / 'regrade.db'}"
+        asyncio.run(run(database_url, args.attempts, args.tasks, args.distinct, args.workers))
+
+
+if __name__ == "__main__":
+    main()
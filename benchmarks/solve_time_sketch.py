@@ -0,0 +1,141 @@
+"""
+Benchmark: solve-time quantile sketch versus exact percentiles.
+
+Draws a synthetic set of solve times (log-normal, median about 20 s, long
+tail), splits it across simulated workers that each build a sketch,
+merges the sketches and compares p50 / p90 / p99 and timings with exact
+percentiles. Without a database URL the exact values come from sorting in
+Python (same definition as percentile_cont). With a PostgreSQL URL the
+durations are generated server-side in a temporary table and the exact
+values come from SQL percentile_cont; the sketch is then built by
+streaming the same rows.
+
+Usage:
+    python -m benchmarks.solve_time_sketch [--rows 10000000] [--workers 8]
+    python -m benchmarks.solve_time_sketch --database-url postgresql+asyncpg://...
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+from array import array
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.quantile_sketch import QuantileSketch
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def percentile_cont(ordered, q: float) -> float:
+    """Linear interpolation between closest ranks, as SQL percentile_cont."""
+    position = q * (len(ordered) - 1)
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def build_sketches(values, workers: int) -> tuple[QuantileSketch, float, float, int]:
+    """Build one sketch per worker, merge them; return merged sketch and timings."""
+    started = time.perf_counter()
+    parts = [QuantileSketch() for _ in range(workers)]
+    for i, value in enumerate(values):
+        parts[i % workers].add(value)
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    serialized = [part.to_bytes() for part in parts]
+    merged = QuantileSketch()
+    for data in serialized:
+        merged.merge(QuantileSketch.from_bytes(data))
+    merge_seconds = time.perf_counter() - started
+    return merged, build_seconds, merge_seconds, max(len(data) for data in serialized)
+
+
+def report(rows: int, exact: dict, exact_seconds: float, exact_label: str, sketch: QuantileSketch,
+           build_seconds: float, merge_seconds: float, size: int) -> None:
+    started = time.perf_counter()
+    approx = {q: sketch.quantile(q) for q in QUANTILES}
+    query_ms = (time.perf_counter() - started) * 1000
+
+    print(f"rows: {rows:,}")
+    print(f"{'quantile':>10} {'exact':>12} {'sketch':>12} {'rel. error':>11}")
+    for q in QUANTILES:
+        error = abs(approx[q] - exact[q]) / exact[q]
+        print(f"{'p' + str(round(q * 100)):>10} {exact[q]:12.3f} {approx[q]:12.3f} {error:10.3%}")
+    print(f"exact ({exact_label}): {exact_seconds:8.2f} s")
+    print(f"sketch build (all workers): {build_seconds:8.2f} s ({build_seconds / rows * 1e9:.0f} ns/value)")
+    print(f"sketch serialize + merge:   {merge_seconds * 1000:8.2f} ms")
+    print(f"sketch query:               {query_ms:8.3f} ms")
+    print(f"largest serialized sketch:  {size:8d} bytes")
+
+
+def run_in_process(rows: int, workers: int, seed: int) -> None:
+    rng = random.Random(seed)
+    values = array("d", (rng.lognormvariate(3, 1) for _ in range(rows)))
+
+    started = time.perf_counter()
+    ordered = sorted(values)
+    exact = {q: percentile_cont(ordered, q) for q in QUANTILES}
+    exact_seconds = time.perf_counter() - started
+    del ordered
+
+    sketch, build_seconds, merge_seconds, size = build_sketches(values, workers)
+    report(rows, exact, exact_seconds, "sort in Python", sketch, build_seconds, merge_seconds, size)
+
+
+async def run_postgres(database_url: str, rows: int, workers: int) -> None:
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            # Box-Muller log-normal with mu = 3, sigma = 1
+            await conn.execute(
+                text(
+                    "CREATE TEMP TABLE bench_solve_times AS "
+                    "SELECT exp(3 + sqrt(-2 * ln(1 - random())) * cos(2 * pi() * random())) "
+                    "AS seconds FROM generate_series(1, :rows)"
+                ),
+                {"rows": rows},
+            )
+
+            started = time.perf_counter()
+            result = await conn.execute(
+                text(
+                    "SELECT percentile_cont(ARRAY[:p50, :p90, :p99]) "
+                    "WITHIN GROUP (ORDER BY seconds) FROM bench_solve_times"
+                ),
+                {"p50": QUANTILES[0], "p90": QUANTILES[1], "p99": QUANTILES[2]},
+            )
+            exact = dict(zip(QUANTILES, result.scalar_one()))
+            exact_seconds = time.perf_counter() - started
+
+            stream = await conn.stream(text("SELECT seconds FROM bench_solve_times"))
+            values = array("d")
+            async for (seconds,) in stream:
+                values.append(seconds)
+    finally:
+        await engine.dispose()
+
+    sketch, build_seconds, merge_seconds, size = build_sketches(values, workers)
+    report(rows, exact, exact_seconds, "SQL percentile_cont", sketch, build_seconds, merge_seconds, size)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="PostgreSQL URL for the percentile_cont comparison")
+    args = parser.parse_args()
+
+    if args.database_url:
+        asyncio.run(run_postgres(args.database_url, args.rows, args.workers))
+    else:
+        run_in_process(args.rows, args.workers, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -62,6 +62,13 @@
 		this.options = $.extend({}, defaults, options);
 		this.id_prefix = 'sortable-codeline';
 
+		// Compact log of block moves since the last takeMoves():
+		// [block id, from position, to position, indent, ms since the log started],
+		// positions are -1 in the starter (trash) column
+		this.moves = [];
+		this.movesStartedAt = Date.now();
+		this.dragFrom = -1;
+
 		// translate trash_label and solution_label
 		if (!this.options['trash_label']) {
 			this.options.trash_label = userStrings.trash_label;
@@ -262,6 +269,25 @@
 		return new_indent;
 	};
 
+	// Record one block move (see this.moves)
+	ParsonsWidget.prototype.logMove = function (id, to, indent) {
+		this.moves.push([
+			id.replace(this.id_prefix, ''),
+			this.dragFrom,
+			to,
+			indent,
+			Date.now() - this.movesStartedAt,
+		]);
+	};
+
+	// Return the moves logged so far and start a new log
+	ParsonsWidget.prototype.takeMoves = function () {
+		var moves = this.moves;
+		this.moves = [];
+		this.movesStartedAt = Date.now();
+		return moves;
+	};
+
 	// Get a line object by the full id including id prefix
 	// (see parseCode for description of line objects)
 	ParsonsWidget.prototype.getLineById = function (id) {
@@ -465,22 +491,27 @@
 		var that = this;
 
 		var sortable = $(this.options.sortableId.querySelector('ul')).sortable({
+			start: function (event, ui) {
+				that.dragFrom = ui.item.index();
+			},
 			stop: function (event, ui) {
 				if ($(event.target)[0] != ui.item.parent()[0]) {
 					return;
 				}
-				that.updateIndent(
+				var indent = that.updateIndent(
 					ui.position.left - ui.item.parent().position().left,
 					ui.item[0].id
 				);
 				that.updateHTMLIndent(ui.item[0].id);
+				that.logMove(ui.item[0].id, ui.item.index(), indent);
 			},
 			receive: function (event, ui) {
-				that.updateIndent(
+				var indent = that.updateIndent(
 					ui.position.left - ui.item.parent().position().left,
 					ui.item[0].id
 				);
 				that.updateHTMLIndent(ui.item[0].id);
+				that.logMove(ui.item[0].id, ui.item.index(), indent);
 			},
 			update: (e) => {
 				this.setLineNumbers();
@@ -492,9 +523,13 @@
 		if (this.options.trashId) {
 			var trash = $(this.options.trashId.querySelector('ul')).sortable({
 				connectWith: sortable,
+				start: function (event, ui) {
+					that.dragFrom = -1;
+				},
 				receive: function (event, ui) {
 					that.getLineById(ui.item[0].id).indent = 0;
 					that.updateHTMLIndent(ui.item[0].id);
+					that.logMove(ui.item[0].id, -1, 0);
 				},
 				stop: function (event, ui) {
 					if ($(event.target)[0] != ui.item.parent()[0]) {
@@ -11,6 +11,9 @@ import {FiniteWorker} from './worker-manager.js'; // Worker process for Python c
 // Local storage key for saving user code representation
 const LS_REPR = '-repr';
 
+// Moves sent with one submission (the server's MOVE_EVENT_MAX_BATCH)
+const MAX_MOVES_PER_SUBMIT = 2000;
+
 // Global reference to the current problem element
 let probEl;
 
@@ -111,7 +114,7 @@ export async function initWidget() {
 
 		// Listen for 'run' event fired when user clicks the Run button
 		probEl.addEventListener('run', (e) => {
-			handleSubmit(e.detail.code, e.detail.repr, functionHeader);
+			handleSubmit(e.detail.code, e.detail.repr, functionHeader, e.detail.moves);
 		});
 
 		// Activate the run button
@@ -155,7 +158,8 @@ function reconstructCodeLines(blocks) {
 // submittedCode: the code written by the user
 // reprCode: visual representation of user code (for storage)
 // codeHeader: Python function template/header
-async function handleSubmit(submittedCode, reprCode, codeHeader) {
+// moves: compact block moves made before this run (see ParsonsWidget.takeMoves)
+async function handleSubmit(submittedCode, reprCode, codeHeader, moves = []) {
 	// Prepare code and inject test code
 	let testResults = prepareCode(submittedCode, codeHeader);
 
@@ -201,7 +205,9 @@ async function handleSubmit(submittedCode, reprCode, codeHeader) {
         submitted_code: submittedCode,
         test_output: testResults.details || '',
         repr_code: reprCode,
-        start_time: startTime
+        start_time: startTime,
+        // Stored with the attempt, also when the server queues it (write-behind)
+        moves: moves.slice(0, MAX_MOVES_PER_SUBMIT)
     };
 
     const response = await fetch(`/api/tasks/${globalTaskId}/submit-result`, {
@@ -214,6 +220,10 @@ async function handleSubmit(submittedCode, reprCode, codeHeader) {
 
     if (response.ok) {
         console.log('Test results saved to backend');
+        const saved = await response.json();
+        if (saved.moves_accepted < moves.length) {
+            console.warn(`Only ${saved.moves_accepted} of ${moves.length} moves were saved`);
+        }
     } else {
         console.warn('Failed to save test results:', response.statusText);
     }
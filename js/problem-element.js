@@ -151,6 +151,8 @@ export class ProblemElement extends LitElement {
 					code: this.parsonsWidget.solutionCode(),
 					// Serializable block representation for persistence
 					repr: this.parsonsWidget.reprCode(),
+					// Block moves since the previous run
+					moves: this.parsonsWidget.takeMoves(),
 				},
 			})
 		);
@@ -16,9 +16,48 @@ except ImportError:
     from sqlalchemy.orm import sessionmaker
     async_sessionmaker = sessionmaker
 
-from backend.database import Base, get_db
+from backend.database import Base, get_db, get_read_db
 from backend.main import app
+from backend.activity_tracker import activity_tracker
+from backend.analytics import analytics_cache
+from backend.attempt_columns import attempt_columns
+from backend.block_structure import structure_checker
+from backend.grading_cache import grading_cache
 from backend.models import Teacher
+from backend.live_feed import live_feed
+from backend.principal_cache import principal_cache
+from backend.regrade import regrade_runner
+from backend.solve_times import solve_time_sketches
+from backend.task_catalog import task_catalog
+from backend.tasklist_cache import tasklist_resolver
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Clear in-process caches so each test sees only its own database."""
+    tasklist_resolver.clear()
+    activity_tracker.clear()
+    principal_cache.clear()
+    task_catalog.clear()
+    analytics_cache.clear()
+    solve_time_sketches.clear()
+    live_feed.clear()
+    attempt_columns.clear()
+    grading_cache.clear()
+    structure_checker.clear()
+    regrade_runner.clear()
+    yield
+    tasklist_resolver.clear()
+    activity_tracker.clear()
+    principal_cache.clear()
+    task_catalog.clear()
+    analytics_cache.clear()
+    solve_time_sketches.clear()
+    live_feed.clear()
+    attempt_columns.clear()
+    grading_cache.clear()
+    structure_checker.clear()
+    regrade_runner.clear()
 
 
 @pytest_asyncio.fixture
@@ -64,6 +103,7 @@ async def client(db_session):
         yield db_session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     async with AsyncClient(
         transport=ASGITransport(app=app),
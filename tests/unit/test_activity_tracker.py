@@ -0,0 +1,135 @@
+"""
+Unit tests for activity_tracker.py - coalesced student session activity.
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.activity_tracker import SessionActivityTracker, activity_tracker
+from backend.models import StudentSession, TaskList
+from backend.student_auth import (
+    STUDENT_SESSION_EXPIRE_HOURS,
+    create_student_session,
+    get_student_session,
+)
+
+
+@pytest_asyncio.fixture
+async def session_factory(db_engine):
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest_asyncio.fixture
+async def student(db_session, test_teacher) -> StudentSession:
+    task_list = TaskList(title="Act", unique_link_code="ACT01", teacher_id=test_teacher.id)
+    db_session.add(task_list)
+    await db_session.commit()
+    return await create_student_session(
+        task_list_id=task_list.id, nickname="Active", db=db_session
+    )
+
+
+def as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class TestSessionActivityTracker:
+    """Tests for recording and flushing touches."""
+
+    def test_touch_keeps_newest_timestamp(self):
+        tracker = SessionActivityTracker(flush_interval=30)
+        newer = datetime.now(timezone.utc)
+        older = newer - timedelta(minutes=5)
+
+        tracker.touch(1, newer)
+        tracker.touch(1, older)
+
+        assert tracker.last_seen(1) == newer
+        assert tracker.last_seen(2) is None
+
+    async def test_flush_writes_batched_update(
+        self, db_session, session_factory, student
+    ):
+        tracker = SessionActivityTracker(flush_interval=30)
+        touched_at = datetime.now(timezone.utc) + timedelta(minutes=1)
+        tracker.touch(student.id, touched_at)
+
+        written = await tracker.flush(session_factory)
+
+        assert written == 1
+        assert tracker.stats()["pending"] == 0
+        result = await db_session.execute(
+            select(StudentSession.last_activity_at)
+            .where(StudentSession.id == student.id)
+            .execution_options(populate_existing=True)
+        )
+        assert as_utc(result.scalar_one()) == touched_at
+
+    async def test_flush_never_moves_activity_backwards(
+        self, db_session, session_factory, student
+    ):
+        tracker = SessionActivityTracker(flush_interval=30)
+        stored = as_utc(student.last_activity_at)
+        tracker.touch(student.id, stored - timedelta(hours=1))
+
+        await tracker.flush(session_factory)
+
+        result = await db_session.execute(
+            select(StudentSession.last_activity_at)
+            .where(StudentSession.id == student.id)
+            .execution_options(populate_existing=True)
+        )
+        assert as_utc(result.scalar_one()) == stored
+
+    async def test_postgres_uses_single_update_from_values(self):
+        tracker = SessionActivityTracker(flush_interval=30)
+        db = MagicMock()
+        db.bind.dialect.name = "postgresql"
+        db.execute = AsyncMock()
+        now = datetime.now(timezone.utc)
+
+        await tracker._write(db, [(1, now), (2, now)])
+
+        db.execute.assert_awaited_once()
+        stmt = db.execute.await_args.args[0]
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert sql.startswith("UPDATE student_sessions SET last_activity_at=touched.ts")
+        assert "FROM (VALUES" in sql
+
+
+class TestStudentSessionExpiry:
+    """Tests for expiry checks using in-memory touches."""
+
+    async def test_get_student_session_does_not_commit_when_coalescing(
+        self, db_session, student
+    ):
+        retrieved = await get_student_session(str(student.session_id), db_session)
+
+        assert activity_tracker.last_seen(student.id) == as_utc(retrieved.last_activity_at)
+        assert student not in db_session.dirty
+
+    async def test_in_memory_touch_keeps_session_alive(self, db_session, student):
+        old = datetime.now(timezone.utc) - timedelta(hours=STUDENT_SESSION_EXPIRE_HOURS + 1)
+        student.last_activity_at = old
+        await db_session.commit()
+        activity_tracker.touch(student.id)
+
+        retrieved = await get_student_session(
+            str(student.session_id), db_session, update_activity=False
+        )
+
+        assert retrieved is not None
+
+    async def test_stale_session_without_touch_expires(self, db_session, student):
+        old = datetime.now(timezone.utc) - timedelta(hours=STUDENT_SESSION_EXPIRE_HOURS + 1)
+        student.last_activity_at = old
+        await db_session.commit()
+
+        retrieved = await get_student_session(str(student.session_id), db_session)
+
+        assert retrieved is None
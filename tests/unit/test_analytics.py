@@ -0,0 +1,253 @@
+"""
+Unit tests for analytics.py - SQL-aggregated attempt statistics.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest_asyncio
+from fastapi import status
+
+from backend.analytics import AnalyticsCache, analytics_cache, task_analytics, tasklist_analytics
+from backend.auth import create_access_token
+from backend.live_feed import live_feed
+from backend.models import Parsons, StudentSession, TaskAttempt, TaskList, TaskListItem
+
+T0 = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def attempt(session, task, started, completed, success) -> TaskAttempt:
+    return TaskAttempt(
+        student_session_id=session.id,
+        task_id=task.id,
+        task_started_at=T0 + timedelta(seconds=started),
+        completed_at=T0 + timedelta(seconds=completed),
+        success=success,
+    )
+
+
+@pytest_asyncio.fixture
+async def dataset(db_session, test_teacher):
+    """Two tasks in one list; sessions A and B from the list, C from elsewhere."""
+    tasks = [
+        Parsons(
+            created_by_teacher_id=test_teacher.id,
+            title=title,
+            description="{}",
+            task_type="normal",
+            code_blocks={},
+            correct_solution={},
+        )
+        for title in ("First", "Second")
+    ]
+    task_list = TaskList(title="Lab", unique_link_code="STATS01", teacher_id=test_teacher.id)
+    db_session.add_all([*tasks, task_list])
+    await db_session.flush()
+    db_session.add_all(
+        [TaskListItem(task_list_id=task_list.id, task_id=task.id) for task in tasks]
+    )
+    sessions = {
+        name: StudentSession(session_id=uuid.uuid4(), task_list_id=list_id, username=name)
+        for name, list_id in (("A", task_list.id), ("B", task_list.id), ("C", None))
+    }
+    db_session.add_all(sessions.values())
+    await db_session.flush()
+
+    first = tasks[0]
+    db_session.add_all(
+        [
+            attempt(sessions["A"], first, 0, 10, False),
+            attempt(sessions["A"], first, 15, 30, True),
+            attempt(sessions["B"], first, 0, 60, True),
+            attempt(sessions["C"], first, 0, 5, False),
+        ]
+    )
+    await db_session.commit()
+    return tasks, task_list, sessions
+
+
+class TestTaskAnalytics:
+    """Tests for per-task statistics."""
+
+    async def test_counts_and_rates(self, db_session, dataset):
+        tasks, _, _ = dataset
+
+        stats = await task_analytics(db_session, tasks[0].id)
+
+        assert stats["total_attempts"] == 4
+        assert stats["completions"] == 2
+        assert stats["students_attempted"] == 3
+        assert stats["students_completed"] == 2
+        assert stats["success_rate"] == 0.5
+        assert stats["avg_attempts_to_first_success"] == 1.5
+
+    async def test_durations_from_first_start(self, db_session, dataset):
+        tasks, _, _ = dataset
+
+        stats = await task_analytics(db_session, tasks[0].id)
+
+        assert stats["time_to_first_success"] == {
+            "avg": 45.0, "min": 30.0, "max": 60.0, "median": 45.0
+        }
+        assert stats["time_to_first_fail"] == {"avg": 7.5, "min": 5.0, "max": 10.0}
+
+    async def test_median_with_odd_count(self, db_session, dataset):
+        tasks, _, sessions = dataset
+        db_session.add(attempt(sessions["C"], tasks[0], 0, 100, True))
+        await db_session.commit()
+
+        stats = await task_analytics(db_session, tasks[0].id)
+
+        assert stats["time_to_first_success"]["median"] == 60.0
+
+    async def test_task_without_attempts(self, db_session, dataset):
+        tasks, _, _ = dataset
+
+        stats = await task_analytics(db_session, tasks[1].id)
+
+        assert stats["total_attempts"] == 0
+        assert stats["time_to_first_success"]["median"] is None
+
+
+class TestTaskListAnalytics:
+    """Tests for task list statistics."""
+
+    async def test_only_sessions_of_the_list_count(self, db_session, dataset):
+        tasks, task_list, _ = dataset
+
+        stats = await tasklist_analytics(db_session, task_list.id)
+
+        assert [t["title"] for t in stats["tasks"]] == ["First", "Second"]
+        first, second = stats["tasks"]
+        assert first["total_attempts"] == 3
+        assert first["time_to_first_fail"]["avg"] == 10.0
+        assert second["total_attempts"] == 0
+        assert stats["students_attempted"] == 2
+        assert stats["success_rate"] == round(2 / 3, 4)
+
+
+class TestAnalyticsCache:
+    """Tests for caching and invalidation."""
+
+    async def test_second_read_is_cached(self, db_session, dataset):
+        tasks, _, _ = dataset
+        cache = AnalyticsCache()
+
+        first = await cache.task(db_session, tasks[0].id)
+        second = await cache.task(db_session, tasks[0].id)
+
+        assert second is first
+        assert cache.stats()["hits"] == 1
+
+    async def test_new_attempt_invalidates_task_and_lists(self, db_session, dataset):
+        tasks, task_list, sessions = dataset
+        await analytics_cache.task(db_session, tasks[0].id)
+        await analytics_cache.tasklist(db_session, task_list.id)
+
+        db_session.add(attempt(sessions["B"], tasks[0], 70, 80, False))
+        await db_session.commit()
+
+        task_stats = await analytics_cache.task(db_session, tasks[0].id)
+        list_stats = await analytics_cache.tasklist(db_session, task_list.id)
+        assert task_stats["total_attempts"] == 5
+        assert list_stats["total_attempts"] == 4
+
+    async def test_invalidation_waits_for_commit(self, db_session, dataset):
+        tasks, _, sessions = dataset
+        key = ("task", tasks[0].id)
+        await analytics_cache.task(db_session, tasks[0].id)
+
+        db_session.add(attempt(sessions["B"], tasks[0], 70, 80, False))
+        await db_session.flush()
+        # Readers outside this transaction still see the old numbers
+        assert key in analytics_cache._entries
+        await db_session.commit()
+
+        assert key not in analytics_cache._entries
+
+    async def test_rolled_back_attempt_keeps_cache(self, db_session, dataset):
+        tasks, _, sessions = dataset
+        key = ("task", tasks[0].id)
+        await analytics_cache.task(db_session, tasks[0].id)
+
+        db_session.add(attempt(sessions["B"], tasks[0], 70, 80, False))
+        await db_session.flush()
+        await db_session.rollback()
+
+        assert key in analytics_cache._entries
+
+    async def test_commit_notifies_other_workers(self, db_session, dataset, monkeypatch):
+        tasks, _, sessions = dataset
+        sent = []
+        monkeypatch.setattr(live_feed, "_notifier", SimpleNamespace(send=sent.append))
+
+        db_session.add(attempt(sessions["B"], tasks[0], 70, 80, False))
+        await db_session.commit()
+
+        messages = [message for message in sent if message.get("kind") == "analytics"]
+        assert messages == [
+            {"kind": "analytics", "origin": live_feed.origin, "scopes": [("task", tasks[0].id)]}
+        ]
+
+    async def test_other_workers_commit_drops_entries(self, db_session, dataset):
+        tasks, task_list, _ = dataset
+        await analytics_cache.task(db_session, tasks[0].id)
+        await analytics_cache.tasklist(db_session, task_list.id)
+        await analytics_cache.task(db_session, tasks[1].id)
+
+        live_feed.receive({"kind": "analytics", "origin": "other", "scopes": [["task", tasks[0].id]]})
+
+        assert set(analytics_cache._entries) == {("task", tasks[1].id)}
+
+    async def test_own_messages_are_ignored(self, db_session, dataset):
+        tasks, _, _ = dataset
+        await analytics_cache.task(db_session, tasks[0].id)
+
+        live_feed.receive(live_feed.message("analytics", scopes=[["task", tasks[0].id]]))
+
+        assert ("task", tasks[0].id) in analytics_cache._entries
+
+    def test_zero_ttl_disables_cache(self):
+        cache = AnalyticsCache(ttl=0)
+        cache._put(("task", 1), {})
+
+        assert cache.stats()["size"] == 0
+
+
+class TestAnalyticsEndpoints:
+    """Tests for the analytics API."""
+
+    async def test_requires_auth(self, client, dataset):
+        tasks, _, _ = dataset
+
+        response = await client.get(f"/api/analytics/tasks/{tasks[0].id}")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_task_endpoint(self, client, test_teacher, dataset):
+        tasks, _, _ = dataset
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        response = await client.get(f"/api/analytics/tasks/{tasks[0].id}")
+        missing = await client.get("/api/analytics/tasks/999")
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["completions"] == 2
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    async def test_tasklist_endpoint_is_owner_only(self, client, db_session, test_teacher, dataset):
+        _, task_list, _ = dataset
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        response = await client.get(f"/api/analytics/tasklists/{task_list.id}")
+
+        task_list.teacher_id = test_teacher.id + 1
+        await db_session.commit()
+        other = await client.get(f"/api/analytics/tasklists/{task_list.id}")
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()["tasks"]) == 2
+        assert other.status_code == status.HTTP_404_NOT_FOUND
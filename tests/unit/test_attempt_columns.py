@@ -0,0 +1,235 @@
+"""
+Unit tests for attempt_columns.py - columnar attempt store.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.attempt_columns import AttemptColumns, attempt_columns
+from backend.auth import create_access_token
+from backend.live_feed import live_feed
+from backend.models import Parsons, StudentSession, TaskAttempt, TaskList, TaskListItem
+
+T0 = datetime(2025, 3, 1, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def cohort(db_session, test_teacher):
+    """
+    Task list with two tasks and three sessions:
+    ana solves task 0 after one failure (40 s, 60 s), ben solves it at once (20 s),
+    ana fails task 1 an hour later, and cy solves task 1 (100 s).
+    """
+    task_list = TaskList(title="Cohort", unique_link_code="COH01", teacher_id=test_teacher.id)
+    tasks = [
+        Parsons(
+            created_by_teacher_id=test_teacher.id,
+            title=f"Task {i}",
+            description="{}",
+            task_type="normal",
+            code_blocks={},
+            correct_solution={},
+        )
+        for i in range(2)
+    ]
+    db_session.add_all([task_list, *tasks])
+    await db_session.flush()
+    db_session.add_all([TaskListItem(task_list_id=task_list.id, task_id=task.id) for task in tasks])
+    ana, ben, cy = (
+        StudentSession(session_id=uuid.uuid4(), task_list_id=task_list.id, username=name)
+        for name in ("ana", "ben", "cy")
+    )
+    db_session.add_all([ana, ben, cy])
+    await db_session.flush()
+
+    def attempt(session, task, offset, seconds, success):
+        started = T0 + timedelta(seconds=offset)
+        return TaskAttempt(
+            student_session_id=session.id,
+            task_id=task.id,
+            task_started_at=started,
+            completed_at=started + timedelta(seconds=seconds),
+            success=success,
+        )
+
+    db_session.add_all(
+        [
+            attempt(ana, tasks[0], 0, 40, False),
+            attempt(ana, tasks[0], 100, 60, True),
+            attempt(ben, tasks[0], 0, 20, True),
+            attempt(ana, tasks[1], 3600, 30, False),
+            attempt(cy, tasks[1], 3600, 100, True),
+        ]
+    )
+    await db_session.commit()
+    return task_list, tasks
+
+
+def synthetic(rows: int) -> dict:
+    return {
+        "attempt_id": np.arange(1, rows + 1),
+        "task_id": np.arange(rows) % 3,
+        "session_id": np.arange(rows) % 5,
+        "task_list_id": np.full(rows, 7),
+        "started": np.zeros(rows),
+        "completed": np.arange(rows, dtype=float) * 10 + 10,
+        "success": np.arange(rows) % 2,
+    }
+
+
+class TestStore:
+    """Tests for loading and aggregations."""
+
+    def test_extend_grows_capacity(self):
+        store = AttemptColumns()
+
+        store.extend(synthetic(1500))
+        store.extend(synthetic(10))
+
+        assert len(store) == 1510
+        assert store.max_attempt_id == 1500
+        assert store.column("task_id")[-1] == 9 % 3
+
+    def test_pivot_values(self):
+        store = AttemptColumns()
+        store.extend(synthetic(30))
+        selected = store.mask()
+
+        rows, columns, attempts = store.pivot(selected, "task_id", "session_id")
+        _, _, rate = store.pivot(selected, "task_id", "session_id", value="success_rate")
+
+        assert rows.tolist() == [0, 1, 2]
+        assert columns.tolist() == [0, 1, 2, 3, 4]
+        assert attempts.sum() == 30
+        assert attempts[0, 0] == 2
+        assert ((rate >= 0) & (rate <= 1)).all()
+
+    def test_pivot_rejects_unknown_dimension(self):
+        store = AttemptColumns()
+        store.extend(synthetic(3))
+
+        with pytest.raises(ValueError):
+            store.pivot(store.mask(), "student", "task_id")
+
+    async def test_summary_from_database(self, db_session, cohort):
+        _, tasks = cohort
+        store = AttemptColumns()
+
+        assert await store.refresh(db_session) == 5
+        summary = store.task_summary(store.mask())
+
+        first = summary[tasks[0].id]
+        assert (first["attempts"], first["successes"], first["sessions"]) == (3, 2, 2)
+        assert first["median_solve_seconds"] == pytest.approx(40, abs=0.01)
+        assert summary[tasks[1].id]["median_solve_seconds"] == pytest.approx(100, abs=0.01)
+
+    async def test_incremental_refresh_skips_loaded_rows(self, db_session, cohort):
+        task_list, tasks = cohort
+        store = AttemptColumns(refresh_interval=0)
+        await store.refresh(db_session)
+        session_id = store.column("session_id")[0]
+
+        db_session.add(
+            TaskAttempt(
+                student_session_id=int(session_id),
+                task_id=tasks[1].id,
+                task_started_at=T0,
+                completed_at=T0 + timedelta(seconds=5),
+                success=True,
+            )
+        )
+        await db_session.commit()
+
+        assert await store.refresh(db_session) == 1
+        assert len(store) == 6
+        assert store.stats()["reloads"] == 1
+        assert store.mask(task_list_id=task_list.id).sum() == 6
+
+    async def test_refresh_is_throttled(self, db_session, cohort):
+        store = AttemptColumns(refresh_interval=60)
+        await store.refresh(db_session)
+        store.clear()
+
+        # clear() forces the next refresh to reload
+        assert await store.refresh(db_session) == 5
+        assert await store.refresh(db_session) == 0
+
+    async def test_background_reload_drops_deleted_attempts(self, db_engine, db_session, cohort):
+        store = AttemptColumns(refresh_interval=0)
+        await store.refresh(db_session)
+        first_id = int(store.column("attempt_id")[0])
+        await db_session.execute(delete(TaskAttempt).where(TaskAttempt.id == first_id))
+        await db_session.commit()
+        # Loaded by a refresh while the reload was reading
+        newer = synthetic(1)
+        newer["attempt_id"] = np.array([store.max_attempt_id + 100])
+        store.extend(newer)
+
+        loaded = await store.flush(async_sessionmaker(db_engine, class_=AsyncSession))
+
+        assert loaded == 5
+        assert first_id not in store.column("attempt_id")
+        assert store.max_attempt_id == int(newer["attempt_id"][0])
+        assert store.stats()["reloads"] == 2
+
+    async def test_regrade_message_rereads_the_tasks_verdicts(self, db_session, cohort):
+        _, tasks = cohort
+        await attempt_columns.refresh(db_session)
+        await db_session.execute(
+            update(TaskAttempt).where(TaskAttempt.task_id == tasks[1].id).values(success=True)
+        )
+        await db_session.commit()
+
+        live_feed.receive({"kind": "attempt_verdicts", "origin": "other", "task_ids": [tasks[1].id]})
+        await attempt_columns.refresh(db_session, force=True)
+
+        summary = attempt_columns.task_summary(attempt_columns.mask())
+        assert summary[tasks[1].id]["successes"] == 2
+        assert summary[tasks[0].id]["successes"] == 2
+
+    async def test_time_filter_and_buckets(self, db_session, cohort):
+        store = AttemptColumns()
+        await store.refresh(db_session)
+
+        selected = store.mask(start=T0 + timedelta(minutes=30))
+        buckets, _, attempts = store.pivot(store.mask(), "bucket", "task_id", bucket_seconds=3600)
+
+        assert selected.sum() == 2
+        assert [datetime.fromtimestamp(b, timezone.utc) for b in buckets] == [T0, T0 + timedelta(hours=1)]
+        assert attempts.sum(axis=1).tolist() == [3, 2]
+
+
+class TestCohortEndpoint:
+    """Tests for GET /api/analytics/tasklists/{id}/cohort."""
+
+    async def test_requires_owner(self, client, cohort):
+        task_list, _ = cohort
+
+        response = await client.get(f"/api/analytics/tasklists/{task_list.id}/cohort")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_cohort(self, client, test_teacher, cohort):
+        task_list, tasks = cohort
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        response = await client.get(
+            f"/api/analytics/tasklists/{task_list.id}/cohort", params={"bins": 4}
+        )
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert [task["task_id"] for task in data["tasks"]] == [t.id for t in tasks]
+        assert data["tasks"][0]["sessions"] == 2
+        assert sum(data["solve_time_histogram"]["counts"]) == 3
+        assert len(data["solve_time_histogram"]["edges"]) == 5
+        assert data["activity"]["task_ids"] == [t.id for t in tasks]
+        assert data["activity"]["attempts"] == [[3, 0], [0, 2]]
@@ -0,0 +1,181 @@
+"""
+Unit tests for attempt_export.py - streaming attempt export.
+"""
+
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from fastapi import status
+
+from backend import attempt_export
+from backend.attempt_export import COLUMNS, export_query, stream_attempts
+from backend.auth import create_access_token
+from backend.models import Parsons, StudentSession, TaskAttempt, TaskList
+
+T0 = datetime(2025, 3, 1, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def context(db_session, test_teacher):
+    """A task list with two tasks, five attempts from its session and one from elsewhere."""
+    task_list = TaskList(title="Export", unique_link_code="EXP01", teacher_id=test_teacher.id)
+    tasks = [
+        Parsons(
+            created_by_teacher_id=test_teacher.id,
+            title=f"Task {i}",
+            description="{}",
+            task_type="normal",
+            code_blocks={},
+            correct_solution={},
+        )
+        for i in range(2)
+    ]
+    db_session.add_all([task_list, *tasks])
+    await db_session.flush()
+    student = StudentSession(session_id=uuid.uuid4(), task_list_id=task_list.id, username="ana")
+    outsider = StudentSession(session_id=uuid.uuid4(), task_list_id=None, username="other")
+    db_session.add_all([student, outsider])
+    await db_session.flush()
+    for day in range(5):
+        db_session.add(
+            TaskAttempt(
+                student_session_id=student.id,
+                task_id=tasks[day % 2].id,
+                task_started_at=T0 + timedelta(days=day),
+                completed_at=T0 + timedelta(days=day, seconds=30),
+                success=day % 2 == 0,
+                submitted_inputs={"code": f"print({day})"},
+            )
+        )
+    db_session.add(
+        TaskAttempt(
+            student_session_id=outsider.id,
+            task_id=tasks[0].id,
+            completed_at=T0,
+            success=True,
+        )
+    )
+    await db_session.commit()
+    return task_list, tasks
+
+
+async def collect(db, stmt, export_format) -> bytes:
+    return b"".join([chunk async for chunk in stream_attempts(db, stmt, export_format)])
+
+
+class TestExportQuery:
+    """Tests for filters."""
+
+    async def test_only_attempts_of_the_list(self, db_session, context):
+        task_list, _ = context
+
+        body = await collect(db_session, export_query(task_list.id), "ndjson")
+
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        assert len(rows) == 5
+        assert {row["username"] for row in rows} == {"ana"}
+        assert rows[0]["submitted_inputs"] == {"code": "print(0)"}
+
+    async def test_date_range_and_task_filters(self, db_session, context):
+        task_list, tasks = context
+        stmt = export_query(
+            task_list.id,
+            start=T0 + timedelta(days=1),
+            end=T0 + timedelta(days=4),
+            task_ids=[tasks[0].id],
+        )
+
+        body = await collect(db_session, stmt, "ndjson")
+
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        assert [row["task_id"] for row in rows] == [tasks[0].id]
+        assert rows[0]["completed_at"].startswith("2025-03-03")
+
+
+class TestFormats:
+    """Tests for the encoders."""
+
+    async def test_csv_streams_in_batches(self, db_session, context, monkeypatch):
+        task_list, _ = context
+        monkeypatch.setattr(attempt_export, "EXPORT_BATCH_ROWS", 2)
+
+        chunks = [
+            chunk
+            async for chunk in stream_attempts(db_session, export_query(task_list.id), "csv")
+        ]
+
+        assert len(chunks) == 3
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+        assert rows[0] == list(COLUMNS)
+        assert len(rows) == 6
+        assert json.loads(rows[1][COLUMNS.index("submitted_inputs")]) == {"code": "print(0)"}
+
+    async def test_csv_without_rows_has_header(self, db_session, context):
+        body = await collect(db_session, export_query(9999), "csv")
+
+        assert body.decode().strip() == ",".join(COLUMNS)
+
+    async def test_parquet_round_trip(self, db_session, context):
+        pq = pytest.importorskip("pyarrow.parquet")
+        task_list, _ = context
+
+        body = await collect(db_session, export_query(task_list.id), "parquet")
+
+        table = pq.read_table(io.BytesIO(body))
+        assert table.num_rows == 5
+        assert table.column_names == list(COLUMNS)
+        assert table.column("username").to_pylist() == ["ana"] * 5
+
+
+class TestExportEndpoint:
+    """Tests for GET /api/tasklists/{id}/attempts/export."""
+
+    async def test_requires_auth(self, client, context):
+        task_list, _ = context
+
+        response = await client.get(f"/api/tasklists/{task_list.id}/attempts/export")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_ndjson_download(self, client, test_teacher, context):
+        task_list, tasks = context
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        response = await client.get(
+            f"/api/tasklists/{task_list.id}/attempts/export",
+            params={"format": "ndjson", "task_id": [tasks[1].id]},
+        )
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert "attachment" in response.headers["content-disposition"]
+        assert len(response.text.splitlines()) == 2
+
+    async def test_unknown_format(self, client, test_teacher, context):
+        task_list, _ = context
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        response = await client.get(
+            f"/api/tasklists/{task_list.id}/attempts/export", params={"format": "xlsx"}
+        )
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    async def test_parquet_without_pyarrow(self, client, test_teacher, context, monkeypatch):
+        task_list, _ = context
+        monkeypatch.setattr("backend.main.parquet_available", lambda: False)
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        response = await client.get(
+            f"/api/tasklists/{task_list.id}/attempts/export", params={"format": "parquet"}
+        )
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_501_NOT_IMPLEMENTED
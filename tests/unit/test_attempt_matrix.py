@@ -0,0 +1,158 @@
+"""
+Unit tests for attempt_matrix.py - students x tasks heatmap.
+"""
+
+import uuid
+
+import numpy as np
+import pytest_asyncio
+from fastapi import status
+
+from backend.analytics import analytics_cache
+from backend.attempt_matrix import ATTEMPTED, SOLVED, UNTOUCHED, pivot_cells, tasklist_matrix
+from backend.auth import create_access_token
+from backend.live_feed import live_feed
+from backend.models import Parsons, StudentSession, TaskAttempt, TaskList, TaskListItem
+
+
+@pytest_asyncio.fixture
+async def dataset(db_session, test_teacher):
+    """Three tasks in one list; sessions A, B and idle D from the list, C from elsewhere."""
+    tasks = [
+        Parsons(
+            created_by_teacher_id=test_teacher.id,
+            title=title,
+            description="{}",
+            task_type="normal",
+            code_blocks={},
+            correct_solution={},
+        )
+        for title in ("First", "Second", "Third")
+    ]
+    task_list = TaskList(title="Grid", unique_link_code="GRID01", teacher_id=test_teacher.id)
+    db_session.add_all([*tasks, task_list])
+    await db_session.flush()
+    # Listed out of id order: columns follow the list
+    db_session.add_all(
+        [TaskListItem(task_list_id=task_list.id, task_id=task.id) for task in reversed(tasks)]
+    )
+    sessions = {
+        name: StudentSession(session_id=uuid.uuid4(), task_list_id=list_id, username=name)
+        for name, list_id in (("A", task_list.id), ("B", task_list.id), ("C", None), ("D", task_list.id))
+    }
+    db_session.add_all(sessions.values())
+    await db_session.flush()
+
+    first, second, _ = tasks
+    db_session.add_all(
+        [
+            TaskAttempt(student_session_id=sessions["A"].id, task_id=first.id, success=False),
+            TaskAttempt(student_session_id=sessions["A"].id, task_id=first.id, success=True),
+            TaskAttempt(student_session_id=sessions["A"].id, task_id=second.id, success=False),
+            TaskAttempt(student_session_id=sessions["B"].id, task_id=second.id, success=None),
+            TaskAttempt(student_session_id=sessions["C"].id, task_id=first.id, success=True),
+        ]
+    )
+    await db_session.commit()
+    return tasks, task_list, sessions
+
+
+class TestPivotCells:
+    """Tests for the vectorized scatter."""
+
+    def test_scatters_into_display_order_and_drops_unknown(self):
+        grid = pivot_cells(
+            np.array([10, 20]),
+            np.array([7, 3, 5]),
+            np.array([10, 20, 20, 30]),
+            np.array([3, 5, -1, 3]),
+            np.array([4, 2, 9, 9]),
+        )
+
+        assert grid.tolist() == [[0, 4, 0], [0, 0, 2]]
+
+    def test_empty(self):
+        empty = np.array([], dtype=np.int64)
+
+        assert pivot_cells(np.array([1]), empty, empty, empty, empty).shape == (1, 0)
+
+
+class TestTaskListMatrix:
+    """Tests for the matrix query."""
+
+    async def test_grid(self, db_session, dataset):
+        _, task_list, _ = dataset
+
+        matrix = await tasklist_matrix(db_session, task_list.id)
+
+        assert [row["username"] for row in matrix["rows"]] == ["A", "B", "D"]
+        assert [column["title"] for column in matrix["columns"]] == ["Third", "Second", "First"]
+        assert matrix["attempts"] == [[0, 1, 2], [0, 1, 0], [0, 0, 0]]
+        assert matrix["state"] == [
+            [UNTOUCHED, ATTEMPTED, SOLVED],
+            [UNTOUCHED, ATTEMPTED, UNTOUCHED],
+            [UNTOUCHED, UNTOUCHED, UNTOUCHED],
+        ]
+
+    async def test_cached_until_next_submission(self, db_session, dataset):
+        tasks, task_list, sessions = dataset
+        first = await analytics_cache.matrix(db_session, task_list.id)
+
+        assert await analytics_cache.matrix(db_session, task_list.id) is first
+
+        db_session.add(TaskAttempt(student_session_id=sessions["D"].id, task_id=tasks[2].id, success=True))
+        await db_session.commit()
+        updated = await analytics_cache.matrix(db_session, task_list.id)
+
+        assert updated is not first
+        assert updated["state"][2] == [SOLVED, UNTOUCHED, UNTOUCHED]
+
+    async def test_new_session_adds_row(self, db_session, dataset):
+        _, task_list, _ = dataset
+        await analytics_cache.matrix(db_session, task_list.id)
+
+        db_session.add(StudentSession(session_id=uuid.uuid4(), task_list_id=task_list.id, username="E"))
+        await db_session.commit()
+
+        matrix = await analytics_cache.matrix(db_session, task_list.id)
+        assert len(matrix["rows"]) == 4
+
+    async def test_changes_in_other_workers_drop_the_matrix(self, db_session, dataset):
+        tasks, task_list, _ = dataset
+        key = ("matrix", task_list.id)
+
+        await analytics_cache.matrix(db_session, task_list.id)
+        live_feed.receive({"kind": "analytics", "origin": "other", "scopes": [["task", tasks[2].id]]})
+        assert key not in analytics_cache._entries
+
+        await analytics_cache.matrix(db_session, task_list.id)
+        live_feed.receive({"kind": "analytics", "origin": "other", "scopes": [["tasklist", task_list.id]]})
+        assert key not in analytics_cache._entries
+
+
+class TestMatrixEndpoint:
+    """Tests for GET /api/analytics/tasklists/{id}/matrix."""
+
+    async def test_owner_only(self, client, db_session, test_teacher, dataset):
+        _, task_list, _ = dataset
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        response = await client.get(f"/api/analytics/tasklists/{task_list.id}/matrix")
+
+        task_list.teacher_id = test_teacher.id + 1
+        await db_session.commit()
+        other = await client.get(f"/api/analytics/tasklists/{task_list.id}/matrix")
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        payload = response.json()
+        assert payload["states"] == {"0": "untouched", "1": "attempted", "2": "solved"}
+        assert payload["attempts"][0] == [0, 1, 2]
+        assert other.status_code == status.HTTP_404_NOT_FOUND
+
+    async def test_requires_auth(self, client, dataset):
+        _, task_list, _ = dataset
+
+        response = await client.get(f"/api/analytics/tasklists/{task_list.id}/matrix")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
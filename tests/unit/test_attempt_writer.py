@@ -0,0 +1,208 @@
+"""
+Unit tests for attempt_writer.py - write-behind buffer for task attempts.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.attempt_writer import (
+    AttemptQueueFullError,
+    AttemptWriteBuffer,
+    attempt_writer,
+)
+from backend.models import Parsons, StudentSession, TaskAttempt, TaskList
+
+
+@pytest_asyncio.fixture
+async def session_factory(db_engine):
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest_asyncio.fixture
+async def attempt_context(db_session, test_teacher):
+    """Create a task and a student session to attach attempts to."""
+    task_list = TaskList(title="WB", unique_link_code="WB01", teacher_id=test_teacher.id)
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="WB Task",
+        description='{"description": "WB"}',
+        task_type="normal",
+        code_blocks={"blocks": []},
+        correct_solution={"correct_order": []},
+    )
+    db_session.add_all([task_list, task])
+    await db_session.commit()
+    session_id = uuid.uuid4()
+    student_session = StudentSession(
+        session_id=session_id, task_list_id=task_list.id, username="wb"
+    )
+    db_session.add(student_session)
+    await db_session.commit()
+    return task, student_session, session_id
+
+
+def make_row(task_id: int, student_session_id: int, success: bool = True) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "student_session_id": student_session_id,
+        "task_id": task_id,
+        "task_started_at": now,
+        "completed_at": now,
+        "success": success,
+        "submitted_inputs": {"code": "pass"},
+    }
+
+
+async def count_attempts(db_session) -> int:
+    result = await db_session.execute(select(func.count()).select_from(TaskAttempt))
+    return result.scalar_one()
+
+
+class TestAttemptWriteBuffer:
+    """Tests for batching, draining and backpressure."""
+
+    async def test_flushes_when_batch_size_reached(
+        self, db_session, session_factory, attempt_context
+    ):
+        task, student_session, _ = attempt_context
+        buffer = AttemptWriteBuffer(flush_interval_ms=10_000, flush_max_rows=5)
+        buffer.start(session_factory)
+
+        for _ in range(5):
+            await buffer.submit(make_row(task.id, student_session.id))
+        for _ in range(50):
+            if buffer.flushed_rows == 5:
+                break
+            await asyncio.sleep(0.01)
+
+        assert buffer.flushes == 1
+        assert await count_attempts(db_session) == 5
+        await buffer.stop()
+
+    async def test_stop_drains_queue(self, db_session, session_factory, attempt_context):
+        task, student_session, _ = attempt_context
+        buffer = AttemptWriteBuffer(flush_interval_ms=10_000, flush_max_rows=1000)
+        buffer.start(session_factory)
+
+        for _ in range(12):
+            await buffer.submit(make_row(task.id, student_session.id))
+        await buffer.stop()
+
+        assert not buffer.running
+        assert buffer.flushed_rows == 12
+        assert await count_attempts(db_session) == 12
+
+    async def test_allocated_ids_are_used_for_the_rows(
+        self, db_session, session_factory, attempt_context
+    ):
+        task, student_session, _ = attempt_context
+        buffer = AttemptWriteBuffer(flush_interval_ms=10_000)
+        buffer.start(session_factory)
+
+        # Both ids are handed out before either row is written
+        ids = [await buffer.allocate_id(db_session) for _ in range(2)]
+        for attempt_id in ids:
+            await buffer.submit({**make_row(task.id, student_session.id), "id": attempt_id})
+        await buffer.stop()
+
+        stored = await db_session.execute(select(TaskAttempt.id).order_by(TaskAttempt.id))
+        assert stored.scalars().all() == ids == [ids[0], ids[0] + 1]
+
+    async def test_postgres_allocates_from_the_sequence(self):
+        buffer = AttemptWriteBuffer()
+        db = MagicMock()
+        db.bind.dialect.name = "postgresql"
+        db.execute = AsyncMock(return_value=MagicMock(**{"scalar_one.return_value": 42}))
+
+        assert await buffer.allocate_id(db) == 42
+        sql = str(db.execute.await_args.args[0])
+        assert sql == "SELECT nextval(pg_get_serial_sequence('task_attempts', 'id'))"
+
+    async def test_submit_raises_when_queue_full(self, session_factory):
+        buffer = AttemptWriteBuffer(max_size=1, enqueue_timeout_ms=10)
+        buffer._queue = asyncio.Queue(maxsize=1)
+        await buffer.submit({"x": 1})
+
+        with pytest.raises(AttemptQueueFullError):
+            await buffer.submit({"x": 2})
+
+        assert buffer.stats()["rejected"] == 1
+        assert buffer.stats()["queue_depth"] == 1
+
+    async def test_stats_report_flush_latency(
+        self, session_factory, attempt_context
+    ):
+        task, student_session, _ = attempt_context
+        buffer = AttemptWriteBuffer()
+        buffer.start(session_factory)
+        await buffer.submit(make_row(task.id, student_session.id))
+        await buffer.stop()
+
+        stats = buffer.stats()
+        assert stats["flushes"] == 1
+        assert stats["last_flush_ms"] > 0
+        assert stats["max_flush_ms"] >= stats["avg_flush_ms"] > 0
+
+
+class TestSubmitWithWriteBehind:
+    """Tests for submit_test_result when the buffer is running."""
+
+    async def test_submit_result_is_queued(
+        self, client, db_session, session_factory, attempt_context
+    ):
+        task, student_session, session_id = attempt_context
+        attempt_writer.start(session_factory)
+        try:
+            client.cookies.set("student_session", str(session_id))
+            response = await client.post(
+                f"/api/tasks/{task.id}/submit-result",
+                json={
+                    "task_id": task.id,
+                    "success": True,
+                    "submitted_code": "pass",
+                    "test_output": "ok",
+                    "repr_code": "pass",
+                },
+            )
+            client.cookies.clear()
+            assert response.status_code == status.HTTP_202_ACCEPTED
+        finally:
+            await attempt_writer.stop()
+
+        stored = await db_session.execute(select(TaskAttempt.id))
+        assert stored.scalars().all() == [response.json()["attempt_id"]]
+
+    async def test_submit_result_returns_503_when_full(
+        self, client, attempt_context, monkeypatch
+    ):
+        task, _, session_id = attempt_context
+
+        async def reject(_row, _moves=()):
+            raise AttemptQueueFullError("full")
+
+        monkeypatch.setattr(type(attempt_writer), "running", property(lambda self: True))
+        monkeypatch.setattr(attempt_writer, "submit", reject)
+
+        client.cookies.set("student_session", str(session_id))
+        response = await client.post(
+            f"/api/tasks/{task.id}/submit-result",
+            json={
+                "task_id": task.id,
+                "success": False,
+                "submitted_code": "pass",
+                "test_output": "fail",
+                "repr_code": "pass",
+            },
+        )
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["retry-after"] == "1"
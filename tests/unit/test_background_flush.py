@@ -0,0 +1,118 @@
+"""
+Unit tests for background_flush.py - shared batch writer and periodic flusher.
+"""
+
+import asyncio
+
+from backend.background_flush import BatchWriter, PeriodicFlusher
+
+
+class FakeSession:
+    def __init__(self, fail: bool):
+        self.fail = fail
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def commit(self):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+
+
+class RecordingWriter(BatchWriter):
+    label = "Test"
+    retries = 2
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.written: list[list] = []
+
+    async def _write(self, session, rows):
+        self.written.append(list(rows))
+
+
+class CountingFlusher(PeriodicFlusher):
+    label = "Test"
+
+    def __init__(self, flush_interval: float, fail: bool = False):
+        super().__init__(flush_interval)
+        self.fail = fail
+        self.calls = 0
+
+    async def flush(self, session_factory=None) -> int:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        return 0
+
+
+class TestBatchWriter:
+    """Tests for BatchWriter."""
+
+    async def test_collects_batches_into_chunks(self):
+        writer = RecordingWriter(flush_interval=10, flush_max_rows=3)
+        writer.start(lambda: FakeSession(fail=False))
+
+        writer._put_nowait([1, 2])
+        writer._put_nowait([3, 4])
+        await writer.stop()
+
+        assert writer.written == [[1, 2, 3], [4]]
+        stats = writer.flush_stats()
+        assert (stats["flushes"], stats["flushed_rows"], stats["failed_rows"]) == (2, 4, 0)
+        assert writer._queued_rows == 0
+
+    async def test_counts_rows_dropped_after_retries(self, capsys):
+        writer = RecordingWriter(flush_interval=10, flush_max_rows=10)
+        writer.start(lambda: FakeSession(fail=True))
+
+        writer._put_nowait([1, 2, 3])
+        await writer.stop()
+
+        assert len(writer.written) == 2
+        assert writer.flush_stats()["failed_rows"] == 3
+        assert writer.flush_stats()["flushes"] == 0
+        assert "Test flush gave up, dropping 3 rows" in capsys.readouterr().out
+
+
+class TestPeriodicFlusher:
+    """Tests for PeriodicFlusher."""
+
+    async def test_flushes_periodically_and_on_stop(self):
+        flusher = CountingFlusher(flush_interval=0.01)
+        flusher.start()
+        await asyncio.sleep(0.05)
+        await flusher.stop()
+
+        assert flusher.calls >= 2
+        assert flusher._task is None
+
+    async def test_disabled_interval_only_flushes_on_stop(self):
+        flusher = CountingFlusher(flush_interval=0)
+        flusher.start()
+
+        assert flusher._task is None
+        await flusher.stop()
+        assert flusher.calls == 1
+
+    async def test_stop_without_final_flush(self):
+        flusher = CountingFlusher(flush_interval=60)
+        flusher.flush_on_stop = False
+        flusher.start()
+        await flusher.stop()
+
+        assert flusher.calls == 0
+
+    async def test_failures_are_logged_and_do_not_stop_the_loop(self, capsys):
+        flusher = CountingFlusher(flush_interval=0.01, fail=True)
+        flusher.start()
+        await asyncio.sleep(0.05)
+        await flusher.stop()
+
+        output = capsys.readouterr().out
+        assert "Test flush failed: database unavailable" in output
+        assert "Test flush failed on shutdown: database unavailable" in output
+        assert flusher.calls >= 3
@@ -0,0 +1,153 @@
+"""
+Unit tests for block_structure.py - structural fast-path verdicts.
+"""
+
+import uuid
+
+import pytest_asyncio
+from fastapi import status
+
+from backend import migrate_tasks
+from backend.block_structure import EXECUTE, WRONG, StructureChecker, structure_checker
+from backend.models import Parsons, StudentSession
+
+BLOCKS = {
+    "blocks": [
+        {"id": "block_1", "code": "def total_to(n):", "indent": 0},
+        {"id": "block_2", "code": "total = 0", "indent": 1},
+        {"id": "block_3", "code": "for i in range(n):", "indent": 1},
+        {"id": "block_4", "code": "total += i", "indent": 2},
+        {"id": "block_5", "code": "return total", "indent": 1},
+    ],
+    "function_header": 'def total_to(n):\n    """\n    >>> total_to(4)\n    6\n    """',
+}
+ORDER = {"correct_order": ["block_1", "block_2", "block_3", "block_4", "block_5"]}
+SOLUTION = "def total_to(n):\n    total = 0\n    for i in range(n):\n        total += i\n    return total\n"
+
+
+def check(submitted_code: str, code_blocks: dict = BLOCKS, correct_solution: dict = ORDER):
+    return StructureChecker().check(code_blocks, correct_solution, submitted_code)
+
+
+class TestStructuralVerdict:
+    """Tests for the comparison policy."""
+
+    def test_exact_solution_is_executed(self):
+        verdict = check(SOLUTION)
+
+        assert (verdict.outcome, verdict.final) == (EXECUTE, False)
+
+    def test_foreign_line_is_wrong(self):
+        verdict = check(SOLUTION.replace("total = 0", "total = 1"))
+
+        assert (verdict.outcome, verdict.block) == (WRONG, 2)
+        assert verdict.result()["header"] == "Wrong at block 2"
+        assert verdict.result()["status"] == "fail"
+
+    def test_missing_and_repeated_blocks_are_wrong(self):
+        missing = check("def total_to(n):\n    total = 0\n    return total\n")
+        repeated = check(SOLUTION + "    return total\n")
+
+        assert (missing.outcome, missing.block) == (WRONG, 3)
+        assert (repeated.outcome, repeated.block) == (WRONG, 6)
+
+    def test_other_order_or_indent_is_executed(self):
+        swapped = check(
+            "def total_to(n):\n    for i in range(n):\n        total += i\n    total = 0\n    return total\n"
+        )
+        dedented = check(SOLUTION.replace("        total += i", "    total += i"))
+
+        assert swapped.outcome == dedented.outcome == EXECUTE
+
+    def test_alternative_order_is_not_ruled_out(self):
+        blocks = {"blocks": [*BLOCKS["blocks"], {"id": "block_6", "code": "count = 0", "indent": 1}]}
+        solution = {
+            "correct_order": ["block_1", "block_2", "block_6", "block_3", "block_4", "block_5"],
+            "alternative_orders": [["block_1", "block_6", "block_2", "block_3", "block_4", "block_5"]],
+        }
+        code = SOLUTION.replace("    total = 0\n", "    count = 0\n    total = 0\n")
+        assert check(code, blocks, solution).outcome == EXECUTE
+
+    def test_blanks_are_executed_unless_empty(self):
+        blocks = {
+            "blocks": [
+                {"id": "block_1", "code": "def total_to(n):", "indent": 0},
+                {"id": "block_2", "code": "return ___", "indent": 1},
+                {"id": "block_3", "code": "___ = ___", "indent": 1},
+            ]
+        }
+        solution = {"correct_order": ["block_1", "block_3", "block_2"]}
+
+        filled = check("def total_to(n):\n    total = n\n    return total\n", blocks, solution)
+        empty = check("def total_to(n):\n    total = \n    return total\n", blocks, solution)
+
+        assert filled.outcome == EXECUTE
+        assert (empty.outcome, empty.block) == (WRONG, 2)
+
+    def test_flush_left_task_files_only_rule_out(self, tmp_path, monkeypatch):
+        (tmp_path / "total_to.yaml").write_text(
+            "code_lines: |\n  def total_to(n): #0given\n  total = 0\n  return total\n"
+        )
+        (tmp_path / "total_to.py").write_text(BLOCKS["function_header"])
+        monkeypatch.setattr(migrate_tasks, "PARSONS_PROBS_DIR", tmp_path)
+        task = migrate_tasks.load_task_file("total_to")
+        blocks, solution = task["code_blocks"], task["correct_solution"]
+
+        solved = check("def total_to(n):\n    total = 0\n    return total\n", blocks, solution)
+        missing = check("def total_to(n):\n    return total\n", blocks, solution)
+
+        assert solved.outcome == EXECUTE
+        assert missing.outcome == WRONG
+
+    def test_shipped_tasks_never_take_the_pass_path(self):
+        """Assembled solutions of the tasks in parsons_probs always run the doctests."""
+        names = migrate_tasks.get_task_files()
+        assert names
+        for name in names:
+            task = migrate_tasks.load_task_file(name)
+            blocks, solution = task["code_blocks"], task["correct_solution"]
+            by_id = {block["id"]: block for block in blocks["blocks"]}
+            assembled = "\n".join(
+                by_id[block_id]["code"].replace("___", "1") for block_id in solution["correct_order"]
+            )
+
+            verdict = check(assembled, blocks, solution)
+
+            assert verdict.outcome == EXECUTE, name
+
+    def test_disabled_or_without_blocks(self):
+        assert StructureChecker(enabled=False).check(BLOCKS, ORDER, SOLUTION).outcome == EXECUTE
+        assert check(SOLUTION, {"blocks": []}, {}).outcome == EXECUTE
+
+
+@pytest_asyncio.fixture
+async def block_task(db_session, test_teacher):
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="total_to",
+        description="{}",
+        task_type="normal",
+        code_blocks=BLOCKS,
+        correct_solution=ORDER,
+    )
+    student = StudentSession(session_id=uuid.uuid4(), username="blocks")
+    db_session.add_all([task, student])
+    await db_session.commit()
+    return task, student
+
+
+class TestGradeEndpointFastPath:
+    """POST /api/tasks/{id}/grade answers structural verdicts without the pool."""
+
+    async def test_wrong_blocks_without_execution(self, client, block_task):
+        task, student = block_task
+        client.cookies.set("student_session", str(student.session_id))
+
+        wrong = await client.post(
+            f"/api/tasks/{task.id}/grade", json={"code": "def total_to(n):\n    return total\n"}
+        )
+        client.cookies.clear()
+
+        assert wrong.status_code == status.HTTP_200_OK
+        assert (wrong.json()["status"], wrong.json()["header"]) == ("fail", "Wrong at block 2")
+        assert structure_checker.stats()["skipped_execution_rate"] == 1.0
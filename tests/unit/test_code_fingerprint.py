@@ -0,0 +1,203 @@
+"""
+Unit tests for code_fingerprint.py - normalized-code fingerprints and answer clusters.
+"""
+
+import uuid
+
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy import select
+
+from backend.auth import create_access_token
+from backend.code_fingerprint import (
+    backfill_code_fingerprints,
+    code_fingerprint,
+    normalize_code,
+)
+from backend.models import Parsons, StudentSession, TaskAttempt, TaskList, Teacher
+
+SUM_LOOP = "def total(xs):\n    s = 0\n    for x in xs:\n        s += x\n    return s\n"
+
+
+class TestNormalizeCode:
+    """Tests for normalization."""
+
+    def test_layout_comments_and_names_do_not_matter(self):
+        variant = (
+            "def  add_all( values ):  # sum them\n"
+            "    acc=0\n"
+            "    for v in values :\n"
+            "        acc+=v\n"
+            "\n"
+            "    return acc\n"
+        )
+
+        assert code_fingerprint(variant) == code_fingerprint(SUM_LOOP)
+
+    def test_structure_and_literals_matter(self):
+        off_by_one = SUM_LOOP.replace("s = 0", "s = 1")
+        wrong_order = "def total(xs):\n    s = 0\n    for x in xs:\n        return s\n        s += x\n"
+
+        assert code_fingerprint(off_by_one) != code_fingerprint(SUM_LOOP)
+        assert code_fingerprint(wrong_order) != code_fingerprint(SUM_LOOP)
+
+    def test_builtins_and_attributes_are_kept(self):
+        normalized = normalize_code("items = []\nitems.append(len(items))\nprint(sorted(items))")
+
+        assert normalized == "v0 = []\nv0.append(len(v0))\nprint(sorted(v0))"
+
+    def test_indented_code_is_dedented(self):
+        assert code_fingerprint("    x = 1\n    y = x") == code_fingerprint("a = 1\nb = a")
+
+    def test_unparsable_code_keeps_indentation(self):
+        broken = "def f(x):\nreturn x"
+
+        assert normalize_code(broken) == "raw:def f(x):\nreturn x"
+        assert code_fingerprint("def f(x):\n  return   x\n") != code_fingerprint(broken)
+        assert code_fingerprint("def  f(x):\nreturn x  ") == code_fingerprint(broken)
+
+    def test_no_code(self):
+        assert code_fingerprint(None) is None
+        assert len(code_fingerprint("")) == 32
+
+
+@pytest_asyncio.fixture
+async def task_with_sessions(db_session, test_teacher):
+    task_list = TaskList(title="Clusters", unique_link_code="CLU01", teacher_id=test_teacher.id)
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="Sum",
+        description="{}",
+        task_type="normal",
+        code_blocks={},
+        correct_solution={},
+    )
+    db_session.add_all([task_list, task])
+    await db_session.flush()
+    sessions = [
+        StudentSession(session_id=uuid.uuid4(), task_list_id=task_list.id, username=f"s{i}")
+        for i in range(3)
+    ]
+    db_session.add_all(sessions)
+    await db_session.commit()
+    return task, sessions
+
+
+class TestBackfill:
+    """Tests for backfill_code_fingerprints."""
+
+    async def test_fills_missing_fingerprints(self, db_engine, db_session, task_with_sessions):
+        task, sessions = task_with_sessions
+        db_session.add_all(
+            [
+                TaskAttempt(
+                    student_session_id=sessions[0].id,
+                    task_id=task.id,
+                    success=True,
+                    submitted_inputs={"code": SUM_LOOP},
+                ),
+                TaskAttempt(student_session_id=sessions[0].id, task_id=task.id, success=False),
+            ]
+        )
+        await db_session.commit()
+
+        assert await backfill_code_fingerprints(db_engine) == 1
+
+        result = await db_session.execute(
+            select(TaskAttempt.code_fingerprint).order_by(TaskAttempt.id)
+        )
+        assert result.scalars().all() == [code_fingerprint(SUM_LOOP), None]
+
+    async def test_commits_in_batches(self, db_engine, db_session, task_with_sessions):
+        task, sessions = task_with_sessions
+        db_session.add_all(
+            [
+                TaskAttempt(
+                    student_session_id=session.id,
+                    task_id=task.id,
+                    success=True,
+                    submitted_inputs={"code": SUM_LOOP},
+                )
+                for session in sessions[:3]
+            ]
+        )
+        await db_session.commit()
+
+        assert await backfill_code_fingerprints(db_engine, batch_rows=2) == 3
+        assert await backfill_code_fingerprints(db_engine, batch_rows=2) == 0
+
+
+class TestClustersEndpoint:
+    """Tests for submissions and GET /api/analytics/tasks/{id}/clusters."""
+
+    async def submit(self, client, session, task, code, success):
+        client.cookies.set("student_session", str(session.session_id))
+        response = await client.post(
+            f"/api/tasks/{task.id}/submit-result",
+            json={
+                "task_id": task.id,
+                "success": success,
+                "submitted_code": code,
+                "test_output": "",
+                "repr_code": code,
+            },
+        )
+        client.cookies.clear()
+        assert response.status_code == status.HTTP_200_OK
+
+    async def test_clusters(self, client, db_session, test_teacher, task_with_sessions):
+        task, sessions = task_with_sessions
+        wrong = SUM_LOOP.replace("s = 0", "s = 1")
+        await self.submit(client, sessions[0], task, wrong, False)
+        await self.submit(client, sessions[1], task, wrong.replace("xs", "items"), False)
+        await self.submit(client, sessions[1], task, "def total(xs):\nreturn 0", False)
+        await self.submit(client, sessions[2], task, SUM_LOOP, True)
+
+        stored = await db_session.execute(select(TaskAttempt.code_fingerprint))
+        assert None not in stored.scalars().all()
+
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+        response = await client.get(f"/api/analytics/tasks/{task.id}/clusters")
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert [(c["attempts"], c["sessions"]) for c in data["failing"]] == [(2, 2), (1, 1)]
+        assert data["failing"][0]["fingerprint"] == code_fingerprint(wrong)
+        assert data["failing"][0]["example_code"] == wrong
+        assert [c["example_code"] for c in data["passing"]] == [SUM_LOOP]
+
+    async def test_only_the_callers_task_lists(self, client, db_session, test_teacher, task_with_sessions):
+        task, sessions = task_with_sessions
+        other = Teacher(username="other", email="other@example.com")
+        other.set_password("otherpassword123")
+        db_session.add(other)
+        await db_session.flush()
+        other_list = TaskList(title="Other", unique_link_code="CLU02", teacher_id=other.id)
+        db_session.add(other_list)
+        await db_session.flush()
+        outsider = StudentSession(session_id=uuid.uuid4(), task_list_id=other_list.id, username="o")
+        db_session.add(outsider)
+        await db_session.commit()
+        await self.submit(client, sessions[0], task, SUM_LOOP, True)
+        await self.submit(client, outsider, task, "secret = 1", False)
+
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+        own = (await client.get(f"/api/analytics/tasks/{task.id}/clusters")).json()
+        client.cookies.set("access_token", create_access_token({"sub": other.username}))
+        theirs = (await client.get(f"/api/analytics/tasks/{task.id}/clusters")).json()
+        client.cookies.clear()
+
+        assert (own["failing"], [c["example_code"] for c in own["passing"]]) == ([], [SUM_LOOP])
+        assert ([c["example_code"] for c in theirs["failing"]], theirs["passing"]) == (["secret = 1"], [])
+
+    async def test_limit_and_missing_task(self, client, test_teacher, task_with_sessions):
+        task, _ = task_with_sessions
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        empty = await client.get(f"/api/analytics/tasks/{task.id}/clusters", params={"limit": 1})
+        missing = await client.get("/api/analytics/tasks/9999/clusters")
+        client.cookies.clear()
+
+        assert empty.json() == {"task_id": task.id, "failing": [], "passing": []}
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
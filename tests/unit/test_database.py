@@ -307,3 +307,146 @@ class TestDatabaseIntegration:
                 await gen.__anext__()
             except StopAsyncIteration:
                 pass
+
+
+class TestEngineFactory:
+    """Tests for the environment-driven engine factory."""
+
+    def test_postgres_options_include_pool_settings(self):
+        """Pool sizing and the asyncpg statement cache come from the DB_* settings."""
+        import backend.database as db_module
+
+        with patch.multiple(
+            db_module,
+            DB_POOL_SIZE=7,
+            DB_MAX_OVERFLOW=3,
+            DB_POOL_TIMEOUT=2.5,
+            DB_POOL_RECYCLE=600,
+            DB_POOL_PRE_PING=False,
+            DB_STATEMENT_CACHE_SIZE=0,
+            DB_ECHO=False,
+        ):
+            options = db_module.engine_options("postgresql+asyncpg://u:p@host:5432/db")
+
+        assert options["pool_size"] == 7
+        assert options["max_overflow"] == 3
+        assert options["pool_timeout"] == 2.5
+        assert options["pool_recycle"] == 600
+        assert options["pool_pre_ping"] is False
+        assert options["echo"] is False
+        assert options["connect_args"] == {"statement_cache_size": 0}
+
+    def test_sqlite_options_skip_pool_sizing(self):
+        """SQLite engines get no queue-pool or asyncpg arguments."""
+        from backend.database import engine_options
+
+        options = engine_options("sqlite+aiosqlite:///./replica.db")
+
+        assert "pool_size" not in options
+        assert "connect_args" not in options
+
+    def test_create_engine_from_env_applies_pool_size(self):
+        """The created engine's pool reflects the configured size."""
+        import backend.database as db_module
+
+        with patch.object(db_module, "DB_POOL_SIZE", 9):
+            test_engine = db_module.create_engine_from_env(
+                "postgresql+asyncpg://u:p@host:5432/db"
+            )
+
+        assert test_engine.pool.size() == 9
+
+    def test_read_engine_defaults_to_primary(self):
+        """Without a replica URL, reads share the primary engine."""
+        import backend.database as db_module
+
+        if db_module.DATABASE_REPLICA_URL is None:
+            assert db_module.read_engine is db_module.engine
+
+
+class TestReadReplicaRouting:
+    """Read-only endpoints are served by the replica session."""
+
+    @pytest_asyncio.fixture
+    async def primary_and_replica(self, tmp_path):
+        """Two SQLite files standing in for a primary and its replica."""
+        from backend.database import create_engine_from_env
+
+        engines = []
+        for name in ("primary", "replica"):
+            file_engine = create_engine_from_env(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+            async with file_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            engines.append(file_engine)
+        yield engines
+        for file_engine in engines:
+            await file_engine.dispose()
+
+    async def test_get_read_db_uses_read_session(self, primary_and_replica):
+        """get_read_db yields sessions from the read session factory."""
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        from backend.database import get_read_db
+
+        _primary, replica = primary_and_replica
+        replica_maker = async_sessionmaker(replica, class_=AsyncSession, expire_on_commit=False)
+
+        with patch("backend.database.async_read_session", replica_maker):
+            gen = get_read_db()
+            session = await gen.__anext__()
+            assert session.bind is replica
+            try:
+                await gen.__anext__()
+            except StopAsyncIteration:
+                pass
+
+    async def test_task_reads_go_to_replica(self, primary_and_replica):
+        """/api/tasks/{id} reads from the replica, not from the primary."""
+        from httpx import AsyncClient, ASGITransport
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        # Take the dependencies from main: another test reloads backend.database
+        from backend.main import app, get_db as app_get_db, get_read_db as app_get_read_db
+        from backend.models import Parsons
+
+        primary, replica = primary_and_replica
+        primary_maker = async_sessionmaker(primary, class_=AsyncSession, expire_on_commit=False)
+        replica_maker = async_sessionmaker(replica, class_=AsyncSession, expire_on_commit=False)
+
+        async with replica_maker() as session:
+            teacher = Teacher(username="replica", email="replica@example.com")
+            teacher.set_password("password123")
+            session.add(teacher)
+            await session.flush()
+            session.add(
+                Parsons(
+                    id=1,
+                    created_by_teacher_id=teacher.id,
+                    title="Replica task",
+                    description="{}",
+                    task_type="parsons",
+                    code_blocks={},
+                    correct_solution={},
+                    is_public=True,
+                )
+            )
+            await session.commit()
+
+        async def primary_db():
+            async with primary_maker() as session:
+                yield session
+
+        async def replica_db():
+            async with replica_maker() as session:
+                yield session
+
+        app.dependency_overrides[app_get_db] = primary_db
+        app.dependency_overrides[app_get_read_db] = replica_db
+        try:
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://test"
+            ) as ac:
+                response = await ac.get("/api/tasks/1")
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert response.json()["title"] == "Replica task"
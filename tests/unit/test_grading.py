@@ -0,0 +1,386 @@
+"""
+Unit tests for grading.py - server-side doctest grading.
+"""
+
+import asyncio
+import threading
+import uuid
+
+import pytest
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy import select
+
+from backend.grading import (
+    GradingPool,
+    GraderOverloaded,
+    InvalidSubmission,
+    grading_pool,
+    prepare_code,
+    run_doctests,
+)
+from backend.grading_cache import grading_cache
+from backend.migrate_tasks import extract_test_cases
+from backend.models import GradingResult, Parsons, StudentSession, TaskAttempt
+
+HEADER = '''def add_in_range(start, stop):
+    """
+    >>> add_in_range(3, 5)
+    12
+    >>> add_in_range(1, 10)
+    55
+    """'''
+
+SOLUTION = """def add_in_range(start, stop):
+    total = 0
+    while start <= stop:
+        total += start
+        start += 1
+    return total"""
+
+WRONG = SOLUTION.replace("start += 1", "start += 2")
+
+
+class TestPrepareCode:
+    """prepare_code mirrors prepareCode in js/doctest-grader.js."""
+
+    def test_splices_body_after_docstring(self):
+        program, start_line = prepare_code(SOLUTION, HEADER + "\n\nprint('after')")
+
+        lines = program.split("\n")
+        assert start_line == 7
+        assert lines[:7] == HEADER.split("\n")
+        assert lines[7] == "    total = 0"
+        assert lines[-1] == "print('after')"
+
+    def test_first_line_must_be_def(self):
+        with pytest.raises(InvalidSubmission, match="First code line"):
+            prepare_code("total = 0", HEADER)
+
+    def test_body_must_be_indented(self):
+        with pytest.raises(InvalidSubmission, match="indented"):
+            prepare_code("def add_in_range(start, stop):\nreturn 1", HEADER)
+
+
+class TestRunDoctests:
+    """Tests for running doctests in-process."""
+
+    def test_pass(self):
+        result = run_doctests(*prepare_code(SOLUTION, HEADER))
+
+        assert result["status"] == "pass"
+        assert result["header"] == "2 of 2 tests passed"
+        assert [example["line"] for example in result["examples"]] == [3, 5]
+
+    def test_failed_examples(self):
+        result = run_doctests(*prepare_code(WRONG, HEADER))
+
+        assert result["status"] == "fail"
+        assert (result["passed"], result["failed"]) == (0, 2)
+        assert result["examples"][0] == {
+            "source": "add_in_range(3, 5)",
+            "expected": "12",
+            "got": "8",
+            "passed": False,
+            "line": 3,
+        }
+        assert "❌ Failed example" in result["details"]
+
+    def test_exception_in_example(self):
+        code = "def add_in_range(start, stop):\n    return missing"
+
+        result = run_doctests(*prepare_code(code, HEADER))
+
+        assert result["failed"] == 2
+        assert "NameError" in result["examples"][0]["got"]
+
+    def test_syntax_error_line_in_submitted_code(self):
+        code = "def add_in_range(start, stop):\n    total = 0\n    while start <=:\n        pass"
+
+        result = run_doctests(*prepare_code(code, HEADER))
+
+        assert result["header"] == "Syntax error"
+        assert result["details"].startswith("Error at line 3:")
+
+
+class TestPrecompiledTestCases:
+    """run_doctests with test cases pre-parsed by migrate_tasks."""
+
+    def test_same_result_as_doctest(self):
+        raising = "def add_in_range(start, stop):\n    print(start)\n    raise ValueError(stop)"
+        for code in (SOLUTION, WRONG, raising):
+            program, start_line = prepare_code(code, HEADER)
+
+            assert run_doctests(program, start_line, extract_test_cases(HEADER)) == run_doctests(program, start_line)
+
+    def test_expected_exception_and_options(self):
+        header = '''def pick(items, index):
+    """
+    >>> pick([1, 2], 5)
+    Traceback (most recent call last):
+    IndexError: list index out of range
+    >>> pick(list(range(30)), slice(None))  # doctest: +ELLIPSIS
+    [0, 1, ..., 29]
+    """'''
+        program, start_line = prepare_code("def pick(items, index):\n    return items[index]", header)
+
+        result = run_doctests(program, start_line, extract_test_cases(header))
+
+        assert result["header"] == "2 of 2 tests passed"
+
+    def test_only_the_last_line_of_an_exception_is_compared(self):
+        # A SyntaxError is formatted with the offending line and a caret above its message
+        header = '''def evaluate(expression):
+    """
+    >>> evaluate("1 +")  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    SyntaxError: ...
+    """'''
+        program, start_line = prepare_code("def evaluate(expression):\n    return eval(expression)", header)
+
+        result = run_doctests(program, start_line, extract_test_cases(header))
+
+        assert result["header"] == "1 of 1 tests passed"
+        assert result["header"] == run_doctests(program, start_line)["header"]
+
+
+class TestGradingPool:
+    """Tests for the sandboxed worker pool."""
+
+    @pytest_asyncio.fixture
+    async def pool(self):
+        pool = GradingPool(workers=2, timeout=1)
+        pool.start()
+        yield pool
+        await pool.stop()
+
+    async def test_grades_on_workers(self, pool):
+        passed, failed = await asyncio.gather(pool.grade(SOLUTION, HEADER), pool.grade(WRONG, HEADER))
+
+        assert passed["status"] == "pass"
+        assert failed["examples"][1]["got"] == "25"
+        assert pool.stats()["completed"] == 2
+
+    async def test_grades_precompiled_test_cases(self, pool):
+        result = await pool.grade(WRONG, HEADER, test_cases=extract_test_cases(HEADER))
+
+        assert result["examples"][1]["got"] == "25"
+
+    async def test_infinite_loop_times_out(self, pool):
+        code = "def add_in_range(start, stop):\n    while True:\n        pass"
+
+        result = await pool.grade(code, HEADER)
+
+        assert result["header"] == "Infinite loop"
+        assert pool.stats()["timeouts"] == 1
+
+    async def test_sandbox_refuses_file_writes_and_sockets(self, pool, tmp_path):
+        target = tmp_path / "written.txt"
+        writes = f"def add_in_range(start, stop):\n    open({str(target)!r}, 'w').write('x')"
+        sockets = "def add_in_range(start, stop):\n    import socket\n    socket.socket()"
+
+        written, connected = await asyncio.gather(pool.grade(writes, HEADER), pool.grade(sockets, HEADER))
+
+        assert "PermissionError" in written["examples"][0]["got"]
+        assert "PermissionError" in connected["examples"][0]["got"]
+        assert not target.exists()
+
+    async def test_sandbox_hides_environment_and_application_files(self, monkeypatch):
+        monkeypatch.setenv("SECRET_KEY", "jwt-signing-key")
+        # A plain fork inherits this process's environment, SECRET_KEY included
+        pool = GradingPool(workers=1, timeout=1, start_method="fork")
+        pool.start()
+        environ = "def add_in_range(start, stop):\n    import os\n    return os.environ.get('SECRET_KEY')"
+        proc = "def add_in_range(start, stop):\n    return open('/proc/self/environ').read()"
+        source = f"def add_in_range(start, stop):\n    return open({__file__!r}).read()"
+        stdlib = "def add_in_range(start, stop):\n    import fractions\n    return fractions.Fraction(1, 2)"
+        try:
+            results = [await pool.grade(code, HEADER) for code in (environ, proc, source, stdlib)]
+        finally:
+            await pool.stop()
+
+        assert results[0]["examples"][0]["got"] == ""
+        assert "jwt-signing-key" not in str(results)
+        assert "PermissionError: Reading files" in results[1]["examples"][0]["got"]
+        assert "PermissionError: Reading files" in results[2]["examples"][0]["got"]
+        assert results[3]["examples"][0]["got"] == "Fraction(1, 2)"
+
+    async def test_state_does_not_leak_between_gradings(self, pool):
+        poison = "def add_in_range(start, stop):\n    import builtins\n    builtins.sum = None\n    return 0"
+        await pool.grade(poison, HEADER)
+
+        code = "def add_in_range(start, stop):\n    return sum(range(start, stop + 1))"
+        results = await asyncio.gather(*(pool.grade(code, HEADER) for _ in range(4)))
+
+        assert {result["status"] for result in results} == {"pass"}
+
+    async def test_dead_worker_is_replaced(self, pool):
+        pool._all[0].process.kill()
+        pool._all[1].process.kill()
+
+        results = await asyncio.gather(pool.grade(SOLUTION, HEADER), pool.grade(SOLUTION, HEADER))
+        again = await pool.grade(SOLUTION, HEADER)
+
+        assert pool.stats()["restarts"] == 2
+        assert all(result["status"] == "fail" for result in results)
+        assert again["status"] == "pass"
+
+    async def test_cancelled_grading_does_not_leak_its_reply(self):
+        pool = GradingPool(workers=1, timeout=2)
+        pool.start()
+        slow = "def add_in_range(start, stop):\n    import time\n    time.sleep(0.3)\n    return 999"
+        try:
+            grading = asyncio.create_task(pool.grade(slow, HEADER))
+            await asyncio.sleep(0.1)
+            grading.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await grading
+            result = await pool.grade(SOLUTION, HEADER)
+        finally:
+            await pool.stop()
+
+        assert result["status"] == "pass"
+        assert pool.stats()["restarts"] == 1
+
+    async def test_replaced_worker_is_reaped_off_the_event_loop(self, pool):
+        worker = pool._all[0]
+        join = worker.process.join
+        joined_on = []
+
+        def recording_join(*args):
+            joined_on.append(threading.current_thread())
+            return join(*args)
+
+        worker.process.join = recording_join
+        pool._replace(worker)
+        await pool.stop()
+
+        assert joined_on and threading.main_thread() not in joined_on
+        assert worker.process.exitcode is not None
+
+    async def test_rejects_when_full(self):
+        pool = GradingPool(workers=1, max_queued=0, timeout=1)
+        pool.start()
+        try:
+            results = await asyncio.gather(
+                pool.grade(SOLUTION, HEADER), pool.grade(SOLUTION, HEADER), return_exceptions=True
+            )
+        finally:
+            await pool.stop()
+
+        assert any(isinstance(result, GraderOverloaded) for result in results)
+        assert pool.stats()["rejected"] == 1
+
+
+@pytest_asyncio.fixture
+async def graded_task(db_session, test_teacher):
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="add_in_range",
+        description="{}",
+        task_type="normal",
+        code_blocks={"blocks": [], "function_header": HEADER},
+        correct_solution={},
+        test_cases=extract_test_cases(HEADER),
+    )
+    student = StudentSession(session_id=uuid.uuid4(), username="grader")
+    db_session.add_all([task, student])
+    await db_session.commit()
+    return task, student
+
+
+class TestGradingEndpoints:
+    """Tests for POST /api/tasks/{id}/grade and server verdicts on submit."""
+
+    @pytest_asyncio.fixture
+    async def running_pool(self):
+        grading_pool.start()
+        yield grading_pool
+        await grading_pool.stop()
+
+    async def test_grade_endpoint(self, client, graded_task, running_pool):
+        task, student = graded_task
+        client.cookies.set("student_session", str(student.session_id))
+
+        response = await client.post(f"/api/tasks/{task.id}/grade", json={"code": WRONG})
+        missing = await client.post("/api/tasks/999/grade", json={"code": WRONG})
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        payload = response.json()
+        assert payload["header"] == "0 of 2 tests passed"
+        assert payload["examples"][0]["got"] == "8"
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    async def test_grade_requires_session(self, client, graded_task):
+        task, _ = graded_task
+
+        response = await client.post(f"/api/tasks/{task.id}/grade", json={"code": SOLUTION})
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_submit_keeps_browser_verdict_by_default(self, client, db_session, graded_task, running_pool):
+        task, student = graded_task
+        client.cookies.set("student_session", str(student.session_id))
+        completed = running_pool.completed
+
+        response = await client.post(
+            f"/api/tasks/{task.id}/submit-result",
+            json={
+                "task_id": task.id,
+                "success": True,
+                "submitted_code": WRONG,
+                "test_output": "",
+                "repr_code": "",
+            },
+        )
+        client.cookies.clear()
+
+        assert response.json()["success"] is True
+        assert running_pool.completed == completed
+
+    async def test_submit_stores_server_verdict(
+        self, client, db_session, graded_task, running_pool, monkeypatch
+    ):
+        monkeypatch.setattr("backend.main.GRADE_ON_SUBMIT", True)
+        task, student = graded_task
+        client.cookies.set("student_session", str(student.session_id))
+
+        response = await client.post(
+            f"/api/tasks/{task.id}/submit-result",
+            json={
+                "task_id": task.id,
+                "success": True,
+                "submitted_code": WRONG,
+                "test_output": "",
+                "repr_code": "",
+            },
+        )
+        client.cookies.clear()
+
+        assert response.json()["success"] is False
+        result = await db_session.execute(select(TaskAttempt.success).where(TaskAttempt.task_id == task.id))
+        assert result.scalar_one() is False
+
+    async def test_identical_submissions_are_graded_once(self, client, db_session, graded_task, running_pool):
+        task, student = graded_task
+        client.cookies.set("student_session", str(student.session_id))
+        completed = running_pool.completed
+
+        first = await client.post(f"/api/tasks/{task.id}/grade", json={"code": WRONG})
+        # Same code up to line endings and trailing whitespace
+        second = await client.post(
+            f"/api/tasks/{task.id}/grade", json={"code": WRONG.replace("\n", "  \r\n") + "\n"}
+        )
+        client.cookies.clear()
+
+        assert second.json() == first.json()
+        assert running_pool.completed == completed + 1
+        assert grading_cache.task_stats(task.id) == {
+            "lookups": 2,
+            "memory_hits": 1,
+            "db_hits": 0,
+            "hit_rate": 0.5,
+        }
+        rows = await db_session.execute(select(GradingResult.task_id))
+        assert rows.scalars().all() == [task.id]
@@ -0,0 +1,100 @@
+"""
+Unit tests for grading_cache.py - content-addressed grading results.
+"""
+
+import pytest_asyncio
+
+from backend.grading_cache import (
+    GradingCache,
+    cacheable,
+    normalize_submission,
+    submission_hash,
+    task_version,
+)
+from backend.models import Parsons
+
+RESULT = {"status": "pass", "header": "1 of 1 tests passed", "details": "", "passed": 1, "failed": 0, "examples": []}
+
+
+@pytest_asyncio.fixture
+async def task(db_session, test_teacher):
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="Cached",
+        description="{}",
+        task_type="normal",
+        code_blocks={},
+        correct_solution={},
+    )
+    db_session.add(task)
+    await db_session.commit()
+    return task
+
+
+class TestKeys:
+    """Tests for the content-addressed key parts."""
+
+    def test_whitespace_identical_code_shares_a_hash(self):
+        code = "def f(x):\n    return x\n"
+
+        assert submission_hash(code) == submission_hash("def f(x):   \r\n    return x\t\r\n\r\n")
+        assert submission_hash(code) != submission_hash("def f(y):\n    return y\n")
+
+    def test_trailing_whitespace_kept_where_it_can_matter(self):
+        code = 'def f():\n    return """a  \n"""'
+
+        assert normalize_submission(code.replace("\n", "\r\n")) == code
+
+    def test_version_follows_the_header(self):
+        assert task_version("def f():\n    '''>>> f()'''") != task_version("def f():\n    '''>>> f(1)'''")
+
+    def test_load_dependent_results_are_not_cacheable(self):
+        assert cacheable(RESULT)
+        assert not cacheable({**RESULT, "header": "Infinite loop"})
+
+
+class TestGradingCache:
+    """Tests for the memory and database tiers."""
+
+    async def test_database_tier_is_shared(self, db_session, task):
+        key = GradingCache.key(task.id, "header", "code")
+        await GradingCache().put(db_session, key, RESULT)
+
+        # A fresh cache (another worker) finds it in the database
+        other = GradingCache()
+        assert await other.get(db_session, key) == RESULT
+        assert await other.get(db_session, key) == RESULT
+        assert other.task_stats(task.id) == {"lookups": 2, "memory_hits": 1, "db_hits": 1, "hit_rate": 1.0}
+
+    async def test_store_leaves_callers_transaction_alone(self, db_session, task):
+        key = GradingCache.key(task.id, "header", "code")
+        task.title = "Renamed, not committed"
+
+        await GradingCache().put(db_session, key, RESULT)
+        await db_session.rollback()
+
+        await db_session.refresh(task)
+        assert task.title == "Cached"
+        assert await GradingCache().get(db_session, key) == RESULT
+
+    async def test_memory_only(self, db_session, task):
+        cache = GradingCache(max_entries=1, persist=False)
+        first = cache.key(task.id, "header", "first")
+        second = cache.key(task.id, "header", "second")
+
+        await cache.put(db_session, first, RESULT)
+        await cache.put(db_session, second, RESULT)
+
+        assert await cache.get(db_session, first) is None
+        assert await cache.get(db_session, second) == RESULT
+        assert await GradingCache().get(db_session, second) is None
+        assert cache.stats()["tasks"][task.id]["hit_rate"] == 0.5
+
+    async def test_timeouts_are_not_stored(self, db_session, task):
+        cache = GradingCache()
+        key = cache.key(task.id, "header", "while True: pass")
+
+        await cache.put(db_session, key, {**RESULT, "status": "fail", "header": "Infinite loop"})
+
+        assert await cache.get(db_session, key) is None
+        assert cache.stats()["stores"] == 0
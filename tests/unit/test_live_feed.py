@@ -0,0 +1,389 @@
+"""
+Unit tests for live_feed.py - per-task-list submission feed.
+"""
+
+import asyncio
+import json
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from backend import main as main_module
+from backend.auth import create_access_token
+from backend.database import Base
+from backend.live_feed import (
+    DROPPED,
+    LIVE_FEED_CHANNEL,
+    LiveFeed,
+    PostgresNotifier,
+    event_stream,
+    live_feed,
+    notify_workers,
+)
+from backend.models import Parsons, StudentSession, TaskList, Teacher
+from backend.principal_cache import TeacherPrincipal
+
+
+def make_event(task_list_id: int = 1, task_id: int = 7, success: bool = True, first: bool = True) -> dict:
+    return {
+        "task_list_id": task_list_id,
+        "task_id": task_id,
+        "student_session_id": 3,
+        "success": success,
+        "solve_seconds": 12.0 if success else None,
+        "first_attempt": first,
+        "completed_at": None,
+    }
+
+
+def parse(chunk: bytes) -> tuple[str, dict]:
+    lines = chunk.decode("utf-8").strip().split("\n")
+    return lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))
+
+
+@pytest_asyncio.fixture
+async def context(db_session, test_teacher):
+    task_list = TaskList(title="Live", unique_link_code="LIVE01", teacher_id=test_teacher.id)
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="Live Task",
+        description="{}",
+        task_type="normal",
+        code_blocks={},
+        correct_solution={},
+    )
+    db_session.add_all([task_list, task])
+    await db_session.flush()
+    student = StudentSession(session_id=uuid.uuid4(), task_list_id=task_list.id, username="live")
+    db_session.add(student)
+    await db_session.commit()
+    return task_list, task, student
+
+
+class FakeListenConnection:
+    """Stands in for the asyncpg connection that LISTENs."""
+
+    def __init__(self):
+        self.driver_connection = self
+        self.channels = []
+        self.on_terminate = None
+        self.broken = False
+        self.closed = False
+
+    async def get_raw_connection(self):
+        return self
+
+    def add_termination_listener(self, callback):
+        self.on_terminate = callback
+
+    async def add_listener(self, channel, callback):
+        self.channels.append(channel)
+
+    async def execute(self, statement):
+        if self.broken:
+            raise ConnectionResetError("connection lost")
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeEngine:
+    def __init__(self):
+        self.connections = []
+        self.refusals = 0
+
+    async def connect(self):
+        if self.refusals:
+            self.refusals -= 1
+            raise ConnectionRefusedError("database restarting")
+        conn = FakeListenConnection()
+        self.connections.append(conn)
+        return conn
+
+
+class TestFanOut:
+    """Tests for in-process delivery."""
+
+    def test_event_reaches_every_subscriber_of_the_list(self):
+        feed = LiveFeed()
+        first, second = feed.subscribe(1), feed.subscribe(1)
+        other = feed.subscribe(2)
+
+        feed.publish(make_event(task_list_id=1))
+
+        assert first.queue.qsize() == second.queue.qsize() == 1
+        assert other.queue.empty()
+
+    def test_slow_subscriber_is_dropped_without_blocking(self):
+        feed = LiveFeed(queue_size=2)
+        slow, fast = feed.subscribe(1), feed.subscribe(1)
+
+        for _ in range(3):
+            feed.publish(make_event())
+            while not fast.queue.empty():
+                fast.queue.get_nowait()
+
+        assert slow.dropped
+        assert slow.queue.get_nowait() is DROPPED
+        assert not fast.dropped
+        assert feed.stats()["subscribers"] == 1
+        assert feed.stats()["dropped_subscribers"] == 1
+
+
+class TestPostgresNotifier:
+    """Tests for the NOTIFY payload handling (no PostgreSQL needed)."""
+
+    def test_notification_is_delivered_locally(self):
+        feed = LiveFeed()
+        subscriber = feed.subscribe(1)
+        notifier = PostgresNotifier(engine=None, deliver=feed.deliver)
+
+        notifier._on_notify(None, 1, "task_attempt_feed", json.dumps(make_event()))
+        notifier._on_notify(None, 1, "task_attempt_feed", "not json")
+
+        assert subscriber.queue.qsize() == 1
+        assert notifier.stats()["received"] == 1
+
+    def test_full_outbound_queue_drops_events(self):
+        notifier = PostgresNotifier(engine=None, deliver=lambda event: None, max_queued=1)
+
+        notifier.send(make_event())
+        notifier.send(make_event())
+
+        assert notifier.stats() == {
+            "queue_depth": 1,
+            "sent": 0,
+            "received": 0,
+            "dropped": 1,
+            "reconnects": 0,
+        }
+
+
+class TestCacheMessages:
+    """Tests for cache messages sent between workers."""
+
+    def test_messages_reach_their_handler_and_reset_after_reconnect(self):
+        feed = LiveFeed()
+        received, resets = [], []
+        feed.add_handler("demo", received.append, reset=lambda: resets.append(True))
+        subscriber = feed.subscribe(1)
+
+        feed.receive({"kind": "demo", "origin": "other", "value": 1})
+        feed.receive(feed.message("demo", value=2))
+        feed.receive({"kind": "unknown", "origin": "other"})
+        feed.receive(make_event())
+        assert subscriber.queue.get_nowait()["task_id"] == 7
+        feed._reconnected()
+
+        assert received == [{"kind": "demo", "origin": "other", "value": 1}]
+        assert resets == [True]
+        assert subscriber.queue.get_nowait() is DROPPED
+
+    async def test_notify_workers_is_transactional_notify_on_postgres(self):
+        conn = MagicMock()
+        conn.dialect.name = "postgresql"
+        conn.execute = AsyncMock()
+
+        await notify_workers(conn, {"kind": "demo"})
+
+        statement, params = conn.execute.await_args.args
+        assert str(statement) == "SELECT pg_notify(:channel, :payload)"
+        assert params == {"channel": LIVE_FEED_CHANNEL, "payload": '{"kind": "demo"}'}
+
+        conn.dialect.name = "sqlite"
+        conn.execute.reset_mock()
+        await notify_workers(conn, {"kind": "demo"})
+        conn.execute.assert_not_awaited()
+
+
+class TestListenReconnect:
+    """The LISTEN connection is reopened when it drops (no PostgreSQL needed)."""
+
+    async def reconnect(self, engine, break_connection) -> list:
+        feed = LiveFeed()
+        subscriber = feed.subscribe(1)
+        notifier = PostgresNotifier(
+            engine, feed.deliver, on_reconnect=feed._drop_all, check_interval=0.01, retry_delay=0.01
+        )
+        await notifier._connect()
+        listen = asyncio.create_task(notifier._listen())
+        break_connection(engine.connections[0])
+        for _ in range(200):
+            if notifier.reconnects:
+                break
+            await asyncio.sleep(0.01)
+        listen.cancel()
+
+        assert notifier.stats()["reconnects"] == 1
+        assert engine.connections[0].closed
+        assert engine.connections[-1].channels == [LIVE_FEED_CHANNEL]
+        # Streams open during the outage missed events and are told to reconnect
+        assert subscriber.queue.get_nowait() is DROPPED
+        assert subscriber.drop_reason == "events missed"
+        return engine.connections
+
+    async def test_terminated_connection_is_reopened_with_backoff(self):
+        engine = FakeEngine()
+
+        def terminate(conn):
+            engine.refusals = 2
+            conn.on_terminate(conn)
+
+        connections = await self.reconnect(engine, terminate)
+
+        assert len(connections) == 2
+        assert engine.refusals == 0
+
+    async def test_silently_dead_connection_fails_the_probe(self):
+        def break_silently(conn):
+            conn.broken = True
+
+        assert len(await self.reconnect(FakeEngine(), break_silently)) == 2
+
+
+class TestEventStream:
+    """Tests for the SSE body."""
+
+    async def test_snapshot_then_attempts_with_counters(self):
+        feed = LiveFeed()
+        counters = {7: {"attempt_count": 4, "success_count": 1, "session_count": 2}}
+        stream = event_stream(feed, feed.subscribe(1), counters)
+
+        name, data = parse(await stream.__anext__())
+        assert name == "snapshot"
+        assert data["tasks"]["7"]["attempt_count"] == 4
+
+        next_chunk = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        feed.publish(make_event(success=True, first=True))
+        name, data = parse(await next_chunk)
+
+        assert name == "attempt"
+        assert data["counters"] == {"attempt_count": 5, "success_count": 2, "session_count": 3}
+        await stream.aclose()
+        assert feed.stats()["subscribers"] == 0
+
+    async def test_heartbeat_comment_when_idle(self):
+        feed = LiveFeed()
+        stream = event_stream(feed, feed.subscribe(1), {}, heartbeat=0.01)
+        await stream.__anext__()
+
+        assert await stream.__anext__() == b": keep-alive\n\n"
+        await stream.aclose()
+
+    async def test_dropped_subscriber_stream_ends(self):
+        feed = LiveFeed(queue_size=1)
+        stream = event_stream(feed, feed.subscribe(1), {})
+        await stream.__anext__()
+
+        feed.publish(make_event())
+        feed.publish(make_event())
+
+        name, _ = parse(await stream.__anext__())
+        assert name == "dropped"
+        assert [chunk async for chunk in stream] == []
+
+
+class TestPublishingSubmissions:
+    """Submissions are published once committed."""
+
+    async def test_submit_reaches_subscriber(self, client, context):
+        task_list, task, student = context
+        stream = event_stream(live_feed, live_feed.subscribe(task_list.id), {})
+        await stream.__anext__()
+
+        client.cookies.set("student_session", str(student.session_id))
+        response = await client.post(
+            f"/api/tasks/{task.id}/submit-result",
+            json={
+                "task_id": task.id,
+                "success": False,
+                "submitted_code": "pass",
+                "test_output": "fail",
+                "repr_code": "pass",
+            },
+        )
+        client.cookies.clear()
+        assert response.status_code == status.HTTP_200_OK
+
+        name, data = parse(await asyncio.wait_for(stream.__anext__(), timeout=1))
+        await stream.aclose()
+        assert name == "attempt"
+        assert data["attempt"]["task_id"] == task.id
+        assert data["attempt"]["first_attempt"] is True
+        assert data["counters"] == {"attempt_count": 1, "success_count": 0, "session_count": 1}
+
+    async def test_rolled_back_attempt_is_not_published(self, db_session, context):
+        task_list, task, student = context
+        subscriber = live_feed.subscribe(task_list.id)
+        live_feed.stage(db_session, make_event(task_list_id=task_list.id, task_id=task.id))
+
+        await db_session.rollback()
+
+        assert subscriber.queue.empty()
+        live_feed.unsubscribe(subscriber)
+
+
+class TestLiveEndpoint:
+    """Tests for GET /api/tasklists/{id}/live."""
+
+    async def test_requires_auth(self, client, context):
+        task_list, _, _ = context
+
+        response = await client.get(f"/api/tasklists/{task_list.id}/live")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_other_teachers_list_is_not_found(self, client, db_session, test_teacher, context):
+        task_list, _, _ = context
+        task_list.teacher_id = test_teacher.id + 1
+        await db_session.commit()
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        response = await client.get(f"/api/tasklists/{task_list.id}/live")
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    async def test_streams_event_stream(self, db_session, test_teacher, context):
+        task_list, _, _ = context
+
+        response = await main_module.tasklist_live_feed(
+            task_list.id, TeacherPrincipal.from_teacher(test_teacher), db_session
+        )
+        # Subscribed before the snapshot was read, not when the body starts
+        assert live_feed.stats()["subscribers"] == 1
+        first = await response.body_iterator.__anext__()
+        await response.body_iterator.aclose()
+
+        assert response.media_type == "text/event-stream"
+        assert response.headers["cache-control"] == "no-cache"
+        assert parse(first)[0] == "snapshot"
+
+    async def test_stream_does_not_hold_a_pooled_connection(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'live.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as setup:
+            teacher = Teacher(username="pooled", email="pooled@example.com", password_hash="x")
+            setup.add(teacher)
+            await setup.flush()
+            task_list = TaskList(title="Pooled", unique_link_code="POOL01", teacher_id=teacher.id)
+            setup.add(task_list)
+            await setup.commit()
+
+        db = factory()
+        response = await main_module.tasklist_live_feed(
+            task_list.id, TeacherPrincipal.from_teacher(teacher), db
+        )
+        try:
+            first = await response.body_iterator.__anext__()
+            assert parse(first)[0] == "snapshot"
+            assert engine.pool.checkedout() == 0
+        finally:
+            await response.body_iterator.aclose()
+            await engine.dispose()
@@ -6,8 +6,10 @@ from types import SimpleNamespace
 from unittest.mock import AsyncMock
 
 import pytest
+from sqlalchemy import select
 
 from backend import migrate_tasks
+from backend.models import Parsons
 
 
 class TestParsingHelpers:
@@ -65,6 +67,98 @@ for i in range(3):
         assert migrate_tasks.get_function_name("print('no function')") == "unknown"
 
 
+HEADER = '''def halve(number):
+    """
+    >>> halve(4)
+    2.0
+    >>> halve(0)  # doctest: +ELLIPSIS
+    0...
+    >>> halve("x")
+    Traceback (most recent call last):
+    TypeError: unsupported operand type(s) for /: 'str' and 'int'
+    """'''
+
+
+class TestExtractTestCases:
+    """Tests for pre-parsing doctest examples."""
+
+    def test_examples_with_lines_options_and_exceptions(self):
+        cases = migrate_tasks.extract_test_cases(HEADER)
+
+        assert [case["line"] for case in cases] == [3, 5, 7]
+        assert cases[0] == {
+            "source": "halve(4)\n",
+            "want": "2.0\n",
+            "exc_msg": None,
+            "line": 3,
+            "options": {},
+        }
+        assert cases[1]["options"] == {"ELLIPSIS": True}
+        assert cases[2]["exc_msg"] == "TypeError: unsupported operand type(s) for /: 'str' and 'int'\n"
+
+    def test_no_docstring(self):
+        assert migrate_tasks.extract_test_cases("def sample(x):\n    pass") is None
+        assert migrate_tasks.extract_test_cases("def broken(:") is None
+        assert migrate_tasks.extract_test_cases('def sample(x):\n    """No examples."""') == []
+
+    @pytest.mark.asyncio
+    async def test_backfill_from_stored_headers(self, db_engine, db_session, test_teacher):
+        tasks = [
+            Parsons(
+                created_by_teacher_id=test_teacher.id,
+                title=title,
+                description="{}",
+                task_type="normal",
+                code_blocks=code_blocks,
+                correct_solution={},
+            )
+            for title, code_blocks in (("With tests", {"function_header": HEADER}), ("Without", {}))
+        ]
+        db_session.add_all(tasks)
+        await db_session.commit()
+
+        async with db_engine.begin() as conn:
+            assert await migrate_tasks.backfill_test_cases(conn) == 1
+
+        result = await db_session.execute(select(Parsons.test_cases).order_by(Parsons.id))
+        filled, empty = result.scalars().all()
+        assert len(filled) == 3
+        assert empty is None
+
+
+    @pytest.mark.asyncio
+    async def test_update_refreshes_doctests_of_existing_task(self, db_session, test_teacher):
+        old_header = HEADER.replace("2.0", "2")
+        task = Parsons(
+            created_by_teacher_id=test_teacher.id,
+            title="halve",
+            description="{}",
+            task_type="normal",
+            code_blocks={"blocks": [{"id": "1", "code": "return number / 2"}], "function_header": old_header},
+            correct_solution={},
+            test_cases=migrate_tasks.extract_test_cases(old_header),
+        )
+        db_session.add(task)
+        await db_session.commit()
+        task_data = {
+            "title": "halve",
+            "code_blocks": {"blocks": [], "function_header": HEADER},
+            "test_cases": migrate_tasks.extract_test_cases(HEADER),
+        }
+
+        assert await migrate_tasks.update_grading_inputs(db_session, task_data) == task.id
+        await db_session.commit()
+        assert await migrate_tasks.update_grading_inputs(db_session, task_data) is None
+
+        result = await db_session.execute(
+            select(Parsons.code_blocks, Parsons.test_cases).execution_options(populate_existing=True)
+        )
+        code_blocks, test_cases = result.one()
+        assert code_blocks["function_header"] == HEADER
+        assert code_blocks["blocks"] == [{"id": "1", "code": "return number / 2"}]
+        assert test_cases[0]["want"] == "2.0\n"
+
+
 class TestTaskFiles:
     """Tests for filesystem-based task loading helpers."""
 
@@ -97,6 +191,7 @@ def hello():
         assert result["task_type"] == "normal"
         assert result["correct_solution"]["test_function"] == "test_hello"
         assert len(result["code_blocks"]["blocks"]) == 2
+        assert result["test_cases"] == []
 
     def test_load_task_file_missing_files_returns_none(self, tmp_path, monkeypatch):
         probs_dir = tmp_path / "parsons_probs"
@@ -235,6 +330,38 @@ class TestMigrationFlow:
         assert len(fake_session.added) == 1
         assert fake_session.added[0].title == "new"
 
+    @pytest.mark.asyncio
+    async def test_update_mode_refreshes_existing_tasks(self, monkeypatch):
+        fake_session = _FakeSession()
+        monkeypatch.setattr(
+            migrate_tasks,
+            "get_or_create_default_teacher",
+            AsyncMock(return_value=SimpleNamespace(id=1, username="teacher")),
+        )
+        monkeypatch.setattr(migrate_tasks, "get_task_files", lambda: ["fixed", "same"])
+        monkeypatch.setattr(migrate_tasks, "task_exists", AsyncMock(return_value=True))
+        monkeypatch.setattr(
+            migrate_tasks,
+            "load_task_file",
+            lambda title: {"title": title, "code_blocks": {"function_header": "def f(): pass"}},
+        )
+        update_mock = AsyncMock(side_effect=[7, None])
+        monkeypatch.setattr(migrate_tasks, "update_grading_inputs", update_mock)
+        monkeypatch.setattr(
+            migrate_tasks,
+            "async_session",
+            lambda: _FakeSessionContext(fake_session),
+        )
+
+        await migrate_tasks.migrate_tasks()
+        update_mock.assert_not_called()
+
+        await migrate_tasks.migrate_tasks(update=True)
+
+        assert [call.args[1]["title"] for call in update_mock.call_args_list] == ["fixed", "same"]
+        assert fake_session.added == []
+        assert fake_session.commit_count == 2
+
     @pytest.mark.asyncio
     async def test_migrate_tasks_rolls_back_on_flush_error(self, monkeypatch):
         teacher = SimpleNamespace(id=1, username="teacher")
@@ -0,0 +1,124 @@
+"""
+Unit tests for migrations.py - versioned schema migrations.
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest_asyncio
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend.migrations import (
+    MIGRATIONS,
+    Backfill,
+    CreateIndex,
+    migration_status,
+    run_migrations,
+)
+
+
+@pytest_asyncio.fixture
+async def engine():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    yield engine
+    await engine.dispose()
+
+
+async def index_names(engine, table: str) -> set[str]:
+    async with engine.connect() as conn:
+        return await conn.run_sync(
+            lambda sync_conn: {i["name"] for i in inspect(sync_conn).get_indexes(table)}
+        )
+
+
+class TestRunMigrations:
+    """Tests for applying migrations."""
+
+    async def test_fresh_database_records_all_versions(self, engine):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        applied = await run_migrations(engine)
+
+        assert applied == [m.version for m in MIGRATIONS]
+        assert await run_migrations(engine) == []
+        assert all(done for _, _, done in await migration_status(engine))
+
+    async def test_legacy_database_gets_column_and_indexes(self, engine):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(text("DROP INDEX ix_task_attempts_task_id_success"))
+            await conn.execute(text("DROP INDEX ix_parsons_public_updated_at"))
+            await conn.execute(text("ALTER TABLE parsons DROP COLUMN description_text"))
+
+        await run_migrations(engine)
+
+        async with engine.connect() as conn:
+            columns = await conn.run_sync(
+                lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns("parsons")}
+            )
+        assert "description_text" in columns
+        assert "ix_task_attempts_task_id_success" in await index_names(engine, "task_attempts")
+        assert "ix_parsons_public_updated_at" in await index_names(engine, "parsons")
+
+    def test_model_indexes_are_covered_by_migrations(self):
+        migrated = {
+            step.name
+            for migration in MIGRATIONS
+            for step in migration.steps
+            if isinstance(step, CreateIndex)
+        }
+        declared = {
+            index.name for table in Base.metadata.tables.values() for index in table.indexes
+        }
+
+        assert declared <= migrated
+
+    def test_startup_does_not_scan_attempts(self):
+        backfilled = {
+            step.table
+            for migration in MIGRATIONS
+            for step in migration.steps
+            if isinstance(step, Backfill)
+        }
+
+        assert backfilled.isdisjoint({"task_attempts", "task_stats", "solve_time_sketches"})
+
+
+class TestCreateIndexOnPostgres:
+    """Tests for the CONCURRENTLY path (SQL only, no Postgres needed)."""
+
+    async def test_concurrent_build_drops_invalid_index_first(self):
+        conn = MagicMock()
+        conn.run_sync = AsyncMock(return_value=True)
+        plain_table = MagicMock()
+        plain_table.scalar.return_value = "r"
+        invalid_result = MagicMock()
+        invalid_result.first.return_value = (1,)
+        conn.execute = AsyncMock(side_effect=[plain_table, invalid_result, None, None])
+
+        await CreateIndex("ix_demo", "task_attempts", "task_id").apply(conn, concurrently=True)
+
+        statements = [str(call.args[0]) for call in conn.execute.await_args_list]
+        assert statements[2] == "DROP INDEX CONCURRENTLY IF EXISTS ix_demo"
+        assert statements[3] == (
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_demo ON task_attempts (task_id)"
+        )
+
+    async def test_partitioned_table_is_indexed_without_concurrently(self):
+        conn = MagicMock()
+        conn.run_sync = AsyncMock(return_value=True)
+        partitioned = MagicMock()
+        partitioned.scalar.return_value = "p"
+        conn.execute = AsyncMock(side_effect=[partitioned, None])
+
+        await CreateIndex("ix_demo", "task_attempts", "task_id").apply(conn, concurrently=True)
+
+        statements = [str(call.args[0]) for call in conn.execute.await_args_list]
+        assert statements[1] == "CREATE INDEX IF NOT EXISTS ix_demo ON task_attempts (task_id)"
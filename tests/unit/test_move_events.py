@@ -0,0 +1,241 @@
+"""
+Unit tests for move_events.py - batched move event ingestion.
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend import move_events
+from backend.attempt_writer import attempt_writer
+from backend.models import MoveEvent, Parsons, StudentSession, TaskAttempt
+from backend.move_events import (
+    MoveEventQueueFullError,
+    MoveEventWriter,
+    move_event_writer,
+    move_records,
+    write_move_events,
+)
+
+EVENTS = [["3", -1, 0, 0, 1200], ["5", -1, 1, 1, 2500], ["3", 0, 1, 0, 4100]]
+
+
+@pytest_asyncio.fixture
+async def attempt(db_session, test_teacher):
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="Moves",
+        description="{}",
+        task_type="normal",
+        code_blocks={},
+        correct_solution={},
+    )
+    student = StudentSession(session_id=uuid.uuid4(), username="mover")
+    db_session.add_all([task, student])
+    await db_session.flush()
+    attempt = TaskAttempt(student_session_id=student.id, task_id=task.id, success=False)
+    db_session.add(attempt)
+    await db_session.commit()
+    return attempt, student
+
+
+async def stored_moves(db_session) -> list[tuple]:
+    result = await db_session.execute(
+        select(
+            MoveEvent.block_id,
+            MoveEvent.from_position,
+            MoveEvent.to_position,
+            MoveEvent.indent,
+            MoveEvent.offset_ms,
+        ).order_by(MoveEvent.id)
+    )
+    return [tuple(row) for row in result]
+
+
+class TestWriteMoveEvents:
+    """Tests for move_records and write_move_events."""
+
+    def test_records_follow_copy_columns(self):
+        received_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+        records = move_records(7, EVENTS[:1], received_at)
+
+        assert records == [(7, received_at, "3", -1, 0, 0, 1200)]
+
+    async def test_multi_row_insert(self, db_session, attempt):
+        task_attempt, _ = attempt
+
+        await write_move_events(db_session, move_records(task_attempt.id, EVENTS))
+        await db_session.commit()
+
+        assert await stored_moves(db_session) == [tuple(event) for event in EVENTS]
+
+
+class TestMoveEventWriter:
+    """Tests for the background writer."""
+
+    async def test_stop_flushes_queued_batches(self, db_engine, db_session, attempt):
+        task_attempt, _ = attempt
+        writer = MoveEventWriter(flush_interval_ms=10_000)
+        writer.start(async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False))
+
+        writer.submit(move_records(task_attempt.id, EVENTS))
+        writer.submit(move_records(task_attempt.id, EVENTS[:1]))
+        await writer.stop()
+
+        assert len(await stored_moves(db_session)) == 4
+        stats = writer.stats()
+        assert (stats["flushed_rows"], stats["queued_rows"], stats["enabled"]) == (4, 0, False)
+
+    async def test_rejects_batches_over_capacity(self, db_engine, attempt):
+        task_attempt, _ = attempt
+        writer = MoveEventWriter(max_rows=4)
+        writer.start(async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False))
+
+        writer.submit(move_records(task_attempt.id, EVENTS))
+        with pytest.raises(MoveEventQueueFullError):
+            writer.submit(move_records(task_attempt.id, EVENTS))
+        await writer.stop()
+
+        assert writer.stats()["rejected_rows"] == 3
+
+
+class TestMovesEndpoint:
+    """Tests for POST /api/tasks/{task_id}/attempts/{attempt_id}/moves."""
+
+    def url(self, task_attempt) -> str:
+        return f"/api/tasks/{task_attempt.task_id}/attempts/{task_attempt.id}/moves"
+
+    async def test_requires_student_session(self, client, attempt):
+        task_attempt, _ = attempt
+
+        response = await client.post(self.url(task_attempt), json={"events": EVENTS})
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_stores_moves(self, client, db_session, attempt):
+        task_attempt, student = attempt
+        client.cookies.set("student_session", str(student.session_id))
+
+        response = await client.post(self.url(task_attempt), json={"events": EVENTS})
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.json()["accepted"] == 3
+        assert await stored_moves(db_session) == [tuple(event) for event in EVENTS]
+
+    async def test_other_students_attempt(self, client, db_session, attempt):
+        task_attempt, _ = attempt
+        other = StudentSession(session_id=uuid.uuid4(), username="other")
+        db_session.add(other)
+        await db_session.commit()
+        client.cookies.set("student_session", str(other.session_id))
+
+        response = await client.post(self.url(task_attempt), json={"events": EVENTS})
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize(
+        "events",
+        [
+            [["3", -1, 0, -1, 100]],
+            [["3", -1, 0, 0]],
+            [["x" * 65, -1, 0, 0, 100]],
+        ],
+    )
+    async def test_invalid_events(self, client, attempt, events):
+        task_attempt, student = attempt
+        client.cookies.set("student_session", str(student.session_id))
+
+        response = await client.post(self.url(task_attempt), json={"events": events})
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+    async def test_batch_size_limit(self, client, attempt):
+        task_attempt, student = attempt
+        client.cookies.set("student_session", str(student.session_id))
+
+        events = [["1", 0, 1, 0, i] for i in range(move_events.MOVE_EVENT_MAX_BATCH + 1)]
+        response = await client.post(self.url(task_attempt), json={"events": events})
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+    async def test_submit_returns_attempt_id(self, client, db_session, attempt):
+        task_attempt, student = attempt
+        client.cookies.set("student_session", str(student.session_id))
+
+        response = await client.post(
+            f"/api/tasks/{task_attempt.task_id}/submit-result",
+            json={
+                "task_id": task_attempt.task_id,
+                "success": True,
+                "submitted_code": "x = 1",
+                "test_output": "",
+                "repr_code": "x = 1",
+            },
+        )
+        moves = await client.post(
+            f"/api/tasks/{task_attempt.task_id}/attempts/{response.json()['attempt_id']}/moves",
+            json={"events": EVENTS},
+        )
+        client.cookies.clear()
+
+        assert moves.status_code == status.HTTP_202_ACCEPTED
+
+    async def test_submit_stores_moves_with_the_attempt(self, client, db_session, attempt):
+        task_attempt, student = attempt
+        client.cookies.set("student_session", str(student.session_id))
+
+        response = await client.post(
+            f"/api/tasks/{task_attempt.task_id}/submit-result",
+            json={
+                "task_id": task_attempt.task_id,
+                "success": True,
+                "submitted_code": "x = 1",
+                "test_output": "",
+                "repr_code": "x = 1",
+                "moves": EVENTS,
+            },
+        )
+        client.cookies.clear()
+
+        assert response.json()["moves_accepted"] == 3
+        stored = await db_session.execute(select(MoveEvent.attempt_id).distinct())
+        assert stored.scalars().all() == [response.json()["attempt_id"]]
+
+    async def test_write_behind_submit_keeps_its_moves(self, client, db_engine, db_session, attempt):
+        task_attempt, student = attempt
+        session_factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+        attempt_writer.start(session_factory)
+        move_event_writer.start(session_factory)
+        try:
+            client.cookies.set("student_session", str(student.session_id))
+            response = await client.post(
+                f"/api/tasks/{task_attempt.task_id}/submit-result",
+                json={
+                    "task_id": task_attempt.task_id,
+                    "success": True,
+                    "submitted_code": "x = 1",
+                    "test_output": "",
+                    "repr_code": "x = 1",
+                    "moves": EVENTS,
+                },
+            )
+            client.cookies.clear()
+            assert response.status_code == status.HTTP_202_ACCEPTED
+        finally:
+            await attempt_writer.stop()
+            await move_event_writer.stop()
+
+        assert response.json()["moves_accepted"] == 3
+        assert await stored_moves(db_session) == [tuple(event) for event in EVENTS]
+        stored = await db_session.execute(select(MoveEvent.attempt_id).distinct())
+        assert stored.scalars().all() == [response.json()["attempt_id"]]
@@ -0,0 +1,156 @@
+"""
+Unit tests for password_hashing.py - bcrypt on a bounded thread pool.
+"""
+
+import asyncio
+import threading
+import time
+
+import bcrypt
+import pytest
+import pytest_asyncio
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from backend import password_hashing
+from backend.database import Base, get_db
+from backend.main import app
+from backend.models import Teacher
+from backend.password_hashing import PasswordHasher, PasswordHasherOverloaded
+
+
+class TestPasswordHasher:
+    """Tests for PasswordHasher hashing and admission control."""
+
+    async def test_hash_and_verify_round_trip(self):
+        hasher = PasswordHasher(workers=1, max_queued=1)
+
+        password_hash = await hasher.hash("secret123")
+
+        assert await hasher.verify("secret123", password_hash)
+        assert not await hasher.verify("wrong", password_hash)
+        assert hasher.stats()["completed"] == 3
+        hasher.shutdown()
+
+    async def test_rejects_beyond_capacity(self):
+        hasher = PasswordHasher(workers=1, max_queued=0)
+        release = threading.Event()
+        running = asyncio.create_task(hasher._run(release.wait))
+        await asyncio.sleep(0)
+
+        with pytest.raises(PasswordHasherOverloaded):
+            await hasher.verify("x", "y")
+
+        release.set()
+        await running
+        assert hasher.stats()["rejected"] == 1
+        hasher.shutdown()
+
+    async def test_records_queue_time(self):
+        hasher = PasswordHasher(workers=1, max_queued=5)
+
+        await asyncio.gather(*(hasher._run(time.sleep, 0.02) for _ in range(3)))
+
+        assert hasher.stats()["max_queue_ms"] >= 20
+        hasher.shutdown()
+
+
+class TestLoginOverload:
+    """Tests for explicit overload responses."""
+
+    async def test_login_returns_503_when_overloaded(self, client, test_teacher, monkeypatch):
+        async def overloaded(*_args):
+            raise PasswordHasherOverloaded("busy")
+
+        monkeypatch.setattr(password_hashing.password_hasher, "verify", overloaded)
+
+        response = await client.post(
+            "/api/login/access-token",
+            data={"username": "testteacher", "password": "testpassword123"},
+        )
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["retry-after"] == "1"
+
+    async def test_register_returns_503_when_overloaded(self, client, monkeypatch):
+        async def overloaded(*_args):
+            raise PasswordHasherOverloaded("busy")
+
+        monkeypatch.setattr(password_hashing.password_hasher, "hash", overloaded)
+
+        response = await client.post(
+            "/api/register",
+            json={
+                "username": "busy",
+                "password": "password123",
+                "password_confirm": "password123",
+                "email": "busy@example.com",
+            },
+        )
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+class TestEventLoopLag:
+    """A burst of logins must not block the event loop."""
+
+    @pytest_asyncio.fixture
+    async def file_db(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'lag.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with session_maker() as session:
+            # Low cost factor keeps the test fast; each check still takes ~10-30 ms
+            password_hash = bcrypt.hashpw(b"burst-pass", bcrypt.gensalt(rounds=8)).decode()
+            session.add(Teacher(username="burst", email="burst@example.com", password_hash=password_hash))
+            await session.commit()
+
+        async def override_get_db():
+            async with session_maker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override_get_db
+        yield
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+    async def test_burst_of_50_logins_keeps_loop_responsive(self, file_db, monkeypatch):
+        hasher = PasswordHasher(workers=2, max_queued=64)
+        monkeypatch.setattr(password_hashing, "password_hasher", hasher)
+        monkeypatch.setattr("backend.auth.password_hasher", hasher)
+
+        started = time.perf_counter()
+        bcrypt.checkpw(b"burst-pass", bcrypt.hashpw(b"burst-pass", bcrypt.gensalt(rounds=8)))
+        single_check_ms = (time.perf_counter() - started) * 1000
+
+        lags = []
+        done = asyncio.Event()
+
+        async def ticker():
+            interval = 0.005
+            while not done.is_set():
+                before = time.perf_counter()
+                await asyncio.sleep(interval)
+                lags.append((time.perf_counter() - before - interval) * 1000)
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            tick_task = asyncio.create_task(ticker())
+            responses = await asyncio.gather(*(
+                ac.post(
+                    "/api/login/access-token",
+                    data={"username": "burst", "password": "burst-pass"},
+                )
+                for _ in range(50)
+            ))
+            done.set()
+            await tick_task
+
+        hasher.shutdown()
+        assert all(r.status_code == status.HTTP_200_OK for r in responses)
+        assert hasher.stats()["completed"] == 50
+        # Synchronous bcrypt would stall the loop for at least one full check
+        # per login; on the pool the loop keeps ticking far more often.
+        median_lag = sorted(lags)[len(lags) // 2]
+        assert median_lag < single_check_ms / 2
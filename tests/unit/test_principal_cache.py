@@ -0,0 +1,81 @@
+"""
+Unit tests for principal_cache.py - cached teacher authentication.
+"""
+
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from fastapi import HTTPException
+
+from backend.auth import create_access_token, get_current_user
+from backend.principal_cache import PrincipalCache, TeacherPrincipal, principal_cache
+
+
+def token_request(username: str) -> Mock:
+    request = Mock()
+    request.cookies = {"access_token": create_access_token({"sub": username})}
+    request.headers = {}
+    return request
+
+
+class TestPrincipalCache:
+    """Tests for PrincipalCache storage rules."""
+
+    def test_put_and_get(self):
+        cache = PrincipalCache(ttl=30)
+        principal = TeacherPrincipal(id=1, username="t", email="t@example.com", is_active=True)
+
+        cache.put(principal)
+
+        assert cache.get("t") is principal
+        assert cache.stats()["hits"] == 1
+
+    def test_inactive_principals_are_not_cached(self):
+        cache = PrincipalCache(ttl=30)
+
+        cache.put(TeacherPrincipal(id=1, username="t", email="e", is_active=False))
+
+        assert cache.get("t") is None
+
+    def test_zero_ttl_disables_cache(self):
+        cache = PrincipalCache(ttl=0)
+
+        cache.put(TeacherPrincipal(id=1, username="t", email="e", is_active=True))
+
+        assert cache.get("t") is None
+
+
+class TestGetCurrentUserCaching:
+    """Tests for get_current_user with the principal cache."""
+
+    async def test_second_request_skips_database(self, db_session, test_teacher):
+        first = await get_current_user(token_request(test_teacher.username), db_session)
+
+        db = Mock()
+        db.execute = AsyncMock(side_effect=AssertionError("database was queried"))
+        second = await get_current_user(token_request(test_teacher.username), db)
+
+        assert second == first
+        assert second.id == test_teacher.id
+
+    async def test_deactivation_invalidates_cache(self, db_session, test_teacher):
+        await get_current_user(token_request(test_teacher.username), db_session)
+
+        test_teacher.is_active = False
+        await db_session.commit()
+
+        assert principal_cache.get(test_teacher.username) is None
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_user(token_request(test_teacher.username), db_session)
+        assert exc_info.value.status_code == 401
+
+    async def test_username_change_invalidates_old_entry(self, db_session, test_teacher):
+        await get_current_user(token_request("testteacher"), db_session)
+
+        test_teacher.username = "renamedteacher"
+        await db_session.commit()
+
+        with pytest.raises(HTTPException):
+            await get_current_user(token_request("testteacher"), db_session)
+        renamed = await get_current_user(token_request("renamedteacher"), db_session)
+        assert renamed.id == test_teacher.id
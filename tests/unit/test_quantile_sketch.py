@@ -0,0 +1,122 @@
+"""
+Unit tests for quantile_sketch.py - mergeable DDSketch.
+"""
+
+import random
+
+import pytest
+
+from backend.quantile_sketch import QuantileSketch
+
+
+def exact_quantile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[round(q * (len(ordered) - 1))]
+
+
+@pytest.fixture
+def values() -> list[float]:
+    rng = random.Random(42)
+    return [rng.lognormvariate(3, 1) for _ in range(20_000)]
+
+
+class TestQuantileSketch:
+    """Tests for accuracy, merging and serialization."""
+
+    def test_empty_sketch(self):
+        assert QuantileSketch().quantile(0.5) is None
+
+    @pytest.mark.parametrize("q", [0.1, 0.5, 0.9, 0.99])
+    def test_relative_error_bound(self, values, q):
+        sketch = QuantileSketch(alpha=0.01)
+        sketch.update(values)
+
+        exact = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.011 * exact
+
+    def test_extremes_are_exact(self, values):
+        sketch = QuantileSketch()
+        sketch.update(values)
+
+        assert sketch.quantile(0) == min(values)
+        assert sketch.quantile(1) == max(values)
+
+    def test_merge_equals_single_sketch(self, values):
+        whole = QuantileSketch()
+        whole.update(values)
+        parts = [QuantileSketch() for _ in range(4)]
+        for i, value in enumerate(values):
+            parts[i % 4].add(value)
+
+        merged = QuantileSketch()
+        for part in parts:
+            merged.merge(part)
+
+        assert merged.buckets == whole.buckets
+        assert merged.count == whole.count
+        assert merged.quantile(0.9) == whole.quantile(0.9)
+
+    def test_merge_rejects_different_accuracy(self):
+        with pytest.raises(ValueError):
+            QuantileSketch(alpha=0.01).merge(QuantileSketch(alpha=0.02))
+
+    def test_zero_and_negative_durations(self):
+        sketch = QuantileSketch()
+        sketch.update([-1.0, 0.0, 0.0, 10.0])
+
+        assert sketch.quantile(0.5) == 0.0
+        assert sketch.count == 4
+
+    def test_round_trip_is_compact(self, values):
+        sketch = QuantileSketch()
+        sketch.update(values)
+
+        data = sketch.to_bytes()
+        restored = QuantileSketch.from_bytes(data)
+
+        assert len(data) < 2048
+        assert restored.buckets == sketch.buckets
+        assert restored.quantile(0.5) == sketch.quantile(0.5)
+        assert (restored.min, restored.max, restored.count) == (sketch.min, sketch.max, sketch.count)
+
+    def test_bucket_limit_collapses_lowest(self):
+        sketch = QuantileSketch(max_buckets=10)
+        sketch.update(float(2 ** i) for i in range(30))
+
+        assert len(sketch.buckets) == 10
+        assert sketch.quantile(1) == 2 ** 29
+
+    def test_rebucketed_keeps_counts(self, values):
+        sketch = QuantileSketch(alpha=0.01)
+        sketch.update(values)
+
+        coarse = sketch.rebucketed(0.05)
+
+        assert coarse.count == sketch.count
+        exact = exact_quantile(values, 0.5)
+        assert abs(coarse.quantile(0.5) - exact) <= 0.07 * exact
+
+    def test_subtract_reverses_merge(self, values):
+        kept, withdrawn = values[:15_000], values[15_000:]
+        expected = QuantileSketch()
+        expected.update(kept)
+        removed = QuantileSketch()
+        removed.update(withdrawn)
+
+        sketch = QuantileSketch()
+        sketch.update(values)
+        sketch.subtract(removed)
+
+        assert sketch.buckets == expected.buckets
+        assert sketch.count == expected.count
+        assert sketch.quantile(0.5) == expected.quantile(0.5)
+        assert abs(sketch.max - max(kept)) <= 0.011 * max(kept)
+
+    def test_subtract_everything_empties_the_sketch(self):
+        sketch = QuantileSketch()
+        sketch.update([0.0, 5.0, 30.0])
+
+        sketch.subtract(sketch.rebucketed(sketch.alpha))
+
+        assert sketch.count == 0
+        assert sketch.quantile(0.5) is None
@@ -0,0 +1,307 @@
+"""
+Unit tests for regrade.py - bulk re-grading of stored attempts.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy import select, update
+
+from backend import regrade
+from backend.attempt_columns import attempt_columns
+from backend.auth import create_access_token
+from backend.grading import GradingPool
+from backend.grading_cache import task_version
+from backend.migrate_tasks import extract_test_cases
+from backend.models import (
+    GradingResult,
+    Parsons,
+    RegradeCheckpoint,
+    StudentSession,
+    TaskAttempt,
+    TaskList,
+    TaskStats,
+    Teacher,
+)
+from backend.regrade import FINISHED, SKIPPED, regrade_runner, run_regrade
+from backend.solve_times import TASK, rebuild_solve_time_sketches, solve_time_sketches
+from backend.task_stats import rebuild_task_stats
+
+HEADER = '''def add_in_range(start, stop):
+    """
+    >>> add_in_range(3, 5)
+    12
+    >>> add_in_range(1, 10)
+    55
+    """'''
+
+SOLUTION = """def add_in_range(start, stop):
+    total = 0
+    while start <= stop:
+        total += start
+        start += 1
+    return total"""
+
+WRONG = SOLUTION.replace("start += 1", "start += 2")
+LOOPING = "def add_in_range(start, stop):\n    while True:\n        pass"
+
+T0 = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def pool():
+    pool = GradingPool(workers=2, timeout=1)
+    pool.start()
+    yield pool
+    await pool.stop()
+
+
+@pytest_asyncio.fixture
+async def graded_task(db_session, test_teacher):
+    """A task whose attempts were graded against a broken header."""
+    task_list = TaskList(teacher_id=test_teacher.id, title="Loops", unique_link_code="regrade")
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="add_in_range",
+        description="{}",
+        task_type="normal",
+        code_blocks={"blocks": [], "function_header": HEADER},
+        correct_solution={},
+        test_cases=extract_test_cases(HEADER),
+    )
+    db_session.add_all([task_list, task])
+    await db_session.flush()
+    student = StudentSession(
+        session_id=uuid.uuid4(), username="regrade", task_list_id=task_list.id
+    )
+    db_session.add(student)
+    await db_session.flush()
+
+    # (code, stored verdict); the old header failed correct code and passed WRONG
+    stored = [
+        (SOLUTION, False),
+        (WRONG, True),
+        (SOLUTION, False),
+        (SOLUTION + "  ", True),
+        (WRONG, False),
+        (None, False),
+    ]
+    for offset, (code, success) in enumerate(stored):
+        db_session.add(
+            TaskAttempt(
+                student_session_id=student.id,
+                task_id=task.id,
+                task_started_at=T0 + timedelta(minutes=offset),
+                completed_at=T0 + timedelta(minutes=offset, seconds=30),
+                success=success,
+                submitted_inputs={"code": code} if code is not None else None,
+            )
+        )
+    # Started but never submitted
+    db_session.add(TaskAttempt(student_session_id=student.id, task_id=task.id, task_started_at=T0))
+    await db_session.commit()
+    return task
+
+
+async def verdicts(db_session, task) -> list:
+    result = await db_session.execute(
+        select(TaskAttempt.success)
+        .where(TaskAttempt.task_id == task.id)
+        .order_by(TaskAttempt.id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().all()
+
+
+async def checkpoint(db_session, task) -> RegradeCheckpoint:
+    result = await db_session.execute(
+        select(RegradeCheckpoint)
+        .where(RegradeCheckpoint.task_id == task.id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+
+class TestRunRegrade:
+    """Tests for re-grading, checkpoints and rollups."""
+
+    async def test_regrades_each_distinct_submission_once(self, db_engine, db_session, graded_task, pool):
+        runs = await run_regrade(db_engine, pool, [graded_task.id], batch_size=2)
+
+        assert await verdicts(db_session, graded_task) == [True, False, True, True, False, False, None]
+        assert (runs[0].status, runs[0].total, runs[0].processed, runs[0].changed) == (FINISHED, 6, 6, 3)
+        assert pool.stats()["completed"] == 2
+        saved = await checkpoint(db_session, graded_task)
+        assert saved.finished_at is not None
+        assert saved.task_version == task_version(HEADER, extract_test_cases(HEADER))
+        assert (saved.processed, saved.changed, saved.unresolved) == (6, 3, 0)
+        stored = await db_session.execute(select(GradingResult.code_hash))
+        assert len(stored.all()) == 2
+
+    async def test_columnar_copy_serves_new_verdicts(self, db_engine, db_session, graded_task, pool):
+        await attempt_columns.refresh(db_session)
+        updated = attempt_columns.stats()["verdicts_updated"]
+
+        await run_regrade(db_engine, pool, [graded_task.id], batch_size=2)
+        await attempt_columns.refresh(db_session, force=True)
+
+        stored = attempt_columns.column("success")[attempt_columns.column("task_id") == graded_task.id]
+        assert stored.tolist() == [1, 0, 1, 1, 0, 0, -1]
+        assert attempt_columns.stats()["verdicts_updated"] == updated + 7
+
+    async def test_moves_changed_verdicts_in_rollups(self, db_engine, db_session, graded_task, pool):
+        async with db_engine.begin() as conn:
+            await rebuild_task_stats(conn)
+            await rebuild_solve_time_sketches(conn)
+
+        await run_regrade(db_engine, pool, [graded_task.id])
+
+        result = await db_session.execute(
+            select(
+                TaskStats.attempt_count,
+                TaskStats.success_count,
+                TaskStats.solve_seconds_sum,
+                TaskStats.solve_seconds_min,
+            )
+            .where(TaskStats.task_id == graded_task.id)
+            .execution_options(populate_existing=True)
+        )
+        # SQLite's rebuild computes durations from Julian days
+        assert result.one() == pytest.approx((7, 3, 90.0, 30.0), abs=1e-3)
+        summary = await solve_time_sketches.summary(db_session, TASK, graded_task.id)
+        assert summary["count"] == 3
+
+    async def test_finished_task_is_skipped_until_its_version_changes(
+        self, db_engine, db_session, graded_task, pool
+    ):
+        await run_regrade(db_engine, pool, [graded_task.id])
+        again = await run_regrade(db_engine, pool, [graded_task.id])
+
+        assert again[0].status == SKIPPED
+        assert pool.stats()["completed"] == 2
+
+        header = HEADER.replace("55", "54")
+        await db_session.execute(
+            update(Parsons)
+            .where(Parsons.id == graded_task.id)
+            .values(
+                code_blocks={"blocks": [], "function_header": header},
+                test_cases=extract_test_cases(header),
+            )
+        )
+        await db_session.commit()
+        edited = await run_regrade(db_engine, pool, [graded_task.id])
+
+        assert edited[0].status == FINISHED
+        assert await verdicts(db_session, graded_task) == [False] * 6 + [None]
+
+    async def test_resumes_after_interruption(self, db_engine, db_session, graded_task, pool):
+        def interrupt(progress):
+            if progress.processed == 4:
+                raise RuntimeError("worker stopped")
+
+        with pytest.raises(RuntimeError):
+            await run_regrade(db_engine, pool, [graded_task.id], batch_size=2, on_progress=interrupt)
+        saved = await checkpoint(db_session, graded_task)
+        assert (saved.processed, saved.finished_at) == (4, None)
+
+        runs = await run_regrade(db_engine, pool, [graded_task.id], batch_size=2)
+
+        assert (runs[0].processed, runs[0].changed) == (6, 3)
+        assert await verdicts(db_session, graded_task) == [True, False, True, True, False, False, None]
+        # Both submissions were graded before the interruption and stored
+        assert pool.stats()["completed"] == 2
+
+    async def test_timeouts_keep_the_stored_verdict(
+        self, db_engine, db_session, graded_task, pool, monkeypatch
+    ):
+        monkeypatch.setattr(regrade, "REGRADE_RETRIES", 1)
+        await db_session.execute(
+            update(TaskAttempt)
+            .where(TaskAttempt.task_id == graded_task.id)
+            .values(submitted_inputs={"code": LOOPING})
+        )
+        await db_session.commit()
+
+        runs = await run_regrade(db_engine, pool, [graded_task.id])
+
+        assert (runs[0].changed, runs[0].unresolved) == (0, 6)
+        assert await verdicts(db_session, graded_task) == [False, True, False, True, False, False, None]
+
+
+class TestRegradeEndpoints:
+    """Tests for POST / GET /api/admin/regrade."""
+
+    async def test_teacher_regrades_own_task(
+        self, client, db_session, graded_task, test_teacher, pool, monkeypatch
+    ):
+        monkeypatch.setattr("backend.main.grading_pool", pool)
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        started = await client.post("/api/admin/regrade", json={"task_ids": [graded_task.id]})
+        while regrade_runner.running:
+            await asyncio.sleep(0.05)
+        progress = await client.get("/api/admin/regrade")
+        client.cookies.clear()
+
+        assert started.status_code == status.HTTP_202_ACCEPTED
+        payload = progress.json()
+        assert payload["running"] is False
+        assert payload["error"] is None
+        assert [(task["status"], task["changed"]) for task in payload["tasks"]] == [(FINISHED, 3)]
+        assert await verdicts(db_session, graded_task) == [True, False, True, True, False, False, None]
+
+    async def test_rejects_unknown_tasks(self, client, graded_task, test_teacher):
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        response = await client.post("/api/admin/regrade", json={"task_ids": [graded_task.id, 999]})
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json()["detail"] == "Tasks not found: 999"
+        assert regrade_runner.runs == 0
+
+    async def test_other_teachers_tasks(self, client, db_session, graded_task, test_teacher):
+        other = Teacher(username="other", email="other@example.com")
+        other.set_password("otherpassword123")
+        db_session.add(other)
+        await db_session.flush()
+        # Verdicts of other teachers' tasks are off limits, public or not
+        shared, private = (
+            Parsons(
+                created_by_teacher_id=other.id,
+                title=title,
+                description="{}",
+                task_type="normal",
+                code_blocks={"blocks": [], "function_header": HEADER},
+                correct_solution={},
+                is_public=is_public,
+            )
+            for title, is_public in (("shared", True), ("private", False))
+        )
+        db_session.add_all([shared, private])
+        await db_session.commit()
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        refused = await client.post("/api/admin/regrade", json={"task_ids": [shared.id, private.id]})
+        public = await client.post("/api/admin/regrade", json={"task_ids": [graded_task.id, shared.id]})
+        started = await client.post("/api/admin/regrade", json={"task_ids": [graded_task.id]})
+        await regrade_runner.stop()
+        client.cookies.clear()
+
+        assert refused.status_code == status.HTTP_403_FORBIDDEN
+        assert refused.json()["detail"] == f"Not allowed to re-grade tasks: {shared.id}, {private.id}"
+        assert public.status_code == status.HTTP_403_FORBIDDEN
+        assert public.json()["detail"] == f"Not allowed to re-grade tasks: {shared.id}"
+        assert started.status_code == status.HTTP_202_ACCEPTED
+        assert started.json()["task_ids"] == [graded_task.id]
+        assert regrade_runner.runs == 1
+
+    async def test_requires_teacher(self, client, graded_task):
+        response = await client.post("/api/admin/regrade", json={"task_ids": [graded_task.id]})
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
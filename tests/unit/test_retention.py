@@ -0,0 +1,228 @@
+"""
+Unit tests for retention.py - partitioning, archival and session purging.
+"""
+
+import csv
+import gzip
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+
+from backend.models import MoveEvent, Parsons, StudentSession, TaskAttempt
+from backend.retention import (
+    PARTITIONED_TABLES,
+    add_months,
+    archive_rows,
+    ensure_partitions,
+    partition_tables,
+    purge_sessions,
+    retention_cutoff,
+    run_retention,
+)
+
+NOW = datetime(2026, 6, 15, 12, 0, tzinfo=timezone.utc)
+OLD = datetime(2023, 3, 10, 9, 30, tzinfo=timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def task(db_session, test_teacher):
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="Retention",
+        description="{}",
+        task_type="normal",
+        code_blocks={},
+        correct_solution={},
+    )
+    db_session.add(task)
+    await db_session.commit()
+    return task
+
+
+async def add_session(db_session, task, last_activity: datetime, attempts: int = 0) -> StudentSession:
+    student = StudentSession(
+        session_id=uuid.uuid4(), started_at=last_activity, last_activity_at=last_activity
+    )
+    db_session.add(student)
+    await db_session.flush()
+    for _ in range(attempts):
+        attempt = TaskAttempt(
+            student_session_id=student.id,
+            task_id=task.id,
+            task_started_at=last_activity,
+            success=True,
+        )
+        db_session.add(attempt)
+        await db_session.flush()
+        db_session.add(MoveEvent(attempt_id=attempt.id, event_time=last_activity, block_id="1"))
+    await db_session.commit()
+    return student
+
+
+async def count(db_session, model) -> int:
+    result = await db_session.execute(select(func.count()).select_from(model))
+    return result.scalar_one()
+
+
+class TestMonths:
+    """Tests for the month arithmetic."""
+
+    def test_add_months_crosses_years(self):
+        assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+        assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+    def test_cutoff_is_start_of_month(self):
+        assert retention_cutoff(NOW, 24) == datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+class TestPartitioning:
+    """Partitioning is PostgreSQL only."""
+
+    async def test_noop_outside_postgres(self, db_engine):
+        async with db_engine.begin() as conn:
+            await partition_tables(conn)
+            assert await ensure_partitions(conn, NOW) == 0
+
+    def test_partition_names(self):
+        assert PARTITIONED_TABLES[1].partition_name(date(2026, 2, 1)) == "task_attempts_p202602"
+
+    async def test_postgres_conversion_ddl(self):
+        """The statements partition_tables sends to PostgreSQL (no server needed)."""
+        partitioned = set()
+
+        async def respond(statement, params=None):
+            sql = str(statement.compile(dialect=postgresql.dialect()))
+            result = MagicMock()
+            if sql.startswith("SELECT relkind"):
+                name = params["name"]
+                kind = "p" if name in partitioned else "r" if name in ("task_attempts", "move_events") else None
+                result.scalar_one_or_none.return_value = kind
+            elif sql.startswith("SELECT pg_get_serial_sequence"):
+                result.scalar_one.return_value = f"public.{params['table']}_id_seq"
+            elif sql.startswith("SELECT pg_get_constraintdef"):
+                result.scalars.return_value.all.return_value = (
+                    ["FOREIGN KEY (student_session_id) REFERENCES student_sessions(id) ON DELETE CASCADE"]
+                    if params["table"] == "task_attempts"
+                    else []
+                )
+            elif sql.startswith("SELECT CAST(conrelid"):
+                result.all.return_value = (
+                    [("move_events", "move_events_attempt_id_fkey")] if params["table"] == "task_attempts" else []
+                )
+            elif sql.startswith("SELECT min"):
+                result.one.return_value = (OLD, OLD + timedelta(days=40))
+            elif sql.startswith("CREATE TABLE") and "PARTITION BY" in sql:
+                partitioned.add(sql.split()[2])
+            return result
+
+        conn = MagicMock()
+        conn.dialect = postgresql.dialect()
+        conn.execute = AsyncMock(side_effect=respond)
+
+        await partition_tables(conn)
+
+        statements = [
+            str(call.args[0].compile(dialect=postgresql.dialect())).strip()
+            for call in conn.execute.await_args_list
+        ]
+        ddl = [sql for sql in statements if not sql.startswith("SELECT")]
+        attempts = ddl[: ddl.index("DROP TABLE task_attempts_unpartitioned") + 1]
+        assert attempts[:2] == [
+            "ALTER TABLE task_attempts RENAME TO task_attempts_unpartitioned",
+            "ALTER INDEX task_attempts_pkey RENAME TO task_attempts_unpartitioned_pkey",
+        ]
+        assert set(attempts[2:5]) == {
+            "DROP INDEX IF EXISTS ix_task_attempts_task_id_success",
+            "DROP INDEX IF EXISTS ix_task_attempts_session_task_completed",
+            "DROP INDEX IF EXISTS ix_task_attempts_task_fingerprint",
+        }
+        assert attempts[5:9] == [
+            "CREATE TABLE task_attempts (LIKE task_attempts_unpartitioned INCLUDING DEFAULTS "
+            "INCLUDING CONSTRAINTS) PARTITION BY RANGE (task_started_at)",
+            "ALTER TABLE task_attempts ALTER COLUMN task_started_at SET NOT NULL",
+            "ALTER TABLE task_attempts ADD PRIMARY KEY (id, task_started_at)",
+            "ALTER SEQUENCE public.task_attempts_id_seq OWNED BY task_attempts.id",
+        ]
+        assert attempts[9:16] == [
+            "ALTER TABLE task_attempts ADD FOREIGN KEY (student_session_id) "
+            "REFERENCES student_sessions(id) ON DELETE CASCADE",
+            "CREATE TABLE task_attempts_default PARTITION OF task_attempts DEFAULT",
+            "CREATE TABLE task_attempts_p202303 PARTITION OF task_attempts "
+            "FOR VALUES FROM ('2023-03-01T00:00:00+00:00') TO ('2023-04-01T00:00:00+00:00')",
+            "CREATE TABLE task_attempts_p202304 PARTITION OF task_attempts "
+            "FOR VALUES FROM ('2023-04-01T00:00:00+00:00') TO ('2023-05-01T00:00:00+00:00')",
+            "INSERT INTO task_attempts SELECT * FROM task_attempts_unpartitioned",
+            # The foreign key of move_events is dropped by name, not by CASCADE
+            "ALTER TABLE move_events DROP CONSTRAINT move_events_attempt_id_fkey",
+            "DROP TABLE task_attempts_unpartitioned",
+        ]
+        assert all("CASCADE" not in sql or "ON DELETE CASCADE" in sql for sql in ddl)
+        assert "CREATE INDEX ix_task_attempts_task_id_success ON task_attempts (task_id, success)" in ddl
+        assert "CREATE INDEX ix_move_events_attempt_id ON move_events (attempt_id)" in ddl
+        assert partitioned == {"task_attempts", "move_events"}
+
+
+class TestPurgeSessions:
+    """Tests for purge_sessions."""
+
+    async def test_purges_expired_idle_and_old_sessions(self, db_engine, db_session, task):
+        await add_session(db_session, task, NOW - timedelta(days=2))
+        active = await add_session(db_session, task, NOW - timedelta(hours=1))
+        with_history = await add_session(db_session, task, NOW - timedelta(days=30), attempts=2)
+        await add_session(db_session, task, OLD, attempts=1)
+
+        purged = await purge_sessions(db_engine, retention_cutoff(NOW, 24), NOW, batch_size=1)
+
+        assert purged == 2
+        result = await db_session.execute(select(StudentSession.id))
+        assert set(result.scalars()) == {active.id, with_history.id}
+        assert await count(db_session, TaskAttempt) == 2
+        assert await count(db_session, MoveEvent) == 2
+
+    async def test_workers_drop_cached_analytics_of_purged_attempts(
+        self, db_engine, db_session, task, monkeypatch
+    ):
+        notified = AsyncMock()
+        monkeypatch.setattr("backend.retention.notify_invalidation", notified)
+        await add_session(db_session, task, OLD, attempts=1)
+        await add_session(db_session, task, NOW - timedelta(days=2))
+
+        await purge_sessions(db_engine, retention_cutoff(NOW, 24), NOW)
+
+        (_, scopes), = [call.args for call in notified.await_args_list]
+        assert scopes == [("task", task.id)]
+
+
+class TestArchiveRows:
+    """Tests for the row-by-row archive path used outside monthly partitions."""
+
+    async def test_archives_old_rows_to_gzip_csv(self, db_engine, db_session, task, tmp_path):
+        await add_session(db_session, task, OLD, attempts=3)
+        await add_session(db_session, task, NOW - timedelta(days=30), attempts=1)
+        cutoff = retention_cutoff(NOW, 24)
+
+        moves = await archive_rows(db_engine, PARTITIONED_TABLES[0], cutoff, tmp_path, batch_size=2)
+        attempts = await archive_rows(db_engine, PARTITIONED_TABLES[1], cutoff, tmp_path, batch_size=2)
+
+        assert (moves, attempts) == (3, 3)
+        assert await count(db_session, TaskAttempt) == 1
+        assert await count(db_session, MoveEvent) == 1
+        [archive] = (tmp_path / "task_attempts").glob("*.csv.gz")
+        with gzip.open(archive, "rt", newline="") as f:
+            rows = list(csv.reader(f))
+        assert rows[0][:2] == ["id", "student_session_id"]
+        assert len(rows) == 4
+
+    async def test_run_retention_reports_counts(self, db_engine, db_session, task, tmp_path):
+        await add_session(db_session, task, OLD, attempts=1)
+
+        report = await run_retention(db_engine, NOW, 24, tmp_path)
+
+        assert report["partitions_archived"] == 0
+        assert report["rows_archived"] == {"move_events": 1, "task_attempts": 1}
+        assert report["sessions_purged"] == 1
+        assert await count(db_session, StudentSession) == 0
@@ -0,0 +1,173 @@
+"""
+Unit tests for solve_times.py - persisted per-task solve-time sketches.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.auth import create_access_token
+from backend.models import Parsons, SolveTimeSketch, StudentSession, TaskAttempt, TaskList
+from backend.solve_times import (
+    TASK,
+    TASKLIST,
+    SolveTimeSketches,
+    rebuild_solve_time_sketches,
+    solve_time_sketches,
+)
+from backend.task_stats import record_attempts
+
+T0 = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def session_factory(db_engine):
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest_asyncio.fixture
+async def context(db_session, test_teacher):
+    task_list = TaskList(title="Times", unique_link_code="TIME01", teacher_id=test_teacher.id)
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="Timed",
+        description="{}",
+        task_type="normal",
+        code_blocks={},
+        correct_solution={},
+    )
+    db_session.add_all([task_list, task])
+    await db_session.flush()
+    student = StudentSession(session_id=uuid.uuid4(), task_list_id=task_list.id, username="t")
+    db_session.add(student)
+    await db_session.commit()
+    return task_list, task, student
+
+
+def make_row(student, task, seconds: float, success: bool = True) -> dict:
+    return {
+        "student_session_id": student.id,
+        "task_id": task.id,
+        "task_started_at": T0,
+        "completed_at": T0 + timedelta(seconds=seconds),
+        "success": success,
+    }
+
+
+class TestStaging:
+    """Solve times follow the submitting transaction."""
+
+    async def test_added_after_commit_only(self, db_session, context):
+        _, task, student = context
+        pending_before = solve_time_sketches.stats()["samples"]
+
+        await record_attempts(db_session, [make_row(student, task, 30)])
+        assert solve_time_sketches.stats()["samples"] == pending_before
+        await db_session.commit()
+
+        assert solve_time_sketches.stats()["samples"] == pending_before + 1
+        summary = await solve_time_sketches.summary(db_session, TASK, task.id)
+        assert summary["count"] == 1
+
+    async def test_rolled_back_submissions_are_dropped(self, db_session, context):
+        _, task, student = context
+        task_id = task.id
+
+        await record_attempts(db_session, [make_row(student, task, 30)])
+        await db_session.rollback()
+
+        summary = await solve_time_sketches.summary(db_session, TASK, task_id)
+        assert summary["count"] == 0
+
+    async def test_failed_attempts_have_no_solve_time(self, db_session, context):
+        _, task, student = context
+
+        await record_attempts(db_session, [make_row(student, task, 30, success=False)])
+        await db_session.commit()
+
+        assert (await solve_time_sketches.summary(db_session, TASK, task.id))["count"] == 0
+
+
+class TestPersistence:
+    """Flushing merges per-worker deltas into one stored sketch."""
+
+    async def test_workers_merge_on_flush(self, db_session, session_factory, context):
+        task_list, task, _ = context
+        workers = [SolveTimeSketches(flush_interval=0), SolveTimeSketches(flush_interval=0)]
+        for worker, seconds in zip(workers, ([10, 20, 30], [40, 50])):
+            for value in seconds:
+                worker.add(task.id, task_list.id, value)
+
+        for worker in workers:
+            assert await worker.flush(session_factory) == 2
+
+        fresh = SolveTimeSketches(flush_interval=0)
+        merged = await fresh.get(db_session, TASK, task.id)
+        assert merged.count == 5
+        assert abs(merged.quantile(0.5) - 30) <= 0.3
+        assert (await fresh.get(db_session, TASKLIST, task_list.id)).count == 5
+
+    async def test_query_includes_unflushed_delta(self, db_session, session_factory, context):
+        _, task, _ = context
+        worker = SolveTimeSketches(flush_interval=0)
+        worker.add(task.id, None, 10)
+        await worker.flush(session_factory)
+        worker.add(task.id, None, 20)
+
+        assert (await worker.get(db_session, TASK, task.id)).count == 2
+
+    async def test_failed_flush_keeps_deltas(self, context):
+        _, task, _ = context
+        worker = SolveTimeSketches(flush_interval=0)
+        worker.add(task.id, None, 10)
+
+        def broken_factory():
+            raise RuntimeError("database down")
+
+        try:
+            await worker.flush(broken_factory)
+        except RuntimeError:
+            pass
+
+        assert worker.stats()["pending_sketches"] == 1
+
+    async def test_rebuild_from_attempts(self, db_engine, db_session, context):
+        task_list, task, student = context
+        db_session.add_all(
+            [TaskAttempt(**make_row(student, task, seconds)) for seconds in (5, 15)]
+            + [TaskAttempt(**make_row(student, task, 99, success=False))]
+        )
+        await db_session.commit()
+
+        async with db_engine.begin() as conn:
+            assert await rebuild_solve_time_sketches(conn) == 2
+
+        result = await db_session.execute(
+            select(SolveTimeSketch.scope, SolveTimeSketch.sample_count).order_by(SolveTimeSketch.scope)
+        )
+        assert result.all() == [(TASK, 2), (TASKLIST, 2)]
+
+
+class TestSolveTimeEndpoints:
+    """Tests for the solve-time analytics API."""
+
+    async def test_task_and_tasklist_endpoints(self, client, db_session, test_teacher, context):
+        task_list, task, student = context
+        await record_attempts(db_session, [make_row(student, task, s) for s in (10, 20, 30)])
+        await db_session.commit()
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        task_response = await client.get(f"/api/analytics/tasks/{task.id}/solve-times")
+        list_response = await client.get(f"/api/analytics/tasklists/{task_list.id}/solve-times")
+        client.cookies.clear()
+
+        assert task_response.status_code == status.HTTP_200_OK
+        body = task_response.json()
+        assert body["count"] == 3
+        assert body["min"] == 10.0 and body["max"] == 30.0
+        assert abs(body["p50"] - 20) <= 0.2
+        assert list_response.json()["count"] == 3
@@ -0,0 +1,105 @@
+"""
+Unit tests for student_progress.py and GET /api/problemsets/{code}/progress.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest_asyncio
+from fastapi import status
+
+from backend.models import Parsons, StudentSession, TaskAttempt, TaskList, TaskListItem
+from backend.student_progress import student_progress
+
+T0 = datetime(2026, 3, 1, 10, 0, tzinfo=timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def problemset(db_session, test_teacher):
+    task_list = TaskList(title="Progress", unique_link_code="PROG01", teacher_id=test_teacher.id)
+    db_session.add(task_list)
+    await db_session.flush()
+    tasks = []
+    for title in ("Solved", "Failed", "Open", "Untouched"):
+        task = Parsons(
+            created_by_teacher_id=test_teacher.id,
+            title=title,
+            description="{}",
+            task_type="normal",
+            code_blocks={},
+            correct_solution={},
+        )
+        db_session.add(task)
+        await db_session.flush()
+        db_session.add(TaskListItem(task_list_id=task_list.id, task_id=task.id))
+        tasks.append(task)
+
+    student = StudentSession(session_id=uuid.uuid4(), username="learner", task_list_id=task_list.id)
+    other = StudentSession(session_id=uuid.uuid4(), username="other", task_list_id=task_list.id)
+    db_session.add_all([student, other])
+    await db_session.flush()
+
+    solved, failed, open_task, _ = tasks
+    for offset, success in ((1, False), (2, True), (3, True)):
+        db_session.add(
+            TaskAttempt(
+                student_session_id=student.id,
+                task_id=solved.id,
+                completed_at=T0 + timedelta(minutes=offset),
+                success=success,
+            )
+        )
+    db_session.add(
+        TaskAttempt(student_session_id=student.id, task_id=failed.id, completed_at=T0, success=False)
+    )
+    db_session.add(TaskAttempt(student_session_id=student.id, task_id=open_task.id))
+    db_session.add(
+        TaskAttempt(student_session_id=other.id, task_id=failed.id, completed_at=T0, success=True)
+    )
+    await db_session.commit()
+    return task_list, student, tasks
+
+
+class TestStudentProgress:
+    """Tests for the single-query progress aggregation."""
+
+    async def test_best_result_per_task(self, db_session, problemset):
+        task_list, student, tasks = problemset
+
+        progress = await student_progress(db_session, task_list.id, student.id)
+
+        assert [(p["title"], p["status"], p["attempts"]) for p in progress] == [
+            ("Solved", "solved", 3),
+            ("Failed", "failed", 1),
+            ("Open", "in_progress", 1),
+            ("Untouched", "not_started", 0),
+        ]
+        assert progress[0]["first_success_at"].replace(tzinfo=timezone.utc) == T0 + timedelta(minutes=2)
+        assert progress[1]["first_success_at"] is None
+        assert progress[3]["best_attempt_id"] is None
+
+
+class TestProgressEndpoint:
+    """Tests for GET /api/problemsets/{code}/progress."""
+
+    async def test_returns_current_session_progress(self, client, problemset):
+        _, student, _ = problemset
+        client.cookies.set("student_session", str(student.session_id))
+
+        response = await client.get("/api/problemsets/PROG01/progress")
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        payload = response.json()
+        assert [item["status"] for item in payload] == ["solved", "failed", "in_progress", "not_started"]
+        assert payload[0]["first_success_at"].startswith("2026-03-01T10:02:00")
+
+    async def test_requires_student_session(self, client, problemset):
+        response = await client.get("/api/problemsets/PROG01/progress")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_unknown_code(self, client):
+        response = await client.get("/api/problemsets/NOPE/progress")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,123 @@
+"""
+Unit tests for task_catalog.py - precomputed public task listing.
+"""
+
+import json
+
+from fastapi import status
+from sqlalchemy import select
+
+from backend.models import Parsons
+from backend.task_catalog import (
+    TaskCatalog,
+    TaskCatalogEntry,
+    extract_description_text,
+    task_catalog,
+)
+
+
+def make_task(teacher_id: int, title: str, **overrides) -> Parsons:
+    values = dict(
+        created_by_teacher_id=teacher_id,
+        title=title,
+        description=json.dumps({"description": f"{title} text"}),
+        task_type="normal",
+        code_blocks={"blocks": []},
+        correct_solution={"correct_order": []},
+        is_public=True,
+    )
+    values.update(overrides)
+    return Parsons(**values)
+
+
+class TestExtractDescriptionText:
+    """Tests for extract_description_text helper."""
+
+    def test_extracts_description(self):
+        assert extract_description_text('{"description": "Hi"}') == "Hi"
+
+    def test_invalid_json_returns_empty(self):
+        assert extract_description_text("not json") == ""
+        assert extract_description_text(None) == ""
+
+
+class TestTaskCatalog:
+    """Tests for catalog loading and refresh."""
+
+    def test_entries_use_slots(self):
+        assert not hasattr(TaskCatalogEntry.__new__(TaskCatalogEntry), "__dict__")
+
+    async def test_prefers_precomputed_description_text(self, db_session, test_teacher):
+        db_session.add(make_task(test_teacher.id, "A", description_text="Stored text"))
+        await db_session.commit()
+
+        body = await TaskCatalog().get_body(db_session)
+
+        assert json.loads(body)[0]["description"] == "Stored text"
+
+    async def test_body_is_reused_between_requests(self, db_session, test_teacher):
+        db_session.add(make_task(test_teacher.id, "A"))
+        await db_session.commit()
+        catalog = TaskCatalog(check_interval=60)
+
+        first = await catalog.get_body(db_session)
+        second = await catalog.get_body(db_session)
+
+        assert second is first
+        assert catalog.stats()["version"] == 1
+
+    async def test_update_refreshes_incrementally(self, db_session, test_teacher):
+        task = make_task(test_teacher.id, "A")
+        db_session.add_all([task, make_task(test_teacher.id, "B")])
+        await db_session.commit()
+        catalog = TaskCatalog(check_interval=0)
+        await catalog.get_body(db_session)
+
+        task.title = "A renamed"
+        await db_session.commit()
+        body = await catalog.get_body(db_session)
+
+        assert [t["title"] for t in json.loads(body)] == ["A renamed", "B"]
+        assert catalog.stats()["incremental_loads"] == 1
+        assert catalog.stats()["full_loads"] == 1
+        assert catalog.stats()["version"] == 2
+
+    async def test_orm_write_marks_shared_catalog_stale(self, db_session, test_teacher):
+        await task_catalog.get_body(db_session)
+        assert not task_catalog.stale
+
+        db_session.add(make_task(test_teacher.id, "New"))
+        await db_session.commit()
+
+        assert task_catalog.stale
+        assert b"New" in await task_catalog.get_body(db_session)
+
+    async def test_hidden_and_deleted_tasks_leave_catalog(self, db_session, test_teacher):
+        a, b, c = (make_task(test_teacher.id, t) for t in "ABC")
+        db_session.add_all([a, b, c])
+        await db_session.commit()
+        await task_catalog.get_body(db_session)
+
+        b.is_public = False
+        await db_session.delete(c)
+        await db_session.commit()
+        body = await task_catalog.get_body(db_session)
+
+        assert [t["title"] for t in json.loads(body)] == ["A"]
+
+
+class TestListTasksEndpoint:
+    """Tests for /api/tasks served from the catalog."""
+
+    async def test_list_tasks_serves_catalog_body(self, client, db_session, test_teacher):
+        db_session.add(make_task(test_teacher.id, "Listed"))
+        await db_session.commit()
+
+        response = await client.get("/api/tasks")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/json"
+        payload = response.json()
+        assert payload[0]["title"] == "Listed"
+        assert payload[0]["description"] == "Listed text"
+        assert set(payload[0]) == {"id", "title", "description", "task_type", "created_at"}
@@ -0,0 +1,230 @@
+"""
+Unit tests for task_stats.py - incrementally maintained rollup table.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.attempt_writer import AttemptWriteBuffer
+from backend.auth import create_access_token
+from backend.models import Parsons, StudentSession, TaskAttempt, TaskList, TaskStats
+from backend.task_stats import rebuild_task_stats, record_attempts, solve_seconds
+
+T0 = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def make_row(session, task, seconds: float, success: bool) -> dict:
+    return {
+        "student_session_id": session.id,
+        "task_id": task.id,
+        "task_started_at": T0,
+        "completed_at": T0 + timedelta(seconds=seconds),
+        "success": success,
+        "submitted_inputs": {"code": "pass"},
+    }
+
+
+async def insert_attempts(db, rows, task_list_ids=None):
+    """Record rows in the rollup and insert them, like submit_test_result."""
+    for row in rows:
+        await record_attempts(db, [row], task_list_ids)
+        db.add(TaskAttempt(**row))
+        await db.flush()
+    await db.commit()
+
+
+def _round(value):
+    # SQLite computes durations from julianday(), accurate to about a millisecond
+    return round(value, 2) if value is not None else None
+
+
+async def stats_rows(db) -> dict:
+    result = await db.execute(
+        select(TaskStats).execution_options(populate_existing=True)
+    )
+    return {
+        (row.task_list_id, row.task_id): (
+            row.attempt_count,
+            row.success_count,
+            row.session_count,
+            _round(row.solve_seconds_sum),
+            _round(row.solve_seconds_min),
+            _round(row.solve_seconds_max),
+        )
+        for row in result.scalars()
+    }
+
+
+@pytest_asyncio.fixture
+async def context(db_session, test_teacher):
+    """A task list with one task and two sessions, plus a session without a list."""
+    task_list = TaskList(title="Rollup", unique_link_code="ROLL01", teacher_id=test_teacher.id)
+    task = Parsons(
+        created_by_teacher_id=test_teacher.id,
+        title="Rollup Task",
+        description="{}",
+        task_type="normal",
+        code_blocks={},
+        correct_solution={},
+    )
+    db_session.add_all([task_list, task])
+    await db_session.flush()
+    sessions = [
+        StudentSession(session_id=uuid.uuid4(), task_list_id=list_id, username=f"s{i}")
+        for i, list_id in enumerate((task_list.id, task_list.id, None))
+    ]
+    db_session.add_all(sessions)
+    await db_session.commit()
+    return task_list, task, sessions
+
+
+class TestSolveSeconds:
+    """Tests for the per-attempt duration helper."""
+
+    def test_only_successful_attempts_have_a_duration(self):
+        row = {"task_started_at": T0, "completed_at": T0 + timedelta(seconds=3)}
+
+        assert solve_seconds({**row, "success": True}) == 3.0
+        assert solve_seconds({**row, "success": False}) is None
+
+    def test_naive_timestamps_are_utc(self):
+        row = {
+            "task_started_at": T0.replace(tzinfo=None),
+            "completed_at": T0 + timedelta(seconds=2),
+            "success": True,
+        }
+
+        assert solve_seconds(row) == 2.0
+
+
+class TestRecordAttempts:
+    """Tests for incremental upserts."""
+
+    async def test_totals_accumulate(self, db_session, context):
+        task_list, task, (a, b, _) = context
+
+        await insert_attempts(
+            db_session,
+            [
+                make_row(a, task, 10, False),
+                make_row(a, task, 30, True),
+                make_row(b, task, 20, True),
+            ],
+        )
+
+        assert await stats_rows(db_session) == {
+            (task_list.id, task.id): (3, 2, 2, 50.0, 20.0, 30.0)
+        }
+
+    async def test_batch_counts_each_session_once(self, db_session, context):
+        task_list, task, (a, _, _) = context
+        rows = [make_row(a, task, 5, True), make_row(a, task, 7, True)]
+
+        await record_attempts(db_session, rows)
+        await db_session.commit()
+
+        assert await stats_rows(db_session) == {
+            (task_list.id, task.id): (2, 2, 1, 12.0, 5.0, 7.0)
+        }
+
+    async def test_sessions_without_task_list_are_skipped(self, db_session, context):
+        _, task, (_, _, no_list) = context
+
+        assert await record_attempts(db_session, [make_row(no_list, task, 5, True)]) == 0
+        assert await stats_rows(db_session) == {}
+
+
+class TestRebuild:
+    """Tests for recomputing the rollup from task_attempts."""
+
+    async def test_rebuild_matches_incremental_totals(self, db_session, context):
+        _, task, (a, b, no_list) = context
+        await insert_attempts(
+            db_session,
+            [
+                make_row(a, task, 10, False),
+                make_row(a, task, 30, True),
+                make_row(b, task, 20, True),
+                make_row(no_list, task, 1, True),
+            ],
+        )
+        incremental = await stats_rows(db_session)
+
+        await rebuild_task_stats(db_session)
+        await db_session.commit()
+
+        assert await stats_rows(db_session) == incremental
+
+
+class TestSubmissionPaths:
+    """The rollup follows both submission paths."""
+
+    async def test_submit_endpoint_updates_rollup(self, client, db_session, context):
+        task_list, task, (a, _, _) = context
+
+        client.cookies.set("student_session", str(a.session_id))
+        response = await client.post(
+            f"/api/tasks/{task.id}/submit-result",
+            json={
+                "task_id": task.id,
+                "success": True,
+                "submitted_code": "pass",
+                "test_output": "ok",
+                "repr_code": "pass",
+                "start_time": (datetime.now(timezone.utc) - timedelta(seconds=30)).isoformat(),
+            },
+        )
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        attempts, successes, sessions, total, _, _ = (await stats_rows(db_session))[
+            (task_list.id, task.id)
+        ]
+        assert (attempts, successes, sessions) == (1, 1, 1)
+        assert 29 < total < 60
+
+    async def test_write_behind_flush_updates_rollup(self, db_engine, db_session, context):
+        task_list, task, (a, b, _) = context
+        buffer = AttemptWriteBuffer(flush_interval_ms=10)
+        buffer.start(async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False))
+
+        await buffer.submit(make_row(a, task, 4, True))
+        await buffer.submit(make_row(b, task, 6, False))
+        await buffer.stop()
+
+        assert await stats_rows(db_session) == {
+            (task_list.id, task.id): (2, 1, 2, 4.0, 4.0, 4.0)
+        }
+
+
+class TestSummaryEndpoint:
+    """Tests for GET /api/analytics/tasklists/{id}/summary."""
+
+    async def test_summary_reads_rollup(self, client, db_session, test_teacher, context):
+        task_list, task, (a, b, _) = context
+        await insert_attempts(
+            db_session, [make_row(a, task, 10, True), make_row(b, task, 20, False)]
+        )
+        client.cookies.set("access_token", create_access_token({"sub": test_teacher.username}))
+
+        response = await client.get(f"/api/analytics/tasklists/{task_list.id}/summary")
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [
+            {
+                "task_id": task.id,
+                "attempt_count": 2,
+                "success_count": 1,
+                "session_count": 2,
+                "success_rate": 0.5,
+                "avg_solve_seconds": 10.0,
+                "min_solve_seconds": 10.0,
+                "max_solve_seconds": 10.0,
+            }
+        ]
@@ -0,0 +1,155 @@
+"""
+Unit tests for tasklist_cache.py - cached link code resolution.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from fastapi import status
+from sqlalchemy import select
+
+from backend.models import TaskList
+from backend.tasklist_cache import TaskListRef, TaskListResolver, tasklist_resolver
+
+
+class TestTaskListResolver:
+    """Tests for TaskListResolver caching behaviour."""
+
+    async def test_resolve_returns_snapshot_and_caches(self, db_session, test_teacher):
+        db_session.add(
+            TaskList(title="Cached", unique_link_code="CACHE01", teacher_id=test_teacher.id)
+        )
+        await db_session.commit()
+        resolver = TaskListResolver()
+
+        first = await resolver.resolve("CACHE01", db_session)
+        second = await resolver.resolve("CACHE01", db_session)
+
+        assert isinstance(first, TaskListRef)
+        assert first.title == "Cached"
+        assert first.teacher_id == test_teacher.id
+        assert second is first
+        stats = resolver.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+
+    async def test_resolve_caches_negative_results(self, db_session):
+        resolver = TaskListResolver()
+
+        with patch.object(resolver, "_load", wraps=resolver._load) as load:
+            assert await resolver.resolve("MISSING", db_session) is None
+            assert await resolver.resolve("MISSING", db_session) is None
+
+        assert load.await_count == 1
+        assert resolver.stats()["negative_hits"] == 1
+
+    async def test_entries_expire_after_ttl(self, db_session):
+        resolver = TaskListResolver(negative_ttl=0)
+
+        with patch.object(resolver, "_load", wraps=resolver._load) as load:
+            await resolver.resolve("MISSING", db_session)
+            await resolver.resolve("MISSING", db_session)
+
+        assert load.await_count == 2
+
+    async def test_entry_does_not_outlive_task_list_expiry(self, db_session, test_teacher):
+        db_session.add(
+            TaskList(
+                title="Expired",
+                unique_link_code="EXPIRED01",
+                teacher_id=test_teacher.id,
+                expires_at=datetime.now(timezone.utc) - timedelta(minutes=1),
+            )
+        )
+        await db_session.commit()
+        resolver = TaskListResolver()
+
+        await resolver.resolve("EXPIRED01", db_session)
+
+        assert resolver.stats()["size"] == 0
+
+    async def test_lru_eviction(self, db_session):
+        resolver = TaskListResolver(max_entries=2)
+
+        for code in ("A", "B", "C"):
+            await resolver.resolve(code, db_session)
+
+        stats = resolver.stats()
+        assert stats["size"] == 2
+        assert stats["evictions"] == 1
+        assert "A" not in resolver._entries
+
+    async def test_concurrent_misses_share_one_query(self, db_session):
+        resolver = TaskListResolver()
+        gate = asyncio.Event()
+        calls = 0
+
+        async def slow_load(code, db):
+            nonlocal calls
+            calls += 1
+            await gate.wait()
+            return None
+
+        with patch.object(resolver, "_load", slow_load):
+            tasks = [
+                asyncio.create_task(resolver.resolve("SHARED", db_session))
+                for _ in range(10)
+            ]
+            await asyncio.sleep(0)
+            gate.set()
+            results = await asyncio.gather(*tasks)
+
+        assert results == [None] * 10
+        assert calls == 1
+
+    async def test_orm_writes_invalidate_cached_code(self, db_session, test_teacher):
+        assert await tasklist_resolver.resolve("LATER01", db_session) is None
+
+        db_session.add(
+            TaskList(title="Later", unique_link_code="LATER01", teacher_id=test_teacher.id)
+        )
+        await db_session.commit()
+        created = await tasklist_resolver.resolve("LATER01", db_session)
+        assert created is not None
+
+        result = await db_session.execute(
+            select(TaskList).where(TaskList.unique_link_code == "LATER01")
+        )
+        task_list = result.scalar_one()
+        task_list.unique_link_code = "LATER02"
+        await db_session.commit()
+
+        assert await tasklist_resolver.resolve("LATER01", db_session) is None
+        assert (await tasklist_resolver.resolve("LATER02", db_session)).id == created.id
+
+
+class TestResolverInRoutes:
+    """Tests for the resolver shared by the /set/... routes."""
+
+    async def test_set_routes_share_cached_lookup(self, client, db_session, test_teacher):
+        db_session.add(
+            TaskList(title="Shared", unique_link_code="SHARE01", teacher_id=test_teacher.id)
+        )
+        await db_session.commit()
+        before = tasklist_resolver.stats()
+
+        for path in (
+            "/set/SHARE01",
+            "/set/SHARE01/tasks",
+            "/set/SHARE01/tasks/1",
+            "/set/SHARE01/tasks/1/description",
+            "/set/SHARE01/tasks/1/start",
+            "/api/problemsets/SHARE01/tasks",
+        ):
+            response = await client.get(path)
+            assert response.status_code == status.HTTP_200_OK
+
+        stats = tasklist_resolver.stats()
+        assert stats["misses"] - before["misses"] == 1
+        assert stats["hits"] - before["hits"] == 5
+
+    async def test_metrics_endpoint_requires_auth(self, client):
+        response = await client.get("/api/metrics")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
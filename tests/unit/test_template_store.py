@@ -0,0 +1,119 @@
+"""
+Unit tests for template_store.py - in-memory HTML templates with ETags.
+"""
+
+import gzip
+import os
+
+import brotli
+from fastapi import status
+
+from backend.auth import create_access_token
+from backend.models import TaskList
+from backend.template_store import TemplateStore
+
+
+class TestTemplateStore:
+    """Tests for TemplateStore loading and reloading."""
+
+    def test_load_reads_all_html_files(self, tmp_path):
+        (tmp_path / "a.html").write_text("<p>a</p>")
+        (tmp_path / "b.html").write_text("<p>b</p>")
+        (tmp_path / "notes.txt").write_text("ignored")
+        store = TemplateStore(tmp_path)
+
+        store.load()
+
+        assert store.get("a.html").body == b"<p>a</p>"
+        assert store.get("b.html").body == b"<p>b</p>"
+        assert gzip.decompress(store.get("a.html").gzip_body) == b"<p>a</p>"
+        assert brotli.decompress(store.get("a.html").brotli_body) == b"<p>a</p>"
+
+    def test_without_auto_reload_keeps_loaded_content(self, tmp_path):
+        page = tmp_path / "page.html"
+        page.write_text("v1")
+        store = TemplateStore(tmp_path, auto_reload=False)
+        store.load()
+
+        page.write_text("v2")
+
+        assert store.get("page.html").body == b"v1"
+
+    def test_auto_reload_picks_up_changes(self, tmp_path):
+        page = tmp_path / "page.html"
+        page.write_text("v1")
+        store = TemplateStore(tmp_path, auto_reload=True)
+        etag_v1 = store.get("page.html").etag_base
+
+        page.write_text("v2")
+        stat = page.stat()
+        os.utime(page, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert store.get("page.html").body == b"v2"
+        assert store.get("page.html").etag_base != etag_v1
+
+
+class TestTemplateResponses:
+    """Tests for conditional and encoded template responses via the app."""
+
+    async def test_index_has_strong_etag(self, client):
+        response = await client.get("/", headers={"Accept-Encoding": "identity"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/html")
+        etag = response.headers["etag"]
+        assert etag.startswith('"') and not etag.startswith("W/")
+
+    async def test_if_none_match_returns_304(self, client):
+        first = await client.get("/problem.html")
+
+        second = await client.get(
+            "/problem.html", headers={"If-None-Match": first.headers["etag"]}
+        )
+
+        assert second.status_code == status.HTTP_304_NOT_MODIFIED
+        assert second.content == b""
+        assert second.headers["etag"] == first.headers["etag"]
+
+    async def test_stale_etag_returns_full_body(self, client):
+        response = await client.get("/register", headers={"If-None-Match": '"stale"'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert b"<html" in response.content.lower()
+
+    async def test_brotli_preferred_when_accepted(self, client):
+        response = await client.get("/", headers={"Accept-Encoding": "gzip, br"})
+
+        assert response.headers["content-encoding"] == "br"
+        assert response.headers["vary"] == "Accept-Encoding"
+
+    async def test_gzip_when_brotli_not_accepted(self, client):
+        response = await client.get("/", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert b"<html" in response.content.lower()
+
+    async def test_304_keeps_problemset_headers(self, client, db_session, test_teacher):
+        db_session.add(
+            TaskList(title="ETag Set", unique_link_code="ETAG01", teacher_id=test_teacher.id)
+        )
+        await db_session.commit()
+        first = await client.get("/set/ETAG01/tasks/7")
+
+        second = await client.get(
+            "/set/ETAG01/tasks/7", headers={"If-None-Match": first.headers["etag"]}
+        )
+
+        assert second.status_code == status.HTTP_304_NOT_MODIFIED
+        assert second.headers["X-Problemset-Code"] == "ETAG01"
+        assert second.headers["X-Task-Id"] == "7"
+
+    async def test_teacher_pages_keep_no_store(self, client, test_teacher):
+        token = create_access_token({"sub": test_teacher.username})
+        client.cookies.set("access_token", token)
+        response = await client.get("/exerciselist")
+        client.cookies.clear()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "no-store" in response.headers["cache-control"]
+        assert response.headers["pragma"] == "no-cache"